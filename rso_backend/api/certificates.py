@@ -0,0 +1,467 @@
+import io
+import os
+import zipfile
+from datetime import datetime
+
+import pdfrw
+from django.conf import settings
+from pdfrw import PdfArray, PdfDict
+from pdfrw.buildxobj import pagexobj
+from pdfrw.toreportlab import makerl
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.exceptions import NotFound, ValidationError
+
+from api.utils import process_map, text_to_lines
+from headquarters.models import UserRegionalHeadquarterPosition
+from users.models import RSOUser
+
+EXTERNAL_CERT = 'external_cert.pdf'
+INTERNAL_CERT = 'internal_cert.pdf'
+# Шаблоны справок и соответствующие им типы в логах выдачи.
+CERT_TYPES = {
+    EXTERNAL_CERT: 'Для работодателя',
+    INTERNAL_CERT: 'Внутренняя справка',
+}
+# Автор задачи формирования справок, сохраняется при ее постановке:
+# у задач в состоянии PENDING и FAILURE нет метаданных с issuer_id.
+CERTS_JOB_ISSUER_CACHE_KEY = 'member_certs_job_issuer:{task_id}'
+
+
+class CertLayout:
+    """Размеры шрифтов и координаты полей на листе справки."""
+
+    TIMES_HEAD_SIZE = 15
+    TIMES_TEXT_SIZE = 14
+    ARIAL_TEXT_SIZE = 9
+    HEAD_Y = 800
+    VERTICAL_DISP = 155
+    VERTICAL_RECIPIENT_DISP = 10
+    VERTICAL_DISP_REQ = 160
+    HORIZONTAL_DISP = 11
+    HORIZONTAL_DISP_RECIPIENT = 12
+    REQUISITES_X = 140
+    REQUISITES_Y = 729
+    LETTER_NUMBER_X = 50
+    LETTER_NUMBER_Y = 650
+    NAME_X = 135
+    NAME_Y = 529
+    BIRTHDAY_X = 126
+    BIRTHDAY_Y = 496
+    CERT_DATE_X = 160
+    CERT_DATE_Y = 432
+    REG_CASE_NAME_X = 29
+    REG_CASE_NAME_Y = 385
+    REG_NUMBER_X = 140
+    REG_NUMBER_Y = 360
+    INN_X = 380
+    INN_Y = 309
+    SNILS_X = 380
+    SNILS_Y = 291
+    RECIPIENT_X = 33
+    RECIPIENT_Y = 230
+    RECIPIENT_INTERNAL_X = 33
+    RECIPIENT_INTERNAL_Y = 282
+    RECIPIENT_LINE_X = 25
+    RECIPIENT_LINE_Y = 240
+    POSITION_PROC_PROP = 0.3
+    POSITION_PROC_X = 25
+    POSITION_PROC_Y = 99
+    POSITION_PROC_LINE_Y = 110
+    FIO = 3
+    FI = 2
+    SIGNATORY_X = 450
+    SIGNATORY_Y = 85
+
+
+CERT_SAMPLES_DIR = os.path.join(str(settings.BASE_DIR), 'templates', 'samples')
+# Шрифты справок: имя в reportlab и файл в CERT_SAMPLES_DIR/fonts.
+CERT_FONTS = {
+    'Times_New_Roman': 'times.ttf',
+    'Arial_Narrow': 'arialnarrow.ttf',
+}
+# Разобранные шаблоны справок текущего процесса.
+_cert_templates = {}
+
+
+def get_cert_template(cert_template: str, reload: bool = False):
+    """
+    Шаблон справки в виде Form XObject.
+
+    Шаблон разбирается один раз на процесс и переиспользуется
+    для всех справок.
+    """
+    template_obj = _cert_templates.get(cert_template)
+    if reload or template_obj is None:
+        template = pdfrw.PdfReader(
+            os.path.join(CERT_SAMPLES_DIR, cert_template), decompress=False
+        ).pages[0]
+        template_obj = _cert_templates[cert_template] = pagexobj(template)
+    return template_obj
+
+
+def register_cert_fonts(reload: bool = False):
+    """
+    Регистрирует шрифты справок в reportlab.
+
+    Разбор TTF-файлов - самая долгая часть подготовки справки,
+    поэтому уже зарегистрированные шрифты не загружаются повторно.
+    """
+    registered = pdfmetrics.getRegisteredFontNames()
+    for font_name, file_name in CERT_FONTS.items():
+        if reload or font_name not in registered:
+            pdfmetrics.registerFont(TTFont(
+                font_name, os.path.join(CERT_SAMPLES_DIR, 'fonts', file_name)
+            ))
+
+
+def load_cert_resources(reload: bool = False):
+    """
+    Загружает шаблоны и шрифты справок в текущий процесс.
+
+    Вызывается при старте процесса воркера Celery, чтобы первая
+    справка не ждала загрузки.
+
+    :param reload: загрузить заново, даже если уже загружены
+    """
+    register_cert_fonts(reload)
+    for cert_template in CERT_TYPES:
+        get_cert_template(cert_template, reload)
+
+
+def _release_cert_template(template_obj, rldoc):
+    """
+    Удаляет из объектов шаблона ссылки на документ reportlab.
+
+    makerl запоминает на каждом объекте pdfrw созданный для документа
+    объект reportlab. Без очистки закешированный шаблон удерживал бы
+    в памяти все отрисованные справки.
+    """
+    stack = [template_obj]
+    seen = set()
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        derived = getattr(obj, 'derived_rl_obj', None)
+        if derived:
+            derived.pop(rldoc, None)
+        if isinstance(obj, PdfDict):
+            stack.extend(value for _, value in obj.iteritems())
+        elif isinstance(obj, PdfArray):
+            stack.extend(obj)
+
+
+def _format_date(value):
+    return value.strftime('%d.%m.%Y') if value else None
+
+
+def get_certificates_data(user_ids, data: dict, issuer,
+                          cert_template=INTERNAL_CERT) -> list[dict]:
+    """
+    Собирает данные справок для списка пользователей.
+
+    Пользователи, их документы, региональные штабы и командиры штабов
+    загружаются двумя запросами на всю пачку. Результат содержит только
+    строки, поэтому передается в Celery и в процессы рендеринга.
+
+    :param user_ids: id пользователей
+    :param data: данные запроса (даты, получатель, подписант)
+    :param issuer: пользователь, выдающий справки
+    :param cert_template: шаблон справки
+    :raises ValidationError: если данных для справки недостаточно
+    :raises NotFound: если пользователь не найден
+    :return: данные справок в порядке user_ids
+    """
+    if data.get('cert_start_date') is None:
+        raise ValidationError(
+            {'detail': 'Не указана дата начала действия сертификата.'}
+        )
+    cert_start_date = datetime.strptime(data['cert_start_date'], '%Y-%m-%d')
+    cert_end_date = datetime.strptime(data.get('cert_end_date'), '%Y-%m-%d')
+    issuer_name = ' '.join(
+        name for name in (
+            issuer.last_name, issuer.first_name, issuer.patronymic_name
+        ) if name is not None
+    )
+    common_data = {
+        'cert_template': cert_template,
+        'recipient': data.get('recipient', 'по месту требования'),
+        'cert_start_date': _format_date(cert_start_date),
+        'cert_end_date': _format_date(cert_end_date),
+        'signatory': data.get('signatory', issuer_name),
+        'position_procuration': data.get(
+            'position_procuration', 'Руководитель регионального отделения'
+        ),
+    }
+    users = RSOUser.objects.filter(
+        id__in=user_ids
+    ).select_related('documents').in_bulk()
+    regional_headquarters = {
+        position.user_id: position.headquarter
+        for position in UserRegionalHeadquarterPosition.objects.filter(
+            user_id__in=user_ids
+        ).select_related('headquarter__commander')
+    }
+    certificates_data = []
+    for user_id in user_ids:
+        user = users.get(user_id)
+        if user is None:
+            raise NotFound(f'Пользователь с id {user_id} не найден.')
+        user_docs = getattr(user, 'documents', None)
+        if (
+            user_docs is None
+            or user_docs.inn is None
+            or user_docs.snils is None
+        ):
+            raise ValidationError({
+                'detail': f'Документы пользователя {user.username} '
+                          'не заполнены.'
+            })
+        regional_headquarter = regional_headquarters.get(user_id)
+        if regional_headquarter is None:
+            raise ValidationError({
+                'detail': 'Не удалось определить региональный штаб '
+                          f'пользователя {user.username}.'
+            })
+        if (
+            not (user.last_name or user.first_name or user.patronymic_name)
+            or not user.date_of_birth
+        ):
+            raise ValidationError({
+                'detail': f'Профиль пользователя {user.username} не заполнен.'
+            })
+        if not regional_headquarter.registry_date:
+            raise ValidationError({
+                'detail': f'Данные РШ {regional_headquarter} не заполнены.'
+            })
+        commander = regional_headquarter.commander
+        certificates_data.append({
+            **common_data,
+            'user_id': user.id,
+            'filename': f'{user.username}.pdf',
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'patronymic_name': user.patronymic_name,
+            'date_of_birth': _format_date(user.date_of_birth),
+            'inn': user_docs.inn,
+            'snils': user_docs.snils,
+            'regional_headquarter': str(regional_headquarter),
+            'reg_case_name': regional_headquarter.case_name,
+            'legal_address': str(regional_headquarter.legal_address),
+            'requisites': str(regional_headquarter.requisites),
+            'registry_number': str(regional_headquarter.registry_number),
+            'registry_date': _format_date(regional_headquarter.registry_date),
+            'commander_first_name': commander.first_name,
+            'commander_last_name': commander.last_name,
+            'commander_patronymic_name': commander.patronymic_name,
+        })
+    return certificates_data
+
+
+def _draw_lines(c, text, x, y, proportion, line_step):
+    """Переносит текст по строкам, начиная с y - HORIZONTAL_DISP."""
+    line_break = CertLayout.HORIZONTAL_DISP
+    for line in text_to_lines(text=text, proportion=proportion):
+        c.drawString(x, y - line_break, line)
+        line_break += line_step
+
+
+def _draw_recipient(c, recipient, page_width, x, y):
+    string_width = c.stringWidth(
+        recipient, 'Times_New_Roman', CertLayout.TIMES_TEXT_SIZE
+    )
+    line_width = page_width - CertLayout.VERTICAL_RECIPIENT_DISP
+    proportion = line_width / string_width
+    if proportion >= 1.0:
+        c.drawString(line_width/2 - string_width/2, y, recipient)
+    else:
+        _draw_lines(
+            c, recipient, x, y, proportion,
+            CertLayout.HORIZONTAL_DISP_RECIPIENT
+        )
+
+
+def _draw_signatory(c, data):
+    layout = CertLayout
+    if data['cert_template'] == EXTERNAL_CERT:
+        signatory_list = data['signatory'].split()
+        if len(signatory_list) == layout.FIO:
+            signatory = (
+                signatory_list[0] + ' ' + signatory_list[1][0] + '.'
+                + signatory_list[2][0] + '.'
+            )
+        elif len(signatory_list) == layout.FI:
+            signatory = signatory_list[0] + ' ' + signatory_list[1][0] + '.'
+        else:
+            signatory = data['signatory']
+        c.drawString(layout.SIGNATORY_X, layout.SIGNATORY_Y, signatory)
+        return
+    first_name = data['commander_first_name']
+    last_name = data['commander_last_name']
+    patronymic_name = data['commander_patronymic_name']
+    if first_name and last_name and patronymic_name:
+        c.drawString(
+            layout.SIGNATORY_X,
+            layout.SIGNATORY_Y,
+            str(first_name)[0].upper() + '.'
+            + str(patronymic_name)[0].upper() + '. '
+            + str(last_name).capitalize()
+        )
+    elif first_name and last_name:
+        c.drawString(
+            layout.SIGNATORY_X,
+            layout.SIGNATORY_Y,
+            str(first_name)[0].upper() + '. ' + str(last_name).capitalize()
+        )
+
+
+def render_certificate(data: dict) -> bytes:
+    """
+    Рендерит справку о членстве в PDF.
+
+    Функция не обращается к БД и может выполняться в пуле процессов.
+
+    :param data: данные справки из get_certificates_data
+    :return: содержимое PDF-файла
+    """
+    layout = CertLayout
+
+    """Подготовка шаблона и шрифтов к выводу информации на лист."""
+    template_obj = get_cert_template(data['cert_template'])
+    register_cert_fonts()
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4, bottomup=1)
+    xobj_name = makerl(c, template_obj)
+    c.doForm(xobj_name)
+
+    """Блок вывода названия РШ в заголовок листа."""
+    c.setFont('Times_New_Roman', layout.TIMES_HEAD_SIZE)
+    page_width = c._pagesize[0]
+    string_width = c.stringWidth(
+        data['regional_headquarter'],
+        'Times_New_Roman',
+        layout.TIMES_HEAD_SIZE
+    )
+    center_x = (page_width - string_width) / 2 + layout.VERTICAL_DISP
+    c.drawCentredString(center_x, layout.HEAD_Y, data['regional_headquarter'])
+
+    """Блок вывода юр.адреса и реквизитов РШ под заголовком.
+
+    Функция text_to_lines разбивает текст на строки, длина строки
+    определяется долей ширины поля на листе.
+    """
+    c.setFont('Arial_Narrow', layout.ARIAL_TEXT_SIZE)
+    text = data['legal_address'] + '.  ' + data['requisites']
+    string_width = c.stringWidth(text, 'Arial_Narrow', layout.ARIAL_TEXT_SIZE)
+    _draw_lines(
+        c, text, layout.REQUISITES_X, layout.REQUISITES_Y,
+        (page_width - layout.VERTICAL_DISP_REQ) / string_width,
+        layout.HORIZONTAL_DISP
+    )
+    c.drawString(
+        layout.LETTER_NUMBER_X,
+        layout.LETTER_NUMBER_Y,
+        'б/н от ' + datetime.now().strftime('%d.%m.%Y')
+    )
+
+    """Блок вывода информации о пользователе и РШ в тексте справки."""
+    c.setFont('Times_New_Roman', layout.TIMES_TEXT_SIZE)
+    last_name = data['last_name']
+    first_name = data['first_name']
+    patronymic_name = data['patronymic_name']
+    if last_name and first_name and patronymic_name:
+        c.drawString(
+            layout.NAME_X,
+            layout.NAME_Y,
+            last_name + ' ' + first_name + ' ' + patronymic_name
+        )
+    if last_name and first_name and not patronymic_name:
+        c.drawString(
+            layout.NAME_X, layout.NAME_Y, last_name + ' ' + first_name
+        )
+    c.drawString(
+        layout.BIRTHDAY_X, layout.BIRTHDAY_Y, data['date_of_birth'] + ' г.'
+    )
+    c.drawString(
+        layout.CERT_DATE_X,
+        layout.CERT_DATE_Y,
+        f'c {data["cert_start_date"]} г. по {data["cert_end_date"]} г.'
+    )
+    c.drawString(
+        layout.REG_CASE_NAME_X, layout.REG_CASE_NAME_Y, data['reg_case_name']
+    )
+    c.drawString(
+        layout.REG_NUMBER_X,
+        layout.REG_NUMBER_Y,
+        f'{data["registry_number"]} от {data["registry_date"]} г.'
+    )
+    if layout.POSITION_PROC_PROP >= 1.0:
+        c.drawString(
+            layout.POSITION_PROC_X,
+            layout.POSITION_PROC_Y,
+            data['position_procuration']
+        )
+    else:
+        _draw_lines(
+            c, data['position_procuration'],
+            layout.POSITION_PROC_X, layout.POSITION_PROC_LINE_Y,
+            layout.POSITION_PROC_PROP, layout.HORIZONTAL_DISP_RECIPIENT
+        )
+    if data['cert_template'] == EXTERNAL_CERT:
+        c.drawString(layout.INN_X, layout.INN_Y, data['inn'])
+        c.drawString(layout.SNILS_X, layout.SNILS_Y, data['snils'])
+        _draw_recipient(
+            c, data['recipient'], page_width,
+            layout.RECIPIENT_X, layout.RECIPIENT_Y
+        )
+    else:
+        _draw_recipient(
+            c, data['recipient'], page_width,
+            layout.RECIPIENT_INTERNAL_X, layout.RECIPIENT_INTERNAL_Y
+        )
+    _draw_signatory(c, data)
+    c.showPage()
+    c.save()
+    _release_cert_template(template_obj, c._doc)
+    return buf.getvalue()
+
+
+def get_certificates_archive_path(archive_name: str) -> str:
+    return os.path.join(settings.MEMBER_CERTS_ROOT, archive_name)
+
+
+def write_certificates_archive(certificates_data, archive_name: str,
+                               workers: int = None, progress=None) -> str:
+    """
+    Рендерит справки в пуле процессов и записывает их в ZIP-архив на диске.
+
+    Справки добавляются в архив по мере готовности, в памяти
+    одновременно находятся только справки, ожидающие записи.
+
+    :param certificates_data: данные справок из get_certificates_data
+    :param archive_name: имя архива в MEMBER_CERTS_ROOT
+    :param workers: количество процессов, по умолчанию - число ядер
+    :param progress: функция, которая вызывается с количеством
+                     записанных справок
+    :return: путь к архиву
+    """
+    archive_path = get_certificates_archive_path(archive_name)
+    # Процессы пула наследуют загруженные шаблоны и шрифты.
+    load_cert_resources()
+    os.makedirs(settings.MEMBER_CERTS_ROOT, exist_ok=True)
+    tmp_path = archive_path + '.tmp'
+    with zipfile.ZipFile(tmp_path, 'w') as archive:
+        for rendered, (data, certificate) in enumerate(zip(
+            certificates_data,
+            process_map(render_certificate, certificates_data, workers)
+        ), start=1):
+            archive.writestr(data['filename'], certificate)
+            if progress is not None:
+                progress(rendered)
+    # Архив появляется под итоговым именем только целиком.
+    os.replace(tmp_path, archive_path)
+    return archive_path
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.certificates import (CERT_TYPES, get_cert_template,
+                              load_cert_resources, register_cert_fonts,
+                              render_certificate)
+
+SAMPLE_CERTIFICATE_DATA = {
+    'user_id': 1,
+    'filename': 'sample.pdf',
+    'recipient': 'по месту требования',
+    'cert_start_date': '01.01.2024',
+    'cert_end_date': '31.12.2024',
+    'signatory': 'Иванов Иван Иванович',
+    'position_procuration': 'Руководитель регионального отделения',
+    'first_name': 'Петр',
+    'last_name': 'Петров',
+    'patronymic_name': 'Петрович',
+    'date_of_birth': '01.01.2000',
+    'inn': '123456789012',
+    'snils': '12345678901',
+    'regional_headquarter': 'Региональный штаб',
+    'reg_case_name': 'Региональном штабе',
+    'legal_address': 'г. Москва, ул. Тверская, д. 1',
+    'requisites': 'ИНН 7700000000, КПП 770001001, ОГРН 1027700000000',
+    'registry_number': '123',
+    'registry_date': '01.01.2020',
+    'commander_first_name': 'Иван',
+    'commander_last_name': 'Иванов',
+    'commander_patronymic_name': 'Иванович',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время рендеринга справок о членстве с загрузкой шаблона '
+        'и шрифтов для каждой справки и с загруженными один раз.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=500,
+            help='Количество справок в каждом замере.'
+        )
+
+    def measure(self, count, reload):
+        templates = list(CERT_TYPES)
+        start = time.perf_counter()
+        for number in range(count):
+            cert_template = templates[number % len(templates)]
+            if reload:
+                # Как до кеширования: шаблон и шрифты заново для справки.
+                get_cert_template(cert_template, reload=True)
+                register_cert_fonts(reload=True)
+            render_certificate({
+                **SAMPLE_CERTIFICATE_DATA, 'cert_template': cert_template
+            })
+        return (time.perf_counter() - start) / count * 1000
+
+    def handle(self, *args, **options):
+        count = options['count']
+        load_cert_resources()
+        cold = self.measure(count, reload=True)
+        cached = self.measure(count, reload=False)
+        self.stdout.write(
+            f'Загрузка для каждой справки: {cold:.1f} мс/справка\n'
+            f'Загрузка один раз на процесс: {cached:.1f} мс/справка'
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Ускорение: {cold / cached:.1f}x')
+        )
@@ -1,24 +1,26 @@
-from django.db.models import QuerySet, Q
+from django.db.models import QuerySet
 from django.shortcuts import get_object_or_404
 from rest_framework import permissions, status
 from rest_framework.permissions import BasePermission
 from rest_framework.response import Response
 
-from api.utils import (check_commander_or_not, check_roles_for_edit,
+from api.utils import (UNIT_POSITION_MODELS, check_commander_in_units,
+                       check_commander_or_not, check_roles_for_edit,
                        check_trusted_for_centralhead,
                        check_trusted_for_detachments,
                        check_trusted_for_districthead,
                        check_trusted_for_eduhead, check_trusted_for_localhead,
                        check_trusted_for_regionalhead,
                        check_trusted_in_headquarters, check_trusted_user,
+                       get_district_headquarter_id, get_role_context,
                        is_commander_this_detachment,
                        is_regional_commander, is_regional_commissioner,
                        is_safe_method,
                        get_detachment_commander_num, is_regional_commander,
                        get_regional_hq_commander_num, is_safe_method,
                        is_stuff_or_central_commander)
-from competitions.models import CompetitionParticipants, Q13DetachmentReport, Q5DetachmentReport
-from competitions.utils import is_competition_participant
+from competitions.models import Q13DetachmentReport, Q5DetachmentReport
+from competitions.pairing import get_participation
 from events.models import Event, EventOrganizationData
 from headquarters.models import (CentralHeadquarter, Detachment,
                                  DistrictHeadquarter, EducationalHeadquarter,
@@ -30,7 +32,6 @@ from headquarters.models import (CentralHeadquarter, Detachment,
                                  UserLocalHeadquarterPosition,
                                  UserRegionalHeadquarterPosition)
 from users.models import RSOUser, UserVerificationRequest
-from users.serializers import UserCommanderSerializer, UserTrustedSerializer
 
 
 class IsStuffOrCentralCommander(BasePermission):
@@ -143,9 +144,9 @@ class IsRegionalCommander(BasePermission):
         user_id = request.user.id
         if isinstance(obj, RegionalHeadquarter) and (
                 user_id == obj.commander_id
-                or (
-                        user_id == obj.district_headquarter.commander_id
-                )
+                or check_commander_in_units(request, [
+                    (DistrictHeadquarter, obj.district_headquarter_id)
+                ])
         ):
             check_model_instance = True
         check_roles = any([
@@ -182,6 +183,14 @@ class IsLocalCommander(BasePermission):
             check_commander_or_not(request, headquarters),
         ])
 
+    @staticmethod
+    def check_parent_commanders(request, obj):
+        """Является ли юзер командиром РШ или ОШ, к которым относится obj."""
+        return check_commander_in_units(request, [
+            (RegionalHeadquarter, obj.regional_headquarter_id),
+            (DistrictHeadquarter, lambda: get_district_headquarter_id(obj)),
+        ])
+
     def has_object_permission(self, request, view, obj):
         """Метод, для проверки доступа к эндпоинтам МШ.
 
@@ -190,14 +199,9 @@ class IsLocalCommander(BasePermission):
 
         check_model_instance = False
         user_id = request.user.id
-        regional_head = obj.regional_headquarter
-        if isinstance(obj, LocalHeadquarter) and any(
-                user_id == commander.commander_id
-                for commander in [
-                    obj,
-                    regional_head,
-                    regional_head.district_headquarter
-                ]
+        if isinstance(obj, LocalHeadquarter) and (
+                user_id == obj.commander_id
+                or self.check_parent_commanders(request, obj)
         ):
             check_model_instance = True
         check_roles = any([
@@ -244,21 +248,15 @@ class IsEducationalCommander(BasePermission):
         check_model_instance = False
         check_local_head = False
         user_id = request.user.id
-        regional_head = obj.regional_headquarter
-        if isinstance(obj, EducationalHeadquarter) and any(
-                user_id == commander.commander_id
-                for commander in [
-                    obj,
-                    regional_head,
-                    regional_head.district_headquarter
-                ]
+        if isinstance(obj, EducationalHeadquarter) and (
+                user_id == obj.commander_id
+                or IsLocalCommander.check_parent_commanders(request, obj)
         ):
             check_model_instance = True
-        if local_head := obj.local_headquarter:
-            if isinstance(obj, Detachment) and (
-                    user_id == local_head.commander_id
-            ):
-                check_local_head = True
+        if isinstance(obj, Detachment) and check_commander_in_units(
+                request, [(LocalHeadquarter, obj.local_headquarter_id)]
+        ):
+            check_local_head = True
         check_roles = any([
             is_safe_method(request),
             is_stuff_or_central_commander(request),
@@ -283,35 +281,16 @@ class IsDetachmentCommander(BasePermission):
 
     @classmethod
     def check_instances(cls, request, obj=None):
-        check_model_instance = False
-        check_local_head = False
-        check_edu_head = False
-        user_id = request.user.id
-        regional_head = obj.regional_headquarter
-        if isinstance(obj, Detachment) and any(
-                user_id == commander.commander_id
-                for commander in [
-                    obj,
-                    regional_head,
-                    regional_head.district_headquarter
-                ]
-        ):
-            check_model_instance = True
-        if local_head := obj.local_headquarter:
-            if isinstance(obj, Detachment) and (
-                    user_id == local_head.commander_id
-            ):
-                check_local_head = True
-        if edu_head := obj.educational_headquarter:
-            if isinstance(obj, Detachment) and (
-                    user_id == edu_head.commander_id
-            ):
-                check_edu_head = True
-        return any([
-            check_model_instance,
-            check_local_head,
-            check_edu_head
-        ])
+        if not isinstance(obj, Detachment):
+            return False
+        return (
+            request.user.id == obj.commander_id
+            or IsLocalCommander.check_parent_commanders(request, obj)
+            or check_commander_in_units(request, [
+                (LocalHeadquarter, obj.local_headquarter_id),
+                (EducationalHeadquarter, obj.educational_headquarter_id),
+            ])
+        )
 
     def has_permission(self, request, view):
         if request.method in ('PATCH', 'PUT'):
@@ -415,31 +394,21 @@ class IsRegStuffOrDetCommander(BasePermission):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if reg_headquarter.commander == user:
+        if reg_headquarter.commander_id == user.id:
             return True
 
-        try:
-            reg_headquarter_member = (
-                UserRegionalHeadquarterPosition.
-                objects.get(user=user, headquarter=reg_headquarter)
-            )
-        except (UserRegionalHeadquarterPosition.DoesNotExist, AttributeError):
-            reg_headquarter_member = None
-
-        if reg_headquarter_member:
-            if reg_headquarter_member.is_trusted:
-                return True
-
-        try:
-            user_in_detachment = UserDetachmentPosition.objects.get(
-                user=user_to_verify
-            )
-        except (UserDetachmentPosition.DoesNotExist, AttributeError):
-            return False
-
-        if user_in_detachment.headquarter.commander == user:
+        role_context = get_role_context(user)
+        if role_context.is_trusted(
+            UserRegionalHeadquarterPosition, reg_headquarter.id
+        ):
             return True
-        return False
+
+        detachment_id = role_context.commander_id(Detachment)
+        return detachment_id is not None and (
+            UserDetachmentPosition.objects.filter(
+                user=user_to_verify, headquarter_id=detachment_id
+            ).exists()
+        )
 
 
 class MembershipFeePermission(BasePermission):
@@ -452,37 +421,17 @@ class MembershipFeePermission(BasePermission):
         user = request.user
         user_to_change = get_object_or_404(RSOUser, id=view.kwargs.get('pk'))
 
-        try:
-            reg_headquarter = RegionalHeadquarter.objects.get(commander=user)
-            if reg_headquarter:
-                return True
-        except RegionalHeadquarter.DoesNotExist:
-            try:
-                reg_headquarter = (
-                    UserRegionalHeadquarterPosition.
-                    objects.get(user=user_to_change)
-                ).headquarter
-            except (
-                UserRegionalHeadquarterPosition.DoesNotExist, AttributeError
-            ):
-                return False
-
-            if reg_headquarter.commander == user:
-                return True
-
-            try:
-                reg_headquarter_member = (
-                    UserRegionalHeadquarterPosition.
-                    objects.get(user=user, headquarter=reg_headquarter)
-                )
-            except (
-                UserRegionalHeadquarterPosition.DoesNotExist, AttributeError
-            ):
-                return False
-            if reg_headquarter_member:
-                if reg_headquarter_member.is_trusted:
-                    return True
+        role_context = get_role_context(user)
+        if role_context.is_commander([RegionalHeadquarter]):
+            return True
+        reg_headquarter_id = UserRegionalHeadquarterPosition.objects.filter(
+            user=user_to_change
+        ).values_list('headquarter_id', flat=True).first()
+        if reg_headquarter_id is None:
             return False
+        return role_context.is_trusted(
+            UserRegionalHeadquarterPosition, reg_headquarter_id
+        )
 
 
 class IsRegionalCommanderForCert(BasePermission):
@@ -505,22 +454,28 @@ class IsRegionalCommanderForCert(BasePermission):
                 {'detail': 'Поле "ids" не может быть пустым.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        try:
-            commanders_regional_head_id = RegionalHeadquarter.objects.filter(
-                commander_id=request.user.id
-            ).first().id
+        commanders_regional_head_id = get_role_context(
+            request.user
+        ).commander_id(RegionalHeadquarter)
+        if commanders_regional_head_id is None:
+            check_model_instance = False
+        else:
+            users_regional_head_ids = dict(
+                UserRegionalHeadquarterPosition.objects.filter(
+                    user_id__in=ids
+                ).values_list('user_id', 'headquarter_id')
+            )
             for id in ids:
                 if id == 0:
                     return Response(
                         {'detail': 'Поле "ids" не может содержать 0.'},
                     )
-                users_regional_head_id = (
-                    UserRegionalHeadquarterPosition.objects.get(
-                        user_id=id
-                    ).headquarter_id
-                )
+                if id not in users_regional_head_ids:
+                    check_model_instance = False
+                    break
                 if (
-                    users_regional_head_id != commanders_regional_head_id
+                    users_regional_head_ids[id]
+                    != commanders_regional_head_id
                 ):
                     check_model_instance = False
                     self.message = (
@@ -528,12 +483,6 @@ class IsRegionalCommanderForCert(BasePermission):
                         ' не из вашего регионального штаба.'
                     )
                     break
-        except (
-            RegionalHeadquarter.DoesNotExist,
-            AttributeError,
-            UserRegionalHeadquarterPosition.DoesNotExist
-        ):
-            check_model_instance = False
         return any([
             is_stuff_or_central_commander(request),
             check_model_instance,
@@ -653,9 +602,9 @@ class IsCommander(BasePermission):
         available_structural_model = self._STRUCTURAL_MAPPING.get(
             event.available_structural_units
         )
-        return available_structural_model.objects.filter(
-            commander=request.user
-        ).exists() and request.user.is_verified
+        return get_role_context(request.user).is_commander(
+            [available_structural_model]
+        ) and request.user.is_verified
 
 
 class IsAuthorMultiEventApplication(BasePermission):
@@ -678,71 +627,6 @@ class IsUserModelPositionCommander(permissions.BasePermission):
     при обращении к эндпоинтам членов штабов.
     """
 
-    POSITIONS = {
-        UserCentralHeadquarterPosition: [
-            'centralheadquarter_commander',
-            'centralheadquarter_trusted'
-        ],
-        UserDistrictHeadquarterPosition: [
-            'districtheadquarter_commander',
-            'districtheadquarter_trusted'
-        ],
-        UserRegionalHeadquarterPosition: [
-            'regionalheadquarter_commander',
-            'regionalheadquarter_trusted'
-        ],
-        UserLocalHeadquarterPosition: [
-            'localheadquarter_commander',
-            'localheadquarter_trusted'
-        ],
-        UserEducationalHeadquarterPosition: [
-            'educationalheadquarter_commander',
-            'educationalheadquarter_trusted'
-        ],
-        UserDetachmentPosition: [
-            'detachment_commander',
-            'detachment_trusted'
-        ]
-    }
-
-    def prepare_data_commander(self, request):
-        """Метод создает словарь со штабами/отрядами, где юзер - командир.
-
-        Пример словаря prepared_data, возвращаемого этим методом:
-        {
-            'centralheadquarter_commander': 1,
-            'localheadquarter_commander': 2,
-            ...
-            'detachment_commander': 3
-        }
-        """
-
-        data = UserCommanderSerializer(request.user).data
-        prepared_data = {}
-        for key, value in data.items():
-            if value and type(value) is not int:
-                prepared_data[key] = value['id']
-            else:
-                prepared_data[key] = value
-        return prepared_data
-
-    def prepare_data_trusted(self, request):
-        """Метод создает словарь со штабами/отрядами, где юзер - доверенный.
-
-        Пример словаря prepared_data, возвращаемого этим методом:
-        {
-            'centralheadquarter_trusted': 1,
-            'localheadquarter_trusted': 2,
-        }
-        """
-
-        data = UserTrustedSerializer(request.user).data
-        prepared_data = {}
-        for key, value in data.items():
-            if value:
-                prepared_data[key] = value
-        return prepared_data
-
     def has_permission(self, request, view):
         if (
             request.method in ['PUT', 'PATCH']
@@ -754,17 +638,14 @@ class IsUserModelPositionCommander(permissions.BasePermission):
         return False
 
     def has_object_permission(self, request, view, obj):
-        headquarter_id = obj.headquarter.id
-        prepared_data = (
-            self.prepare_data_commander(request)
-            | self.prepare_data_trusted(request)
-        )
-        for prepared_key, prepared_value in prepared_data.items():
-            for model_position, commander_or_trusted in self.POSITIONS.items():
-                if prepared_key in commander_or_trusted:
-                    if isinstance(obj, model_position):
-                        if headquarter_id == prepared_value:
-                            return True
+        headquarter_id = obj.headquarter_id
+        role_context = get_role_context(request.user)
+        for unit_model, model_position in UNIT_POSITION_MODELS.items():
+            if isinstance(obj, model_position):
+                return (
+                    role_context.commander_id(unit_model) == headquarter_id
+                    or role_context.is_trusted(model_position, headquarter_id)
+                )
         return False
 
 
@@ -774,11 +655,11 @@ class IsCommanderOrTrustedAnywhere(BasePermission):
     лицом хотя бы где-либо.
     """
     def has_object_permission(self, request, view, obj):
-        commander_data = UserCommanderSerializer(request.user).data
-        trusted_data = UserTrustedSerializer(request.user).data
-        if any(commander_data.values()) or any(trusted_data.values()):
-            return True
-        return False
+        role_context = get_role_context(request.user)
+        return (
+            role_context.is_commander()
+            or role_context.is_trusted_anywhere()
+        )
 
 
 class IsRegionalCommanderOrAdmin(BasePermission):
@@ -822,23 +703,19 @@ class IsCommanderAndCompetitionParticipant(BasePermission):
     """
     def has_permission(self, request, view):
         competition = view.get_competitions()
-        try:
-            detachment = request.user.detachment_commander
-        except Detachment.DoesNotExist:
-            return False
-        return (
-            CompetitionParticipants.objects.filter(
-                Q(competition=competition, detachment=detachment) |
-                Q(competition=competition, junior_detachment=detachment)
-            ).exists()
+        detachment_id = get_role_context(request.user).commander_id(
+            Detachment
         )
+        if detachment_id is None:
+            return False
+        return get_participation(competition.id, detachment_id) is not None
 
     def has_object_permission(self, request, view, obj):
         detachment = view.get_detachment(obj)
         competition = view.get_competitions()
         return (
             is_commander_this_detachment(request.user, detachment) and
-            is_competition_participant(detachment, competition)
+            get_participation(competition.id, detachment.id) is not None
         )
 
 
@@ -855,16 +732,12 @@ class IsCompetitionParticipantAndCommander(
     """
     def has_permission(self, request, view):
         competition = view.get_competitions()
-        try:
-            detachment = request.user.detachment_commander
-        except Detachment.DoesNotExist:
-            return False
-        return (
-            CompetitionParticipants.objects.filter(
-                Q(competition=competition, detachment=detachment) |
-                Q(competition=competition, junior_detachment=detachment)
-            ).exists()
+        detachment_id = get_role_context(request.user).commander_id(
+            Detachment
         )
+        if detachment_id is None:
+            return False
+        return get_participation(competition.id, detachment_id) is not None
 
     def has_object_permission(self, request, view, obj):
         detachment = obj.detachment
@@ -872,7 +745,7 @@ class IsCompetitionParticipantAndCommander(
         if detachment:
             return (
                 is_commander_this_detachment(request.user, detachment) and
-                is_competition_participant(detachment, competition)
+                get_participation(competition.id, detachment.id) is not None
             )
 
 
@@ -936,9 +809,10 @@ class IsQ13DetachmentReportAuthor(permissions.BasePermission):
     """
 
     def has_permission(self, request, view):
-        try:
-            detachment_id = Detachment.objects.get(commander=request.user).id
-        except Detachment.DoesNotExist:
+        detachment_id = get_role_context(request.user).commander_id(
+            Detachment
+        )
+        if detachment_id is None:
             return False
         report_pk = view.kwargs.get('report_pk')
         report = get_object_or_404(Q13DetachmentReport, pk=report_pk)
@@ -952,9 +826,10 @@ class IsQ5DetachmentReportAuthor(permissions.BasePermission):
     """
 
     def has_permission(self, request, view):
-        try:
-            detachment_id = Detachment.objects.get(commander=request.user).id
-        except Detachment.DoesNotExist:
+        detachment_id = get_role_context(request.user).commander_id(
+            Detachment
+        )
+        if detachment_id is None:
             return False
         report_pk = view.kwargs.get('report_pk')
         report = get_object_or_404(Q5DetachmentReport, pk=report_pk)
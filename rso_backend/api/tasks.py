@@ -1,9 +1,14 @@
 import logging
+import os
+import time
 
 from celery import shared_task
+from celery.signals import worker_process_init
+from django.conf import settings
 from rest_framework import status
 from rest_framework.response import Response
 
+from api.certificates import load_cert_resources, write_certificates_archive
 from api.email import CustomPasswordResetEmail
 from users.models import RSOUser
 
@@ -27,3 +32,46 @@ def send_reset_password_email_without_user(data: dict):
             {'detail': 'Ошибка в email-адресе'},
             status=status.HTTP_204_NO_CONTENT
         )
+
+
+@worker_process_init.connect
+def load_member_cert_resources(**kwargs):
+    """Загрузка шаблонов и шрифтов справок при старте процесса воркера."""
+
+    load_cert_resources()
+
+
+@shared_task(bind=True)
+def generate_member_certificates(self, certificates_data: list,
+                                 issuer_id: int):
+    """Рендеринг пачки справок о членстве в ZIP-архив.
+
+    Ход рендеринга сохраняется в бэкенде результатов Celery в состоянии
+    PROGRESS. Архив сохраняется в MEMBER_CERTS_ROOT под id таски.
+    """
+
+    total = len(certificates_data)
+
+    def report_progress(rendered):
+        self.update_state(state='PROGRESS', meta={
+            'issuer_id': issuer_id, 'rendered': rendered, 'total': total
+        })
+
+    archive_name = f'{self.request.id}.zip'
+    write_certificates_archive(
+        certificates_data, archive_name, progress=report_progress
+    )
+    logger.info(f'Сформирован архив справок {archive_name}: {total} шт.')
+    return {'issuer_id': issuer_id, 'archive': archive_name, 'total': total}
+
+
+@shared_task
+def delete_expired_member_certs():
+    """Удаление архивов справок старше MEMBER_CERTS_ARCHIVE_TTL."""
+
+    if not os.path.isdir(settings.MEMBER_CERTS_ROOT):
+        return
+    expired_at = time.time() - settings.MEMBER_CERTS_ARCHIVE_TTL
+    for entry in os.scandir(settings.MEMBER_CERTS_ROOT):
+        if entry.is_file() and entry.stat().st_mtime < expired_at:
+            os.remove(entry.path)
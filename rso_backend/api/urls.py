@@ -16,7 +16,7 @@ from competitions.views import (
     CompetitionApplicationsViewSet, CompetitionParticipantsViewSet,
     CompetitionViewSet, Q10ViewSet, Q11ViewSet, Q12ViewSet, Q15DetachmentReportViewSet,
     Q19DetachmentReportViewset, Q20ViewSet, Q2DetachmentReportViewSet,
-    Q7ViewSet,
+    LeaderboardViewSet, Q7ViewSet,
     Q13DetachmentReportViewSet, Q13EventOrganizationViewSet,
     Q18DetachmentReportViewSet, Q8ViewSet, Q9ViewSet, get_place_q1,
     get_place_q3, get_place_q4,
@@ -115,6 +115,11 @@ router.register(
     CompetitionParticipantsViewSet,
     basename='competition-participants'
 )
+router.register(
+    r'competitions/(?P<competition_pk>\d+)/leaderboard',
+    LeaderboardViewSet,
+    basename='competition-leaderboard'
+)
 router.register(
     r'competitions/(?P<competition_pk>\d+)/reports/q2',
     Q2DetachmentReportViewSet,
@@ -2,19 +2,25 @@ import io
 import mimetypes
 import os
 import zipfile
-from datetime import datetime
-
-from django.db import IntegrityError
-from django.db.models import Q
-from django.http.response import HttpResponse
+from collections import namedtuple
+from urllib.parse import quote
+
+from billiard.pool import Pool
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connections, transaction
+from django.http.response import (FileResponse, HttpResponse,
+                                  StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
+from django.utils.http import content_disposition_header
 from rest_framework import serializers, status
 from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
-from competitions.models import CompetitionParticipants
 
+from competitions.pairing import get_participation
 from headquarters.models import (CentralHeadquarter, Detachment,
-                                 RegionalHeadquarter,
+                                 DistrictHeadquarter, EducationalHeadquarter,
+                                 LocalHeadquarter, RegionalHeadquarter,
                                  UserCentralHeadquarterPosition,
                                  UserDetachmentPosition,
                                  UserDistrictHeadquarterPosition,
@@ -24,6 +30,165 @@ from headquarters.models import (CentralHeadquarter, Detachment,
 from users.models import RSOUser
 
 
+# Размер блока, которым файлы читаются с диска при отдаче Django.
+FILE_CHUNK_SIZE = 64 * 1024
+
+# Модели структурных единиц и соответствующие им модели членства.
+UNIT_POSITION_MODELS = {
+    CentralHeadquarter: UserCentralHeadquarterPosition,
+    DistrictHeadquarter: UserDistrictHeadquarterPosition,
+    RegionalHeadquarter: UserRegionalHeadquarterPosition,
+    LocalHeadquarter: UserLocalHeadquarterPosition,
+    EducationalHeadquarter: UserEducationalHeadquarterPosition,
+    Detachment: UserDetachmentPosition,
+}
+
+USER_ROLES_CACHE_KEY = 'user_roles:{user_id}'
+USER_ROLES_DATA_CACHE_KEY = 'user_roles:{user_id}:{name}'
+USER_ROLES_DATA_NAMES = ('commander', 'positions')
+
+Membership = namedtuple(
+    'Membership', ('headquarter_id', 'position_name', 'is_trusted')
+)
+
+
+class RoleContext:
+    """Роли пользователя во всех штабах и отрядах.
+
+    Загружается одним запросом: структурные единицы, где юзер командир,
+    и его членство (штаб/отряд, должность, флаг доверенного) во всех
+    шести таблицах 'Члены штаба'/'Члены отряда'.
+    Все пермишены и проверки ролей из этого модуля отвечают по нему.
+    """
+
+    def __init__(self, user):
+        self.commanders = {}
+        self.memberships = {}
+        if not getattr(user, 'is_authenticated', False):
+            return
+        lookups = {}
+        for unit_model, position_model in UNIT_POSITION_MODELS.items():
+            lookups[unit_model] = f'{unit_model._meta.model_name}_commander'
+            lookups[position_model] = position_model._meta.model_name
+        row = RSOUser.objects.filter(id=user.id).values(
+            *(
+                f'{lookups[unit_model]}__id'
+                for unit_model in UNIT_POSITION_MODELS
+            ),
+            *(
+                f'{lookups[position_model]}__{field}'
+                for position_model in UNIT_POSITION_MODELS.values()
+                for field in ('headquarter_id', 'position__name',
+                              'is_trusted')
+            )
+        ).first() or {}
+        for unit_model, position_model in UNIT_POSITION_MODELS.items():
+            self.commanders[unit_model] = row.get(
+                f'{lookups[unit_model]}__id'
+            )
+            prefix = lookups[position_model]
+            headquarter_id = row.get(f'{prefix}__headquarter_id')
+            if headquarter_id is not None:
+                self.memberships[position_model] = Membership(
+                    headquarter_id,
+                    row[f'{prefix}__position__name'],
+                    row[f'{prefix}__is_trusted']
+                )
+
+    def commander_id(self, unit_model):
+        """Id структурной единицы модели, где юзер командир, или None."""
+        return self.commanders.get(unit_model)
+
+    def is_commander(self, unit_models=None):
+        """Является ли юзер командиром хотя бы в одной из моделей."""
+        unit_models = unit_models or UNIT_POSITION_MODELS.keys()
+        return any(
+            self.commander_id(unit_model) is not None
+            for unit_model in unit_models
+        )
+
+    def position_name(self, position_model):
+        """Должность юзера в штабе/отряде модели или None."""
+        membership = self.memberships.get(position_model)
+        return membership.position_name if membership else None
+
+    def is_trusted(self, position_model, headquarter_id=None):
+        """Является ли юзер доверенным в штабе/отряде модели.
+
+        Если headquarter_id передан, проверяется доверенность
+        именно в этом штабе/отряде.
+        """
+        membership = self.memberships.get(position_model)
+        if membership is None or not membership.is_trusted:
+            return False
+        return headquarter_id is None or (
+            membership.headquarter_id == headquarter_id
+        )
+
+    def is_trusted_anywhere(self, position_models=None):
+        """Является ли юзер доверенным хотя бы в одной из моделей."""
+        position_models = position_models or UNIT_POSITION_MODELS.values()
+        return any(
+            self.is_trusted(position_model)
+            for position_model in position_models
+        )
+
+
+def get_role_context(user) -> RoleContext:
+    """Возвращает контекст ролей пользователя.
+
+    Контекст сохраняется на объекте пользователя, который создается
+    аутентификацией на каждый запрос, поэтому все пермишены и проверки
+    одного запроса используют один и тот же контекст. Между запросами
+    контекст хранится в кеше и сбрасывается сигналами при изменении
+    командиров и членов штабов/отрядов (invalidate_user_roles).
+    """
+    role_context = getattr(user, '_role_context', None)
+    if role_context is None:
+        if not user.is_authenticated:
+            role_context = RoleContext(user)
+        else:
+            cache_key = USER_ROLES_CACHE_KEY.format(user_id=user.id)
+            role_context = cache.get(cache_key)
+            if role_context is None:
+                role_context = RoleContext(user)
+                cache.set(
+                    cache_key, role_context, settings.USER_ROLES_CACHE_TTL
+                )
+        user._role_context = role_context
+    return role_context
+
+
+def get_user_roles_data(user, name, serializer_class):
+    """Данные сериализатора ролей пользователя из кеша.
+
+    name - имя данных из USER_ROLES_DATA_NAMES,
+    serializer_class - сериализатор юзера, которым данные
+    считаются при отсутствии в кеше.
+    """
+    cache_key = USER_ROLES_DATA_CACHE_KEY.format(user_id=user.id, name=name)
+    data = cache.get(cache_key)
+    if data is None:
+        data = serializer_class(user).data
+        cache.set(cache_key, data, settings.USER_ROLES_CACHE_TTL)
+    return data
+
+
+def invalidate_user_roles(user_ids):
+    """Сбрасывает кеш ролей пользователей после коммита транзакции."""
+    cache_keys = []
+    for user_id in set(user_ids):
+        if user_id is None:
+            continue
+        cache_keys.append(USER_ROLES_CACHE_KEY.format(user_id=user_id))
+        cache_keys.extend(
+            USER_ROLES_DATA_CACHE_KEY.format(user_id=user_id, name=name)
+            for name in USER_ROLES_DATA_NAMES
+        )
+    if cache_keys:
+        transaction.on_commit(lambda: cache.delete_many(cache_keys))
+
+
 def create_first_or_exception(self, validated_data, instance, error_msg: str):
     """
     Создает запись или выводит исключение, если уже есть связанная
@@ -35,18 +200,72 @@ def create_first_or_exception(self, validated_data, instance, error_msg: str):
         raise serializers.ValidationError({'detail': error_msg})
 
 
+def get_protected_file_location(filepath) -> str | None:
+    """
+    Внутренний адрес nginx для файла из PROTECTED_FILES_LOCATIONS.
+
+    :return: адрес для X-Accel-Redirect или None, если файл вне
+             каталогов, доступных nginx
+    """
+    filepath = os.path.abspath(filepath)
+    for root, location in settings.PROTECTED_FILES_LOCATIONS.items():
+        root = os.path.abspath(root)
+        if os.path.commonpath((root, filepath)) == root:
+            return location + quote(
+                os.path.relpath(filepath, root).replace(os.sep, '/')
+            )
+    return None
+
+
+def file_response(filepath, filename, content_type=None):
+    """
+    Ответ со скачиванием файла с диска.
+
+    В зависимости от FILE_DELIVERY_BACKEND файл отдает веб-сервер
+    по заголовку X-Accel-Redirect (nginx) или X-Sendfile, и воркер
+    не читает файл. Иначе, а также для файлов вне каталогов
+    PROTECTED_FILES_LOCATIONS, файл отдается FileResponse блоками
+    по FILE_CHUNK_SIZE.
+    """
+    content_type = (
+        content_type
+        or mimetypes.guess_type(str(filepath))[0]
+        or 'application/octet-stream'
+    )
+    backend = settings.FILE_DELIVERY_BACKEND
+    location = (
+        get_protected_file_location(filepath) if backend == 'x-accel'
+        else None
+    )
+    if location is not None:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = location
+    elif backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = os.path.abspath(filepath)
+    else:
+        response = FileResponse(
+            open(filepath, 'rb'),
+            as_attachment=True,
+            filename=filename,
+            content_type=content_type
+        )
+        response.block_size = FILE_CHUNK_SIZE
+        return response
+    response['Content-Disposition'] = content_disposition_header(
+        True, filename
+    )
+    return response
+
+
 def download_file(filepath, filename):
     """Функция скачивания бланков заявлений.
 
-    На вход получает путь до файла и имя файла.
+    На вход получает путь до файла и имя файла.
     """
 
     if os.path.exists(filepath):
-        path = open(filepath, 'r')
-        mime_type, _ = mimetypes.guess_type(filepath)
-        response = HttpResponse(path, content_type=mime_type)
-        response['Content-Disposition'] = 'attachment; filename=%s' % filename
-        return response
+        return file_response(filepath, filename)
     else:
         return Response(
             {'detail': 'Файл не найден.'},
@@ -70,18 +289,11 @@ def is_stuff_or_central_commander(request):
     Если роль совпала с ролью админа или командира ЦШ, возвращает True.
     """
 
-    check_central_commander = False
-    try:
-        commander_id = CentralHeadquarter.objects.get(
-            commander_id=request.user.id
-        ).commander_id
-        if request.user.id == commander_id:
-            check_central_commander = True
-    except (CentralHeadquarter.DoesNotExist, AttributeError):
-        return False
     return (request.user.is_authenticated
             and any([
-                check_central_commander,
+                get_role_context(request.user).is_commander(
+                    [CentralHeadquarter]
+                ),
                 request.user.is_superuser,
                 request.user.is_staff
             ]))
@@ -90,21 +302,10 @@ def is_stuff_or_central_commander(request):
 def check_commander_or_not(request, headquarters):
     """Проверка является ли юзер командиром.
 
-    headquarters - список моделей, в которых проверяется роль пользователя.
+    headquarters - список моделей, в которых проверяется роль пользователя.
     request - запрос к эндпоинту
     """
-    result = False
-    for headquarter in headquarters:
-        try:
-            # поменять на get когда добавим валидацию на 1 командира на уровень
-            if headquarter.objects.filter(
-                commander_id=request.user.id
-            ).first() is not None:
-                result = True
-                break
-        except (headquarter.DoesNotExist, AttributeError):
-            pass
-    return result
+    return get_role_context(request.user).is_commander(headquarters)
 
 
 def check_role_get(request, model, position_in_quarter):
@@ -116,37 +317,21 @@ def check_role_get(request, model, position_in_quarter):
     position_in_quarter - требуемая должность для получения True.
     """
 
-    try:
-        user_headquarter_object = model.objects.get(user_id=request.user.id)
-        position_name = (
-            user_headquarter_object.position.name
-            if user_headquarter_object.position else None
-        )
-    except (model.DoesNotExist, AttributeError):
-        return False
+    position_name = get_role_context(request.user).position_name(model)
     return (
-        request.user.is_authenticated and position_name == position_in_quarter
+        request.user.is_authenticated
+        and position_name is not None
+        and position_name == position_in_quarter
     )
 
 
-def search_trusted_in_list(user_id, tables_list):
+def search_trusted_in_list(user, tables_list):
     """Поиск первого доверенного пользователя в списке таблиц.
 
     tables_list - список таблиц, в котором производится поиск.
     """
 
-    index = 0
-    number_of_tables = len(tables_list)
-    while index < number_of_tables:
-        try:
-            if tables_list[index].objects.get(
-                user_id=user_id
-            ).is_trusted:
-                return True
-            index += 1
-        except (tables_list[index].DoesNotExist, AttributeError):
-            index += 1
-    return False
+    return get_role_context(user).is_trusted_anywhere(tables_list)
 
 
 def check_trusted_user(request, model, obj):
@@ -158,19 +343,63 @@ def check_trusted_user(request, model, obj):
     в той структурной единице, к которой пользователь сделал запрос.
     """
 
-    try:
-        member = model.objects.filter(
-            user_id=request.user.id,
-            headquarter_id=obj.id
-        ).first()
-        is_trusted = member.is_trusted
-    except AttributeError:
-        return False
     return (
-        request.user.is_authenticated and is_trusted
+        request.user.is_authenticated
+        and get_role_context(request.user).is_trusted(model, obj.id)
     )
 
 
+def check_trusted_in_units(request, units):
+    """Проверка доверенности пользователя в одной из структурных единиц.
+
+    units - пары (модель 'Члены штаба'/'Члены отряда', id штаба/отряда),
+    id может быть None, если у объекта нет штаба этого уровня. Вместо id
+    можно передать функцию без аргументов, возвращающую id: она
+    вызывается, только если юзер доверенный в какой-либо единице модели.
+    """
+
+    role_context = get_role_context(request.user)
+    for model, headquarter_id in units:
+        if not role_context.is_trusted(model):
+            continue
+        if callable(headquarter_id):
+            headquarter_id = headquarter_id()
+        if (
+            headquarter_id is not None
+            and role_context.is_trusted(model, headquarter_id)
+        ):
+            return True
+    return False
+
+
+def check_commander_in_units(request, units):
+    """Проверка, является ли юзер командиром одной из структурных единиц.
+
+    units - пары (модель штаба/отряда, id штаба/отряда). Вместо id можно
+    передать функцию без аргументов, возвращающую id: она вызывается,
+    только если юзер командир какой-либо единицы этой модели.
+    """
+
+    role_context = get_role_context(request.user)
+    for model, headquarter_id in units:
+        commander_id = role_context.commander_id(model)
+        if commander_id is None:
+            continue
+        if callable(headquarter_id):
+            headquarter_id = headquarter_id()
+        if commander_id == headquarter_id:
+            return True
+    return False
+
+
+def get_district_headquarter_id(obj):
+    """Id окружного штаба, к которому относится штаб/отряд obj."""
+    regional_headquarter = obj.regional_headquarter
+    if regional_headquarter is None:
+        return None
+    return regional_headquarter.district_headquarter_id
+
+
 def check_trusted_for_detachments(request, obj=None):
     """Проверка доверенного пользователя для отряда.
 
@@ -188,57 +417,17 @@ def check_trusted_for_detachments(request, obj=None):
         UserRegionalHeadquarterPosition,
         UserDistrictHeadquarterPosition
     ]
-    user_id = request.user.id
     if obj is not None:
-        try:
-            detachment_trusted = UserDetachmentPosition.objects.get(
-                headquarter_id=obj.id,
-                user_id=user_id
-            ).is_trusted
-        except (UserDetachmentPosition.DoesNotExist, AttributeError):
-            detachment_trusted = False
-        try:
-            headquarter_id = obj.educational_headquarter.id
-            edu_trusted = UserEducationalHeadquarterPosition.objects.get(
-                headquarter_id=headquarter_id,
-                user_id=user_id
-            ).is_trusted
-        except (
-            UserEducationalHeadquarterPosition.DoesNotExist, AttributeError
-        ):
-            edu_trusted = False
-        try:
-            headquarter_id = obj.local_headquarter.id
-            local_trusted = UserLocalHeadquarterPosition.objects.get(
-                headquarter_id=headquarter_id,
-                user_id=user_id
-            ).is_trusted
-        except (UserLocalHeadquarterPosition.DoesNotExist, AttributeError):
-            local_trusted = False
-        try:
-            regional_trusted = UserRegionalHeadquarterPosition.objects.get(
-                headquarter_id=obj.regional_headquarter.id,
-                user_id=user_id
-            ).is_trusted
-        except (UserRegionalHeadquarterPosition.DoesNotExist, AttributeError):
-            regional_trusted = False
-        try:
-            headquarter_id = obj.regional_headquarter.district_headquarter.id
-            district_trusted = UserDistrictHeadquarterPosition.objects.get(
-                headquarter_id=headquarter_id,
-                user_id=user_id
-            ).is_trusted
-        except (UserDistrictHeadquarterPosition.DoesNotExist, AttributeError):
-            district_trusted = False
-        return any([
-            detachment_trusted,
-            edu_trusted,
-            local_trusted,
-            regional_trusted,
-            district_trusted
+        return check_trusted_in_units(request, [
+            (UserDetachmentPosition, obj.id),
+            (UserEducationalHeadquarterPosition,
+             obj.educational_headquarter_id),
+            (UserLocalHeadquarterPosition, obj.local_headquarter_id),
+            (UserRegionalHeadquarterPosition, obj.regional_headquarter_id),
+            (UserDistrictHeadquarterPosition,
+             lambda: get_district_headquarter_id(obj)),
         ])
-    else:
-        return search_trusted_in_list(user_id, tables_for_check)
+    return search_trusted_in_list(request.user, tables_for_check)
 
 
 def check_trusted_for_eduhead(request, obj=None):
@@ -257,52 +446,15 @@ def check_trusted_for_eduhead(request, obj=None):
         UserRegionalHeadquarterPosition,
         UserDistrictHeadquarterPosition
     ]
-    user_id = request.user.id
     if obj is not None:
-        try:
-            edu_trusted = UserEducationalHeadquarterPosition.objects.get(
-                headquarter_id=obj.id,
-                user_id=user_id
-            ).is_trusted
-        except (
-            UserEducationalHeadquarterPosition.DoesNotExist, AttributeError
-        ):
-            edu_trusted = False
-        try:
-            headquarter_id = obj.local_headquarter.id
-            local_trusted = UserLocalHeadquarterPosition.objects.get(
-                headquarter_id=headquarter_id,
-                user_id=user_id
-            ).is_trusted
-        except (UserLocalHeadquarterPosition.DoesNotExist, AttributeError):
-            local_trusted = False
-        try:
-            regional_trusted = UserRegionalHeadquarterPosition.objects.get(
-                headquarter_id=obj.regional_headquarter.id,
-                user_id=user_id
-            ).is_trusted
-        except (
-            UserRegionalHeadquarterPosition.DoesNotExist, AttributeError
-        ):
-            regional_trusted = False
-        try:
-            head_id = obj.regional_headquarter.district_headquarter.id
-            district_trusted = UserDistrictHeadquarterPosition.objects.get(
-                headquarter_id=head_id,
-                user_id=user_id
-            ).is_trusted
-        except (
-            UserDistrictHeadquarterPosition.DoesNotExist, AttributeError
-        ):
-            district_trusted = False
-        return any([
-            edu_trusted,
-            local_trusted,
-            regional_trusted,
-            district_trusted
+        return check_trusted_in_units(request, [
+            (UserEducationalHeadquarterPosition, obj.id),
+            (UserLocalHeadquarterPosition, obj.local_headquarter_id),
+            (UserRegionalHeadquarterPosition, obj.regional_headquarter_id),
+            (UserDistrictHeadquarterPosition,
+             lambda: get_district_headquarter_id(obj)),
         ])
-    else:
-        return search_trusted_in_list(user_id, tables_for_check)
+    return search_trusted_in_list(request.user, tables_for_check)
 
 
 def check_trusted_for_localhead(request, obj=None):
@@ -320,37 +472,14 @@ def check_trusted_for_localhead(request, obj=None):
         UserRegionalHeadquarterPosition,
         UserDistrictHeadquarterPosition
     ]
-    user_id = request.user.id
     if obj is not None:
-        try:
-            local_trusted = UserLocalHeadquarterPosition.objects.get(
-                headquarter_id=obj.id,
-                user_id=user_id
-            ).is_trusted
-        except (UserLocalHeadquarterPosition.DoesNotExist, AttributeError):
-            local_trusted = False
-        try:
-            regional_trusted = UserRegionalHeadquarterPosition.objects.get(
-                headquarter_id=obj.regional_headquarter.id,
-                user_id=user_id
-            ).is_trusted
-        except (UserRegionalHeadquarterPosition.DoesNotExist, AttributeError):
-            regional_trusted = False
-        try:
-            headquarter_id = obj.regional_headquarter.district_headquarter.id
-            district_trusted = UserDistrictHeadquarterPosition.objects.get(
-                headquarter_id=headquarter_id,
-                user_id=user_id
-            ).is_trusted
-        except (UserDistrictHeadquarterPosition.DoesNotExist, AttributeError):
-            district_trusted = False
-        return any([
-            local_trusted,
-            regional_trusted,
-            district_trusted
+        return check_trusted_in_units(request, [
+            (UserLocalHeadquarterPosition, obj.id),
+            (UserRegionalHeadquarterPosition, obj.regional_headquarter_id),
+            (UserDistrictHeadquarterPosition,
+             lambda: get_district_headquarter_id(obj)),
         ])
-    else:
-        return search_trusted_in_list(user_id, tables_for_check)
+    return search_trusted_in_list(request.user, tables_for_check)
 
 
 def check_trusted_for_regionalhead(request, obj=None):
@@ -363,39 +492,16 @@ def check_trusted_for_regionalhead(request, obj=None):
     в Окружном штабе и если существует, то возвращает статус доверенности.
     """
 
-    user_id = request.user.id
+    tables_for_check = [
+        UserRegionalHeadquarterPosition,
+        UserDistrictHeadquarterPosition
+    ]
     if obj is not None:
-        try:
-            regional_trusted = UserRegionalHeadquarterPosition.objects.get(
-                headquarter_id=obj.id,
-                user_id=user_id
-            ).is_trusted
-        except (UserRegionalHeadquarterPosition.DoesNotExist, AttributeError):
-            regional_trusted = False
-        try:
-            district_trusted = UserDistrictHeadquarterPosition.objects.get(
-                headquarter_id=obj.district_headquarter.id,
-                user_id=user_id
-            ).is_trusted
-        except (UserDistrictHeadquarterPosition.DoesNotExist, AttributeError):
-            district_trusted = False
-    else:
-        try:
-            regional_trusted = UserRegionalHeadquarterPosition.objects.get(
-                user_id=user_id
-            ).is_trusted
-        except (UserRegionalHeadquarterPosition.DoesNotExist, AttributeError):
-            regional_trusted = False
-        try:
-            district_trusted = UserDistrictHeadquarterPosition.objects.get(
-                user_id=user_id
-            ).is_trusted
-        except (UserDistrictHeadquarterPosition.DoesNotExist, AttributeError):
-            district_trusted = False
-    return any([
-        regional_trusted,
-        district_trusted
-    ])
+        return check_trusted_in_units(request, [
+            (UserRegionalHeadquarterPosition, obj.id),
+            (UserDistrictHeadquarterPosition, obj.district_headquarter_id),
+        ])
+    return search_trusted_in_list(request.user, tables_for_check)
 
 
 def check_trusted_for_districthead(request, obj=None):
@@ -407,22 +513,10 @@ def check_trusted_for_districthead(request, obj=None):
     в Окружном штабе и если существует, то возвращает статус доверенности.
     """
 
-    user_id = request.user.id
-    if obj is not None:
-        try:
-            return UserDistrictHeadquarterPosition.objects.get(
-                headquarter_id=obj.id,
-                user_id=user_id
-            ).is_trusted
-        except (UserDistrictHeadquarterPosition.DoesNotExist, AttributeError):
-            return False
-    else:
-        try:
-            return UserDistrictHeadquarterPosition.objects.get(
-                user_id=user_id
-            ).is_trusted
-        except (UserDistrictHeadquarterPosition.DoesNotExist, AttributeError):
-            return False
+    return get_role_context(request.user).is_trusted(
+        UserDistrictHeadquarterPosition,
+        obj.id if obj is not None else None
+    )
 
 
 def check_trusted_for_centralhead(request):
@@ -433,16 +527,9 @@ def check_trusted_for_centralhead(request):
     в Центральном штабе и если существует, то возвращает статус доверенности.
     """
 
-    request_user_id = request.user.id
-    try:
-        return UserCentralHeadquarterPosition.objects.get(
-            user_id=request_user_id
-        ).is_trusted
-    except (
-        UserCentralHeadquarterPosition.DoesNotExist,
-        AttributeError
-    ):
-        return False
+    return get_role_context(request.user).is_trusted(
+        UserCentralHeadquarterPosition
+    )
 
 
 def check_roles_for_edit(request, roles_models: dict):
@@ -543,23 +630,97 @@ def text_to_lines(text, proportion):
     return lines
 
 
-def create_and_return_archive(files: dict):
-    """Функция создает архив и возвращает его с указанными файлами."""
+def process_map(func, items, workers: int = None):
+    """
+    Применяет func к элементам в пуле процессов с сохранением порядка.
+
+    Используется пул billiard: в отличие от multiprocessing, он может
+    запускаться из демонических процессов воркеров Celery.
+    Внутри открытой транзакции элементы обрабатываются в текущем
+    процессе: перед запуском пула соединения с БД закрываются, чтобы
+    дочерние процессы не унаследовали и не закрыли их.
+
+    :param func: функция уровня модуля, не обращающаяся к БД
+    :param items: элементы
+    :param workers: количество процессов, по умолчанию - число ядер
+    :return: генератор результатов в порядке items
+    """
+    items = list(items)
+    workers = min(workers or os.cpu_count() or 1, len(items))
+    if workers <= 1 or any(
+        connection.in_atomic_block
+        for connection in connections.all(initialized_only=True)
+    ):
+        yield from map(func, items)
+        return
+    connections.close_all()
+    with Pool(workers) as pool:
+        yield from pool.imap(
+            func, items, chunksize=max(1, len(items) // (workers * 4))
+        )
+
 
-    archive_buffer = io.BytesIO()
-    with zipfile.ZipFile(archive_buffer, 'w') as archive:
-        for file_name, file_content in files.items():
-            archive.writestr(file_name, file_content)
+class _ZipStreamBuffer(io.RawIOBase):
+    """
+    Буфер, из которого забираются записанные zipfile части архива.
 
-    archive_buffer.seek(0)
-    response = HttpResponse(
-        archive_buffer.read(), content_type='application/zip'
-    )
-    current_datetime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f'certs_{current_datetime}.zip'
-    response['Content-Disposition'] = (
-        f'attachment; filename={filename}'
+    Буфер не поддерживает seek, поэтому zipfile пишет размеры файлов
+    после их содержимого и не возвращается к уже отданным частям.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(entries, chunk_size: int = FILE_CHUNK_SIZE):
+    """
+    Формирует ZIP-архив по частям.
+
+    Архив не собирается в памяти целиком: части отдаются по мере
+    записи, файлы с диска читаются блоками по chunk_size байт.
+
+    :param entries: пары (имя в архиве, содержимое), содержимое -
+                    bytes/str или путь к файлу (pathlib.Path)
+    :param chunk_size: размер блока чтения файлов
+    :return: генератор частей архива
+    """
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in entries:
+            if isinstance(content, (bytes, str)):
+                archive.writestr(name, content)
+                yield buffer.pop()
+                continue
+            with (
+                open(content, 'rb') as file,
+                archive.open(name, 'w', force_zip64=True) as archive_file
+            ):
+                while data := file.read(chunk_size):
+                    archive_file.write(data)
+                    yield buffer.pop()
+    yield buffer.pop()
+
+
+def zip_response(entries, filename: str):
+    """Потоковый ответ с ZIP-архивом, см. iter_zip."""
+
+    response = StreamingHttpResponse(
+        iter_zip(entries), content_type='application/zip'
     )
+    response['Content-Disposition'] = f'attachment; filename={filename}'
     return response
 
 
@@ -571,17 +732,12 @@ def get_is_trusted(obj, model):
     Если не доверенный, то False.
     Если юзера нет в штабе/отряде, то None.
     """
-    try:
-        result = model.objects.filter(
-            user_id=obj.id
-        ).select_related('user').first()
-        is_trusted = result.is_trusted
-        model_id = result.headquarter_id
-    except (model.DoesNotExist, AttributeError):
-        is_trusted = None
-    if is_trusted:
-        return model_id
-    return is_trusted
+    membership = get_role_context(obj).memberships.get(model)
+    if membership is None:
+        return None
+    if membership.is_trusted:
+        return membership.headquarter_id
+    return False
 
 
 def get_regional_headquarters_if_commander(user):
@@ -597,40 +753,21 @@ def is_regional_commander(user):
     """Проверяет, является ли пользователь командиром
     регионального штаба или администратором.
     """
-    check_regional_commander = get_regional_headquarters_if_commander(user)
     return (user.is_authenticated and
-            (check_regional_commander or
+            (get_role_context(user).is_commander([RegionalHeadquarter]) or
              user.is_staff))
 
 
 def get_detachment_commander_num(user) -> int | None:
     """Получение id отряда, в котором юзер командир."""
 
-    try:
-        detachment_commander_num = Detachment.objects.get(
-            commander=user
-        ).id
-    except (
-        Detachment.DoesNotExist, AttributeError, ValueError,
-        Detachment.MultipleObjectsReturned
-    ):
-        return None
-    return detachment_commander_num
+    return get_role_context(user).commander_id(Detachment)
 
 
 def get_regional_hq_commander_num(user) -> int | None:
     """Получение id регионального штаба, в котором юзер командир."""
 
-    try:
-        reghq_commander_num = RegionalHeadquarter.objects.get(
-            commander=user
-        ).id
-    except (
-        RegionalHeadquarter.DoesNotExist, AttributeError, ValueError,
-        RegionalHeadquarter.MultipleObjectsReturned
-    ):
-        return None
-    return reghq_commander_num
+    return get_role_context(user).commander_id(RegionalHeadquarter)
 
 
 def is_commander_this_detachment(user, detachment):
@@ -642,11 +779,12 @@ def is_regional_commissioner(user):
     """Проверяет, является ли пользователь комиссаром рег штаба."""
     if not user.is_authenticated:
         return False
-    try:
-        position_name = user.userregionalheadquarterposition.position.name
-    except UserRegionalHeadquarterPosition.DoesNotExist:
+    membership = get_role_context(user).memberships.get(
+        UserRegionalHeadquarterPosition
+    )
+    if membership is None:
         return False
-    return position_name == 'Комиссар' or user.is_staff
+    return membership.position_name == 'Комиссар' or user.is_staff
 
 
 def get_detachment_tandem(user, competition_id):
@@ -663,11 +801,8 @@ def get_detachment_tandem(user, competition_id):
         Detachment,
         commander=user
     )
-    if CompetitionParticipants.objects.filter(
-        Q(detachment=detachment) | Q(junior_detachment=detachment) &
-        Q(detachment__isnull=False) &
-        Q(competition_id=competition_id)
-    ).exists():
+    participation = get_participation(competition_id, detachment.id)
+    if participation is not None and participation.is_tandem:
         return detachment
 
 
@@ -685,9 +820,6 @@ def get_detachment_start(user, competition_id):
         Detachment,
         commander=user
     )
-    if CompetitionParticipants.objects.filter(
-        Q(junior_detachment=detachment) &
-        Q(detachment__isnull=True) &
-        Q(competition_id=competition_id)
-    ).exists():
+    participation = get_participation(competition_id, detachment.id)
+    if participation is not None and not participation.is_tandem:
         return detachment
@@ -1,26 +1,24 @@
-import io
 import os
 from datetime import datetime
 
-import pdfrw
+from celery.result import AsyncResult
 from django.conf import settings
 from django.utils.decorators import method_decorator
 from django.core.cache import cache
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from django.views.decorators.cache import cache_page
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from pdfrw.buildxobj import pagexobj
-from pdfrw.toreportlab import makerl
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 
+from api.certificates import (CERT_TYPES, CERTS_JOB_ISSUER_CACHE_KEY,
+                              EXTERNAL_CERT, INTERNAL_CERT,
+                              get_certificates_archive_path,
+                              get_certificates_data)
 from api.filters import EducationalInstitutionFilter
 from api.mixins import ListRetrieveViewSet
 from api.permissions import (IsRegionalCommanderForCert,
@@ -30,14 +28,12 @@ from api.permissions import (IsRegionalCommanderForCert,
 from api.serializers import (AreaSerializer, EducationalInstitutionSerializer,
                              MemberCertSerializer, RegionSerializer)
 from api.swagger_schemas import properties, properties_external
-from api.utils import (create_and_return_archive, get_user, get_user_by_id,
-                       text_to_lines)
-from headquarters.models import (Area, EducationalInstitution, Region,
-                                 RegionalHeadquarter,
-                                 UserRegionalHeadquarterPosition)
-from users.models import (MemberCert, RSOUser, UserDocuments,
-                          UserMemberCertLogs, UserMembershipLogs,
-                          UserVerificationLogs, UserVerificationRequest)
+from api.tasks import generate_member_certificates
+from api.utils import file_response, get_user
+from headquarters.models import Area, EducationalInstitution, Region
+from users.models import (MemberCert, RSOUser, UserMemberCertLogs,
+                          UserMembershipLogs, UserVerificationLogs,
+                          UserVerificationRequest)
 
 
 class EducationalInstitutionViewSet(ListRetrieveViewSet):
@@ -161,417 +157,59 @@ class MemberCertViewSet(viewsets.ReadOnlyModelViewSet):
     """Выдача справок о членстве в РСО.
 
     Разрешение на выдачу справок имеет только командир РШ.
+    Справки формируются Celery-таской, эндпоинты external и internal
+    возвращают id задачи. Состояние задачи доступно по адресу
+    jobs/{task_id}/, готовый архив - по адресу jobs/{task_id}/download/.
     """
 
-    TIMES_HEAD_SIZE = 15
-    TIMES_TEXT_SIZE = 14
-    ARIAL_TEXT_SIZE = 9
-    HEAD_Y = 800
-    VERTICAL_DISP = 155
-    VERTICAL_RECIPIENT_DISP = 10
-    VERTICAL_DISP_REQ = 160
-    HORIZONTAL_DISP = 11
-    HORIZONTAL_DISP_RECIPIENT = 12
-    REQUISITES_X = 140
-    REQUISITES_Y = 729
-    LETTER_NUMBER_X = 50
-    LETTER_NUMBER_Y = 650
-    NAME_X = 135
-    NAME_Y = 529
-    BIRTHDAY_X = 126
-    BIRTHDAY_Y = 496
-    CERT_DATE_X = 160
-    CERT_DATE_Y = 432
-    REG_CASE_NAME_X = 29
-    REG_CASE_NAME_Y = 385
-    REG_NUMBER_X = 140
-    REG_NUMBER_Y = 360
-    INN_X = 380
-    INN_Y = 309
-    SNILS_X = 380
-    SNILS_Y = 291
-    RECIPIENT_X = 33
-    RECIPIENT_Y = 230
-    RECIPIENT_INTERNAL_X = 33
-    RECIPIENT_INTERNAL_Y = 282
-    RECIPIENT_LINE_X = 25
-    RECIPIENT_LINE_Y = 240
-    POSITION_PROC_PROP = 0.3
-    POSITION_PROC_X = 25
-    POSITION_PROC_Y = 99
-    POSITION_PROC_LINE_Y = 110
-    FIO = 3
-    FI = 2
-    SIGNATORY_X = 450
-    SIGNATORY_Y = 85
-
     queryset = MemberCert.objects.all()
     serializer_class = MemberCertSerializer
     permission_classes = (IsRegionalCommanderForCert,)
 
-    @classmethod
-    def get_certificate(cls, user, request, cert_template='internal_cert.pdf'):
-        """Метод собирает информацию о пользователе и его РШ.
-
-        Работа метода представлена в комментариях к коду.
-        """
-
-        """Сбор данных из БД и запроса к эндпоинту."""
-        data = request.data
-        reg_hq_commander_fn = request.user.first_name
-        reg_hq_commander_ln = request.user.last_name
-        reg_hq_commander_pn = request.user.patronymic_name
-        username = user.username
-        first_name = user.first_name
-        last_name = user.last_name
-        patronymic_name = user.patronymic_name
-        date_of_birth = user.date_of_birth
-        try:
-            user_docs = UserDocuments.objects.get(
-                user=user
-            )
-            inn = user_docs.inn
-            snils = user_docs.snils
-            if inn is None or snils is None:
-                return Response(
-                    status=status.HTTP_400_BAD_REQUEST,
-                    data={
-                        'detail': 'Документы пользователя '
-                        f'{username} не заполнены.'
-                    }
-                )
-        except UserDocuments.DoesNotExist:
-            return Response(
-                status=status.HTTP_400_BAD_REQUEST,
-                data={
-                    'detail': 'Документы пользователя '
-                    f'{username} не заполнены.'
-                }
-            )
-        recipient = data.get('recipient', 'по месту требования')
-
-        if data.get('cert_start_date') is not None:
-            cert_start_date = datetime.strptime(
-                data.get('cert_start_date'),
-                '%Y-%m-%d'
-            )
-        else:
-            return Response(
-                status=status.HTTP_400_BAD_REQUEST,
-                data={
-                    'detail': 'Не указана дата начала действия сертификата.'
-                }
-            )
-        cert_end_date = datetime.strptime(
-            data.get('cert_end_date'),
-            '%Y-%m-%d'
+    def create_certificates_job(self, request, cert_template):
+        """Проверяет данные справок и ставит их формирование в очередь."""
+        user = get_user(self)
+        serializer = self.get_serializer(
+            data=request.data,
         )
-        if reg_hq_commander_pn is None:
-            signatory = data.get(
-                'signatory',
-                f'{reg_hq_commander_ln} {reg_hq_commander_fn}'
-            )
-        else:
-            signatory = data.get(
-                'signatory',
-                (f'{reg_hq_commander_ln} {reg_hq_commander_fn} '
-                 f'{reg_hq_commander_pn}')
-            )
-        position_procuration = data.get(
-            'position_procuration', 'Руководитель регионального отделения'
-        )
-        try:
-            regional_headquarter = UserRegionalHeadquarterPosition.objects.get(
-                user=user
-            ).headquarter
-            commander = RSOUser.objects.get(
-                id=regional_headquarter.commander.id
-            )
-            reg_case_name = regional_headquarter.case_name
-            legal_address = str(regional_headquarter.legal_address)
-            requisites = str(regional_headquarter.requisites)
-            registry_number = str(regional_headquarter.registry_number)
-            registry_date = regional_headquarter.registry_date
-            commander_first_name = commander.first_name
-            commander_last_name = commander.last_name
-            commander_patronymic_name = commander.patronymic_name
-        except (
-            UserRegionalHeadquarterPosition.DoesNotExist,
-            RegionalHeadquarter.DoesNotExist
-        ):
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=user)
+        ids = request.data.get('ids')
+        if ids is None:
             return Response(
-                status=status.HTTP_400_BAD_REQUEST,
-                data={
-                    'detail': 'Не удалось определить региональный штаб '
-                    f'пользователя {username}.'
-                }
+                {'detail': 'Поле ids не может быть пустым.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-
-        """Подготовка шаблона и шрифтов к выводу информации на лист."""
-        template_path = os.path.join(
-            str(settings.BASE_DIR),
-            'templates',
-            'samples',
-            cert_template
-        )
-        template = pdfrw.PdfReader(template_path, decompress=False).pages[0]
-        template_obj = pagexobj(template)
-        buf = io.BytesIO()
-        c = canvas.Canvas(buf, pagesize=A4, bottomup=1)
-        xobj_name = makerl(c, template_obj)
-        c.doForm(xobj_name)
-        pdfmetrics.registerFont(
-            TTFont(
-                'Times_New_Roman',
-                os.path.join(
-                    str(settings.BASE_DIR),
-                    'templates',
-                    'samples',
-                    'fonts',
-                    'times.ttf'
-                )
-            )
-        )
-        pdfmetrics.registerFont(
-            TTFont(
-                'Arial_Narrow',
-                os.path.join(
-                    str(settings.BASE_DIR),
-                    'templates',
-                    'samples',
-                    'fonts',
-                    'arialnarrow.ttf'
-                )
+        if 0 in ids:
+            return Response(
+                {'detail': 'Поле ids не может содержать 0.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
+        # Повторный id дал бы одноименные файлы в архиве и лишние записи
+        # в журнале выдачи справок.
+        ids = list(dict.fromkeys(ids))
+        certificates_data = get_certificates_data(
+            ids, request.data, request.user, cert_template
         )
-
-        """Блок вывода названия РШ в заголовок листа."""
-        c.setFont('Times_New_Roman', cls.TIMES_HEAD_SIZE)
-        page_width = c._pagesize[0]
-        string_width = c.stringWidth(
-            str(regional_headquarter),
-            'Times_New_Roman',
-            cls.TIMES_HEAD_SIZE
-        )
-        center_x = (page_width - string_width) / 2 + cls.VERTICAL_DISP
-        c.drawCentredString(center_x, cls.HEAD_Y, str(regional_headquarter))
-
-        """Блок вывода юр.адреса и реквизитов РШ под заголовком.
-
-        В блоке опеределяется ширина поля на листе, куда будет выведен текст.
-        Функция text_to_lines разбивает длину текста на строки. Длина строки
-        определяется переменной proportion. Затем с помощью цикла
-        производится перенос строк. Переменная line_break работает как ширина,
-        на которую необходимо перенести строку.
-        """
-        c.setFont('Arial_Narrow', cls.ARIAL_TEXT_SIZE)
-        text = legal_address + '.  ' + requisites
-        string_width = c.stringWidth(
-            text,
-            'Arial_Narrow',
-            cls.ARIAL_TEXT_SIZE
-        )
-        line_width = (page_width - cls.VERTICAL_DISP_REQ)
-        proportion = line_width / string_width
-        lines = text_to_lines(
-            text=text,
-            proportion=proportion
-        )
-        line_break = cls.HORIZONTAL_DISP
-        for line in lines:
-            c.drawString(
-                cls.REQUISITES_X, cls.REQUISITES_Y - line_break, line
+        UserMemberCertLogs.objects.bulk_create([
+            UserMemberCertLogs(
+                user_id=data['user_id'],
+                cert_type=CERT_TYPES[cert_template],
+                cert_issued_by=request.user
             )
-            line_break += cls.HORIZONTAL_DISP
-        c.drawString(
-            cls.LETTER_NUMBER_X,
-            cls. LETTER_NUMBER_Y,
-            'б/н от ' + str(datetime.now().strftime('%d.%m.%Y'))
+            for data in certificates_data
+        ])
+        task = generate_member_certificates.delay(
+            certificates_data, request.user.id
         )
-
-        """Блок вывода информации о пользователе и РШ в тексте справки."""
-        c.setFont('Times_New_Roman', cls.TIMES_TEXT_SIZE)
-        if last_name and first_name and patronymic_name:
-            c.drawString(
-                cls.NAME_X,
-                cls.NAME_Y,
-                last_name + ' ' + first_name + ' ' + patronymic_name
-            )
-        if last_name and first_name and not patronymic_name:
-            c.drawString(
-                cls.NAME_X, cls.NAME_Y, last_name + ' ' + first_name
-            )
-        if date_of_birth:
-            c.drawString(
-                cls.BIRTHDAY_X,
-                cls.BIRTHDAY_Y,
-                str(date_of_birth.strftime('%d.%m.%Y')) + ' г.'
-            )
-        if (
-            (not last_name and not first_name and not patronymic_name)
-            or (not date_of_birth)
-        ):
-            return Response(
-                status=status.HTTP_400_BAD_REQUEST,
-                data={
-                    'detail': f'Профиль пользователя {username} не заполнен.'
-                }
-            )
-        c.drawString(
-            cls.CERT_DATE_X,
-            cls.CERT_DATE_Y,
-            (
-                'c '
-                + str(cert_start_date.strftime('%d.%m.%Y'))
-                + ' г. по '
-                + str(cert_end_date.strftime('%d.%m.%Y') + ' г.')
-            )
+        cache.set(
+            CERTS_JOB_ISSUER_CACHE_KEY.format(task_id=task.id),
+            request.user.id,
+            settings.MEMBER_CERTS_ARCHIVE_TTL
         )
-        c.drawString(cls.REG_CASE_NAME_X, cls.REG_CASE_NAME_Y, reg_case_name)
-        if registry_date:
-            c.drawString(
-                cls.REG_NUMBER_X,
-                cls.REG_NUMBER_Y,
-                (
-                    registry_number
-                    + ' от '
-                    + registry_date.strftime('%d.%m.%Y')
-                    + ' г.'
-                )
-            )
-        else:
-            return Response(
-                status=status.HTTP_400_BAD_REQUEST,
-                data={
-                    'detail': f'Данные РШ {regional_headquarter} не заполнены.'
-                }
-            )
-
-        string_width = c.stringWidth(
-            position_procuration,
-            'Times_New_Roman',
-            cls.TIMES_TEXT_SIZE
+        return Response(
+            {'task_id': task.id}, status=status.HTTP_202_ACCEPTED
         )
-        line_width = page_width
-        proportion = cls.POSITION_PROC_PROP
-        if proportion >= 1.0:
-            c.drawString(
-                cls.POSITION_PROC_X,
-                cls.POSITION_PROC_Y,
-                position_procuration
-            )
-        else:
-            lines = text_to_lines(
-                text=position_procuration,
-                proportion=proportion
-            )
-            line_break = cls.HORIZONTAL_DISP
-            for line in lines:
-                c.drawString(
-                    cls.POSITION_PROC_X,
-                    cls.POSITION_PROC_LINE_Y - line_break,
-                    line
-                )
-                line_break += cls.HORIZONTAL_DISP_RECIPIENT
-        if cert_template == 'external_cert.pdf':
-            c.drawString(cls.INN_X, cls.INN_Y, inn)
-            c.drawString(cls.SNILS_X, cls.SNILS_Y, snils)
-            string_width = c.stringWidth(
-                recipient, 'Times_New_Roman', cls.TIMES_TEXT_SIZE
-            )
-            line_width = (page_width - cls.VERTICAL_RECIPIENT_DISP)
-            start_line = line_width/2 - string_width/2
-            proportion = line_width / string_width
-            if proportion >= 1.0:
-                c.drawString(start_line, cls.RECIPIENT_Y, recipient)
-            else:
-                lines = text_to_lines(
-                    text=recipient,
-                    proportion=proportion
-                )
-                line_break = cls.HORIZONTAL_DISP
-                for line in lines:
-                    c.drawString(
-                        cls.RECIPIENT_X,
-                        cls.RECIPIENT_Y - line_break,
-                        line
-                    )
-                    line_break += cls.HORIZONTAL_DISP_RECIPIENT
-            signatory_list = signatory.split()
-            if len(signatory_list) == cls.FIO:
-                c.drawString(
-                    cls.SIGNATORY_X,
-                    cls.SIGNATORY_Y,
-                    (
-                        signatory_list[0]
-                        + ' '
-                        + signatory_list[1][0]
-                        + '.' + signatory_list[2][0]
-                        + '.'
-                    )
-                )
-            elif len(signatory_list) == cls.FI:
-                c.drawString(
-                    cls.SIGNATORY_X,
-                    cls.SIGNATORY_Y,
-                    signatory_list[0]
-                    + ' '
-                    + signatory_list[1][0]
-                    + '.'
-                )
-            else:
-                c.drawString(cls.SIGNATORY_X, cls.SIGNATORY_Y, signatory)
-        if cert_template == 'internal_cert.pdf':
-            string_width = c.stringWidth(
-                recipient, 'Times_New_Roman', cls.TIMES_TEXT_SIZE
-            )
-            line_width = (page_width - cls.VERTICAL_RECIPIENT_DISP)
-            start_line = line_width/2 - string_width/2
-            proportion = line_width / string_width
-            if proportion >= 1.0:
-                c.drawString(start_line, cls.RECIPIENT_INTERNAL_Y, recipient)
-            else:
-                lines = text_to_lines(
-                    text=recipient,
-                    proportion=proportion
-                )
-                line_break = cls.HORIZONTAL_DISP
-                for line in lines:
-                    c.drawString(
-                        cls.RECIPIENT_INTERNAL_X,
-                        cls.RECIPIENT_INTERNAL_Y - line_break,
-                        line
-                    )
-                    line_break += cls.HORIZONTAL_DISP_RECIPIENT
-            if (
-                commander_first_name
-                and commander_last_name
-                and commander_patronymic_name
-            ):
-                c.drawString(
-                    cls.SIGNATORY_X,
-                    cls.SIGNATORY_Y,
-                    str(commander_first_name)[0].upper()
-                    + '.'
-                    + str(commander_patronymic_name)[0].upper()
-                    + '. '
-                    + str(commander_last_name).capitalize()
-                )
-            elif (
-                commander_first_name
-                and commander_last_name
-                and not commander_patronymic_name
-            ):
-                c.drawString(
-                    cls.SIGNATORY_X,
-                    cls.SIGNATORY_Y,
-                    str(commander_first_name)[0].upper()
-                    + '. '
-                    + str(commander_last_name).capitalize()
-                )
-            c.showPage()
-        c.save()
-        return buf.getvalue()
 
     @swagger_auto_schema(
         request_body=openapi.Schema(
@@ -588,46 +226,7 @@ class MemberCertViewSet(viewsets.ReadOnlyModelViewSet):
         serializer_class=MemberCertSerializer,
     )
     def external(self, request):
-
-        if request.method == 'POST':
-            user = get_user(self)
-            serializer = self.get_serializer(
-                data=request.data,
-            )
-            serializer.is_valid(raise_exception=True)
-            serializer.save(user=user)
-            ids = request.data.get('ids')
-            if ids is None:
-                return Response(
-                    {'detail': 'Поле ids не может быть пустым.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            external_certs = {}
-            for user_id in ids:
-                if user_id == 0:
-                    return Response(
-                        {'detail': 'Поле ids не может содержать 0.'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                user = get_user_by_id(user_id)
-                pdf_cert_or_response = self.get_certificate(
-                    user=user,
-                    request=request,
-                    cert_template='external_cert.pdf'
-                )
-                if isinstance(pdf_cert_or_response, Response):
-                    return pdf_cert_or_response
-                filename = (
-                    f'{user.username}.pdf'
-                )
-                external_certs[filename] = pdf_cert_or_response
-                UserMemberCertLogs.objects.create(
-                    user=user,
-                    cert_type='Для работодателя',
-                    cert_issued_by=request.user
-                )
-            response = create_and_return_archive(external_certs)
-            return response
+        return self.create_certificates_job(request, EXTERNAL_CERT)
 
     @swagger_auto_schema(
         request_body=openapi.Schema(
@@ -644,43 +243,53 @@ class MemberCertViewSet(viewsets.ReadOnlyModelViewSet):
         serializer_class=MemberCertSerializer,
     )
     def internal(self, request):
+        return self.create_certificates_job(request, INTERNAL_CERT)
 
-        if request.method == 'POST':
-            user = get_user(self)
-            serializer = self.get_serializer(
-                data=request.data,
-            )
-            serializer.is_valid(raise_exception=True)
-            serializer.save(user=user)
-            ids = request.data.get('ids')
-            if ids is None:
-                return Response(
-                    {'detail': 'Поле ids не может быть пустым.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            internal_certs = {}
-            for user_id in ids:
-                if user_id == 0:
-                    return Response(
-                        {'detail': 'Поле ids не может содержать 0.'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                user = get_user_by_id(user_id)
-                pdf_cert_or_response = self.get_certificate(
-                    user=user,
-                    request=request,
-                    cert_template='internal_cert.pdf'
-                )
-                if isinstance(pdf_cert_or_response, Response):
-                    return pdf_cert_or_response
-                filename = (
-                    f'{user.username}.pdf'
-                )
-                internal_certs[filename] = pdf_cert_or_response
-                UserMemberCertLogs.objects.create(
-                    user=user,
-                    cert_type='Внутренняя справка',
-                    cert_issued_by=request.user
-                )
-            response = create_and_return_archive(internal_certs)
-            return response
+    @staticmethod
+    def get_job_result(request, task_id):
+        """Результат задачи формирования справок текущего пользователя."""
+        issuer_id = cache.get(
+            CERTS_JOB_ISSUER_CACHE_KEY.format(task_id=task_id)
+        )
+        if issuer_id != request.user.id:
+            raise Http404
+        result = AsyncResult(task_id)
+        info = result.info if isinstance(result.info, dict) else {}
+        return result, info
+
+    @action(
+        detail=False,
+        methods=['get',],
+        url_path=r'jobs/(?P<task_id>[^/.]+)',
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def job_status(self, request, task_id):
+        """Состояние задачи формирования справок.
+
+        Для состояния PROGRESS возвращается количество готовых справок.
+        """
+        result, info = self.get_job_result(request, task_id)
+        return Response({
+            'state': result.state,
+            'rendered': info.get('rendered', info.get('total')),
+            'total': info.get('total'),
+        })
+
+    @action(
+        detail=False,
+        methods=['get',],
+        url_path=r'jobs/(?P<task_id>[^/.]+)/download',
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def job_download(self, request, task_id):
+        """Скачивание архива справок."""
+        result, info = self.get_job_result(request, task_id)
+        archive_path = get_certificates_archive_path(info.get('archive', ''))
+        if not result.successful() or not os.path.isfile(archive_path):
+            raise Http404
+        current_datetime = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        return file_response(
+            archive_path,
+            f'certs_{current_datetime}.zip',
+            'application/zip'
+        )
@@ -2,6 +2,7 @@ from django.contrib import admin
 
 from competitions.models import (
     Q10, Q9, CompetitionApplications, CompetitionParticipants, Competitions,
+    LeaderboardEntry,
     Q7, Q10Ranking, Q10Report, Q10TandemRanking, Q18Ranking, Q19Ranking,
     Q19Report, Q19TandemRanking, Q1Ranking, Q1Report, Q1TandemRanking,
     Q20Ranking, Q20Report, Q20TandemRanking, Q2DetachmentReport, Q2Ranking,
@@ -54,6 +55,15 @@ class Q18TandemRankingAdmin(QBaseTandemRankingAdmin):
     pass
 
 
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'competition', 'detachment', 'is_tandem', 'total', 'place'
+    )
+    list_filter = ('competition', 'is_tandem')
+    search_fields = ('detachment__name',)
+
+
 admin.site.register(CompetitionParticipants)
 admin.site.register(CompetitionApplications)
 admin.site.register(Competitions)
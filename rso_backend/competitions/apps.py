@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CompetitionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'competitions'
+
+    def ready(self):
+        import competitions.signal_handlers
@@ -1,8 +1,8 @@
 from django.db.models import Q
 from django_filters.rest_framework import FilterSet
-from django_filters.filters import BooleanFilter, CharFilter
+from django_filters.filters import BooleanFilter, CharFilter, NumberFilter
 
-from .models import CompetitionParticipants
+from .models import CompetitionParticipants, LeaderboardEntry
 
 
 class CompetitionParticipantsFilter(FilterSet):
@@ -23,3 +23,13 @@ class CompetitionParticipantsFilter(FilterSet):
         return queryset.filter(
             Q(detachment__area__name=value) | Q(junior_detachment__area__name=value)
         )
+
+
+class LeaderboardFilter(FilterSet):
+    is_tandem = BooleanFilter()
+    region = NumberFilter(field_name='detachment__region')
+    area = CharFilter(field_name='detachment__area__name')
+
+    class Meta:
+        model = LeaderboardEntry
+        fields = ['is_tandem', 'region', 'area']
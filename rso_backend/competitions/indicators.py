@@ -0,0 +1,184 @@
+import time
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+
+from competitions.models import (
+    CompetitionParticipants, Competitions, Q10Ranking, Q10Report,
+    Q10TandemRanking, Q11Ranking, Q11Report, Q11TandemRanking, Q12Ranking,
+    Q12Report, Q12TandemRanking, Q13DetachmentReport, Q13Ranking,
+    Q13TandemRanking, Q17DetachmentReport, Q17Ranking, Q17TandemRanking,
+    Q18DetachmentReport, Q18Ranking, Q18TandemRanking, Q19Ranking, Q19Report,
+    Q19TandemRanking, Q1Ranking, Q1Report, Q1TandemRanking,
+    Q20Ranking, Q20Report, Q20TandemRanking, Q2DetachmentReport, Q2Ranking,
+    Q2TandemRanking, Q3Ranking, Q3TandemRanking, Q4Ranking, Q4TandemRanking,
+    Q5DetachmentReport, Q5Ranking, Q5TandemRanking, Q7Ranking, Q7Report,
+    Q7TandemRanking, Q8Ranking, Q8Report, Q8TandemRanking, Q9Ranking,
+    Q9Report, Q9TandemRanking
+)
+
+PLACES_VERSION_CACHE_KEY = 'competition_places_version_{competition_id}'
+PLACE_CACHE_KEY = (
+    'competition_place_{competition_id}_{version}_'
+    '{detachment_id}_{indicator}'
+)
+
+
+class Indicator(NamedTuple):
+    """Модели показателя конкурса."""
+    report: type | None
+    ranking: type
+    tandem_ranking: type
+
+
+# Показатели, по которым есть рейтинги. Q3 и Q4 считаются по тестам
+# членов отряда, отдельного отчета у них нет.
+INDICATORS = {
+    1: Indicator(Q1Report, Q1Ranking, Q1TandemRanking),
+    2: Indicator(Q2DetachmentReport, Q2Ranking, Q2TandemRanking),
+    3: Indicator(None, Q3Ranking, Q3TandemRanking),
+    4: Indicator(None, Q4Ranking, Q4TandemRanking),
+    5: Indicator(Q5DetachmentReport, Q5Ranking, Q5TandemRanking),
+    7: Indicator(Q7Report, Q7Ranking, Q7TandemRanking),
+    8: Indicator(Q8Report, Q8Ranking, Q8TandemRanking),
+    9: Indicator(Q9Report, Q9Ranking, Q9TandemRanking),
+    10: Indicator(Q10Report, Q10Ranking, Q10TandemRanking),
+    11: Indicator(Q11Report, Q11Ranking, Q11TandemRanking),
+    12: Indicator(Q12Report, Q12Ranking, Q12TandemRanking),
+    13: Indicator(Q13DetachmentReport, Q13Ranking, Q13TandemRanking),
+    17: Indicator(Q17DetachmentReport, Q17Ranking, Q17TandemRanking),
+    18: Indicator(Q18DetachmentReport, Q18Ranking, Q18TandemRanking),
+    19: Indicator(Q19Report, Q19Ranking, Q19TandemRanking),
+    20: Indicator(Q20Report, Q20Ranking, Q20TandemRanking),
+}
+
+
+class IndicatorPlace(NamedTuple):
+    """
+    Состояние показателя отряда в конкурсе.
+
+    has_report - отряд подал отчет (для показателей без отчета - False),
+    is_verified - отчет верифицирован, None если у отчета нет верификации,
+    place - место в рейтинге старт или тандем, None если рейтинг
+            еще не сформирован.
+    """
+    is_participant: bool
+    is_tandem: bool
+    has_report: bool
+    is_verified: bool | None
+    place: float | None
+
+
+def _get_places_version(competition_id) -> int:
+    return cache.get_or_set(
+        PLACES_VERSION_CACHE_KEY.format(competition_id=competition_id),
+        time.time_ns,
+        None
+    )
+
+
+def invalidate_competition_places(competition_id=None):
+    """
+    Сбрасывает кеш мест конкурса после коммита транзакции.
+
+    Вместо удаления ключей всех отрядов меняется версия конкурса,
+    входящая в ключи, старые записи истекают сами.
+
+    :param competition_id: id конкурса, если None - все конкурсы
+    """
+    def set_versions():
+        competition_ids = (
+            [competition_id] if competition_id is not None
+            else Competitions.objects.values_list('id', flat=True)
+        )
+        version = time.time_ns()
+        cache.set_many({
+            PLACES_VERSION_CACHE_KEY.format(competition_id=changed_id): version
+            for changed_id in competition_ids
+        }, None)
+
+    transaction.on_commit(set_versions)
+
+
+def _query_indicator_place(indicator, competition_id, detachment_id):
+    """Отчет и места старт и тандем отряда одним запросом."""
+    models = INDICATORS[indicator]
+    detachment_q = (
+        Q(detachment_id=detachment_id)
+        | Q(junior_detachment_id=detachment_id)
+    )
+    participants = CompetitionParticipants.objects.filter(
+        detachment_q, competition_id=OuterRef('id')
+    )
+    annotations = {
+        'is_participant': Exists(participants),
+        'is_tandem': Exists(participants.filter(detachment__isnull=False)),
+        'start_place': Subquery(models.ranking.objects.filter(
+            competition_id=OuterRef('id'), detachment_id=detachment_id
+        ).values('place')[:1]),
+        'tandem_place': Subquery(models.tandem_ranking.objects.filter(
+            detachment_q, competition_id=OuterRef('id')
+        ).values('place')[:1]),
+    }
+    if models.report is not None:
+        reports = models.report.objects.filter(
+            competition_id=OuterRef('id'), detachment_id=detachment_id
+        )
+        annotations['has_report'] = Exists(reports)
+        if any(
+            field.name == 'is_verified'
+            for field in models.report._meta.get_fields()
+        ):
+            annotations['is_verified'] = Subquery(
+                reports.values('is_verified')[:1]
+            )
+    row = Competitions.objects.filter(id=competition_id).annotate(
+        **annotations
+    ).values(*annotations).first()
+    if row is None:
+        return IndicatorPlace(False, False, False, None, None)
+    if row['is_participant']:
+        place = row['tandem_place' if row['is_tandem'] else 'start_place']
+    elif row['start_place'] is not None:
+        place = row['start_place']
+    else:
+        place = row['tandem_place']
+    return IndicatorPlace(
+        row['is_participant'],
+        row['is_tandem'],
+        row.get('has_report', False),
+        row.get('is_verified'),
+        place,
+    )
+
+
+def get_indicator_place(indicator, competition_id,
+                        detachment_id) -> IndicatorPlace:
+    """
+    Состояние показателя отряда для get_place эндпоинтов.
+
+    Ответ кешируется до пересчета рейтингов или изменения отчетов
+    и участников конкурса (invalidate_competition_places).
+
+    :param indicator: номер показателя из INDICATORS
+    """
+    cache_key = PLACE_CACHE_KEY.format(
+        competition_id=competition_id,
+        version=_get_places_version(competition_id),
+        detachment_id=detachment_id,
+        indicator=indicator
+    )
+    indicator_place = cache.get(cache_key)
+    if indicator_place is None:
+        indicator_place = _query_indicator_place(
+            indicator, competition_id, detachment_id
+        )
+        cache.set(
+            cache_key, tuple(indicator_place),
+            settings.COMPETITION_PLACES_CACHE_TTL
+        )
+        return indicator_place
+    return IndicatorPlace(*indicator_place)
@@ -0,0 +1,139 @@
+from django.db import transaction
+
+from competitions.indicators import INDICATORS
+from competitions.models import CompetitionParticipants, LeaderboardEntry
+
+LEADERBOARD_INDICATORS = tuple(INDICATORS)
+
+
+def get_place_field(indicator: int) -> str:
+    return f'q{indicator}_place'
+
+
+def _get_participants_entries(competition_id) -> dict:
+    """Пустые строки сводного рейтинга для участников конкурса."""
+    entries = {}
+    for junior_id, detachment_id in CompetitionParticipants.objects.filter(
+        competition_id=competition_id
+    ).values_list('junior_detachment_id', 'detachment_id'):
+        if detachment_id is None:
+            entries[junior_id] = LeaderboardEntry(detachment_id=junior_id)
+            continue
+        entries[detachment_id] = LeaderboardEntry(
+            detachment_id=detachment_id,
+            tandem_partner_id=junior_id,
+            is_tandem=True
+        )
+        entries[junior_id] = LeaderboardEntry(
+            detachment_id=junior_id,
+            tandem_partner_id=detachment_id,
+            is_tandem=True
+        )
+    return entries
+
+
+def _fill_indicator_places(entries, competition_id, indicator):
+    """Места по показателю из таблиц рейтингов старт и тандем."""
+    field = get_place_field(indicator)
+    model_ranking = INDICATORS[indicator].ranking
+    model_tandem_ranking = INDICATORS[indicator].tandem_ranking
+    for detachment_id, place in model_ranking.objects.filter(
+        competition_id=competition_id
+    ).values_list('detachment_id', 'place'):
+        entry = entries.get(detachment_id)
+        if entry is not None and not entry.is_tandem:
+            setattr(entry, field, place)
+    for detachment_id, junior_id, place in model_tandem_ranking.objects.filter(
+        competition_id=competition_id
+    ).values_list('detachment_id', 'junior_detachment_id', 'place'):
+        for tandem_id in (detachment_id, junior_id):
+            entry = entries.get(tandem_id)
+            if entry is not None and entry.is_tandem:
+                setattr(entry, field, place)
+
+
+def _get_pair_key(entry):
+    """Оба отряда тандема - один участник: ключ по меньшему id пары."""
+    return min(entry.detachment_id,
+               entry.tandem_partner_id or entry.detachment_id)
+
+
+def _set_group_totals(entries):
+    """
+    Суммы мест участников одной номинации.
+
+    Учитываются показатели, по которым место получил хотя бы один
+    участник номинации. Участнику без места по такому показателю
+    ставится худшее место - число участников номинации + 1, иначе
+    пропущенный показатель уменьшал бы сумму и поднимал участника выше.
+    """
+    worst_place = len({_get_pair_key(entry) for entry in entries}) + 1
+    fields = [
+        get_place_field(indicator) for indicator in LEADERBOARD_INDICATORS
+        if any(
+            getattr(entry, get_place_field(indicator)) is not None
+            for entry in entries
+        )
+    ]
+    for entry in entries:
+        places = [getattr(entry, field) for field in fields]
+        if all(place is None for place in places):
+            entry.total = None
+            continue
+        entry.total = sum(
+            worst_place if place is None else place for place in places
+        )
+
+
+def _set_total_places(entries):
+    """
+    Итоговые места отдельно для старт и тандем участников по сумме мест:
+    чем меньше сумма, тем выше место. Участники, не получившие место
+    ни по одному показателю, итогового места не получают.
+    """
+    for is_tandem in (False, True):
+        group = [entry for entry in entries if entry.is_tandem is is_tandem]
+        _set_group_totals(group)
+        # Оба отряда тандема занимают одно место.
+        participants = {}
+        for entry in group:
+            if entry.total is not None:
+                participants.setdefault(
+                    (entry.total, _get_pair_key(entry)), []
+                ).append(entry)
+        for place, key in enumerate(sorted(participants), start=1):
+            for entry in participants[key]:
+                entry.place = place
+
+
+def get_leaderboard_entries(competition_id) -> dict:
+    """
+    Собирает строки сводного рейтинга из таблиц рейтингов.
+
+    :return: словарь {detachment_id: LeaderboardEntry}
+    """
+    entries = _get_participants_entries(competition_id)
+    for indicator in LEADERBOARD_INDICATORS:
+        _fill_indicator_places(entries, competition_id, indicator)
+    _set_total_places(entries.values())
+    return entries
+
+
+def rebuild_leaderboard(competition_id) -> int:
+    """
+    Перестраивает сводный рейтинг конкурса.
+
+    Таблицы рейтингов читаются по одному запросу на таблицу,
+    сводный рейтинг перезаписывается в одной транзакции.
+
+    :return: количество строк сводного рейтинга
+    """
+    entries = get_leaderboard_entries(competition_id)
+    for entry in entries.values():
+        entry.competition_id = competition_id
+    with transaction.atomic():
+        LeaderboardEntry.objects.filter(
+            competition_id=competition_id
+        ).delete()
+        LeaderboardEntry.objects.bulk_create(entries.values())
+    return len(entries)
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from competitions.q_calculations import score_q1_reports
+from competitions.rankings import mark_rankings_dirty
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает очки отрядов-участников конкурса по 1 показателю '
+        '(численность и уплаченные членские взносы).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--competition',
+            type=int,
+            default=settings.COMPETITION_ID,
+            help='id конкурса. По умолчанию - COMPETITION_ID из настроек.'
+        )
+
+    def handle(self, *args, **options):
+        competition_id = options['competition']
+        count = score_q1_reports(competition_id)
+        mark_rankings_dirty((1,), competition_id=competition_id)
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано отчетов по 1 показателю: {count}')
+        )
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('competitions', '0019_alter_q5educatedparticipant_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingRecalculation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indicator', models.PositiveSmallIntegerField(verbose_name='Номер показателя')),
+                ('marked_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата и время последнего изменения')),
+                ('competition', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ranking_recalculations', to='competitions.competitions', verbose_name='Конкурс')),
+            ],
+            options={
+                'verbose_name': 'Показатель для пересчета рейтинга',
+                'verbose_name_plural': 'Показатели для пересчета рейтинга',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='rankingrecalculation',
+            constraint=models.UniqueConstraint(fields=('competition', 'indicator'), name='unique_ranking_recalculation'),
+        ),
+    ]
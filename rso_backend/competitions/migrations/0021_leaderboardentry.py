@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('headquarters', '0033_unithierarchy'),
+        ('competitions', '0020_rankingrecalculation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_tandem', models.BooleanField(default=False, verbose_name='Тандем')),
+                ('q1_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 1')),
+                ('q2_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 2')),
+                ('q3_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 3')),
+                ('q4_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 4')),
+                ('q5_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 5')),
+                ('q7_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 7')),
+                ('q8_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 8')),
+                ('q9_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 9')),
+                ('q10_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 10')),
+                ('q11_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 11')),
+                ('q12_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 12')),
+                ('q13_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 13')),
+                ('q17_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 17')),
+                ('q18_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 18')),
+                ('q19_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 19')),
+                ('q20_place', models.FloatField(blank=True, null=True, verbose_name='Место по показателю 20')),
+                ('total', models.FloatField(blank=True, null=True, verbose_name='Сумма мест по показателям')),
+                ('place', models.PositiveIntegerField(blank=True, null=True, verbose_name='Итоговое место')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата и время пересчета')),
+                ('competition', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard', to='competitions.competitions', verbose_name='Конкурс')),
+                ('detachment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard', to='headquarters.detachment', verbose_name='Отряд')),
+                ('tandem_partner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='headquarters.detachment', verbose_name='Отряд-партнер по тандему')),
+            ],
+            options={
+                'verbose_name': 'Место в сводном рейтинге',
+                'verbose_name_plural': 'Сводный рейтинг',
+                'indexes': [models.Index(fields=['competition', 'is_tandem', 'place'], name='leaderboard_place_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardentry',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_leaderboard_entry'),
+        ),
+    ]
@@ -0,0 +1,290 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:22
+
+import re
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_rankings(apps, schema_editor):
+    """Оставляет последнюю строку рейтинга участника перед UNIQUE."""
+    for model in apps.get_app_config('competitions').get_models():
+        if not re.fullmatch(r'Q\d+(Tandem)?Ranking', model.__name__):
+            continue
+        unique_fields = [('competition', 'detachment')]
+        if 'Tandem' in model.__name__:
+            unique_fields.append(('competition', 'junior_detachment'))
+        for fields in unique_fields:
+            latest_ids = model.objects.values(*fields).annotate(
+                latest_id=Max('id')
+            ).values('latest_id')
+            model.objects.exclude(id__in=latest_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('competitions', '0021_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_rankings, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='q10ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q10ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q10tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q10tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q10tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q10tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q10tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q10tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q11ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q11ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q11tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q11tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q11tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q11tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q11tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q11tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q12ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q12ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q12tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q12tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q12tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q12tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q12tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q12tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q13ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q13ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q13tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q13tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q13tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q13tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q13tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q13tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q17ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q17ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q17tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q17tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q17tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q17tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q17tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q17tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q18ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q18ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q18tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q18tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q18tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q18tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q18tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q18tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q19ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q19ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q19tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q19tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q19tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q19tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q19tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q19tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q1ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q1ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q1tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q1tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q1tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q1tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q1tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q1tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q20ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q20ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q20tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q20tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q20tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q20tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q20tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q20tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q2ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q2ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q2tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q2tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q2tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q2tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q2tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q2tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q3ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q3ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q3tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q3tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q3tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q3tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q3tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q3tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q4ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q4ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q4tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q4tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q4tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q4tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q4tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q4tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q5ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q5ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q5tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q5tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q5tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q5tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q5tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q5tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q7ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q7ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q7tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q7tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q7tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q7tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q7tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q7tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q8ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q8ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q8tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q8tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q8tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q8tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q8tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q8tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q9ranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_ranking_q9ranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q9tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment', 'junior_detachment'), name='unique_tandem_ranking_q9tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q9tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'detachment'), name='unique_main_ranking_q9tandemranking'),
+        ),
+        migrations.AddConstraint(
+            model_name='q9tandemranking',
+            constraint=models.UniqueConstraint(fields=('competition', 'junior_detachment'), name='unique_junior_ranking_q9tandemranking'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.utils import timezone
 
 from competitions.utils import (
     get_certificate_scans_path, document_path, round_math
@@ -128,6 +129,159 @@ class CompetitionParticipants(models.Model):
         ]
 
 
+class RankingRecalculation(models.Model):
+    """
+    Показатель конкурса, рейтинг по которому нужно пересчитать.
+
+    Запись создается (или обновляется marked_at) при изменении отчетов,
+    их верификации и изменении участников конкурса. Периодическая таска
+    пересчитывает только отмеченные показатели и удаляет записи.
+    """
+    competition = models.ForeignKey(
+        to='Competitions',
+        on_delete=models.CASCADE,
+        related_name='ranking_recalculations',
+        verbose_name='Конкурс',
+    )
+    indicator = models.PositiveSmallIntegerField(
+        verbose_name='Номер показателя'
+    )
+    marked_at = models.DateTimeField(
+        verbose_name='Дата и время последнего изменения',
+        default=timezone.now
+    )
+
+    def __str__(self):
+        return (f'Пересчет показателя {self.indicator} '
+                f'в конкурсе id {self.competition_id}')
+
+    class Meta:
+        verbose_name_plural = 'Показатели для пересчета рейтинга'
+        verbose_name = 'Показатель для пересчета рейтинга'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('competition', 'indicator'),
+                name='unique_ranking_recalculation'
+            )
+        ]
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Строка сводного рейтинга конкурса - места отряда по всем показателям.
+
+    Денормализованная копия таблиц рейтингов Q1-Q20, перестраивается
+    тасками пересчета рейтингов (competitions.leaderboard).
+    Участники тандема получают по строке с одинаковыми местами.
+    """
+    competition = models.ForeignKey(
+        to='Competitions',
+        on_delete=models.CASCADE,
+        related_name='leaderboard',
+        verbose_name='Конкурс',
+    )
+    detachment = models.ForeignKey(
+        to='headquarters.Detachment',
+        on_delete=models.CASCADE,
+        related_name='leaderboard',
+        verbose_name='Отряд',
+    )
+    tandem_partner = models.ForeignKey(
+        to='headquarters.Detachment',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Отряд-партнер по тандему',
+        null=True,
+        blank=True
+    )
+    is_tandem = models.BooleanField(
+        verbose_name='Тандем',
+        default=False
+    )
+    q1_place = models.FloatField(
+        verbose_name='Место по показателю 1', null=True, blank=True
+    )
+    q2_place = models.FloatField(
+        verbose_name='Место по показателю 2', null=True, blank=True
+    )
+    q3_place = models.FloatField(
+        verbose_name='Место по показателю 3', null=True, blank=True
+    )
+    q4_place = models.FloatField(
+        verbose_name='Место по показателю 4', null=True, blank=True
+    )
+    q5_place = models.FloatField(
+        verbose_name='Место по показателю 5', null=True, blank=True
+    )
+    q7_place = models.FloatField(
+        verbose_name='Место по показателю 7', null=True, blank=True
+    )
+    q8_place = models.FloatField(
+        verbose_name='Место по показателю 8', null=True, blank=True
+    )
+    q9_place = models.FloatField(
+        verbose_name='Место по показателю 9', null=True, blank=True
+    )
+    q10_place = models.FloatField(
+        verbose_name='Место по показателю 10', null=True, blank=True
+    )
+    q11_place = models.FloatField(
+        verbose_name='Место по показателю 11', null=True, blank=True
+    )
+    q12_place = models.FloatField(
+        verbose_name='Место по показателю 12', null=True, blank=True
+    )
+    q13_place = models.FloatField(
+        verbose_name='Место по показателю 13', null=True, blank=True
+    )
+    q17_place = models.FloatField(
+        verbose_name='Место по показателю 17', null=True, blank=True
+    )
+    q18_place = models.FloatField(
+        verbose_name='Место по показателю 18', null=True, blank=True
+    )
+    q19_place = models.FloatField(
+        verbose_name='Место по показателю 19', null=True, blank=True
+    )
+    q20_place = models.FloatField(
+        verbose_name='Место по показателю 20', null=True, blank=True
+    )
+    total = models.FloatField(
+        verbose_name='Сумма мест по показателям',
+        null=True,
+        blank=True
+    )
+    place = models.PositiveIntegerField(
+        verbose_name='Итоговое место',
+        null=True,
+        blank=True
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата и время пересчета',
+        auto_now=True
+    )
+
+    def __str__(self):
+        return (f'Сводный рейтинг отряда id {self.detachment_id} '
+                f'в конкурсе id {self.competition_id}')
+
+    class Meta:
+        verbose_name_plural = 'Сводный рейтинг'
+        verbose_name = 'Место в сводном рейтинге'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('competition', 'detachment'),
+                name='unique_leaderboard_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('competition', 'is_tandem', 'place'),
+                name='leaderboard_place_idx'
+            )
+        ]
+
+
 class QBaseReport(models.Model):
     competition = models.ForeignKey(
         'Competitions',
@@ -324,7 +478,7 @@ class Q1TandemRanking(QBaseTandemRanking):
         verbose_name='Итоговое место по показателю 1'
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-место по 1 показателю'
         verbose_name_plural = 'Тандем-места по 1 показателю'
 
@@ -338,7 +492,7 @@ class Q1Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю 1'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Место по 1 показателю'
         verbose_name_plural = 'Места по 1 показателю'
 
@@ -350,7 +504,7 @@ class Q2Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Место по 2 показателю'
         verbose_name_plural = 'Места по 2 показателю'
 
@@ -361,7 +515,7 @@ class Q2TandemRanking(QBaseTandemRanking):
         default=3.0,
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-место по 2 показателю'
         verbose_name_plural = 'Тандем-места по 2 показателю'
 
@@ -406,7 +560,7 @@ class Q3Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Место по 3 показателю'
         verbose_name_plural = 'Места по 3 показателю'
 
@@ -417,7 +571,7 @@ class Q3TandemRanking(QBaseTandemRanking):
         default=8.0,
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-место по 3 показателю'
         verbose_name_plural = 'Тандем-места по 3 показателю'
 
@@ -429,7 +583,7 @@ class Q4Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Место по 4 показателю'
         verbose_name_plural = 'Места по 4 показателю'
 
@@ -440,7 +594,7 @@ class Q4TandemRanking(QBaseTandemRanking):
         default=8.0,
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-место по 4 показателю'
         verbose_name_plural = 'Тандем-места по 4 показателю'
 
@@ -451,7 +605,7 @@ class Q5TandemRanking(QBaseTandemRanking):
         default=20.0
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-места по 13 показателю'
         verbose_name_plural = 'Тандем-места по 13 показателю'
 
@@ -463,7 +617,7 @@ class Q5Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Места по 13 показателю'
         verbose_name_plural = 'Места по 13 показателю'
 
@@ -497,7 +651,7 @@ class Q7TandemRanking(QBaseTandemRanking):
         verbose_name='Итоговое место по показателю 7'
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-место по 7 показателю'
         verbose_name_plural = 'Тандем-места по 7 показателю'
 
@@ -511,7 +665,7 @@ class Q7Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю 7'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Место по 7 показателю'
         verbose_name_plural = 'Места по 7 показателю'
 
@@ -608,7 +762,7 @@ class Q8TandemRanking(QBaseTandemRanking):
         verbose_name='Итоговое место по показателю 8'
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-место по 8 показателю'
         verbose_name_plural = 'Тандем-места по 8 показателю'
 
@@ -622,7 +776,7 @@ class Q8Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю 8'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Место по 8 показателю'
         verbose_name_plural = 'Места по 8 показателю'
 
@@ -717,7 +871,7 @@ class Q9TandemRanking(QBaseTandemRanking):
         verbose_name='Итоговое место по показателю 9'
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-место по 9 показателю'
         verbose_name_plural = 'Тандем-места по 9 показателю'
 
@@ -731,7 +885,7 @@ class Q9Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю 9'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Место по 9 показателю'
         verbose_name_plural = 'Места по 9 показателю'
 
@@ -797,7 +951,7 @@ class Q10TandemRanking(QBaseTandemRanking):
         verbose_name='Итоговое место по показателю 10'
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-место по 10 показателю'
         verbose_name_plural = 'Тандем-места по 10 показателю'
 
@@ -811,7 +965,7 @@ class Q10Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю 10'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Место по 10 показателю'
         verbose_name_plural = 'Места по 10 показателю'
 
@@ -882,7 +1036,7 @@ class Q11TandemRanking(QBaseTandemRanking):
         verbose_name='Итоговое место по показателю 11'
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-место по 11 показателю'
         verbose_name_plural = 'Тандем-места по 11 показателю'
 
@@ -896,7 +1050,7 @@ class Q11Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю 11'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Место по 11 показателю'
         verbose_name_plural = 'Места по 11 показателю'
 
@@ -963,7 +1117,7 @@ class Q12TandemRanking(QBaseTandemRanking):
         verbose_name='Итоговое место по показателю 12'
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-место по 12 показателю'
         verbose_name_plural = 'Тандем-места по 12 показателю'
 
@@ -977,7 +1131,7 @@ class Q12Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю 12'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Место по 12 показателю'
         verbose_name_plural = 'Места по 12 показателю'
 
@@ -1041,7 +1195,7 @@ class Q13TandemRanking(QBaseTandemRanking):
         default=6.0
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-места по 13 показателю'
         verbose_name_plural = 'Тандем-места по 13 показателю'
 
@@ -1053,7 +1207,7 @@ class Q13Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Места по 13 показателю'
         verbose_name_plural = 'Места по 13 показателю'
 
@@ -1121,7 +1275,7 @@ class Q17Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Место по 17 показателю'
         verbose_name_plural = 'Места по 17 показателю'
 
@@ -1131,7 +1285,7 @@ class Q17TandemRanking(QBaseTandemRanking):
         verbose_name='Итоговое место по показателю в тандеме',
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-место по 17 показателю'
         verbose_name_plural = 'Тандем-места по 17 показателю'
 
@@ -1141,7 +1295,7 @@ class Q18TandemRanking(QBaseTandemRanking):
         verbose_name='Итоговое место по показателю'
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-места по 18 показателю'
         verbose_name_plural = 'Тандем-места по 18 показателю'
 
@@ -1151,7 +1305,7 @@ class Q18Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Места по 18 показателю'
         verbose_name_plural = 'Места по 18 показателю'
 
@@ -1177,7 +1331,7 @@ class Q19TandemRanking(QBaseTandemRanking):
         validators=[MinValueValidator(1), MaxValueValidator(2)],
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-место по 19 показателю'
         verbose_name_plural = 'Тандем-места по 19 показателю'
 
@@ -1191,7 +1345,7 @@ class Q19Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю 19'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Место по 19 показателю'
         verbose_name_plural = 'Места по 19 показателю'
 
@@ -1227,7 +1381,7 @@ class Q20TandemRanking(QBaseTandemRanking):
         verbose_name='Итоговое место по показателю 20'
     )
 
-    class Meta:
+    class Meta(QBaseTandemRanking.Meta):
         verbose_name = 'Тандем-место по 20 показателю'
         verbose_name_plural = 'Тандем-места по 20 показателю'
 
@@ -1241,7 +1395,7 @@ class Q20Ranking(QBaseRanking):
         verbose_name='Итоговое место по показателю 20'
     )
 
-    class Meta:
+    class Meta(QBaseRanking.Meta):
         verbose_name = 'Место по 20 показателю'
         verbose_name_plural = 'Места по 20 показателю'
 
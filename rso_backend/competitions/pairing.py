@@ -0,0 +1,77 @@
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from competitions.models import CompetitionParticipants
+
+PAIRING_CACHE_KEY = 'competition_pairing_{competition_id}'
+
+
+class Participation(NamedTuple):
+    """
+    Участие отряда в конкурсе.
+
+    is_tandem - участник тандема, иначе старт,
+    is_junior - младший отряд (старт-участник всегда младший),
+    partner_id - id отряда-напарника по тандему, для старта - None.
+    """
+    is_tandem: bool
+    is_junior: bool
+    partner_id: int | None
+
+
+def _build_pairing_index(competition_id) -> dict:
+    index = {}
+    for junior_detachment_id, detachment_id in (
+        CompetitionParticipants.objects.filter(
+            competition_id=competition_id
+        ).values_list('junior_detachment_id', 'detachment_id')
+    ):
+        if detachment_id is None:
+            index[junior_detachment_id] = (False, True, None)
+            continue
+        index[junior_detachment_id] = (True, True, detachment_id)
+        index[detachment_id] = (True, False, junior_detachment_id)
+    return index
+
+
+def get_pairing_index(competition_id) -> dict:
+    """
+    Участники конкурса одним запросом.
+
+    Индекс хранится в кеше и сбрасывается сигналами при изменении
+    участников конкурса (invalidate_pairing_index).
+
+    :return: словарь {detachment_id: (is_tandem, is_junior, partner_id)}
+    """
+    cache_key = PAIRING_CACHE_KEY.format(competition_id=competition_id)
+    index = cache.get(cache_key)
+    if index is None:
+        index = _build_pairing_index(competition_id)
+        cache.set(
+            cache_key, index, settings.COMPETITION_PAIRING_CACHE_TTL
+        )
+    return index
+
+
+def get_participation(competition_id,
+                      detachment_id) -> Participation | None:
+    """
+    Роль отряда в конкурсе и его напарник по тандему.
+
+    :return: Participation или None, если отряд не участвует в конкурсе
+    """
+    if competition_id is None or detachment_id is None:
+        return None
+    participation = get_pairing_index(competition_id).get(detachment_id)
+    if participation is None:
+        return None
+    return Participation(*participation)
+
+
+def invalidate_pairing_index(competition_id):
+    """Сбрасывает индекс участников конкурса после коммита транзакции."""
+    cache_key = PAIRING_CACHE_KEY.format(competition_id=competition_id)
+    transaction.on_commit(lambda: cache.delete(cache_key))
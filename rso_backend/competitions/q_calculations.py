@@ -1,15 +1,16 @@
 from datetime import date
-from django.db.models import Max
+from django.db import transaction
+from django.db.models import Count, Q
 from django.conf import settings
 import logging
 from competitions.models import Q13EventOrganization, Q18Ranking, \
     Q18DetachmentReport, CompetitionParticipants, Q18TandemRanking, Q19Ranking, \
     Q19Report, Q19TandemRanking, Q1Report, Q7Ranking, Q7Report, \
     Q7TandemRanking, Q3Ranking, Q3TandemRanking, Q4Ranking, Q4TandemRanking, \
-    Q5TandemRanking, Q5Ranking, \
-    Q5EducatedParticipant, Q5DetachmentReport
-from headquarters.models import UserDetachmentPosition
-from questions.models import Attempt
+    Q5TandemRanking, Q5Ranking, Q5DetachmentReport
+from competitions.rankings import save_places
+from headquarters.models import Detachment, UserDetachmentPosition
+from questions.utils import get_best_scores
 
 logger = logging.getLogger('tasks')
 
@@ -60,118 +61,82 @@ def calculate_q13_place(objects: list[Q13EventOrganization]) -> int:
 
 
 def calculate_q18_place(competition_id):
+    """
+    Расчет мест по 18 показателю.
+
+    Очки отчета - доля бойцов, принявших участие во Всероссийском дне
+    ударного труда, от численности отряда на 15 июня. Чем больше очков,
+    тем выше место, тандему считается сумма очков обоих отрядов.
+    До 15 июня 2024 года численность отрядов обновляется.
+    Число запросов к БД не зависит от количества отчетов.
+    """
     today = date.today()
     cutoff_date = date(2024, 6, 15)
 
-    logger.info(f'Сегодняшняя дата: {cutoff_date}')
+    reports = list(Q18DetachmentReport.objects.filter(
+        competition_id=competition_id,
+        is_verified=True
+    ))
+    logger.info(f'Получили верифицированные отчеты: {len(reports)}')
 
-    verified_entries = Q18DetachmentReport.objects.filter(is_verified=True)
-    logger.info(
-        f'Получили верифицированные отчеты: {verified_entries.count()}')
-
-    solo_entries = []
-    tandem_entries = []
-
-    for entry in verified_entries:
-        participants_entry = CompetitionParticipants.objects.filter(
-            junior_detachment=entry.detachment
-        ).first()
-        partner_entry = None
-        if participants_entry and not participants_entry.detachment:
-            category = solo_entries
-            logger.info(f'Отчет {entry} - соло участник')
-        elif participants_entry:
-            logger.info(f'Отчет {entry} - тандем участник')
-            category = tandem_entries
-            if participants_entry:
-                partner_entry = Q18DetachmentReport.objects.filter(
-                    detachment=participants_entry.detachment,
-                    is_verified=True
-                ).first()
-                if partner_entry:
-                    logger.info(
-                        f'Для отчета {entry} найден '
-                        f'партнерский отчет: {partner_entry}'
-                    )
-        elif not participants_entry:
-            participants_entry = CompetitionParticipants.objects.filter(
-                detachment=entry.detachment
-            ).first()
-            partner_entry = entry
-            if participants_entry:
-                category = tandem_entries
-                entry = Q18DetachmentReport.objects.filter(
-                    detachment=participants_entry.junior_detachment,
-                    is_verified=True
-                ).first()
-                if entry:
-                    logger.info(
-                        f'Для отчета {partner_entry} найден '
-                        f'партнерский отчет: {entry}'
-                    )
-        if today <= cutoff_date:
-            logger.info(
-                f'Сегодняшняя дата {today} меньше '
-                f'cutoff date: {cutoff_date}. '
-                f'Обновляем кол-во участников.'
-            )
-            calculate_detachment_members(entry, partner_entry)
-
-        entry.score = entry.participants_number / entry.june_15_detachment_members
-        entry.save()
-
-        if partner_entry:
-            partner_entry.score = partner_entry.participants_number / partner_entry.june_15_detachment_members
-            partner_entry.save()
-            tuple_to_append = (
-                entry, partner_entry, entry.score + partner_entry.score)
-            if tuple_to_append not in category:
-                category.append(tuple_to_append)
-        else:
-            category.append((entry, entry.score))
-
-    if solo_entries:
+    update_fields = ['score']
+    if today <= cutoff_date:
         logger.info(
-            'Есть записи для соло-участников. Удаляем записи из таблицы Q18 Ranking')
-        Q18Ranking.objects.all().delete()
-        solo_entries.sort(key=lambda entry: entry[1])
-        place = len(solo_entries)
-        for entry in solo_entries:
-            logger.info(
-                f'Отчет {entry[0]} занимает {place} место'
-            )
-            Q18Ranking.objects.create(
-                detachment=entry[0].detachment,
-                place=place,
-                competition_id=competition_id
+            f'Сегодняшняя дата {today} меньше '
+            f'cutoff date: {cutoff_date}. '
+            f'Обновляем кол-во участников.'
+        )
+        members_count = get_detachments_members_count(
+            [report.detachment_id for report in reports]
+        )
+        for report in reports:
+            report.june_15_detachment_members = (
+                members_count[report.detachment_id]
             )
-            place -= 1
+        update_fields.append('june_15_detachment_members')
 
-    if tandem_entries:
-        logger.info(
-            'Есть записи для тандем-участников. Удаляем записи из таблицы Q18 TandemRanking')
-        Q18TandemRanking.objects.all().delete()
-        tandem_entries.sort(key=lambda entry: entry[2])
-        place = len(tandem_entries)
-        for entry in tandem_entries:
-            logger.info(
-                f'Отчеты {entry[0]} и {entry[1]} занимают {place} место'
-            )
-            Q18TandemRanking.objects.create(
-                junior_detachment=entry[0].detachment,
-                detachment=entry[1].detachment,
-                place=place,
-                competition_id=competition_id
-            )
-            place -= 1
+    for report in reports:
+        report.score = (
+            report.participants_number / report.june_15_detachment_members
+        )
+    # bulk_update не отправляет post_save: пересчет очков не отмечает
+    # показатель для повторного пересчета.
+    Q18DetachmentReport.objects.bulk_update(reports, update_fields)
+
+    participants = list(
+        CompetitionParticipants.objects.filter(
+            competition_id=competition_id
+        ).order_by('id').values_list('junior_detachment_id', 'detachment_id')
+    )
+    scores = {report.detachment_id: report.score for report in reports}
+    start_places = get_start_places(participants, scores)
+    tandem_places = get_tandem_places(participants, scores)
+    logger.info(
+        f'Q18: {len(start_places)} старт мест, '
+        f'{len(tandem_places)} тандем мест'
+    )
+    save_places(
+        competition_id, Q18Ranking, Q18TandemRanking,
+        start_places, tandem_places
+    )
 
 
-def calculate_detachment_members(entry, partner_entry=None):
-    entry.june_15_detachment_members = entry.detachment.members.count() + 1
-    entry.save()
-    if partner_entry:
-        partner_entry.june_15_detachment_members = partner_entry.detachment.members.count() + 1
-        partner_entry.save()
+def get_detachments_members_count(detachment_ids) -> dict:
+    """
+    Численность отрядов одним запросом.
+
+    Командира нет в members, поэтому к количеству членов отряда
+    добавляется единица.
+    :return: словарь {detachment_id: количество человек в отряде}
+    """
+    return {
+        detachment_id: members_count + 1
+        for detachment_id, members_count in Detachment.objects.filter(
+            id__in=detachment_ids
+        ).annotate(
+            members_count=Count('members')
+        ).values_list('id', 'members_count')
+    }
 
 
 def calculate_place(
@@ -195,107 +160,116 @@ def calculate_place(
     if today >= cutoff_date:
         return
 
-    participants = CompetitionParticipants.objects.filter(
-        # первый запрос к бд
-        competition_id=competition_id
-    ).select_related('junior_detachment', 'detachment')
+    rank_participants(
+        competition_id, model_report, model_ranking, model_tandem_ranking,
+        reverse
+    )
+
+
+def rank_participants(
+        competition_id, model_report, model_ranking, model_tandem_ranking,
+        reverse=True
+):
+    """
+    Пересчитывает рейтинги старт и тандем участников конкурса.
+
+    Число запросов к БД не зависит от количества участников:
+    участники и очки отчетов загружаются двумя запросами, места
+    считаются в памяти, в таблицы рейтингов записываются только
+    изменившиеся места (save_places).
+    Параметры аналогичны calculate_place.
+    """
+    participants = list(
+        CompetitionParticipants.objects.filter(  # первый запрос к бд
+            competition_id=competition_id
+        ).order_by('id').values_list('junior_detachment_id', 'detachment_id')
+    )
 
     if not participants:
         return
 
-    start_ids = list(participants.filter(detachment__isnull=True)
-                     .values_list('junior_detachment__id', flat=True))
+    scores = dict(
+        model_report.objects.filter(  # второй запрос к бд
+            competition_id=competition_id
+        ).values_list('detachment_id', 'score')
+    )
 
-    tandem_ids = list(participants.filter(detachment__isnull=False)
-                      .values_list('junior_detachment__id', 'detachment__id'))
+    start_places = get_start_places(participants, scores, reverse)
+    tandem_places = get_tandem_places(participants, scores, reverse)
 
-    reports_start = model_report.objects.filter(  # второй запрос к бд
-        competition_id=competition_id,
-        detachment_id__in=start_ids
+    logger.info(
+        f'{model_ranking.__name__}: {len(start_places)} старт мест, '
+        f'{model_tandem_ranking.__name__}: {len(tandem_places)} тандем мест'
     )
 
-    sorted_by_score_start_reports = sorted(
-        reports_start, key=lambda x: x.score, reverse=reverse
+    save_places(
+        competition_id, model_ranking, model_tandem_ranking,
+        start_places, tandem_places
     )
 
-    to_create_entries = []
-    for index, report in enumerate(sorted_by_score_start_reports):
-        to_create_entries.append(
-            model_ranking(competition=report.competition,
-                          detachment=report.detachment,
-                          place=index + 1)
-        )
-
-    model_ranking.objects.filter(
-        competition_id=competition_id).delete()  # третий запрос к бд
-    model_ranking.objects.bulk_create(
-        to_create_entries)  # четвертый запрос к бд
 
-    reports = model_report.objects.filter(  # пятый запрос к бд
-        competition_id=competition_id
-    ).select_related('detachment').all()
+def get_start_places(participants, scores, reverse=True):
+    """
+    Места старт участников.
 
-    tandem_reports = [
-        [reports.filter(detachment_id=id).first() for id in ids]
-        for ids in tandem_ids
+    :param participants: список пар (junior_detachment_id, detachment_id)
+    :param scores: словарь {detachment_id: score} по отчетам конкурса
+    :return: список пар (detachment_id, place). Участники без отчета
+             в рейтинг не попадают.
+    """
+    start_ids = [
+        junior_id for junior_id, detachment_id in participants
+        if detachment_id is None and junior_id in scores
+    ]
+    start_ids.sort(key=lambda detachment_id: scores[detachment_id],
+                   reverse=reverse)
+    return [
+        (detachment_id, index + 1)
+        for index, detachment_id in enumerate(start_ids)
     ]
 
-    sorted_by_score_tandem_reports = sorted(
-        tandem_reports,
-        key=lambda x: ((x[0].score + x[1].score) if (x[0] and x[1])
-                       else (x[0].score if x[0] is not None
-                             else (x[1].score if x[1] is not None
-                                   else (0 if reverse else len(tandem_ids))))),
-        reverse=reverse
-    )
-
-    logger.info(f'Отчеты: {sorted_by_score_tandem_reports}')
-
-    to_create_entries = []
-    for index, report in enumerate(sorted_by_score_tandem_reports):
-        if report[0] is None and report[1] is None:
-            continue
 
-        if report[0] is not None and report[1] is not None:
-            to_create_entries.append(
-                model_tandem_ranking(competition=report[0].competition,
-                                     junior_detachment=report[0].detachment,
-                                     detachment=report[1].detachment,
-                                     place=index + 1)
-            )
+def get_tandem_places(participants, scores, reverse=True):
+    """
+    Места тандем участников.
 
-        elif report[0] is not None:
-            detachment = participants.get(
-                junior_detachment=report[0].detachment,
-            ).detachment
-            to_create_entries.append(
-                model_tandem_ranking(competition=report[0].competition,
-                                     junior_detachment=report[0].detachment,
-                                     detachment=detachment,
-                                     place=index + 1)
-            )
+    Очки тандема - сумма очков обоих отрядов, если отчет подал только
+    один из отрядов - его очки. Тандемы без отчетов в рейтинг не попадают,
+    но занимают место в конце списка, как и раньше.
 
-        elif report[1] is not None:
-            junior_detachment = participants.get(
-                detachment=report[1].detachment,
-            ).junior_detachment
-            to_create_entries.append(
-                model_tandem_ranking(competition=report[1].competition,
-                                     junior_detachment=junior_detachment,
-                                     detachment=report[1].detachment,
-                                     place=index + 1)
-            )
-    model_tandem_ranking.objects.filter(
-        competition_id=competition_id).delete()  # шестой запрос к бд
-    model_tandem_ranking.objects.bulk_create(
-        to_create_entries)  # седьмой запрос к бд
+    :param participants: список пар (junior_detachment_id, detachment_id)
+    :param scores: словарь {detachment_id: score} по отчетам конкурса
+    :return: список (junior_detachment_id, detachment_id, place).
+    """
+    tandems = [
+        (junior_id, detachment_id) for junior_id, detachment_id
+        in participants if detachment_id is not None
+    ]
+    no_reports_score = 0 if reverse else len(tandems)
+
+    def tandem_score(tandem):
+        tandem_scores = [
+            scores[detachment_id] for detachment_id in tandem
+            if detachment_id in scores
+        ]
+        if not tandem_scores:
+            return no_reports_score
+        return sum(tandem_scores)
+
+    tandems.sort(key=tandem_score, reverse=reverse)
+    return [
+        (junior_id, detachment_id, index + 1)
+        for index, (junior_id, detachment_id) in enumerate(tandems)
+        if junior_id in scores or detachment_id in scores
+    ]
 
 
 def calculate_q1_score(competition_id):
     """
     Функция для расчета очков по 1 показателю.
 
-    Выполняется только 15.04.2024.
+    Выполняется только 15.04.2024, в остальные дни очки можно
+    пересчитать командой calculate_q1_score.
     """
     today = date.today()
     start_date = date(2024, 4, 15)
@@ -303,135 +277,135 @@ def calculate_q1_score(competition_id):
     if today != start_date:
         return
 
-    participants = CompetitionParticipants.objects.filter(
-        competition_id=competition_id
-    ).all()  # мб добавить select_related('junior_detachment__members', 'detachment__members')
+    score_q1_reports(competition_id)
 
-    if not participants:
-        logger.info('Нет участников')
-        return
 
-    detachments_data = []
-
-    # Собираем список списков, где
-    #       первый элемент - id отряда-участника,
-    #       второй - количество участников в отряде,
-    #       третий - количество участников с оплаченным членским взносом
-    # Добавляем везде единичку, т.к. командира нет в members
-    for entry in participants:
-        detachments_data.append([
-            entry.junior_detachment_id,
-            entry.junior_detachment.members.count() + 1,
-            entry.junior_detachment.members.filter(
-                user__membership_fee=True
-            ).count() + 1 if entry.junior_detachment.commander.membership_fee else 0
-        ])
-        if entry.detachment:
-            detachments_data.append([
-                entry.detachment_id,
-                entry.detachment.members.count() + 1,
-                entry.detachment.members.filter(
-                    user__membership_fee=True
-                ).count() + 1 if entry.detachment.commander.membership_fee else 0
-            ])
-
-    # Создаем отчеты каждому отряду с посчитанными score
-    #       10 человек в отряде  – за каждого уплатившего 1 балл
-    #       11-20 человек – за каждого уплатившего 0.75 балла
-    #       21 и более человек – за каждого уплатившего 0.5 балла
-
-    to_create_entries = []
-
-    # score по дефолту 1, иначе в таске как False проходит, не считается
-    for data in detachments_data:
-        score = 1  # TODO: Если в отряде меньше 10 человек - то score = 1 УТОЧНИТЬ
-        if data[1] == 10:
-            score = data[2] * 1 + 1
-        elif data[1] > 10 and data[1] <= 20:
-            score = data[2] * 0.75 + 1
-        elif data[1] > 20:
-            score = data[2] * 0.5 + 1
-        to_create_entries.append(
-            Q1Report(competition_id=competition_id,
-                     detachment_id=data[0],
-                     score=score)
+def score_q1_reports(competition_id) -> int:
+    """
+    Пересчитывает отчеты по 1 показателю всех отрядов-участников.
+
+    Численность отрядов и количество уплативших членский взнос
+    считаются одним сгруппированным запросом, отчеты перезаписываются
+    в одной транзакции.
+    Командира нет в members, поэтому он добавляется к численности
+    отряда, а к уплатившим - если уплатил членский взнос.
+
+    Очки за оплаченный членский взнос:
+          10 человек в отряде  – за каждого уплатившего 1 балл
+          11-20 человек – за каждого уплатившего 0.75 балла
+          21 и более человек – за каждого уплатившего 0.5 балла
+    score по дефолту 1, иначе в таске как False проходит, не считается.
+
+    :return: количество отчетов
+    """
+    detachment_ids = set()
+    for junior_detachment_id, detachment_id in (
+        CompetitionParticipants.objects.filter(
+            competition_id=competition_id
+        ).values_list('junior_detachment_id', 'detachment_id')
+    ):
+        detachment_ids.add(junior_detachment_id)
+        if detachment_id is not None:
+            detachment_ids.add(detachment_id)
+
+    if not detachment_ids:
+        logger.info('Нет участников')
+        return 0
+
+    detachments = Detachment.objects.filter(
+        id__in=detachment_ids
+    ).annotate(
+        members_count=Count('members'),
+        paid_members_count=Count(
+            'members', filter=Q(members__user__membership_fee=True)
         )
+    ).values_list(
+        'id', 'members_count', 'paid_members_count',
+        'commander__membership_fee'
+    )
+    reports = [
+        Q1Report(
+            competition_id=competition_id,
+            detachment_id=detachment_id,
+            score=get_q1_score(
+                members_count + 1,
+                paid_members_count + int(bool(commander_paid))
+            )
+        )
+        for detachment_id, members_count, paid_members_count, commander_paid
+        in detachments
+    ]
 
-    Q1Report.objects.filter(competition_id=competition_id).delete()
-    Q1Report.objects.bulk_create(to_create_entries)
+    with transaction.atomic():
+        Q1Report.objects.filter(competition_id=competition_id).delete()
+        Q1Report.objects.bulk_create(reports)
+    return len(reports)
+
+
+def get_q1_score(members_count: int, paid_members_count: int) -> float:
+    """Очки отряда по 1 показателю, см. score_q1_reports."""
+    if members_count == 10:
+        return paid_members_count * 1 + 1
+    if 10 < members_count <= 20:
+        return paid_members_count * 0.75 + 1
+    if members_count > 20:
+        return paid_members_count * 0.5 + 1
+    return 1  # TODO: Если в отряде меньше 10 человек - то score = 1 УТОЧНИТЬ
 
 
 def calculate_q3_q4_place(competition_id: int):
+    """
+    Расчет мест по 3 и 4 показателям.
+
+    Места считаются для отрядов, подавших отчет по 5 показателю,
+    по результатам тестов командира, комиссаров и членов отряда
+    (get_q3_q4_places). Тандему ставится среднее место обоих отрядов.
+    """
+    places = get_q3_q4_places(competition_id)
     logger.info(
-        'Удаляем все записи из Q3Ranking, Q3TandemRanking, '
-        'Q4Ranking, Q4TandemRanking, '
-    )
-    Q3TandemRanking.objects.all().delete()
-    Q3Ranking.objects.all().delete()
-    Q4Ranking.objects.all().delete()
-    Q4TandemRanking.objects.all().delete()
-    logger.info('Считаем места по 3 показателю')
-    solo_entries = CompetitionParticipants.objects.filter(
-        competition_id=competition_id,
-        junior_detachment__isnull=False,
-        detachment__isnull=True
-    )
-    tandem_entries = CompetitionParticipants.objects.filter(
-        competition_id=competition_id,
-        junior_detachment__isnull=False,
-        detachment__isnull=False
+        f'Посчитали места по 3-4 показателям для {len(places)} отрядов'
     )
-    for entry in solo_entries:
-        # Получаем результаты для командира отряда
-        try:
-            entry_report = entry.junior_detachment.q5detachmentreport_detachment_reports.get(competition_id=competition_id)
-        except Q5DetachmentReport.DoesNotExist:
+    participants = CompetitionParticipants.objects.filter(
+        competition_id=competition_id
+    ).values_list('junior_detachment_id', 'detachment_id')
+
+    q3_places, q4_places = [], []
+    q3_tandem_places, q4_tandem_places = [], []
+    for junior_detachment_id, detachment_id in participants:
+        if detachment_id is None:
+            if junior_detachment_id not in places:
+                continue
+            q3_place, q4_place = places[junior_detachment_id]
+            if q3_place:
+                q3_places.append((junior_detachment_id, q3_place))
+            if q4_place:
+                q4_places.append((junior_detachment_id, q4_place))
             continue
-        q3_place = get_q3_q4_place(entry_report, 'university')
-        q4_place = get_q3_q4_place(entry_report, 'safety')
-        if q3_place:
-            logger.info(f'Для СОЛО {entry} посчитали Q3 место - {q3_place}')
-            Q3Ranking.objects.create(
-                competition_id=competition_id,
-                detachment=entry_report.detachment,
-                place=q3_place,
-            )
-        if q4_place:
-            logger.info(f'Для {entry} посчитали Q4 место - {q4_place}')
-            Q4Ranking.objects.create(
-                competition_id=competition_id,
-                detachment=entry,
-                place=q3_place,
-            )
-    for tandem_entry in tandem_entries:
-        try:
-            tandem_entry_report = tandem_entry.detachment.q5detachmentreport_detachment_reports.get(competition_id=competition_id)
-            junior_tandem_entry_report = tandem_entry.junior_detachment.q5detachmentreport_detachment_reports.get(competition_id=competition_id)
-            logger.info(f'detachment reports for tandem entries: {tandem_entry_report}, {junior_tandem_entry_report}')
-        except Q5DetachmentReport.DoesNotExist:
+        if junior_detachment_id not in places or detachment_id not in places:
             continue
-        q3_place_1 = get_q3_q4_place(junior_tandem_entry_report, 'university')
-        q3_place_2 = get_q3_q4_place(tandem_entry_report, 'university')
-        q4_place_1 = get_q3_q4_place(junior_tandem_entry_report, 'safety')
-        q4_place_2 = get_q3_q4_place(tandem_entry_report, 'safety')
+        q3_place_1, q4_place_1 = places[junior_detachment_id]
+        q3_place_2, q4_place_2 = places[detachment_id]
         if q3_place_1 and q3_place_2:
-            final_place = round((q3_place_1 + q3_place_2) / 2)
-            logger.info(f'Для ТАНДЕМ {tandem_entry} посчитали Q3 место - {final_place}')
-            Q3TandemRanking.objects.create(
-                competition_id=competition_id,
-                detachment=tandem_entry.detachment,
-                junior_detachment=tandem_entry.junior_detachment,
-                place=final_place
-            )
+            q3_tandem_places.append((
+                junior_detachment_id,
+                detachment_id,
+                round((q3_place_1 + q3_place_2) / 2)
+            ))
         if q4_place_1 and q4_place_2:
-            final_place = round((q4_place_1 + q4_place_2) / 2)
-            logger.info(f'Для ТАНДЕМ {tandem_entry} посчитали Q4 место - {final_place}')
-            Q4TandemRanking.objects.create(
-                competition_id=competition_id,
-                detachment=tandem_entry.detachment,
-                junior_detachment=tandem_entry.junior_detachment,
-                place=final_place
-            )
+            q4_tandem_places.append((
+                junior_detachment_id,
+                detachment_id,
+                round((q4_place_1 + q4_place_2) / 2)
+            ))
+
+    save_places(
+        competition_id, Q3Ranking, Q3TandemRanking,
+        q3_places, q3_tandem_places
+    )
+    save_places(
+        competition_id, Q4Ranking, Q4TandemRanking,
+        q4_places, q4_tandem_places
+    )
 
 
 def calculate_q5_place(competition_id: int):
@@ -461,85 +435,76 @@ def calculate_q5_place(competition_id: int):
     от 10% до 15% - 18 место
     от 5% до 10% - 19 место
     от 0% до 5% - 20 место
+
+    Тандему ставится округленное среднее место обоих отрядов, если
+    отчеты подали оба отряда.
+    До 15 июня 2024 года численность отрядов обновляется.
+    Число запросов к БД не зависит от количества участников,
+    в таблицы рейтингов записываются только изменившиеся места.
     """
     today = date.today()
     cutoff_date = date(2024, 6, 15)
 
-    logger.info(
-        'Удаляем все записи из Q5Ranking, Q5TandemRanking'
-    )
-    Q5TandemRanking.objects.all().delete()
-    Q5Ranking.objects.all().delete()
-    solo_entries = CompetitionParticipants.objects.filter(
-        competition_id=competition_id,
-        junior_detachment__isnull=False,
-        detachment__isnull=True
-    )
-    tandem_entries = CompetitionParticipants.objects.filter(
-        competition_id=competition_id,
-        junior_detachment__isnull=False,
-        detachment__isnull=False
+    reports = Q5DetachmentReport.objects.filter(
+        competition_id=competition_id
+    ).annotate(
+        educated_participants_count=Count(
+            'q5educatedparticipant',
+            filter=Q(q5educatedparticipant__is_verified=True)
+        )
     )
-    logger.info(f'solo entries: {solo_entries}, tandem entries: {tandem_entries}')
-    for entry in solo_entries:
-        try:
-            entry_report = entry.junior_detachment.q5detachmentreport_detachment_reports.get(competition_id=competition_id)
-        except Q5DetachmentReport.DoesNotExist:
-            continue
-        logger.info(f'detachment report for solo entry: {entry_report}')
-        if not entry_report:
-            continue
-        if today <= cutoff_date:
-            logger.info(
-                f'Сегодняшняя дата {today} меньше '
-                f'cutoff date: {cutoff_date}. '
-                f'Обновляем кол-во участников.'
-            )
-            calculate_detachment_members(entry_report)
-        educated_participants_count = Q5EducatedParticipant.objects.filter(is_verified=True, detachment_report=entry_report).count()
-        Q5Ranking.objects.create(
-            competition_id=competition_id,
-            detachment=entry_report.detachment,
-            place=get_q5_place(educated_participants_count, entry_report.june_15_detachment_members)
+    if today <= cutoff_date:
+        logger.info(
+            f'Сегодняшняя дата {today} меньше '
+            f'cutoff date: {cutoff_date}. '
+            f'Обновляем кол-во участников.'
         )
-    for tandem_entry in tandem_entries:
-        try:
-            tandem_entry_report = tandem_entry.detachment.q5detachmentreport_detachment_reports.get(competition_id=competition_id)
-            junior_tandem_entry_report = tandem_entry.junior_detachment.q5detachmentreport_detachment_reports.get(competition_id=competition_id)
-            logger.info(f'detachment reports for tandem entries: {tandem_entry_report}, {junior_tandem_entry_report}')
-        except Q5DetachmentReport.DoesNotExist:
-            continue
-        if not tandem_entry_report or not junior_tandem_entry_report:
-            continue
-
-        if today <= cutoff_date:
-            logger.info(
-                f'Сегодняшняя дата {today} меньше '
-                f'cutoff date: {cutoff_date}. '
-                f'Обновляем кол-во участников.'
+        reports = list(reports)
+        members_count = get_detachments_members_count(
+            [report.detachment_id for report in reports]
+        )
+        for report in reports:
+            report.june_15_detachment_members = (
+                members_count[report.detachment_id]
             )
-            calculate_detachment_members(tandem_entry_report, junior_tandem_entry_report)
-
-        educated_participants_count_junior = Q5EducatedParticipant.objects.filter(
-            is_verified=True,
-            detachment_report=junior_tandem_entry_report
-        ).count()
-        educated_participants_count_detachment = Q5EducatedParticipant.objects.filter(
-            is_verified=True,
-            detachment_report=tandem_entry_report
-        ).count()
-
-        final_place = round((
-            get_q5_place(educated_participants_count_junior, junior_tandem_entry_report.june_15_detachment_members) +
-            get_q5_place(educated_participants_count_detachment, tandem_entry_report.june_15_detachment_members)
-        ) / 2)
-
-        Q5TandemRanking.objects.create(
-            competition_id=competition_id,
-            detachment=tandem_entry.detachment,
-            junior_detachment=tandem_entry.junior_detachment,
-            place=final_place
+        Q5DetachmentReport.objects.bulk_update(
+            reports, ['june_15_detachment_members']
+        )
+    places = {
+        report.detachment_id: get_q5_place(
+            report.educated_participants_count,
+            report.june_15_detachment_members
         )
+        for report in reports
+    }
+
+    start_places, tandem_places = [], []
+    for junior_detachment_id, detachment_id in (
+        CompetitionParticipants.objects.filter(
+            competition_id=competition_id
+        ).values_list('junior_detachment_id', 'detachment_id')
+    ):
+        if detachment_id is None:
+            if junior_detachment_id in places:
+                start_places.append(
+                    (junior_detachment_id, places[junior_detachment_id])
+                )
+        elif junior_detachment_id in places and detachment_id in places:
+            tandem_places.append((
+                junior_detachment_id,
+                detachment_id,
+                round(
+                    (places[junior_detachment_id] + places[detachment_id]) / 2
+                )
+            ))
+    logger.info(
+        f'Q5: {len(start_places)} старт мест, '
+        f'{len(tandem_places)} тандем мест'
+    )
+    save_places(
+        competition_id, Q5Ranking, Q5TandemRanking,
+        start_places, tandem_places
+    )
 
 
 def get_q5_place(participants_count: int, june_15_detachment_members: int) -> int:
@@ -587,52 +552,79 @@ def get_q5_place(participants_count: int, june_15_detachment_members: int) -> in
         return 20
 
 
-def get_q3_q4_place(entry: CompetitionParticipants, category: str):
-    commander_score = Attempt.objects.filter(
-        user=entry.detachment.commander,
-        category=category
-    ).aggregate(Max('score'))['score__max'] or 0
+def get_q3_q4_places(competition_id: int) -> dict:
+    """
+    Места по 3 и 4 показателям для всех отрядов конкурса.
 
-    if category == 'university':
-        # Получаем результаты для комиссара отряда
-        commissioner_score = 0
-        commissioners = UserDetachmentPosition.objects.filter(
-            position__name=settings.COMMISSIONER_POSITION_NAME,
-            detachment=entry.detachment
-        )
-        for commissioner in commissioners:
-            commissioner_max_score = Attempt.objects.filter(
-                user=commissioner.user,
-                category=category
-            ).aggregate(Max('score'))['score__max']
-            if commissioner_max_score:
-                commissioner_score = max(commissioner_score,
-                                         commissioner_max_score)
-
-        # Рассчитываем средний балл
-        average_score = (
-                                commander_score + commissioner_score
-                        ) / 2 if commander_score + commissioner_score > 0 else 0
-    else:
-        # Получаем результаты для всех участников отряда
-        score = 0
-        participants = UserDetachmentPosition.objects.filter(
-            detachment=entry.detachment
+    Учитываются отряды, подавшие отчет по 5 показателю. Лучшие
+    результаты командиров и членов этих отрядов читаются одним запросом
+    из таблицы лучших попыток (questions.BestAttempt).
+
+    :return: словарь {detachment_id: (место по Q3, место по Q4)},
+             место None, если средний балл ниже порогового.
+    """
+    reports = Q5DetachmentReport.objects.filter(competition_id=competition_id)
+    members = UserDetachmentPosition.objects.filter(
+        headquarter_id__in=reports.values('detachment_id')
+    )
+    commanders = dict(
+        reports.values_list('detachment_id', 'detachment__commander_id')
+    )
+    detachments_members = {detachment_id: [] for detachment_id in commanders}
+    for detachment_id, user_id, position_name in members.values_list(
+        'headquarter_id', 'user_id', 'position__name'
+    ):
+        detachments_members[detachment_id].append((user_id, position_name))
+
+    user_ids = set(commanders.values())
+    for detachment_members in detachments_members.values():
+        user_ids.update(user_id for user_id, _ in detachment_members)
+    best_scores = get_best_scores(user_ids)
+
+    return {
+        detachment_id: (
+            determine_q3_q4_place(get_q3_average_score(
+                commander_id, detachments_members[detachment_id], best_scores
+            )),
+            determine_q3_q4_place(get_q4_average_score(
+                commander_id, detachments_members[detachment_id], best_scores
+            )),
         )
-        for participant in participants:
-            participant_max_score = Attempt.objects.filter(
-                user=participant.user,
-                category=category
-            ).aggregate(Max('score'))['score__max']
-            if participant_max_score:
-                score += participant_max_score
-
-        # Рассчитываем средний балл
-        average_score = (commander_score + score) / (len(participants) + 1)
-
-    # Определяем место
-    place = determine_q3_q4_place(average_score)
-    return place
+        for detachment_id, commander_id in commanders.items()
+    }
+
+
+def get_q3_average_score(commander_id, members, best_scores):
+    """
+    Средний балл по тесту корпоративного университета:
+    командир и лучший из комиссаров отряда.
+    """
+    category = 'university'
+    commander_score = best_scores.get((commander_id, category)) or 0
+    commissioner_score = max(
+        (
+            best_scores.get((user_id, category)) or 0
+            for user_id, position_name in members
+            if position_name == settings.COMMISSIONER_POSITION_NAME
+        ),
+        default=0
+    )
+    if commander_score + commissioner_score > 0:
+        return (commander_score + commissioner_score) / 2
+    return 0
+
+
+def get_q4_average_score(commander_id, members, best_scores):
+    """
+    Средний балл по тесту по безопасности: командир и все члены отряда.
+    """
+    category = 'safety'
+    commander_score = best_scores.get((commander_id, category)) or 0
+    score = sum(
+        best_scores.get((user_id, category)) or 0
+        for user_id, _ in members
+    )
+    return (commander_score + score) / (len(members) + 1)
 
 
 def determine_q3_q4_place(average_score):
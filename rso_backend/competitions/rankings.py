@@ -0,0 +1,281 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from competitions.indicators import INDICATORS, invalidate_competition_places
+from competitions.models import (
+    CompetitionParticipants, Competitions, QBaseTandemRanking,
+    RankingRecalculation
+)
+
+# Показатели, рейтинг по которым считается периодической таской.
+RANKED_INDICATORS = (1, 3, 4, 5, 7, 8, 9, 10, 11, 12, 18, 20)
+
+# Поля уникальных ограничений QBaseRanking и QBaseTandemRanking,
+# по которым строки рейтингов перезаписываются при конфликте.
+RANKING_UNIQUE_FIELDS = ('competition', 'detachment')
+TANDEM_RANKING_UNIQUE_FIELDS = (
+    'competition', 'detachment', 'junior_detachment'
+)
+
+
+def mark_rankings_dirty(indicators, competition_id=None):
+    """
+    Отмечает показатели конкурса для пересчета рейтинга.
+
+    Запись делается после коммита текущей транзакции, чтобы таска
+    пересчета не прочитала отметку раньше, чем изменения в отчетах.
+
+    :param indicators: номера показателей
+    :param competition_id: id конкурса, если None - отмечаются все конкурсы
+    """
+    transaction.on_commit(
+        lambda: _mark_rankings_dirty(indicators, competition_id)
+    )
+
+
+def _mark_rankings_dirty(indicators, competition_id=None):
+    # Конкурс мог быть удален в той же транзакции (каскадное удаление
+    # отчетов), поэтому отмечаем только существующие конкурсы.
+    competitions = Competitions.objects.all()
+    if competition_id is not None:
+        competitions = competitions.filter(id=competition_id)
+    competition_ids = list(competitions.values_list('id', flat=True))
+    marked_at = timezone.now()
+    RankingRecalculation.objects.bulk_create(
+        [
+            RankingRecalculation(competition_id=competition_id,
+                                 indicator=indicator,
+                                 marked_at=marked_at)
+            for competition_id in competition_ids
+            for indicator in set(indicators)
+        ],
+        update_conflicts=True,
+        unique_fields=('competition', 'indicator'),
+        update_fields=('marked_at',)
+    )
+
+
+def mark_detachments_q3_q4_rankings(detachment_ids):
+    """
+    Отмечает Q3 и Q4 конкурсов, в которых участвуют отряды:
+    места по ним зависят от состава отрядов и результатов тестов.
+    """
+    competition_ids = set(CompetitionParticipants.objects.filter(
+        Q(junior_detachment_id__in=detachment_ids)
+        | Q(detachment_id__in=detachment_ids)
+    ).values_list('competition_id', flat=True))
+    for competition_id in competition_ids:
+        mark_rankings_dirty((3, 4), competition_id)
+
+
+def pop_dirty_rankings(delay: int) -> list[tuple[int, int]]:
+    """
+    Забирает показатели, готовые к пересчету рейтинга.
+
+    Показатель готов, если с последнего изменения прошло не меньше
+    delay секунд - серия верификаций приводит к одному пересчету.
+    Запись удаляется только если marked_at не изменился с момента чтения,
+    иначе показатель остается до следующего запуска таски.
+
+    :param delay: задержка пересчета в секундах
+    :return: список пар (competition_id, indicator)
+    """
+    marks = list(RankingRecalculation.objects.filter(
+        marked_at__lte=timezone.now() - timedelta(seconds=delay)
+    ).values_list('id', 'competition_id', 'indicator', 'marked_at'))
+    dirty_rankings = []
+    for mark_id, competition_id, indicator, marked_at in marks:
+        deleted, _ = RankingRecalculation.objects.filter(
+            id=mark_id, marked_at=marked_at
+        ).delete()
+        if deleted:
+            dirty_rankings.append((competition_id, indicator))
+    return dirty_rankings
+
+
+def upsert_rankings(model, rankings):
+    """
+    Записывает строки рейтинга одним INSERT ... ON CONFLICT: место
+    участника, уже попавшего в рейтинг, обновляется, без гонки между
+    проверкой существования строки и ее созданием.
+
+    :param model: модель рейтинга старт или тандем
+    :param rankings: несохраненные строки рейтинга
+    """
+    if not rankings:
+        return
+    model.objects.bulk_create(
+        rankings,
+        update_conflicts=True,
+        unique_fields=(
+            TANDEM_RANKING_UNIQUE_FIELDS
+            if issubclass(model, QBaseTandemRanking)
+            else RANKING_UNIQUE_FIELDS
+        ),
+        update_fields=('place',)
+    )
+
+
+def delete_stale_rankings(model_ranking, model_tandem_ranking,
+                          competition_id, start_ids=(), tandems=()):
+    """
+    Удаляет строки рейтингов, оставшиеся от прежнего состава пар.
+
+    upsert тандема разрешает конфликт только по полной паре, поэтому
+    строка отряда с прежним напарником нарушила бы ограничения
+    уникальности по отряду-наставнику или младшему отряду. Строки отряда,
+    перешедшего из старт в тандем или обратно, тоже удаляются.
+
+    :param start_ids: id отрядов, записываемых в рейтинг старт
+    :param tandems: записываемые пары (junior_detachment_id, detachment_id)
+    """
+    start_ids = set(start_ids)
+    tandems = set(tandems)
+    tandem_ids = {
+        detachment_id for tandem in tandems for detachment_id in tandem
+    }
+    detachment_ids = start_ids | tandem_ids
+    stale_ids = [
+        ranking_id
+        for ranking_id, junior_detachment_id, detachment_id
+        in model_tandem_ranking.objects.filter(
+            Q(detachment_id__in=detachment_ids)
+            | Q(junior_detachment_id__in=detachment_ids),
+            competition_id=competition_id
+        ).values_list('id', 'junior_detachment_id', 'detachment_id')
+        if (junior_detachment_id, detachment_id) not in tandems
+    ]
+    if stale_ids:
+        model_tandem_ranking.objects.filter(id__in=stale_ids).delete()
+    if tandem_ids:
+        model_ranking.objects.filter(
+            competition_id=competition_id,
+            detachment_id__in=tandem_ids
+        ).delete()
+
+
+def save_place(indicator, competition_id, detachment_id, place):
+    """
+    Записывает место старт участника, посчитанное во вью.
+
+    upsert не отправляет post_save, поэтому показатель отмечается
+    для перестроения сводного рейтинга здесь же.
+    :param indicator: номер показателя из INDICATORS
+    """
+    model_ranking = INDICATORS[indicator].ranking
+    with transaction.atomic():
+        delete_stale_rankings(
+            model_ranking, INDICATORS[indicator].tandem_ranking,
+            competition_id, start_ids=(detachment_id,)
+        )
+        upsert_rankings(model_ranking, [model_ranking(
+            competition_id=competition_id,
+            detachment_id=detachment_id,
+            place=place
+        )])
+    mark_rankings_dirty((indicator,), competition_id)
+    invalidate_competition_places(competition_id)
+
+
+def save_tandem_place(indicator, competition_id, detachment_id,
+                      junior_detachment_id, place):
+    """Записывает место тандема, посчитанное во вью, см. save_place."""
+    model_tandem_ranking = INDICATORS[indicator].tandem_ranking
+    with transaction.atomic():
+        delete_stale_rankings(
+            INDICATORS[indicator].ranking, model_tandem_ranking,
+            competition_id, tandems=((junior_detachment_id, detachment_id),)
+        )
+        upsert_rankings(model_tandem_ranking, [model_tandem_ranking(
+            competition_id=competition_id,
+            detachment_id=detachment_id,
+            junior_detachment_id=junior_detachment_id,
+            place=place
+        )])
+    mark_rankings_dirty((indicator,), competition_id)
+    invalidate_competition_places(competition_id)
+
+
+def save_places(
+        competition_id, model_ranking, model_tandem_ranking,
+        start_places, tandem_places
+):
+    """
+    Записывает рейтинги старт и тандем конкурса.
+
+    Места сравниваются с текущими: в одной транзакции удаляются строки
+    участников, выпавших из рейтинга, а новые и изменившиеся места
+    записываются одним upsert на таблицу. Таблицы рейтингов не очищаются,
+    поэтому читатели не видят пустой рейтинг. Если места не изменились -
+    в БД ничего не пишется.
+
+    :param start_places: список пар (detachment_id, place)
+    :param tandem_places: список (junior_detachment_id, detachment_id, place)
+    """
+    current_start = {
+        detachment_id: (ranking_id, place)
+        for ranking_id, detachment_id, place in model_ranking.objects.filter(
+            competition_id=competition_id
+        ).values_list('id', 'detachment_id', 'place')
+    }
+    current_tandem = {
+        (junior_detachment_id, detachment_id): (ranking_id, place)
+        for ranking_id, junior_detachment_id, detachment_id, place
+        in model_tandem_ranking.objects.filter(
+            competition_id=competition_id
+        ).values_list('id', 'junior_detachment_id', 'detachment_id', 'place')
+    }
+    stale_start, changed_start = get_places_changes(
+        current_start,
+        {detachment_id: place for detachment_id, place in start_places},
+    )
+    stale_tandem, changed_tandem = get_places_changes(
+        current_tandem,
+        {
+            (junior_detachment_id, detachment_id): place
+            for junior_detachment_id, detachment_id, place in tandem_places
+        }
+    )
+    if not any((stale_start, changed_start, stale_tandem, changed_tandem)):
+        return
+    with transaction.atomic():
+        if stale_start:
+            model_ranking.objects.filter(id__in=stale_start).delete()
+        if stale_tandem:
+            model_tandem_ranking.objects.filter(id__in=stale_tandem).delete()
+        upsert_rankings(model_ranking, [
+            model_ranking(competition_id=competition_id,
+                          detachment_id=detachment_id,
+                          place=place)
+            for detachment_id, place in changed_start
+        ])
+        upsert_rankings(model_tandem_ranking, [
+            model_tandem_ranking(competition_id=competition_id,
+                                 junior_detachment_id=junior_detachment_id,
+                                 detachment_id=detachment_id,
+                                 place=place)
+            for (junior_detachment_id, detachment_id), place in changed_tandem
+        ])
+
+
+def get_places_changes(current, new):
+    """
+    Разница между текущими и новыми местами.
+
+    :param current: словарь {ключ участника: (id строки рейтинга, место)}
+    :param new: словарь {ключ участника: место}
+    :return: id удаляемых строк и список пар (ключ, место) новых
+             и изменившихся мест
+    """
+    stale_ids = [
+        ranking_id for key, (ranking_id, _) in current.items()
+        if key not in new
+    ]
+    changed = [
+        (key, place) for key, place in new.items()
+        if current.get(key, (None, None))[1] != place
+    ]
+    return stale_ids, changed
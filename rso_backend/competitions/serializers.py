@@ -4,9 +4,10 @@ from django.db import transaction
 from django.conf import settings
 from rest_framework import serializers
 
+from competitions.leaderboard import LEADERBOARD_INDICATORS, get_place_field
 from competitions.models import (
     Q10, Q11, Q12, Q7, Q8, Q9, CompetitionApplications,
-    CompetitionParticipants, Competitions,
+    CompetitionParticipants, Competitions, LeaderboardEntry,
     LinksQ7, LinksQ8, Q10Report, Q11Report, Q12Report,
     Q13EventOrganization, Q13DetachmentReport, Q17DetachmentReport, Q17Event, Q17Link,
     Q18DetachmentReport, Q19Report, Q20Report, Q2DetachmentReport, Q7Report,
@@ -179,6 +180,25 @@ class CompetitionParticipantsSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    detachment = ShortRegionalDetachmentCompetitionSerializer()
+    tandem_partner = ShortRegionalDetachmentCompetitionSerializer()
+
+    class Meta:
+        model = LeaderboardEntry
+        fields = (
+            'place',
+            'total',
+            'detachment',
+            'tandem_partner',
+            'is_tandem',
+            *(get_place_field(indicator)
+              for indicator in LEADERBOARD_INDICATORS),
+            'updated_at',
+        )
+        read_only_fields = fields
+
+
 class Q2DetachmentReportSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -1075,3 +1095,11 @@ class Q20ReportSerializer(serializers.ModelSerializer):
                     {'error': 'Отчет по данному показателю уже существует'}
                 )
         return attrs
+
+
+class EventsVerificationSerializer(serializers.Serializer):
+    """ID мероприятий для пакетной верификации рег. комиссаром."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False
+    )
@@ -1,10 +1,20 @@
-from django.db.models import signals
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
 from competitions.models import (
-    Q10, Q11, Q12, Q7, Q8, Q9, Q20Report
+    Q10, Q11, Q12, Q7, Q8, Q9, CompetitionParticipants, Q13Ranking,
+    Q13TandemRanking, Q17Ranking, Q17TandemRanking, Q18DetachmentReport,
+    Q19Ranking, Q19TandemRanking, Q20Report, Q2Ranking, Q2TandemRanking,
+    Q5DetachmentReport, Q5EducatedParticipant
 )
+from competitions.indicators import INDICATORS, invalidate_competition_places
+from competitions.pairing import invalidate_pairing_index
+from competitions.rankings import (RANKED_INDICATORS,
+                                   mark_detachments_q3_q4_rankings,
+                                   mark_rankings_dirty)
+from headquarters.memberships import in_bulk_members_change
+from headquarters.models import Detachment, UserDetachmentPosition
+from questions.models import Attempt
 
 
 @receiver([post_save, post_delete], sender=Q7)
@@ -14,6 +24,7 @@ def create_score_q7(sender, instance, created=False, **kwargs):
     else:
         if instance.is_verified:
             report = instance.detachment_report
+            mark_rankings_dirty((7,), report.competition_id)
             events = Q7.objects.filter(
                         detachment_report=report,
                         is_verified=True
@@ -35,6 +46,7 @@ def create_score_q8(sender, instance, created=False, **kwargs):
     else:
         if instance.is_verified:
             report = instance.detachment_report
+            mark_rankings_dirty((8,), report.competition_id)
             events = Q8.objects.filter(
                         detachment_report=report,
                         is_verified=True
@@ -56,6 +68,7 @@ def create_score_q9(sender, instance, created=False, **kwargs):
     else:
         if instance.is_verified:
             report = instance.detachment_report
+            mark_rankings_dirty((9,), report.competition_id)
             events = Q9.objects.filter(
                         detachment_report=report,
                         is_verified=True
@@ -77,6 +90,7 @@ def create_score_q10(sender, instance, created=False, **kwargs):
     else:
         if instance.is_verified:
             report = instance.detachment_report
+            mark_rankings_dirty((10,), report.competition_id)
             events = Q10.objects.filter(
                         detachment_report=report,
                         is_verified=True
@@ -98,6 +112,7 @@ def create_score_q11(sender, instance, created=False, **kwargs):
     else:
         if instance.is_verified:
             report = instance.detachment_report
+            mark_rankings_dirty((11,), report.competition_id)
             events = Q11.objects.filter(
                         detachment_report=report,
                         is_verified=True
@@ -119,6 +134,7 @@ def create_score_q12(sender, instance, created=False, **kwargs):
     else:
         if instance.is_verified:
             report = instance.detachment_report
+            mark_rankings_dirty((12,), report.competition_id)
             events = Q12.objects.filter(
                         detachment_report=report,
                         is_verified=True
@@ -138,6 +154,8 @@ def create_score_q20(sender, instance, created=False, **kwargs):
     if created:
         pass
     else:
+        if instance.is_verified:
+            mark_rankings_dirty((20,), instance.competition_id)
         if instance.is_verified and instance.score == 0:
             score = 0
             if instance.link_emblem and instance.link_emblem_img:
@@ -150,3 +168,116 @@ def create_score_q20(sender, instance, created=False, **kwargs):
             instance.save()
 
             return instance
+
+
+@receiver([post_save, post_delete], sender=Q18DetachmentReport)
+def mark_q18_ranking(sender, instance, **kwargs):
+    mark_rankings_dirty((18,), instance.competition_id)
+
+
+@receiver([post_save, post_delete], sender=Q5DetachmentReport)
+def mark_q3_q4_q5_rankings(sender, instance, **kwargs):
+    """От наличия отчета по 5 показателю зависят также места Q3 и Q4."""
+    mark_rankings_dirty((3, 4, 5), instance.competition_id)
+
+
+@receiver([post_save, post_delete], sender=Q5EducatedParticipant)
+def mark_q5_ranking(sender, instance, **kwargs):
+    mark_rankings_dirty(
+        (5,), instance.detachment_report.competition_id
+    )
+
+
+@receiver([post_save, post_delete], sender=Attempt)
+def mark_attempt_q3_q4_rankings(sender, instance, **kwargs):
+    """
+    Места Q3 и Q4 считаются по тестам командира и членов отряда.
+    Попытка без баллов (ответы еще не отправлены) на места не влияет.
+    """
+    if instance.category not in Attempt.Category.values or not instance.score:
+        return
+    detachment_ids = set(UserDetachmentPosition.objects.filter(
+        user_id=instance.user_id
+    ).values_list('headquarter_id', flat=True))
+    detachment_ids.update(Detachment.objects.filter(
+        commander_id=instance.user_id
+    ).values_list('id', flat=True))
+    if detachment_ids:
+        mark_detachments_q3_q4_rankings(detachment_ids)
+
+
+@receiver(pre_save, sender=UserDetachmentPosition)
+def remember_member_position(sender, instance, **kwargs):
+    instance._old_position_id = sender.objects.filter(
+        pk=instance.pk
+    ).values_list('position_id', flat=True).first() if instance.pk else None
+
+
+@receiver([post_save, post_delete], sender=UserDetachmentPosition)
+def mark_member_q3_q4_rankings(sender, instance, created=False, **kwargs):
+    """
+    Места Q3 и Q4 зависят от состава отряда и его комиссаров, поэтому
+    сохранение без смены отряда и должности их не меняет.
+    """
+    old_headquarter_id = getattr(
+        instance, '_old_headquarter_id', instance.headquarter_id
+    )
+    if in_bulk_members_change():
+        return
+    if (
+        kwargs['signal'] is post_save
+        and not created
+        and old_headquarter_id == instance.headquarter_id
+        and getattr(instance, '_old_position_id', None) == instance.position_id
+    ):
+        return
+    mark_detachments_q3_q4_rankings(
+        {old_headquarter_id, instance.headquarter_id} - {None}
+    )
+
+
+@receiver([post_save, post_delete], sender=CompetitionParticipants)
+def mark_all_rankings(sender, instance, **kwargs):
+    mark_rankings_dirty(RANKED_INDICATORS, instance.competition_id)
+    invalidate_competition_places(instance.competition_id)
+    invalidate_pairing_index(instance.competition_id)
+
+
+# Рейтинги, которые считаются при верификации отчетов во вью, а не
+# тасками. Отметка нужна, чтобы таска перестроила сводный рейтинг.
+RANKINGS_UPDATED_BY_VIEWS = {
+    Q2Ranking: 2,
+    Q2TandemRanking: 2,
+    Q13Ranking: 13,
+    Q13TandemRanking: 13,
+    Q17Ranking: 17,
+    Q17TandemRanking: 17,
+    Q19Ranking: 19,
+    Q19TandemRanking: 19,
+}
+
+
+@receiver([post_save, post_delete], sender=Q2Ranking)
+@receiver([post_save, post_delete], sender=Q2TandemRanking)
+@receiver([post_save, post_delete], sender=Q13Ranking)
+@receiver([post_save, post_delete], sender=Q13TandemRanking)
+@receiver([post_save, post_delete], sender=Q17Ranking)
+@receiver([post_save, post_delete], sender=Q17TandemRanking)
+@receiver([post_save, post_delete], sender=Q19Ranking)
+@receiver([post_save, post_delete], sender=Q19TandemRanking)
+def mark_leaderboard(sender, instance, **kwargs):
+    mark_rankings_dirty(
+        (RANKINGS_UPDATED_BY_VIEWS[sender],), instance.competition_id
+    )
+    invalidate_competition_places(instance.competition_id)
+
+
+def invalidate_report_places(sender, instance, **kwargs):
+    """От отчета зависит ответ get_place эндпоинтов показателя."""
+    invalidate_competition_places(instance.competition_id)
+
+
+for indicator in INDICATORS.values():
+    if indicator.report is not None:
+        post_save.connect(invalidate_report_places, sender=indicator.report)
+        post_delete.connect(invalidate_report_places, sender=indicator.report)
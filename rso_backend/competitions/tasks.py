@@ -1,4 +1,5 @@
 import logging
+from functools import partial
 
 from celery import shared_task
 from django.conf import settings
@@ -11,11 +12,14 @@ from competitions.models import (
     Q9TandemRanking
 )
 
+from competitions.indicators import invalidate_competition_places
+from competitions.leaderboard import rebuild_leaderboard
 from competitions.q_calculations import (
     calculate_q18_place,
     calculate_place,
     calculate_q1_score, calculate_q3_q4_place, calculate_q5_place
 )
+from competitions.rankings import mark_rankings_dirty, pop_dirty_rankings
 
 logger = logging.getLogger('tasks')
 
@@ -92,6 +96,7 @@ def calculate_q12_places_task():
 def calculate_q1_score_task():
     """Считает очки по 1 показателю."""
     calculate_q1_score(competition_id=settings.COMPETITION_ID)
+    mark_rankings_dirty((1,), competition_id=settings.COMPETITION_ID)
 
 
 @shared_task
@@ -122,3 +127,105 @@ def calculate_q3_q4_places_task():
 def calculate_q5_places_task():
     """Считает места по 3-4 показателям."""
     calculate_q5_place(competition_id=settings.COMPETITION_ID)
+
+
+# Расчеты рейтингов по номерам показателей.
+# Q3 и Q4 считаются одной функцией и пересчитываются один раз.
+RANKING_CALCULATIONS = {
+    1: partial(calculate_place, model_report=Q1Report,
+               model_ranking=Q1Ranking,
+               model_tandem_ranking=Q1TandemRanking),
+    3: calculate_q3_q4_place,
+    4: calculate_q3_q4_place,
+    5: calculate_q5_place,
+    7: partial(calculate_place, model_report=Q7Report,
+               model_ranking=Q7Ranking,
+               model_tandem_ranking=Q7TandemRanking),
+    8: partial(calculate_place, model_report=Q8Report,
+               model_ranking=Q8Ranking,
+               model_tandem_ranking=Q8TandemRanking),
+    9: partial(calculate_place, model_report=Q9Report,
+               model_ranking=Q9Ranking,
+               model_tandem_ranking=Q9TandemRanking,
+               reverse=False),
+    10: partial(calculate_place, model_report=Q10Report,
+                model_ranking=Q10Ranking,
+                model_tandem_ranking=Q10TandemRanking,
+                reverse=False),
+    11: partial(calculate_place, model_report=Q11Report,
+                model_ranking=Q11Ranking,
+                model_tandem_ranking=Q11TandemRanking,
+                reverse=False),
+    12: partial(calculate_place, model_report=Q12Report,
+                model_ranking=Q12Ranking,
+                model_tandem_ranking=Q12TandemRanking,
+                reverse=False),
+    18: calculate_q18_place,
+    20: partial(calculate_place, model_report=Q20Report,
+                model_ranking=Q20Ranking,
+                model_tandem_ranking=Q20TandemRanking),
+}
+
+
+@shared_task
+def calculate_dirty_rankings_task():
+    """
+    Пересчитывает рейтинги только по измененным показателям.
+
+    Показатели отмечаются сигналами при изменении отчетов, рейтингов
+    и участников конкурса (competitions.rankings.mark_rankings_dirty).
+    После пересчета перестраивается сводный рейтинг затронутых конкурсов
+    и сбрасывается кеш мест get_place эндпоинтов.
+    Если изменений не было - таска ничего не пишет в БД.
+    """
+    dirty_rankings = pop_dirty_rankings(
+        settings.RANKINGS_RECALCULATION_DELAY
+    )
+    if not dirty_rankings:
+        return
+    calculated = set()
+    failed = set()
+    error = None
+    for competition_id, indicator in dirty_rankings:
+        calculation = RANKING_CALCULATIONS.get(indicator)
+        if calculation is None or (competition_id, calculation) in calculated:
+            continue
+        calculated.add((competition_id, calculation))
+        logger.info(
+            f'Пересчитываем рейтинг по {indicator} показателю '
+            f'конкурса id {competition_id}'
+        )
+        try:
+            calculation(competition_id=competition_id)
+        except Exception as exc:
+            logger.exception(
+                f'Ошибка пересчета рейтинга по {indicator} показателю '
+                f'конкурса id {competition_id}'
+            )
+            failed.add((competition_id, calculation))
+            error = error or exc
+    failed_leaderboards = set()
+    for competition_id in {
+        competition_id for competition_id, _ in dirty_rankings
+    }:
+        try:
+            rebuild_leaderboard(competition_id)
+            invalidate_competition_places(competition_id)
+        except Exception as exc:
+            logger.exception(
+                'Ошибка перестроения сводного рейтинга '
+                f'конкурса id {competition_id}'
+            )
+            failed_leaderboards.add(competition_id)
+            error = error or exc
+    if error is None:
+        return
+    # Отметки сняты до пересчета, поэтому показатели с ошибкой
+    # (в т.ч. посчитанные той же функцией) и все показатели конкурсов,
+    # сводный рейтинг которых не перестроен, отмечаются повторно.
+    for competition_id, indicator in dirty_rankings:
+        if competition_id in failed_leaderboards or (
+            competition_id, RANKING_CALCULATIONS.get(indicator)
+        ) in failed:
+            mark_rankings_dirty((indicator,), competition_id=competition_id)
+    raise error
@@ -46,12 +46,6 @@ def document_path(instance, filename):
     return os.path.join(filepath, instance.user.username, filename)
 
 
-def is_competition_participant(detachment, competition):
-    """Проверяет, является ли отряд участником конкурса."""
-    return detachment in (competition.junior_detachment.all() +
-                          competition.detachment.all())
-
-
 def round_math(num, decimals=0):
     """
     Функция математического округления.
@@ -73,27 +67,6 @@ def round_math(num, decimals=0):
     return int(num * factor + 0.5) / factor
 
 
-def tandem_or_start(competition, detachment, competition_model) -> bool:
-    """Вычисление Тандем | Старт."""
-
-    is_tandem = False
-    try:
-        if ((competition_model.objects.filter(
-            competition=competition,
-            detachment=detachment
-        ).exists())
-         or (
-            competition_model.objects.filter(
-                competition=competition,
-                junior_detachment=detachment
-            ).exclude(detachment=None)
-        )):
-            is_tandem = True
-    except (competition_model.DoesNotExist, ValueError):
-        is_tandem = False
-    return is_tandem
-
-
 def get_place_q2(
         commander_achievment: bool, commissioner_achievement: bool
 ) -> int:
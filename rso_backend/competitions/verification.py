@@ -0,0 +1,206 @@
+from collections import defaultdict
+from typing import NamedTuple
+
+from django.db import transaction
+from django.db.models import Avg, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from competitions.indicators import INDICATORS, invalidate_competition_places
+from competitions.models import (
+    Q10, Q11, Q12, Q7, Q8, Q9, Q13DetachmentReport, Q13EventOrganization,
+    Q13Ranking, Q13TandemRanking
+)
+from competitions.pairing import get_pairing_index
+from competitions.q_calculations import calculate_q13_place
+from competitions.rankings import (delete_stale_rankings,
+                                   mark_rankings_dirty, upsert_rankings)
+
+# Место по 13 показателю отряда-напарника, не подавшего отчет.
+Q13_MAX_PLACE = 6
+
+
+class EventScore(NamedTuple):
+    """Мероприятия показателя и агрегат, которым считаются очки отчета."""
+    event: type
+    aggregate: type
+    field: str
+    default: int | float
+
+
+# Очки считаются так же, как в сигналах create_score_q7 - create_score_q12:
+# сумма участников или среднее призовое место верифицированных мероприятий.
+EVENT_SCORES = {
+    7: EventScore(Q7, Sum, 'number_of_participants', 0),
+    8: EventScore(Q8, Sum, 'number_of_participants', 0),
+    9: EventScore(Q9, Avg, 'prize_place', 10.0),
+    10: EventScore(Q10, Avg, 'prize_place', 10.0),
+    11: EventScore(Q11, Avg, 'prize_place', 10.0),
+    12: EventScore(Q12, Avg, 'prize_place', 10.0),
+}
+
+
+def _pop_unverified(events) -> list[tuple[int, int]]:
+    """
+    Верифицирует мероприятия одним UPDATE.
+
+    :return: список пар (id мероприятия, id отчета)
+    """
+    rows = list(
+        events.filter(is_verified=False).values_list(
+            'id', 'detachment_report_id'
+        )
+    )
+    if rows:
+        events.model.objects.filter(
+            id__in=[event_id for event_id, _ in rows]
+        ).update(is_verified=True)
+    return rows
+
+
+def _filter_events(model, competition_id, event_ids,
+                   regional_headquarter_id=None):
+    events = model.objects.filter(
+        id__in=event_ids,
+        detachment_report__competition_id=competition_id
+    )
+    if regional_headquarter_id is not None:
+        events = events.filter(
+            detachment_report__detachment__regional_headquarter_id=(
+                regional_headquarter_id
+            )
+        )
+    return events
+
+
+def verify_events(indicator, competition_id, event_ids,
+                  regional_headquarter_id=None) -> int:
+    """
+    Пакетная верификация мероприятий Q7 - Q12.
+
+    Мероприятия верифицируются одним UPDATE, очки каждого затронутого
+    отчета пересчитываются одним UPDATE с агрегатом по его верифицированным
+    мероприятиям. Сигналы create_score_q* при этом не вызываются, рейтинг
+    показателя отмечается для пересчета один раз.
+
+    :param indicator: номер показателя из EVENT_SCORES
+    :param regional_headquarter_id: если передан - верифицируются только
+                                    мероприятия отрядов этого рег. штаба
+    :return: количество верифицированных мероприятий
+    """
+    event_score = EVENT_SCORES[indicator]
+    report_model = INDICATORS[indicator].report
+    with transaction.atomic():
+        rows = _pop_unverified(_filter_events(
+            event_score.event, competition_id, event_ids,
+            regional_headquarter_id
+        ))
+        if not rows:
+            return 0
+        scores = event_score.event.objects.filter(
+            detachment_report=OuterRef('id'),
+            is_verified=True
+        ).values('detachment_report').annotate(
+            score=event_score.aggregate(event_score.field)
+        ).values('score')
+        report_model.objects.filter(
+            id__in={report_id for _, report_id in rows}
+        ).update(
+            score=Coalesce(Subquery(scores), Value(event_score.default))
+        )
+        mark_rankings_dirty((indicator,), competition_id)
+        invalidate_competition_places(competition_id)
+    return len(rows)
+
+
+def _get_q13_places(competition_id, detachment_ids) -> dict:
+    """
+    Места отрядов по верифицированным мероприятиям двумя запросами.
+
+    :return: словарь {detachment_id: place}, отряды без отчета
+             получают Q13_MAX_PLACE
+    """
+    events = defaultdict(list)
+    for event in Q13EventOrganization.objects.filter(
+        detachment_report__competition_id=competition_id,
+        detachment_report__detachment_id__in=detachment_ids,
+        is_verified=True
+    ).select_related('detachment_report').only(
+        'event_type', 'detachment_report__detachment_id'
+    ):
+        events[event.detachment_report.detachment_id].append(event)
+    with_report = set(Q13DetachmentReport.objects.filter(
+        competition_id=competition_id,
+        detachment_id__in=detachment_ids
+    ).values_list('detachment_id', flat=True))
+    return {
+        detachment_id: (
+            calculate_q13_place(events[detachment_id])
+            if detachment_id in with_report else Q13_MAX_PLACE
+        )
+        for detachment_id in detachment_ids
+    }
+
+
+def verify_q13_events(competition_id, event_ids,
+                      regional_headquarter_id=None) -> int:
+    """
+    Пакетная верификация мероприятий Q13.
+
+    Места старт участников и тандемов, в отчетах которых верифицированы
+    мероприятия, пересчитываются один раз и записываются одним upsert
+    на таблицу рейтинга. Место тандема - среднее мест обоих отрядов.
+
+    :return: количество верифицированных мероприятий
+    """
+    with transaction.atomic():
+        rows = _pop_unverified(_filter_events(
+            Q13EventOrganization, competition_id, event_ids,
+            regional_headquarter_id
+        ))
+        if not rows:
+            return 0
+        index = get_pairing_index(competition_id)
+        detachment_ids = set(Q13DetachmentReport.objects.filter(
+            id__in={report_id for _, report_id in rows}
+        ).values_list('detachment_id', flat=True))
+        start_ids = set()
+        tandems = set()
+        for detachment_id in detachment_ids:
+            participation = index.get(detachment_id)
+            if participation is None:
+                continue
+            is_tandem, is_junior, partner_id = participation
+            if not is_tandem:
+                start_ids.add(detachment_id)
+            elif is_junior:
+                tandems.add((detachment_id, partner_id))
+            else:
+                tandems.add((partner_id, detachment_id))
+        tandem_ids = {
+            detachment_id for tandem in tandems for detachment_id in tandem
+        }
+        places = _get_q13_places(competition_id, start_ids | tandem_ids)
+        delete_stale_rankings(
+            Q13Ranking, Q13TandemRanking, competition_id, start_ids, tandems
+        )
+        upsert_rankings(Q13Ranking, [
+            Q13Ranking(competition_id=competition_id,
+                       detachment_id=detachment_id,
+                       place=places[detachment_id])
+            for detachment_id in start_ids
+        ])
+        upsert_rankings(Q13TandemRanking, [
+            Q13TandemRanking(
+                competition_id=competition_id,
+                junior_detachment_id=junior_detachment_id,
+                detachment_id=detachment_id,
+                place=round(
+                    (places[junior_detachment_id] + places[detachment_id]) / 2,
+                    2
+                )
+            )
+            for junior_detachment_id, detachment_id in tandems
+        ])
+        mark_rankings_dirty((13,), competition_id)
+        invalidate_competition_places(competition_id)
+    return len(rows)
@@ -1,13 +1,11 @@
-import os
 from datetime import date
 
 from dal import autocomplete
 from django.conf import settings
 from django.core.exceptions import PermissionDenied, ObjectDoesNotExist
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import F, Q
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http.response import HttpResponse
 from django.shortcuts import get_object_or_404
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
@@ -18,7 +16,7 @@ from rest_framework.serializers import ListSerializer
 
 from api.mixins import (
     CreateListRetrieveUpdateViewSet, ListRetrieveDestroyViewSet,
-    ListRetrieveCreateViewSet, UpdateDestroyViewSet
+    ListRetrieveCreateViewSet, ListRetrieveViewSet, UpdateDestroyViewSet
 )
 from api.permissions import (
     IsCommanderAndCompetitionParticipant,
@@ -30,24 +28,28 @@ from api.permissions import (
     IsRegionalCommissionerOrCommanderDetachmentWithVerif,
     IsQ13DetachmentReportAuthor, IsQ5DetachmentReportAuthor
 )
-from api.utils import get_detachment_start, get_detachment_tandem
+from api.utils import download_file
+from competitions.indicators import get_indicator_place
+from competitions.leaderboard import LEADERBOARD_INDICATORS, get_place_field
+from competitions.pairing import get_participation
 from competitions.models import (
     Q10, Q11, Q12, Q7, Q8, Q9, CompetitionApplications,
-    CompetitionParticipants, Competitions, Q10Report, Q11Report, Q12Report,
+    CompetitionParticipants, Competitions, LeaderboardEntry, Q10Report,
+    Q11Report, Q12Report,
     Q13EventOrganization,
-    Q13DetachmentReport, Q13Ranking, Q13TandemRanking, Q17DetachmentReport, Q19Report, Q1Ranking,
-    Q1TandemRanking, Q20Report, Q2DetachmentReport, Q2Ranking,
-    Q2TandemRanking, Q7Report, Q18DetachmentReport,
-    Q18TandemRanking, Q18Ranking, Q8Report, Q9Report, Q19Ranking,
-    Q19TandemRanking, Q4TandemRanking, Q4Ranking, Q3TandemRanking, Q3Ranking,
-    Q5DetachmentReport, Q5TandemRanking, Q5Ranking, Q5EducatedParticipant
+    Q13DetachmentReport, Q17DetachmentReport,
+    Q19Report, Q20Report, Q2DetachmentReport,
+    Q7Report, Q18DetachmentReport,
+    Q8Report, Q9Report,
+    Q5DetachmentReport, Q5EducatedParticipant
 )
-from competitions.q_calculations import calculate_q13_place, \
-    calculate_q19_place
+from competitions.q_calculations import calculate_q19_place
+from competitions.rankings import save_place, save_tandem_place
 from competitions.serializers import (
     CompetitionApplicationsObjectSerializer, CompetitionApplicationsSerializer,
     CompetitionParticipantsObjectSerializer, CompetitionParticipantsSerializer,
     CompetitionSerializer, CreateQ10Serializer, CreateQ11Serializer,
+    LeaderboardEntrySerializer,
     CreateQ12Serializer, CreateQ7Serializer, CreateQ8Serializer,
     CreateQ9Serializer, Q10ReportSerializer, Q10Serializer,
     Q11ReportSerializer, Q11Serializer, Q12ReportSerializer, Q12Serializer, Q17DetachmentReportSerializer,
@@ -56,9 +58,11 @@ from competitions.serializers import (
     Q8ReportSerializer, Q8Serializer, Q9ReportSerializer, Q9Serializer,
     ShortDetachmentCompetitionSerializer, Q13EventOrganizationSerializer,
     Q13DetachmentReportSerializer, Q18DetachmentReportSerializer,
-    Q5EducatedParticipantSerializer, Q5DetachmentReportSerializer
+    Q5EducatedParticipantSerializer, Q5DetachmentReportSerializer,
+    EventsVerificationSerializer
 )
-from competitions.utils import get_place_q2, tandem_or_start
+from competitions.utils import get_place_q2
+from competitions.verification import verify_events, verify_q13_events
 # сигналы ниже не удалять, иначе сломается
 from competitions.signal_handlers import (
     create_score_q7, create_score_q8, create_score_q9, create_score_q10,
@@ -67,7 +71,8 @@ from competitions.signal_handlers import (
 from api.mixins import ListRetrieveDestroyViewSet
 from api.permissions import (IsRegionalCommanderOrAdmin,
                              IsRegionalCommanderOrAdminOrAuthor)
-from competitions.filters import CompetitionParticipantsFilter
+from competitions.filters import (CompetitionParticipantsFilter,
+                                  LeaderboardFilter)
 from competitions.models import (CompetitionApplications,
                                  CompetitionParticipants, Competitions)
 from competitions.serializers import (CompetitionApplicationsObjectSerializer,
@@ -91,6 +96,49 @@ from headquarters.models import (
 from rso_backend.settings import BASE_DIR
 
 
+def get_place_response(indicator, competition_id, detachment,
+                       not_ranked_status=status.HTTP_200_OK):
+    """
+    Ответ get_place эндпоинта показателя, по которому подается отчет.
+
+    Если отчет не подан - 404, если рейтинг еще не сформирован -
+    {"place": "Показатель в обработке"} с кодом not_ranked_status.
+    """
+    indicator_place = get_indicator_place(
+        indicator, competition_id, detachment.id
+    )
+    if not indicator_place.has_report:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    if indicator_place.place is None:
+        return Response(
+            {'place': 'Показатель в обработке'},
+            status=not_ranked_status
+        )
+    return Response(
+        {'place': indicator_place.place}, status=status.HTTP_200_OK
+    )
+
+
+def get_participant_place_response(request, competition_id, indicator):
+    """
+    Ответ get_place эндпоинта показателя, место по которому считается
+    без отчета отряда.
+
+    Если пользователь не командир или его отряд не участвует в конкурсе -
+    404, если рейтинг еще не сформирован - 400.
+    """
+    detachment = get_object_or_404(Detachment, commander=request.user)
+    indicator_place = get_indicator_place(
+        indicator, competition_id, detachment.id
+    )
+    if not indicator_place.is_participant:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    if indicator_place.place is None:
+        return Response({'error': 'Рейтинг еще не сформирован'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    return Response({'place': indicator_place.place})
+
+
 class CompetitionViewSet(viewsets.ModelViewSet):
     """Представление конкурсов.
 
@@ -222,23 +270,6 @@ class CompetitionViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
 
-    @staticmethod
-    def download_file_competitions(filepath, filename):
-        if os.path.exists(filepath):
-            with open(filepath, 'rb') as file:
-                response = HttpResponse(
-                    file.read(), content_type='application/pdf'
-                )
-                response['Content-Disposition'] = (
-                    f'attachment; filename="{filename}"'
-                )
-                return response
-        else:
-            return Response(
-                {'detail': 'Файл не найден.'},
-                status=status.HTTP_204_NO_CONTENT
-            )
-
     @action(
         detail=False,
         methods=('get',),
@@ -252,7 +283,7 @@ class CompetitionViewSet(viewsets.ModelViewSet):
         """
         filename = 'Regulation_on_the_best_LSO_2024.pdf'
         filepath = str(settings.BASE_DIR) + '/templates/competitions/' + filename
-        return self.download_file_competitions(filepath, filename)
+        return download_file(filepath, filename)
 
 
 class CompetitionApplicationsViewSet(viewsets.ModelViewSet):
@@ -719,6 +750,63 @@ class CompetitionJuniorDetachmentAutoComplete(
         })
 
 
+class LeaderboardViewSet(ListRetrieveViewSet):
+    """Сводный рейтинг конкурса - места отрядов по всем показателям.
+
+    Рейтинг перестраивается периодической таской после пересчета
+    рейтингов по показателям. Строка содержит места по показателям
+    Q1-Q20, сумму мест и итоговое место. За показатель, по которому
+    отряд не получил место, в сумму входит худшее место номинации.
+    Итоговое место считается отдельно для старт и тандем участников,
+    оба отряда тандема занимают одно место.
+
+    Фильтры: is_tandem, region (id региона отряда), area (название
+    направления отряда). Поиск по названию отряда.
+    Сортировка: place, total, qN_place.
+    Детальный просмотр - по id отряда.
+
+    Доступ: все пользователи.
+    """
+    serializer_class = LeaderboardEntrySerializer
+    permission_classes = (permissions.AllowAny,)
+    filter_backends = (DjangoFilterBackend,
+                       filters.SearchFilter,
+                       filters.OrderingFilter)
+    filterset_class = LeaderboardFilter
+    search_fields = ('detachment__name',)
+    ordering_fields = ('place', 'total') + tuple(
+        get_place_field(indicator) for indicator in LEADERBOARD_INDICATORS
+    )
+    lookup_field = 'detachment_id'
+
+    def get_queryset(self):
+        return LeaderboardEntry.objects.filter(
+            competition_id=self.kwargs.get('competition_pk')
+        ).select_related(
+            'detachment__area',
+            'detachment__regional_headquarter',
+            'tandem_partner__area',
+            'tandem_partner__regional_headquarter',
+        ).order_by(
+            'is_tandem', F('place').asc(nulls_last=True), 'detachment__name'
+        )
+
+    @action(detail=False,
+            methods=['get'],
+            url_path='me',
+            permission_classes=(permissions.IsAuthenticated,))
+    def me(self, request, *args, **kwargs):
+        """Места в сводном рейтинге отряда, в котором пользователь командир.
+
+        Если пользователь не командир или его отряда нет в сводном
+        рейтинге - выводится HTTP_404_NOT_FOUND.
+        """
+        entry = get_object_or_404(
+            self.get_queryset(), detachment__commander=request.user
+        )
+        return Response(self.get_serializer(entry).data)
+
+
 class Q2DetachmentReportViewSet(ListRetrieveCreateViewSet):
 
     """
@@ -860,53 +948,24 @@ class Q2DetachmentReportViewSet(ListRetrieveCreateViewSet):
         Возвращается место или статус показателя.
         Если показатель не был подан ранее, то возвращается код 400.
         """
-
         detachment = self.request.user.detachment_commander
-        report = Q2DetachmentReport.objects.filter(
-            detachment=detachment,
-            competition_id=self.kwargs.get('competition_pk')
-        ).first()
-        if not report:
+        indicator_place = get_indicator_place(2, competition_pk, detachment.id)
+        if not indicator_place.has_report:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        is_verified = report.is_verified
-        is_tandem = tandem_or_start(
-            competition=report.competition,
-            detachment=report.detachment,
-            competition_model=CompetitionParticipants
-        )
-
-        if not is_verified:
+        if not indicator_place.is_verified:
             return Response(
                 status=status.HTTP_400_BAD_REQUEST,
                 data={'detail': 'Показатель в обработке.'}
             )
-        tandem_ranking = getattr(
-            detachment, 'q2tandemranking_main_detachment'
-        ).filter(competition_id=competition_pk).first()
-        if not tandem_ranking:
-            tandem_ranking = getattr(
-                detachment, 'q2tandemranking_junior_detachment'
-            ).filter(competition_id=competition_pk).first()
-
-        if is_tandem:
-            if tandem_ranking and tandem_ranking.place is not None:
-                return Response(
-                    {'place': tandem_ranking.place},
-                    status=status.HTTP_200_OK
-                )
-        else:
-            ranking = Q2Ranking.objects.filter(
-                detachment=report.detachment
-            ).first()
-            if ranking and ranking.place is not None:
-                return Response(
-                    {'place': ranking.place}, status=status.HTTP_200_OK
-                )
-
-        return Response(
-                status=status.HTTP_404_NOT_FOUND,
-                data={'detail': 'Показатель в обработке.'}
+        if indicator_place.place is not None:
+            return Response(
+                {'place': indicator_place.place},
+                status=status.HTTP_200_OK
             )
+        return Response(
+            status=status.HTTP_404_NOT_FOUND,
+            data={'detail': 'Показатель в обработке.'}
+        )
 
     @action(
             detail=True,
@@ -945,11 +1004,7 @@ class Q2DetachmentReportViewSet(ListRetrieveCreateViewSet):
 
             """Расчет мест по показателю и запись в таблицы Ranking."""
 
-            is_tandem = tandem_or_start(
-                competition=competition,
-                detachment=detachment,
-                competition_model=CompetitionParticipants
-            )
+            participation = get_participation(competition.id, detachment.id)
             place_1 = get_place_q2(
                 commander_achievment=(
                     detachment_report.commander_achievement
@@ -958,29 +1013,14 @@ class Q2DetachmentReportViewSet(ListRetrieveCreateViewSet):
                     detachment_report.commissioner_achievement
                 )
             )
-            if is_tandem:
-                try:
-                    partner_detachment = CompetitionParticipants.objects.get(
+            if participation is not None and participation.is_tandem:
+                partner_detahcment_report = (
+                    Q2DetachmentReport.objects.filter(
                         competition=competition,
-                        detachment=detachment
-                    ).junior_detachment
-                    partner_is_junior = True
-                except CompetitionParticipants.DoesNotExist:
-                    partner_detachment = (
-                        CompetitionParticipants.objects.filter(
-                            competition=competition,
-                            junior_detachment=detachment
-                        ).first().detachment
-                    )
-                    partner_is_junior = False
-                try:
-                    partner_detahcment_report = (
-                        Q2DetachmentReport.objects.filter(
-                            competition=competition,
-                            detachment=partner_detachment
-                        ).first()
-                    )
-                except Q2DetachmentReport.DoesNotExist:
+                        detachment_id=participation.partner_id
+                    ).first()
+                )
+                if partner_detahcment_report is None:
                     return Response(
                         status=status.HTTP_404_NOT_FOUND,
                         data={
@@ -997,20 +1037,16 @@ class Q2DetachmentReportViewSet(ListRetrieveCreateViewSet):
                     )
                 )
                 result_place = round((place_1 + place_2)/2, 2)
-                if partner_is_junior:
-                    tandem_ranking, _ = Q2TandemRanking.objects.get_or_create(
-                        competition=competition,
-                        detachment=detachment,
-                        junior_detachment=partner_detachment,
+                if participation.is_junior:
+                    save_tandem_place(
+                        2, competition.id, participation.partner_id,
+                        detachment.id, result_place
                     )
                 else:
-                    tandem_ranking, _ = Q2TandemRanking.objects.get_or_create(
-                        competition=competition,
-                        detachment=partner_detachment,
-                        junior_detachment=detachment,
+                    save_tandem_place(
+                        2, competition.id, detachment.id,
+                        participation.partner_id, result_place
                     )
-                tandem_ranking.place = result_place
-                tandem_ranking.save()
                 return Response(
                     status=status.HTTP_201_CREATED,
                     data={
@@ -1019,12 +1055,7 @@ class Q2DetachmentReportViewSet(ListRetrieveCreateViewSet):
                     }
                 )
             else:
-                ranking, _ = Q2Ranking.objects.get_or_create(
-                    competition=competition,
-                    detachment=detachment,
-                )
-                ranking.place = place_1
-                ranking.save()
+                save_place(2, competition.id, detachment.id, place_1)
                 return Response(
                     status=status.HTTP_201_CREATED,
                     data={
@@ -1056,6 +1087,7 @@ class Q7ViewSet(
     ! При редактировании нельзя изменять event_name.
     """
     serializer_class = Q7Serializer
+    indicator = 7
     permission_classes = (
         permissions.IsAuthenticated,
         IsCommanderDetachmentInParameterOrRegionalCommissioner
@@ -1159,6 +1191,31 @@ class Q7ViewSet(
         event.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False,
+            methods=['post'],
+            url_path='bulk_accept',
+            permission_classes=(permissions.IsAuthenticated,
+                                IsRegionalCommissioner,))
+    @swagger_auto_schema(request_body=EventsVerificationSerializer)
+    def bulk_accept(self, request, competition_pk, *args, **kwargs):
+        """
+        Action для пакетной верификации мероприятий рег. комиссаром.
+
+        Принимает {"ids": [id мероприятий]}. Верифицируются только
+        неверифицированные мероприятия отрядов рег. штаба комиссара,
+        очки отчетов и рейтинг пересчитываются один раз.
+        Доступ: комиссары региональных штабов.
+        """
+        serializer = EventsVerificationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        verified = verify_events(
+            self.indicator,
+            competition_pk,
+            serializer.validated_data['ids'],
+            request.user.userregionalheadquarterposition.headquarter_id
+        )
+        return Response({'verified': verified}, status=status.HTTP_200_OK)
+
     @action(detail=False,
             methods=['get'],
             url_path='me',
@@ -1190,53 +1247,8 @@ class Q7ViewSet(
         Если отчет подан и верифицирован - вернется место в рейтинге:
         {"place": int}
         """
-        detachment = request.user.detachment_commander
-        report = self.serializer_class.Meta.model.objects.filter(
-            detachment_report__detachment=detachment,
-            detachment_report__competition_id=competition_pk
-        ).first()
-        if not report:
-            # Отряд участник, но еще не подал отчет по данному показателю.
-            return Response(status=status.HTTP_404_NOT_FOUND)
-        class_name = self.serializer_class.Meta.model.__name__  # Q7
-        ranking_fk = f'{class_name.lower()}ranking'  # q7ranking
-        # Если есть FK на стартовый рейтинг
-        ranking = getattr(detachment, ranking_fk).filter(
-            competition_id=competition_pk
-        ).first()
-        if ranking:
-            return Response(
-                {"place": ranking.place}, status=status.HTTP_200_OK
-            )
-        #  Если нет, то ищем в тандем рейтингах
-        tandem_ranking_fk = (
-            f'{class_name.lower()}tandemranking_main_detachment'
-        )
-        # Если есть FK на наставника
-        tandem_ranking = getattr(detachment, tandem_ranking_fk).filter(
-            competition_id=competition_pk
-        ).first()
-        if tandem_ranking:
-            return Response(
-                {"place": tandem_ranking.place},
-                status=status.HTTP_200_OK
-            )
-        tandem_ranking_fk = (
-            f'{class_name.lower()}tandemranking_junior_detachment'
-        )
-        # Если есть FK на junior
-        tandem_ranking = getattr(
-            detachment, tandem_ranking_fk
-            ).filter(competition_id=competition_pk).first()
-        if tandem_ranking:
-            return Response(
-                {"place": tandem_ranking.place},
-                status=status.HTTP_200_OK
-            )
-        # Отчет уже есть(проверяли в начале), значит еще не верифицировано ни одно мероприятие
-        return Response(
-            {"place": "Показатель в обработке"},
-            status=status.HTTP_200_OK
+        return get_place_response(
+            self.indicator, competition_pk, request.user.detachment_commander
         )
 
 
@@ -1261,6 +1273,7 @@ class Q8ViewSet(Q7ViewSet):
     """
     queryset = Q8.objects.all()
     serializer_class = Q8Serializer
+    indicator = 8
 
     @swagger_auto_schema(
         request_body=q7schema_request,
@@ -1346,6 +1359,7 @@ class Q9ViewSet(
     """
     queryset = Q9.objects.all()
     serializer_class = Q9Serializer
+    indicator = 9
 
     @swagger_auto_schema(
         request_body=q9schema_request,
@@ -1434,6 +1448,7 @@ class Q10ViewSet(
     """
     queryset = Q10.objects.all()
     serializer_class = Q10Serializer
+    indicator = 10
 
     @swagger_auto_schema(
         request_body=q9schema_request,
@@ -1522,6 +1537,7 @@ class Q11ViewSet(
     """
     queryset = Q11.objects.all()
     serializer_class = Q11Serializer
+    indicator = 11
 
     @swagger_auto_schema(
         request_body=q9schema_request,
@@ -1610,6 +1626,7 @@ class Q12ViewSet(
     """
     queryset = Q12.objects.all()
     serializer_class = Q12Serializer
+    indicator = 12
 
     @swagger_auto_schema(
         request_body=q9schema_request,
@@ -1791,42 +1808,10 @@ class Q5DetachmentReportViewSet(ListRetrieveCreateViewSet):
 
     @action(detail=False, methods=['get'], url_path='get-place', permission_classes=(IsCompetitionParticipantAndCommander,))
     def get_place(self, request, **kwargs):
-        detachment = self.request.user.detachment_commander
-        competition_id = self.kwargs.get('competition_pk')
-        report = Q5DetachmentReport.objects.filter(
-            detachment=detachment,
-            competition_id=competition_id
-        ).first()
-        if not report:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-        tandem_ranking = Q5TandemRanking.objects.filter(
-            detachment=report.detachment,
-            competition_id=competition_id
-        ).first()
-        if not tandem_ranking:
-            tandem_ranking = Q5TandemRanking.objects.filter(
-                junior_detachment=report.detachment,
-                competition_id=competition_id
-            ).first()
-
-        if tandem_ranking and tandem_ranking.place is not None:
-            return Response(
-                {"place": tandem_ranking.place},
-                status=status.HTTP_200_OK
-            )
-
-        ranking = Q5Ranking.objects.filter(
-            detachment=report.detachment,
-            competition_id=competition_id
-        ).first()
-        if ranking and ranking.place is not None:
-            return Response(
-                {"place": ranking.place}, status=status.HTTP_200_OK
-            )
-
-        return Response(
-            {"place": "Показатель в обработке"},
-            status=status.HTTP_404_NOT_FOUND
+        return get_place_response(
+            5, self.kwargs.get('competition_pk'),
+            request.user.detachment_commander,
+            not_ranked_status=status.HTTP_404_NOT_FOUND
         )
 
     @action(
@@ -1948,6 +1933,7 @@ class Q13DetachmentReportViewSet(ListRetrieveCreateViewSet):
         - GET: Всем пользователям;
         - POST: Командирам отрядов, принимающих участие в конкурсе;
         - VERIFY-EVENT (POST/DELETE): Комиссарам РШ подвластных отрядов;
+        - VERIFY-EVENTS (POST): Комиссарам РШ подвластных отрядов;
         - GET-PLACE (GET): Всем пользователям
 
     Note:
@@ -1959,8 +1945,6 @@ class Q13DetachmentReportViewSet(ListRetrieveCreateViewSet):
     serializer_class = Q13DetachmentReportSerializer
     permission_classes = (IsCompetitionParticipantAndCommander,)
 
-    MAX_PLACE = 6
-
     def get_queryset(self):
         if self.action == 'list':
             regional_headquarter = (
@@ -2096,46 +2080,10 @@ class Q13DetachmentReportViewSet(ListRetrieveCreateViewSet):
 
     @action(detail=False, methods=['get'], url_path='get-place', permission_classes=(IsCompetitionParticipantAndCommander,))
     def get_place(self, request, **kwargs):
-        detachment = self.request.user.detachment_commander
-        competition_id = self.kwargs.get('competition_pk')
-        report = Q13DetachmentReport.objects.filter(
-            detachment=detachment,
-            competition_id=competition_id
-        ).first()
-        if not report:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-        tandem_ranking = Q13TandemRanking.objects.filter(
-            detachment=report.detachment,
-            competition_id=competition_id
-
-        ).first()
-        if not tandem_ranking:
-            tandem_ranking = Q13TandemRanking.objects.filter(
-                junior_detachment=report.detachment,
-                competition_id=competition_id
-            ).first()
-
-        # Пытаемся найти place в Q13TandemRanking
-        if tandem_ranking and tandem_ranking.place is not None:
-            return Response(
-                {"place": tandem_ranking.place},
-                status=status.HTTP_200_OK
-            )
-
-        # Если не найдено в Q13TandemRanking, ищем в Q13Ranking
-        ranking = Q13Ranking.objects.filter(
-            detachment=report.detachment,
-            competition_id=competition_id
-        ).first()
-        if ranking and ranking.place is not None:
-            return Response(
-                {"place": ranking.place}, status=status.HTTP_200_OK
-            )
-
-        # Если не найдено ни в одной из моделей
-        return Response(
-            {"place": "Показатель в обработке"},
-            status=status.HTTP_404_NOT_FOUND
+        return get_place_response(
+            13, self.kwargs.get('competition_pk'),
+            request.user.detachment_commander,
+            not_ranked_status=status.HTTP_404_NOT_FOUND
         )
 
     @action(
@@ -2163,95 +2111,12 @@ class Q13DetachmentReportViewSet(ListRetrieveCreateViewSet):
                 'detail': 'Данный отчет уже верифицирован'
             }, status=status.HTTP_400_BAD_REQUEST)
         if request.method == 'POST':
-            event.is_verified = True
-            event.save()
-            participants_entry = CompetitionParticipants.objects.filter(
-                junior_detachment=report.detachment,
-                competition_id=competition_id
-            ).first()
-
-            # Подсчет места для индивидуальных и тандем участников:
-            if participants_entry and not participants_entry.detachment:
-                Q13Ranking.objects.get_or_create(
-                    competition_id=competition_id,
-                    detachment=report.detachment,
-                    place=calculate_q13_place(
-                        Q13EventOrganization.objects.filter(
-                            detachment_report=report,
-                            is_verified=True
-                        )
-                    )
+            verify_q13_events(competition_id, [event.id])
+            if get_participation(competition_id, report.detachment_id) is None:
+                return Response(
+                    {'error': 'отряд не найден в участниках'},
+                    status=status.HTTP_400_BAD_REQUEST
                 )
-            else:
-                if participants_entry:
-                    tandem_ranking, _ = Q13TandemRanking.objects.get_or_create(
-                        competition_id=competition_id,
-                        junior_detachment=report.detachment,
-                        detachment=participants_entry.detachment
-                    )
-                    tandem_ranking.place = calculate_q13_place(
-                        Q13EventOrganization.objects.filter(
-                            competition_id=competition_id,
-                            detachment_report=report,
-                            is_verified=True
-                        )
-                    )
-                    elder_detachment_report = None
-                    try:
-                        elder_detachment_report = Q13DetachmentReport.objects.get(
-                            competition_id=competition_id,
-                            detachment=tandem_ranking.detachment
-                        )
-                    except Q13DetachmentReport.DoesNotExist:
-                        tandem_ranking.place += self.MAX_PLACE
-                    if elder_detachment_report:
-                        tandem_ranking.place += calculate_q13_place(
-                            Q13EventOrganization.objects.filter(
-                                competition_id=competition_id,
-                                detachment_report=elder_detachment_report,
-                                is_verified=True
-                            )
-                        )
-                else:
-                    participants_entry = CompetitionParticipants.objects.filter(
-                        competition_id=competition_id,
-                        detachment=report.detachment
-                    ).first()
-                    if not participants_entry:
-                        return Response(
-                            {'error': 'отряд не найден в участниках'},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                    tandem_ranking, _ = Q13TandemRanking.objects.get_or_create(
-                        competition_id=competition_id,
-                        junior_detachment=participants_entry.junior_detachment,
-                        detachment=report.detachment
-                    )
-                    tandem_ranking.place = calculate_q13_place(
-                        Q13EventOrganization.objects.filter(
-                            competition_id=competition_id,
-                            detachment_report=report,
-                            is_verified=True
-                        )
-                    )
-                    junior_detachment_report = None
-                    try:
-                        junior_detachment_report = Q13DetachmentReport.objects.get(
-                            competition_id=competition_id,
-                            detachment=tandem_ranking.junior_detachment
-                        )
-                    except Q13DetachmentReport.DoesNotExist:
-                        tandem_ranking.place += self.MAX_PLACE
-                    if junior_detachment_report:
-                        tandem_ranking.place += calculate_q13_place(
-                            Q13EventOrganization.objects.filter(
-                                competition_id=competition_id,
-                                detachment_report=junior_detachment_report,
-                                is_verified=True
-                            )
-                        )
-                tandem_ranking.place = round(tandem_ranking.place / 2, 2)
-                tandem_ranking.save()
             return Response(
                 {"status": "Данные по организации "
                            "мероприятия верифицированы"},
@@ -2260,6 +2125,31 @@ class Q13DetachmentReportViewSet(ListRetrieveCreateViewSet):
         event.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='verify-events',
+        permission_classes=[
+            permissions.IsAuthenticated, IsRegionalCommissioner,
+        ]
+    )
+    @swagger_auto_schema(request_body=EventsVerificationSerializer)
+    def verify_events(self, request, competition_pk=None):
+        """
+        Пакетная верификация мероприятий отрядов своего рег. штаба.
+
+        Принимает {"ids": [id мероприятий]}, уже верифицированные и чужие
+        мероприятия пропускаются. Места пересчитываются один раз.
+        """
+        serializer = EventsVerificationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        verified = verify_q13_events(
+            competition_pk,
+            serializer.validated_data['ids'],
+            request.user.userregionalheadquarterposition.headquarter_id
+        )
+        return Response({'verified': verified}, status=status.HTTP_200_OK)
+
 
 class Q13EventOrganizationViewSet(UpdateDestroyViewSet):
     """
@@ -2443,41 +2333,10 @@ class Q18DetachmentReportViewSet(ListRetrieveCreateViewSet):
 
     @action(detail=False, methods=['get'], url_path='get-place', permission_classes=(IsCompetitionParticipantAndCommander,))
     def get_place(self, request, **kwargs):
-        detachment = self.request.user.detachment_commander
-        report = Q18DetachmentReport.objects.filter(
-            detachment=detachment,
-            competition_id=self.kwargs.get('competition_pk')
-        ).first()
-        if not report:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-        tandem_ranking = Q18TandemRanking.objects.filter(
-            detachment=report.detachment
-        ).first()
-        if not tandem_ranking:
-            tandem_ranking = Q18TandemRanking.objects.filter(
-                junior_detachment=report.detachment
-            ).first()
-
-        # Пытаемся найти place в Q18TandemRanking
-        if tandem_ranking and tandem_ranking.place is not None:
-            return Response(
-                {"place": tandem_ranking.place},
-                status=status.HTTP_200_OK
-            )
-
-        # Если не найдено в Q18TandemRanking, ищем в Q18Ranking
-        ranking = Q18Ranking.objects.filter(
-            detachment=report.detachment
-        ).first()
-        if ranking and ranking.place is not None:
-            return Response(
-                {"place": ranking.place}, status=status.HTTP_200_OK
-            )
-
-        # Если не найдено ни в одной из моделей
-        return Response(
-            {"place": "Показатель в обработке"},
-            status=status.HTTP_404_NOT_FOUND
+        return get_place_response(
+            18, self.kwargs.get('competition_pk'),
+            request.user.detachment_commander,
+            not_ranked_status=status.HTTP_404_NOT_FOUND
         )
 
 
@@ -2579,64 +2438,41 @@ class Q19DetachmentReportViewset(CreateListRetrieveUpdateViewSet):
         if request.method == 'POST':
             report.is_verified = True
             report.save()
-            participants_entry = CompetitionParticipants.objects.filter(
-                competition_id=settings.COMPETITION_ID,
-                junior_detachment=report.detachment
-            ).first()
+            participation = get_participation(
+                settings.COMPETITION_ID, report.detachment_id
+            )
+            if participation is None:
+                return Response(
+                    {'error': 'отряд не найден в участниках'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
             # Подсчет места для индивидуальных и тандем участников:
-            if participants_entry and not participants_entry.detachment:
-                Q19Ranking.objects.get_or_create(
-                    competition_id=settings.COMPETITION_ID,
-                    detachment=report.detachment,
-                    place=calculate_q19_place(report)
+            if not participation.is_tandem:
+                save_place(
+                    19, settings.COMPETITION_ID,
+                    report.detachment_id, calculate_q19_place(report)
                 )
             else:
-                if participants_entry:
-                    tandem_ranking, _ = Q19TandemRanking.objects.get_or_create(
-                        competition_id=settings.COMPETITION_ID,
-                        junior_detachment=report.detachment,
-                        detachment=participants_entry.detachment
-                    )
-                    tandem_ranking.place = calculate_q19_place(report)
-                    elder_detachment_report = None
-                    try:
-                        elder_detachment_report = Q19Report.objects.get(
-                            competition_id=settings.COMPETITION_ID,
-                            detachment=tandem_ranking.detachment
-                        )
-                    except Q19Report.DoesNotExist:
-                        tandem_ranking.place += self.MAX_PLACE
-                    if elder_detachment_report:
-                        tandem_ranking.place += calculate_q19_place(elder_detachment_report)
+                if participation.is_junior:
+                    junior_detachment_id = report.detachment_id
+                    detachment_id = participation.partner_id
                 else:
-                    participants_entry = CompetitionParticipants.objects.filter(
-                        competition_id=settings.COMPETITION_ID,
-                        detachment=report.detachment
-                    ).first()
-                    if not participants_entry:
-                        return Response(
-                            {'error': 'отряд не найден в участниках'},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                    tandem_ranking, _ = Q19TandemRanking.objects.get_or_create(
-                        competition_id=settings.COMPETITION_ID,
-                        junior_detachment=participants_entry.junior_detachment,
-                        detachment=report.detachment
-                    )
-                    tandem_ranking.place = calculate_q19_place(report)
-                    junior_detachment_report = None
-                    try:
-                        junior_detachment_report = Q19Report.objects.get(
-                            competition_id=settings.COMPETITION_ID,
-                            detachment=tandem_ranking.junior_detachment
-                        )
-                    except Q19Report.DoesNotExist:
-                        tandem_ranking.place += self.MAX_PLACE
-                    if junior_detachment_report:
-                        tandem_ranking.place += calculate_q19_place(report)
-                tandem_ranking.place = round(tandem_ranking.place / 2, 2)
-                tandem_ranking.save()
+                    junior_detachment_id = participation.partner_id
+                    detachment_id = report.detachment_id
+                place = calculate_q19_place(report)
+                partner_report = Q19Report.objects.filter(
+                    competition_id=settings.COMPETITION_ID,
+                    detachment_id=participation.partner_id
+                ).first()
+                if partner_report is None:
+                    place += self.MAX_PLACE
+                else:
+                    place += calculate_q19_place(partner_report)
+                save_tandem_place(
+                    19, settings.COMPETITION_ID, detachment_id,
+                    junior_detachment_id, round(place / 2, 2)
+                )
             return Response(
                 {"status": "Данные "
                            "Успешно верифицированы"},
@@ -2661,39 +2497,8 @@ class Q19DetachmentReportViewset(CreateListRetrieveUpdateViewSet):
         Если отчет подан и верифицирован - вернется место в рейтинге:
         {"place": int}
         """
-        detachment = self.request.user.detachment_commander
-        report = Q19Report.objects.filter(
-            detachment=detachment,
-            competition_id=competition_pk
-        ).first()
-        if not report:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-        ranking = getattr(
-            detachment, 'q19ranking'
-        ).filter(competition_id=competition_pk).first()
-        if ranking:
-            return Response(
-                {"place": ranking.place}, status=status.HTTP_200_OK
-            )
-        tandem_ranking = getattr(
-                    detachment, 'q19tandemranking_main_detachment'
-        ).filter(competition_id=competition_pk).first()
-        if tandem_ranking:
-            return Response(
-                {"place": tandem_ranking.place},
-                status=status.HTTP_200_OK
-            )
-        tandem_ranking = getattr(
-            detachment, 'q19tandemranking_junior_detachment'
-            ).filter(competition_id=competition_pk).first()
-        if tandem_ranking:
-            return Response(
-                {"place": tandem_ranking.place},
-                status=status.HTTP_200_OK
-            )
-        return Response(
-            {"place": "Показатель в обработке"},
-            status=status.HTTP_200_OK
+        return get_place_response(
+            19, competition_pk, request.user.detachment_commander
         )
 
     def create(self, request, competition_pk, *args, **kwargs):
@@ -2835,39 +2640,8 @@ class Q20ViewSet(CreateListRetrieveUpdateViewSet):
         Если отчет подан и верифицирован - вернется место в рейтинге:
         {"place": int}
         """
-        detachment = self.request.user.detachment_commander
-        report = Q20Report.objects.filter(
-            detachment=detachment,
-            competition_id=competition_pk
-        ).first()
-        if not report:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-        ranking = getattr(
-            detachment, 'q20ranking'
-        ).filter(competition_id=competition_pk).first()
-        if ranking:
-            return Response(
-                {"place": ranking.place}, status=status.HTTP_200_OK
-            )
-        tandem_ranking = getattr(
-                    detachment, 'q20tandemranking_main_detachment'
-        ).filter(competition_id=competition_pk).first()
-        if tandem_ranking:
-            return Response(
-                {"place": tandem_ranking.place},
-                status=status.HTTP_200_OK
-            )
-        tandem_ranking = getattr(
-            detachment, 'q20tandemranking_junior_detachment'
-            ).filter(competition_id=competition_pk).first()
-        if tandem_ranking:
-            return Response(
-                {"place": tandem_ranking.place},
-                status=status.HTTP_200_OK
-            )
-        return Response(
-            {"place": "Показатель в обработке"},
-            status=status.HTTP_200_OK
+        return get_place_response(
+            20, competition_pk, request.user.detachment_commander
         )
 
     def create(self, request, competition_pk, *args, **kwargs):
@@ -2911,37 +2685,7 @@ def get_place_q1(request, competition_pk):
     Если пользователь не командир, либо не участвует в мероприятии -
     выводится ошибка 404.
     """
-    detachment_start = get_detachment_start(
-        request.user, competition_pk
-    )
-    if detachment_start is None:
-        detachment_tandem = get_detachment_tandem(
-            request.user, competition_pk
-        )
-        # Если командир, но не участник старт и не участник тандем
-        if detachment_tandem is None:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-
-        if detachment_start:
-            ranking_start = Q1Ranking.objects.filter(
-                competition_id=competition_pk,
-                detachment=detachment_start
-            ).first()
-            if ranking_start:
-                return Response({'place': ranking_start.place})
-
-        if detachment_tandem:
-            ranking_tandem = Q1TandemRanking.objects.filter(
-                Q(competition_id=competition_pk) &
-                Q(junior_detachment=detachment_tandem) |
-                Q(detachment=detachment_tandem)
-            ).first()
-            if ranking_tandem:
-                return Response({'place': ranking_tandem.place})
-
-    # Если отряд является участником конкурса, но нет рейтинга
-    return Response({'error': 'Рейтинг еще не сформирован'},
-                    status=status.HTTP_400_BAD_REQUEST)
+    return get_participant_place_response(request, competition_pk, 1)
 
 
 @api_view(['GET'])
@@ -2958,35 +2702,7 @@ def get_place_q3(request, competition_pk=None):
     Если пользователь не командир, либо не участвует в мероприятии -
     выводится ошибка 404.
     """
-    detachment_start = get_detachment_start(
-        request.user, competition_pk
-    )
-    if detachment_start is None:
-        detachment_tandem = get_detachment_tandem(
-            request.user, competition_pk
-        )
-        if detachment_tandem is None:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-
-        if detachment_start:
-            ranking_start = Q3Ranking.objects.filter(
-                competition_id=competition_pk,
-                detachment=detachment_start
-            ).first()
-            if ranking_start:
-                return Response({'place': ranking_start.place})
-
-        if detachment_tandem:
-            ranking_tandem = Q3TandemRanking.objects.filter(
-                Q(competition_id=competition_pk) &
-                Q(junior_detachment=detachment_tandem) |
-                Q(detachment=detachment_tandem)
-            ).first()
-            if ranking_tandem:
-                return Response({'place': ranking_tandem.place})
-
-    return Response({'error': 'Рейтинг еще не сформирован'},
-                    status=status.HTTP_400_BAD_REQUEST)
+    return get_participant_place_response(request, competition_pk, 3)
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -3002,32 +2718,4 @@ def get_place_q4(request, competition_pk=None):
     Если пользователь не командир, либо не участвует в мероприятии -
     выводится ошибка 404.
     """
-    detachment_start = get_detachment_start(
-        request.user, competition_pk
-    )
-    if detachment_start is None:
-        detachment_tandem = get_detachment_tandem(
-            request.user, competition_pk
-        )
-        if detachment_tandem is None:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-
-        if detachment_start:
-            ranking_start = Q4Ranking.objects.filter(
-                competition_id=competition_pk,
-                detachment=detachment_start
-            ).first()
-            if ranking_start:
-                return Response({'place': ranking_start.place})
-
-        if detachment_tandem:
-            ranking_tandem = Q4TandemRanking.objects.filter(
-                Q(competition_id=competition_pk) &
-                Q(junior_detachment=detachment_tandem) |
-                Q(detachment=detachment_tandem)
-            ).first()
-            if ranking_tandem:
-                return Response({'place': ranking_tandem.place})
-
-    return Response({'error': 'Рейтинг еще не сформирован'},
-                    status=status.HTTP_400_BAD_REQUEST)
+    return get_participant_place_response(request, competition_pk, 4)
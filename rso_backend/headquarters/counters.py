@@ -0,0 +1,107 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from api.utils import UNIT_POSITION_MODELS
+from headquarters.models import CentralHeadquarter
+from headquarters.utils import annotate_unit_counts
+from users.models import RSOUser
+
+COUNTER_FIELDS = ('participants_number', 'members_number', 'events_number')
+
+
+def change_unit_counters(unit_model, unit_ids, **deltas):
+    """
+    Изменяет счетчики структурных единиц одним UPDATE.
+
+    Изменение считается в БД через F(), поэтому параллельные транзакции
+    не перезаписывают результат друг друга.
+
+    :param unit_model: модель - наследник Unit
+    :param unit_ids: id структурных единиц (список или подзапрос),
+                     если None - изменяются все структурные единицы
+    :param deltas: изменения счетчиков, например participants_number=1
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    units = unit_model.objects.all()
+    if unit_ids is not None:
+        units = units.filter(id__in=unit_ids)
+    units.update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+
+
+def change_user_units_members(user_id, delta):
+    """
+    Изменяет счетчики оплативших членский взнос во всех структурных
+    единицах пользователя и в центральном штабе.
+    """
+    for unit_model, position_model in UNIT_POSITION_MODELS.items():
+        if unit_model is CentralHeadquarter:
+            unit_ids = None
+        else:
+            unit_ids = position_model.objects.filter(
+                user_id=user_id
+            ).values('headquarter_id')
+        change_unit_counters(unit_model, unit_ids, members_number=delta)
+
+
+def reset_members_counters():
+    """Обнуляет счетчики оплативших взнос после сброса статуса оплаты."""
+    for unit_model in UNIT_POSITION_MODELS:
+        unit_model.objects.update(members_number=0)
+
+
+def get_actual_counters(unit_model) -> dict:
+    """
+    Значения счетчиков структурных единиц, посчитанные по БД.
+
+    :return: словарь {unit_id: (participants_number, members_number,
+             events_number)}
+    """
+    if unit_model is CentralHeadquarter:
+        participants_number = RSOUser.objects.count()
+        members_number = RSOUser.objects.filter(membership_fee=True).count()
+        return {
+            unit_id: (participants_number, members_number, events_number)
+            for unit_id, events_number in annotate_unit_counts(
+                unit_model.objects.all()
+            ).values_list('id', 'events_count')
+        }
+    return {
+        unit_id: (participants_number, members_number, events_number)
+        for unit_id, participants_number, members_number, events_number in (
+            annotate_unit_counts(unit_model.objects.all()).values_list(
+                'id', 'participants_count', 'members_count', 'events_count'
+            )
+        )
+    }
+
+
+def reconcile_unit_counters(batch_size=1000) -> int:
+    """
+    Исправляет расхождения счетчиков с данными в БД.
+
+    :param batch_size: размер пачки для bulk_update
+    :return: количество исправленных структурных единиц
+    """
+    fixed = 0
+    for unit_model in UNIT_POSITION_MODELS:
+        actual = get_actual_counters(unit_model)
+        units = []
+        for unit in unit_model.objects.only('id', *COUNTER_FIELDS):
+            counters = actual[unit.id]
+            if counters == tuple(
+                getattr(unit, field) for field in COUNTER_FIELDS
+            ):
+                continue
+            for field, value in zip(COUNTER_FIELDS, counters):
+                setattr(unit, field, value)
+            units.append(unit)
+        unit_model.objects.bulk_update(
+            units, COUNTER_FIELDS, batch_size=batch_size
+        )
+        fixed += len(units)
+    return fixed
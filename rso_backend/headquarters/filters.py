@@ -1,8 +1,21 @@
-from django.db.models import Q
 from django_filters import rest_framework as filters
 
-from headquarters.models import (Detachment, EducationalHeadquarter,
-                                 LocalHeadquarter, RegionalHeadquarter)
+from headquarters.hierarchy import get_descendant_ids
+from headquarters.models import (Detachment, DistrictHeadquarter,
+                                 EducationalHeadquarter, LocalHeadquarter,
+                                 RegionalHeadquarter)
+
+
+def filter_by_district_headquarter(queryset, lookup_expr, value):
+    """Структурные единицы, входящие в окружные штабы с названием value
+    на любом уровне иерархии (по таблице замыкания)."""
+    return queryset.filter(id__in=get_descendant_ids(
+        DistrictHeadquarter,
+        DistrictHeadquarter.objects.filter(
+            **{f'name__{lookup_expr}': value}
+        ).values('id'),
+        queryset.model._meta.model_name
+    ))
 
 
 class RegionalHeadquarterFilter(filters.FilterSet):
@@ -24,8 +37,7 @@ class RegionalHeadquarterFilter(filters.FilterSet):
 
 class LocalHeadquarterFilter(filters.FilterSet):
     district_headquarter__name = filters.CharFilter(
-        field_name='regional_headquarter__district_headquarter__name',
-        lookup_expr='icontains',
+        method='filter_district_headquarter',
         label='Название окружного штаба'
     )
     regional_headquarter__name = filters.CharFilter(
@@ -34,6 +46,9 @@ class LocalHeadquarterFilter(filters.FilterSet):
         label='Название регионального штаба'
     )
 
+    def filter_district_headquarter(self, queryset, name, value):
+        return filter_by_district_headquarter(queryset, 'icontains', value)
+
     class Meta:
         model = LocalHeadquarter
         fields = ('regional_headquarter__name', 'district_headquarter__name',)
@@ -57,14 +72,7 @@ class EducationalHeadquarterFilter(filters.FilterSet):
     )
 
     def filter_district_headquarter(self, queryset, name, value):
-        return queryset.filter(
-            Q(
-                local_headquarter__regional_headquarter__district_headquarter__name__icontains=value
-            ) |
-            Q(
-                regional_headquarter__district_headquarter__name__icontains=value
-            )
-        )
+        return filter_by_district_headquarter(queryset, 'icontains', value)
 
     class Meta:
         model = EducationalHeadquarter
@@ -88,8 +96,7 @@ class DetachmentFilter(filters.FilterSet):
         label='Название образовательной организации'
     )
     district_headquarter__name = filters.CharFilter(
-        field_name='regional_headquarter__district_headquarter__name',
-        lookup_expr='iexact',
+        method='filter_district_headquarter',
         label='Название окружного штаба'
     )
     regional_headquarter__name = filters.CharFilter(
@@ -108,6 +115,9 @@ class DetachmentFilter(filters.FilterSet):
         label='Название образовательного штаба'
     )
 
+    def filter_district_headquarter(self, queryset, name, value):
+        return filter_by_district_headquarter(queryset, 'iexact', value)
+
     class Meta:
         model = Detachment
         fields = (
@@ -0,0 +1,277 @@
+from collections import defaultdict
+
+from django.apps import apps as django_apps
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from headquarters.models import UnitHierarchy
+
+# Поля модели структурной единицы со ссылками на вышестоящие.
+# Порядок - сверху вниз по иерархии.
+UNIT_PARENT_FIELDS = {
+    'centralheadquarter': (),
+    'districtheadquarter': ('central_headquarter',),
+    'regionalheadquarter': ('district_headquarter',),
+    'localheadquarter': ('regional_headquarter',),
+    'educationalheadquarter': ('local_headquarter', 'regional_headquarter'),
+    'detachment': (
+        'educational_headquarter', 'local_headquarter', 'regional_headquarter'
+    ),
+}
+
+
+def _nodes_q(prefix, nodes):
+    """Условие по узлам (тип, id) для поля ancestor или descendant."""
+    ids_by_type = defaultdict(list)
+    for node_type, node_id in nodes:
+        ids_by_type[node_type].append(node_id)
+    condition = Q(pk__in=[])
+    for node_type, node_ids in ids_by_type.items():
+        condition |= Q(**{
+            f'{prefix}_type': node_type, f'{prefix}_id__in': node_ids
+        })
+    return condition
+
+
+def _get_stored_ancestors(apps, nodes) -> dict:
+    """Предки узлов по таблице замыкания."""
+    ancestors = defaultdict(set)
+    if not nodes:
+        return ancestors
+    hierarchy_model = apps.get_model('headquarters', 'UnitHierarchy')
+    for row in hierarchy_model.objects.filter(
+        _nodes_q('descendant', nodes)
+    ).values_list(
+        'descendant_type', 'descendant_id', 'ancestor_type', 'ancestor_id'
+    ):
+        ancestors[row[:2]].add(row[2:])
+    return ancestors
+
+
+def _compute_units_ancestors(apps, unit_ids_by_type=None) -> dict:
+    """
+    Считает предков структурных единиц по ссылкам на вышестоящие.
+
+    :param unit_ids_by_type: словарь {тип: id}, если None - все единицы.
+                             Предки вышестоящих единиц, не вошедших
+                             в выборку, берутся из таблицы замыкания.
+    :return: словарь {(тип, id): {(тип, id) предков}}
+    """
+    ancestors = {}
+    for unit_type, parent_fields in UNIT_PARENT_FIELDS.items():
+        units = apps.get_model('headquarters', unit_type).objects.all()
+        if unit_ids_by_type is not None:
+            if not unit_ids_by_type.get(unit_type):
+                continue
+            units = units.filter(id__in=unit_ids_by_type[unit_type])
+        parent_types = [
+            units.model._meta.get_field(field).related_model._meta.model_name
+            for field in parent_fields
+        ]
+        rows = [
+            (row[0], [
+                (parent_type, parent_id)
+                for parent_type, parent_id in zip(parent_types, row[1:])
+                if parent_id is not None
+            ])
+            for row in units.values_list(
+                'id', *(f'{field}_id' for field in parent_fields)
+            )
+        ]
+        stored = _get_stored_ancestors(apps, {
+            parent for _, parents in rows for parent in parents
+            if parent not in ancestors
+        })
+        for unit_id, parents in rows:
+            unit_ancestors = set()
+            for parent in parents:
+                unit_ancestors.add(parent)
+                unit_ancestors |= ancestors.get(parent, stored[parent])
+            ancestors[(unit_type, unit_id)] = unit_ancestors
+    return ancestors
+
+
+def _compute_users_ancestors(apps, user_ids=None, units_ancestors=None):
+    """
+    Считает структурные единицы, в которые входят пользователи:
+    единицы, где пользователь член или командир, и все их предки.
+
+    :return: словарь {(USER_TYPE, user_id): {(тип, id) единиц}}
+    """
+    user_units = defaultdict(set)
+    for unit_type in UNIT_PARENT_FIELDS:
+        units = apps.get_model('headquarters', unit_type).objects.all()
+        positions = apps.get_model(
+            'headquarters', f'user{unit_type}position'
+        ).objects.all()
+        if user_ids is not None:
+            units = units.filter(commander_id__in=user_ids)
+            positions = positions.filter(user_id__in=user_ids)
+        for user_id, unit_id in (
+            *units.values_list('commander_id', 'id'),
+            *positions.values_list('user_id', 'headquarter_id'),
+        ):
+            user_units[user_id].add((unit_type, unit_id))
+    if units_ancestors is None:
+        units_ancestors = _get_stored_ancestors(apps, {
+            unit for units in user_units.values() for unit in units
+        })
+    users_ancestors = {
+        (UnitHierarchy.USER_TYPE, user_id): set()
+        for user_id in user_ids or ()
+    }
+    for user_id, units in user_units.items():
+        ancestors = users_ancestors.setdefault(
+            (UnitHierarchy.USER_TYPE, user_id), set()
+        )
+        for unit in units:
+            ancestors.add(unit)
+            ancestors |= units_ancestors.get(unit, set())
+    return users_ancestors
+
+
+def _write_ancestors(apps, ancestors, batch_size=1000, replace=True):
+    hierarchy_model = apps.get_model('headquarters', 'UnitHierarchy')
+    if replace and ancestors:
+        hierarchy_model.objects.filter(
+            _nodes_q('descendant', ancestors)
+        ).delete()
+    entries = [
+        hierarchy_model(
+            ancestor_type=ancestor_type,
+            ancestor_id=ancestor_id,
+            descendant_type=descendant_type,
+            descendant_id=descendant_id,
+        )
+        for (descendant_type, descendant_id), node_ancestors in (
+            ancestors.items()
+        )
+        for ancestor_type, ancestor_id in node_ancestors
+    ]
+    hierarchy_model.objects.bulk_create(
+        entries, batch_size=batch_size, ignore_conflicts=not replace
+    )
+    return len(entries)
+
+
+def rebuild_unit_hierarchy(apps=django_apps, batch_size=1000) -> int:
+    """
+    Полностью перестраивает таблицу замыкания иерархии.
+
+    :param apps: реестр моделей, в миграциях - исторический
+    :param batch_size: размер пачки для bulk_create
+    :return: количество записанных строк
+    """
+    units_ancestors = _compute_units_ancestors(apps)
+    users_ancestors = _compute_users_ancestors(
+        apps, units_ancestors=units_ancestors
+    )
+    with transaction.atomic():
+        apps.get_model('headquarters', 'UnitHierarchy').objects.all().delete()
+        return (
+            _write_ancestors(apps, units_ancestors, batch_size, replace=False)
+            + _write_ancestors(
+                apps, users_ancestors, batch_size, replace=False
+            )
+        )
+
+
+def refresh_users_hierarchy(user_ids):
+    """Пересчитывает структурные единицы, в которые входят пользователи."""
+    user_ids = [user_id for user_id in set(user_ids) if user_id is not None]
+    if user_ids:
+        _write_ancestors(
+            django_apps, _compute_users_ancestors(django_apps, user_ids)
+        )
+
+
+def add_user_to_unit_hierarchy(user_id, unit):
+    """
+    Добавляет пользователя в структурную единицу и все вышестоящие.
+
+    В отличие от refresh_users_hierarchy не удаляет существующие связи,
+    поэтому подходит только для вступления в структурную единицу.
+    """
+    node = (unit._meta.model_name, unit.id)
+    _write_ancestors(
+        django_apps,
+        {
+            (UnitHierarchy.USER_TYPE, user_id): (
+                {node} | _get_stored_ancestors(django_apps, [node])[node]
+            )
+        },
+        replace=False
+    )
+
+
+def refresh_unit_hierarchy(unit, old_commander_id=None):
+    """
+    Пересчитывает предков структурной единицы и всех входящих в нее
+    единиц и пользователей после создания или смены вышестоящих.
+    """
+    node = (unit._meta.model_name, unit.id)
+    descendants = list(UnitHierarchy.objects.filter(
+        ancestor_type=node[0], ancestor_id=node[1]
+    ).values_list('descendant_type', 'descendant_id'))
+    unit_ids_by_type = defaultdict(list)
+    user_ids = [unit.commander_id, old_commander_id]
+    for descendant_type, descendant_id in [node, *descendants]:
+        if descendant_type == UnitHierarchy.USER_TYPE:
+            user_ids.append(descendant_id)
+        else:
+            unit_ids_by_type[descendant_type].append(descendant_id)
+    _write_ancestors(
+        django_apps, _compute_units_ancestors(django_apps, unit_ids_by_type)
+    )
+    refresh_users_hierarchy(user_ids)
+
+
+def delete_hierarchy_node(node_type, node_id):
+    """Удаляет структурную единицу или пользователя из иерархии."""
+    UnitHierarchy.objects.filter(
+        _nodes_q('ancestor', [(node_type, node_id)])
+        | _nodes_q('descendant', [(node_type, node_id)])
+    ).delete()
+
+
+def get_descendant_ids(ancestor_model, ancestor_ids,
+                       descendant_type=UnitHierarchy.USER_TYPE):
+    """
+    Подзапрос id потомков структурных единиц на любом уровне иерархии.
+
+    :param ancestor_model: модель структурных единиц-предков
+    :param ancestor_ids: id предков (список или подзапрос)
+    :param descendant_type: model_name потомков, по умолчанию - пользователи
+    """
+    return UnitHierarchy.objects.filter(
+        ancestor_type=ancestor_model._meta.model_name,
+        ancestor_id__in=ancestor_ids,
+        descendant_type=descendant_type,
+    ).values('descendant_id')
+
+
+def annotate_descendants_counts(queryset, **descendant_models):
+    """
+    Добавляет к структурным единицам количество входящих в них единиц
+    на любом уровне иерархии, посчитанное подзапросами к таблице замыкания.
+
+    :param descendant_models: имя аннотации и модель потомков,
+                              например detachments_count=Detachment
+    """
+    ancestor_type = queryset.model._meta.model_name
+    return queryset.annotate(**{
+        name: Coalesce(
+            Subquery(
+                UnitHierarchy.objects.filter(
+                    ancestor_type=ancestor_type,
+                    ancestor_id=OuterRef('pk'),
+                    descendant_type=descendant_model._meta.model_name,
+                ).order_by().values('ancestor_id').annotate(
+                    count=Count('pk')
+                ).values('count')
+            ),
+            0
+        )
+        for name, descendant_model in descendant_models.items()
+    })
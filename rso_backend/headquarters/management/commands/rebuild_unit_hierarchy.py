@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from headquarters.hierarchy import rebuild_unit_hierarchy
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает таблицу иерархии структурных единиц '
+        'и их участников.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки для записи в БД.'
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_unit_hierarchy(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Записано связей иерархии: {count}')
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from headquarters.counters import reconcile_unit_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счетчики участников и мероприятий штабов и отрядов '
+        'с данными в БД и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки для записи в БД.'
+        )
+
+    def handle(self, *args, **options):
+        fixed = reconcile_unit_counters(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено структурных единиц: {fixed}')
+        )
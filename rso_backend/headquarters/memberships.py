@@ -0,0 +1,299 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from api.utils import invalidate_user_roles
+from competitions.rankings import mark_detachments_q3_q4_rankings
+from headquarters.counters import change_unit_counters
+from headquarters.hierarchy import refresh_users_hierarchy
+from headquarters.models import (CentralHeadquarter, Detachment,
+                                 EducationalHeadquarter, LocalHeadquarter,
+                                 Position, RegionalHeadquarter,
+                                 UserCentralHeadquarterPosition,
+                                 UserDetachmentPosition,
+                                 UserDistrictHeadquarterPosition,
+                                 UserEducationalHeadquarterPosition,
+                                 UserLocalHeadquarterPosition,
+                                 UserRegionalHeadquarterPosition)
+from users.models import RSOUser
+
+# Модели должностей сверху вниз по иерархии.
+POSITION_MODELS = (
+    UserCentralHeadquarterPosition,
+    UserDistrictHeadquarterPosition,
+    UserRegionalHeadquarterPosition,
+    UserLocalHeadquarterPosition,
+    UserEducationalHeadquarterPosition,
+    UserDetachmentPosition,
+)
+
+
+_bulk_members_change = ContextVar('bulk_members_change', default=False)
+
+
+@contextmanager
+def bulk_members_change():
+    """
+    Пакетное изменение членства: обработчики post_delete должностей,
+    которые обновляют счетчики, иерархию, кеш ролей и рейтинги, пропускают
+    поштучную обработку - ее одним пакетом выполняет _after_members_change.
+    """
+    token = _bulk_members_change.set(True)
+    try:
+        yield
+    finally:
+        _bulk_members_change.reset(token)
+
+
+def in_bulk_members_change() -> bool:
+    """Выполняется ли пакетное изменение членства (bulk_members_change)."""
+    return _bulk_members_change.get()
+
+
+class _Units(NamedTuple):
+    """Вышестоящие единицы отрядов, выбранные get_detachments_chains."""
+    detachments: dict
+    educational_headquarters: dict
+    local_headquarters: dict
+    regional_headquarters: dict
+    central_headquarter_id: int | None
+
+
+def _get_parent_unit(position_model, unit_id, units):
+    """Первый заполненный вышестоящий штаб отряда, ОО или МШ."""
+    if position_model is UserDetachmentPosition:
+        educational_id, local_id, regional_id = units.detachments[unit_id]
+        if educational_id:
+            return UserEducationalHeadquarterPosition, educational_id
+        if local_id:
+            return UserLocalHeadquarterPosition, local_id
+        return UserRegionalHeadquarterPosition, regional_id
+    if position_model is UserEducationalHeadquarterPosition:
+        local_id, regional_id = units.educational_headquarters[unit_id]
+        if local_id:
+            return UserLocalHeadquarterPosition, local_id
+        return UserRegionalHeadquarterPosition, regional_id
+    return UserRegionalHeadquarterPosition, units.local_headquarters[unit_id]
+
+
+def _get_chain(detachment_id, units):
+    chain = [(UserDetachmentPosition, detachment_id)]
+    while chain[-1][0] is not UserRegionalHeadquarterPosition:
+        parent = _get_parent_unit(*chain[-1], units)
+        if parent[1] is None:
+            raise ValidationError(
+                'Отряд должен быть привязан к одному из штабов.'
+            )
+        chain.append(parent)
+    chain.append((
+        UserDistrictHeadquarterPosition,
+        units.regional_headquarters[chain[-1][1]]
+    ))
+    if units.central_headquarter_id:
+        chain.append(
+            (UserCentralHeadquarterPosition, units.central_headquarter_id)
+        )
+    return chain
+
+
+def get_detachments_chains(detachment_ids) -> dict:
+    """
+    Цепочки структурных единиц, в которые входит член отряда.
+
+    Вышестоящая единица выбирается так же, как при сохранении
+    UserUnitPosition: первый заполненный штаб по иерархии.
+
+    :param detachment_ids: id отрядов
+    :return: словарь {detachment_id: [(модель должности, id единицы)]}
+    """
+    detachments = {
+        row[0]: row[1:] for row in Detachment.objects.filter(
+            id__in=detachment_ids
+        ).values_list(
+            'id', 'educational_headquarter_id', 'local_headquarter_id',
+            'regional_headquarter_id'
+        )
+    }
+    missing_ids = set(detachment_ids) - set(detachments)
+    if missing_ids:
+        raise ValidationError(
+            f'Отряды не найдены: {sorted(missing_ids)}.'
+        )
+    educational_headquarters = {
+        row[0]: row[1:] for row in EducationalHeadquarter.objects.filter(
+            id__in={row[0] for row in detachments.values()}
+        ).values_list('id', 'local_headquarter_id', 'regional_headquarter_id')
+    }
+    local_headquarters = dict(LocalHeadquarter.objects.filter(
+        id__in={row[1] for row in detachments.values()}
+        | {row[0] for row in educational_headquarters.values()}
+    ).values_list('id', 'regional_headquarter_id'))
+    units = _Units(
+        detachments,
+        educational_headquarters,
+        local_headquarters,
+        dict(RegionalHeadquarter.objects.filter(
+            id__in={row[2] for row in detachments.values()}
+            | {row[1] for row in educational_headquarters.values()}
+            | set(local_headquarters.values())
+        ).values_list('id', 'district_headquarter_id')),
+        CentralHeadquarter.objects.values_list('id', flat=True).first(),
+    )
+    return {
+        detachment_id: _get_chain(detachment_id, units)
+        for detachment_id in detachments
+    }
+
+
+def _change_members_counters(members, delta):
+    """
+    Изменяет счетчики структурных единиц по списку членства.
+
+    Единицы с одинаковым изменением обновляются одним запросом.
+
+    :param members: список (модель должности, id единицы, membership_fee)
+    :param delta: 1 при вступлении, -1 при исключении
+    """
+    participants = Counter()
+    fee_members = Counter()
+    for position_model, unit_id, membership_fee in members:
+        if position_model is UserCentralHeadquarterPosition:
+            continue
+        participants[position_model, unit_id] += 1
+        fee_members[position_model, unit_id] += int(membership_fee)
+    unit_ids = defaultdict(list)
+    for key, count in participants.items():
+        unit_ids[key[0], count, fee_members[key]].append(key[1])
+    for (position_model, count, fee_count), ids in unit_ids.items():
+        change_unit_counters(
+            position_model._meta.get_field('headquarter').related_model,
+            ids,
+            participants_number=count * delta,
+            members_number=fee_count * delta,
+        )
+
+
+def _after_members_change(user_ids, members, delta):
+    _change_members_counters(members, delta)
+    refresh_users_hierarchy(user_ids)
+    invalidate_user_roles(user_ids)
+    # Места Q3 и Q4 зависят от состава отрядов (см. обработчик
+    # mark_member_q3_q4_rankings, пропускающий пакетные изменения).
+    detachment_ids = {
+        unit_id for position_model, unit_id, _ in members
+        if position_model is UserDetachmentPosition
+    }
+    if detachment_ids:
+        mark_detachments_q3_q4_rankings(detachment_ids)
+
+
+def add_detachment_members(pairs, position=None) -> int:
+    """
+    Добавляет пользователей в отряды и во все вышестоящие штабы.
+
+    Цепочка вышестоящих штабов определяется один раз для каждого отряда,
+    должности всех уровней создаются через bulk_create в одной транзакции.
+    Должность в вышестоящем штабе не создается, если она у пользователя
+    уже есть (например, он входит в штаб, но не состоит в отряде).
+    Счетчики, иерархия и кеш ролей обновляются здесь же, так как
+    bulk_create не отправляет сигналы.
+
+    :param pairs: пары (user_id, detachment_id)
+    :param position: должность в отряде, по умолчанию - должность
+                     settings.DEFAULT_POSITION_NAME, как в вышестоящих штабах
+    :return: количество созданных записей о членстве
+    """
+    pairs = list(pairs)
+    user_ids = [user_id for user_id, _ in pairs]
+    if len(set(user_ids)) != len(user_ids):
+        raise ValidationError(
+            'Пользователь может быть добавлен только в один отряд.'
+        )
+    with transaction.atomic():
+        existing_ids = set(UserDetachmentPosition.objects.filter(
+            user_id__in=user_ids
+        ).values_list('user_id', flat=True))
+        if existing_ids:
+            raise ValidationError(
+                'Пользователь уже является членом одного из отрядов: '
+                f'{sorted(existing_ids)}.'
+            )
+        default_position, _ = Position.objects.get_or_create(
+            name=settings.DEFAULT_POSITION_NAME
+        )
+        chains = get_detachments_chains({
+            detachment_id for _, detachment_id in pairs
+        })
+        membership_fees = dict(RSOUser.objects.filter(
+            id__in=user_ids
+        ).values_list('id', 'membership_fee'))
+        # Пользователь может занимать только одну должность каждого уровня.
+        existing_positions = {
+            (position_model, user_id)
+            for position_model in POSITION_MODELS
+            if position_model is not UserDetachmentPosition
+            for user_id in position_model.objects.filter(
+                user_id__in=user_ids
+            ).values_list('user_id', flat=True)
+        }
+        entries = defaultdict(list)
+        members = []
+        for user_id, detachment_id in pairs:
+            for position_model, unit_id in chains[detachment_id]:
+                if (position_model, user_id) in existing_positions:
+                    continue
+                entries[position_model].append(position_model(
+                    user_id=user_id,
+                    headquarter_id=unit_id,
+                    position=(
+                        position
+                        if position is not None
+                        and position_model is UserDetachmentPosition
+                        else default_position
+                    ),
+                ))
+                members.append(
+                    (position_model, unit_id, membership_fees[user_id])
+                )
+        for position_model, model_entries in entries.items():
+            position_model.objects.bulk_create(model_entries)
+        _after_members_change(user_ids, members, 1)
+    return len(members)
+
+
+def remove_unit_members(user_ids) -> tuple[int, dict]:
+    """
+    Исключает пользователей из всех структурных единиц.
+
+    Для каждой модели должностей выполняется один QuerySet.delete(),
+    обработчики post_delete внутри bulk_members_change пропускают
+    поштучное обновление, а счетчики, иерархия, кеш ролей и отметка
+    рейтингов обновляются одним пакетом.
+
+    :param user_ids: id пользователей
+    :return: как у QuerySet.delete() - общее количество удаленных записей
+             о членстве и количество по моделям
+    """
+    user_ids = list(user_ids)
+    with transaction.atomic(), bulk_members_change():
+        members = []
+        deleted = {}
+        for position_model in POSITION_MODELS:
+            positions = position_model.objects.filter(user_id__in=user_ids)
+            members += [
+                (position_model, unit_id, membership_fee)
+                for unit_id, membership_fee in positions.values_list(
+                    'headquarter_id', 'user__membership_fee'
+                )
+            ]
+            _, deleted_per_model = positions.delete()
+            deleted[position_model._meta.label] = deleted_per_model.get(
+                position_model._meta.label, 0
+            )
+        _after_members_change(user_ids, members, -1)
+    return sum(deleted.values()), deleted
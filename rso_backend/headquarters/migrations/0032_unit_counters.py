@@ -0,0 +1,136 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:38
+
+from django.db import migrations, models
+
+from headquarters.utils import get_unit_counts_subqueries
+
+UNIT_MODEL_NAMES = (
+    'CentralHeadquarter', 'DistrictHeadquarter', 'RegionalHeadquarter',
+    'LocalHeadquarter', 'EducationalHeadquarter', 'Detachment',
+)
+
+
+def fill_unit_counters(apps, schema_editor):
+    RSOUser = apps.get_model('users', 'RSOUser')
+    for model_name in UNIT_MODEL_NAMES:
+        unit_model = apps.get_model('headquarters', model_name)
+        counts = get_unit_counts_subqueries(unit_model)
+        if model_name == 'CentralHeadquarter':
+            unit_model.objects.update(
+                participants_number=RSOUser.objects.count(),
+                members_number=RSOUser.objects.filter(
+                    membership_fee=True
+                ).count(),
+                events_number=counts['events_count'],
+            )
+            continue
+        unit_model.objects.update(
+            participants_number=counts['participants_count'],
+            members_number=counts['members_count'],
+            events_number=counts['events_count'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('headquarters', '0031_alter_regionalheadquarter_requisites'),
+        ('events', '0019_alter_event_address_alter_event_format'),
+        ('users', '0028_alter_usereducation_study_year'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='centralheadquarter',
+            name='events_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество мероприятий'),
+        ),
+        migrations.AddField(
+            model_name='centralheadquarter',
+            name='members_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество участников, оплативших членский взнос'),
+        ),
+        migrations.AddField(
+            model_name='centralheadquarter',
+            name='participants_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество участников'),
+        ),
+        migrations.AddField(
+            model_name='detachment',
+            name='events_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество мероприятий'),
+        ),
+        migrations.AddField(
+            model_name='detachment',
+            name='members_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество участников, оплативших членский взнос'),
+        ),
+        migrations.AddField(
+            model_name='detachment',
+            name='participants_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество участников'),
+        ),
+        migrations.AddField(
+            model_name='districtheadquarter',
+            name='events_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество мероприятий'),
+        ),
+        migrations.AddField(
+            model_name='districtheadquarter',
+            name='members_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество участников, оплативших членский взнос'),
+        ),
+        migrations.AddField(
+            model_name='districtheadquarter',
+            name='participants_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество участников'),
+        ),
+        migrations.AddField(
+            model_name='educationalheadquarter',
+            name='events_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество мероприятий'),
+        ),
+        migrations.AddField(
+            model_name='educationalheadquarter',
+            name='members_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество участников, оплативших членский взнос'),
+        ),
+        migrations.AddField(
+            model_name='educationalheadquarter',
+            name='participants_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество участников'),
+        ),
+        migrations.AddField(
+            model_name='localheadquarter',
+            name='events_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество мероприятий'),
+        ),
+        migrations.AddField(
+            model_name='localheadquarter',
+            name='members_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество участников, оплативших членский взнос'),
+        ),
+        migrations.AddField(
+            model_name='localheadquarter',
+            name='participants_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество участников'),
+        ),
+        migrations.AddField(
+            model_name='regionalheadquarter',
+            name='events_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество мероприятий'),
+        ),
+        migrations.AddField(
+            model_name='regionalheadquarter',
+            name='members_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество участников, оплативших членский взнос'),
+        ),
+        migrations.AddField(
+            model_name='regionalheadquarter',
+            name='participants_number',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество участников'),
+        ),
+        migrations.RunPython(
+            fill_unit_counters, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:46
+
+from django.db import migrations, models
+
+from headquarters.hierarchy import rebuild_unit_hierarchy
+
+
+def fill_unit_hierarchy(apps, schema_editor):
+    rebuild_unit_hierarchy(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('headquarters', '0032_unit_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnitHierarchy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ancestor_type', models.CharField(max_length=30, verbose_name='Тип структурной единицы-предка')),
+                ('ancestor_id', models.PositiveBigIntegerField(verbose_name='Id структурной единицы-предка')),
+                ('descendant_type', models.CharField(max_length=30, verbose_name='Тип потомка')),
+                ('descendant_id', models.PositiveBigIntegerField(verbose_name='Id потомка')),
+            ],
+            options={
+                'verbose_name': 'Связь в иерархии структурных единиц',
+                'verbose_name_plural': 'Иерархия структурных единиц',
+                'indexes': [models.Index(fields=['descendant_type', 'descendant_id'], name='unit_hierarchy_descendant_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='unithierarchy',
+            constraint=models.UniqueConstraint(fields=('ancestor_type', 'ancestor_id', 'descendant_type', 'descendant_id'), name='unique_unit_hierarchy'),
+        ),
+        migrations.RunPython(
+            fill_unit_hierarchy, migrations.RunPython.noop
+        ),
+    ]
@@ -133,6 +133,23 @@ class Unit(models.Model):
         null=True,
         blank=True,
     )
+    # Счетчики обновляются сигналами, расхождения исправляет команда
+    # reconcile_unit_counters. Командир структурной единицы не учитывается.
+    participants_number = models.PositiveIntegerField(
+        verbose_name='Количество участников',
+        default=0,
+        editable=False,
+    )
+    members_number = models.PositiveIntegerField(
+        verbose_name='Количество участников, оплативших членский взнос',
+        default=0,
+        editable=False,
+    )
+    events_number = models.PositiveIntegerField(
+        verbose_name='Количество мероприятий',
+        default=0,
+        editable=False,
+    )
 
     def clean(self):
         if not self.commander:
@@ -141,6 +158,29 @@ class Unit(models.Model):
     class Meta:
         abstract = True
 
+    def get_descendants(self, unit_model):
+        """Структурные единицы модели unit_model, входящие в данную
+        на любом уровне иерархии."""
+        return unit_model.objects.filter(
+            id__in=UnitHierarchy.objects.filter(
+                ancestor_type=self._meta.model_name,
+                ancestor_id=self.id,
+                descendant_type=unit_model._meta.model_name,
+            ).values('descendant_id')
+        )
+
+    def get_users(self):
+        """Пользователи, входящие в структурную единицу или в любую
+        из входящих в нее, включая командиров."""
+        user_model = self._meta.get_field('commander').related_model
+        return user_model.objects.filter(
+            id__in=UnitHierarchy.objects.filter(
+                ancestor_type=self._meta.model_name,
+                ancestor_id=self.id,
+                descendant_type=UnitHierarchy.USER_TYPE,
+            ).values('descendant_id')
+        )
+
     def __str__(self):
         return self.name or 'Структурная единица'
 
@@ -185,22 +225,13 @@ class DistrictHeadquarter(Unit):
         super().save(*args, **kwargs)
 
     def get_related_units(self) -> dict:
-        regional_headquarters = self.regional_headquarters.all()
-        educational_headquarters = EducationalHeadquarter.objects.filter(
-            regional_headquarter__in=regional_headquarters
-        )
-        local_headquarters = LocalHeadquarter.objects.filter(
-            regional_headquarter__in=regional_headquarters
-        )
-        detachments = Detachment.objects.filter(
-            regional_headquarter__in=regional_headquarters
-        )
-
         return {
-            'regional_headquarters': regional_headquarters,
-            'educational_headquarters': educational_headquarters,
-            'local_headquarters': local_headquarters,
-            'detachments': detachments
+            'regional_headquarters': self.regional_headquarters.all(),
+            'educational_headquarters': self.get_descendants(
+                EducationalHeadquarter
+            ),
+            'local_headquarters': self.get_descendants(LocalHeadquarter),
+            'detachments': self.get_descendants(Detachment)
         }
 
 
@@ -271,9 +302,11 @@ class RegionalHeadquarter(Unit):
 
     def get_related_units(self) -> dict:
         return {
-            'educational_headquarters': self.educational_headquarters.all(),
-            'local_headquarters': self.educational_headquarters.all(),
-            'detachments': self.detachments.all()
+            'educational_headquarters': self.get_descendants(
+                EducationalHeadquarter
+            ),
+            'local_headquarters': self.local_headquarters.all(),
+            'detachments': self.get_descendants(Detachment)
         }
 
 
@@ -295,7 +328,7 @@ class LocalHeadquarter(Unit):
     def get_related_units(self) -> dict:
         return {
             'educational_headquarters': self.educational_headquarters.all(),
-            'detachments': self.detachments.all()
+            'detachments': self.get_descendants(Detachment)
         }
 
 
@@ -609,22 +642,21 @@ class UserUnitPosition(models.Model):
         """
         Удаляет пользователя из всех связанных структурных единиц.
         """
-        UserCentralHeadquarterPosition.objects.filter(user=self.user).delete()
-        UserDistrictHeadquarterPosition.objects.filter(user=self.user).delete()
-        UserRegionalHeadquarterPosition.objects.filter(user=self.user).delete()
-        UserLocalHeadquarterPosition.objects.filter(user=self.user).delete()
-        UserEducationalHeadquarterPosition.objects.filter(
-            user=self.user).delete()
-        UserDetachmentPosition.objects.filter(user=self.user).delete()
+        from headquarters.memberships import remove_unit_members
+
+        return remove_unit_members([self.user_id])
 
     def delete(self, *args, **kwargs):
         """
         Переопределяет стандартный метод delete для обеспечения
         удаления пользователя из всех структурных единиц при его удалении
         из одной из структур.
+
+        Должность без пользователя удаляется стандартным способом.
         """
-        self.delete_user_from_all_units()
-        super().delete(*args, **kwargs)
+        if self.user_id is None:
+            return super().delete(*args, **kwargs)
+        return self.delete_user_from_all_units()
 
     def __str__(self):
         position = self.position.name if self.position else 'без должности'
@@ -820,3 +852,55 @@ class UserDetachmentApplication(models.Model):
         ]
         verbose_name_plural = 'Заявки на вступление в отряды'
         verbose_name = 'Заявка на вступление в отряд'
+
+
+class UnitHierarchy(models.Model):
+    """Таблица замыкания иерархии структурных единиц.
+
+    Хранит пары предок - потомок для всех уровней иерархии (ЦШ - ОШ - РШ -
+    МШ - ШОО - отряд), а также пары структурная единица - пользователь
+    для членов и командиров. Тип задается именем модели (model_name).
+    Заполняется сигналами и командой rebuild_unit_hierarchy.
+    """
+
+    USER_TYPE = 'rsouser'
+
+    ancestor_type = models.CharField(
+        max_length=30,
+        verbose_name='Тип структурной единицы-предка'
+    )
+    ancestor_id = models.PositiveBigIntegerField(
+        verbose_name='Id структурной единицы-предка'
+    )
+    descendant_type = models.CharField(
+        max_length=30,
+        verbose_name='Тип потомка'
+    )
+    descendant_id = models.PositiveBigIntegerField(
+        verbose_name='Id потомка'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=(
+                    'ancestor_type', 'ancestor_id',
+                    'descendant_type', 'descendant_id'
+                ),
+                name='unique_unit_hierarchy'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('descendant_type', 'descendant_id'),
+                name='unit_hierarchy_descendant_idx'
+            )
+        ]
+        verbose_name_plural = 'Иерархия структурных единиц'
+        verbose_name = 'Связь в иерархии структурных единиц'
+
+    def __str__(self):
+        return (
+            f'{self.ancestor_type} {self.ancestor_id} - '
+            f'{self.descendant_type} {self.descendant_id}'
+        )
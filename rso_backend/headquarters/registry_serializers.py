@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from headquarters.hierarchy import annotate_descendants_counts
 from headquarters.models import (Detachment, DistrictHeadquarter,
                                  EducationalHeadquarter, LocalHeadquarter,
                                  RegionalHeadquarter)
@@ -10,18 +11,39 @@ class BaseRegistrySerializer(BaseShortUnitListSerializer):
     """
     Базовый класс для сериализаторов, используемых в эндпоинтах
     штабов при указании query-параметра registry как true.
+
+    Количество входящих структурных единиц (DESCENDANTS_COUNTS) добавляется
+    к запросу вьюсета методом annotate_queryset - подзапросами к таблице
+    замыкания, без запросов на каждый штаб.
     """
 
+    DESCENDANTS_COUNTS = {}
+
     class Meta:
         model = None
         fields = BaseShortUnitListSerializer.Meta.fields
 
+    @classmethod
+    def annotate_queryset(cls, queryset):
+        if not cls.DESCENDANTS_COUNTS:
+            return queryset
+        return annotate_descendants_counts(
+            queryset, **cls.DESCENDANTS_COUNTS
+        )
+
 
 class DistrictHeadquarterRegistrySerializer(BaseRegistrySerializer):
-    regional_headquarters_count = serializers.SerializerMethodField()
-    local_headquarters_count = serializers.SerializerMethodField()
-    educational_headquarters_count = serializers.SerializerMethodField()
-    detachments_count = serializers.SerializerMethodField()
+    DESCENDANTS_COUNTS = {
+        'regional_headquarters_count': RegionalHeadquarter,
+        'local_headquarters_count': LocalHeadquarter,
+        'educational_headquarters_count': EducationalHeadquarter,
+        'detachments_count': Detachment,
+    }
+
+    regional_headquarters_count = serializers.IntegerField(read_only=True)
+    local_headquarters_count = serializers.IntegerField(read_only=True)
+    educational_headquarters_count = serializers.IntegerField(read_only=True)
+    detachments_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = DistrictHeadquarter
@@ -32,40 +54,17 @@ class DistrictHeadquarterRegistrySerializer(BaseRegistrySerializer):
             'detachments_count',
         )
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._cached_units = None
-
-    def _get_units(self, obj):
-        """
-        Сохраняем юниты в кэш и отдаем их. Если есть в кэше, берем оттуда.
-        """
-        if self._cached_units is None:
-            self._cached_units = obj.get_related_units()
-        return self._cached_units
-
-    def get_regional_headquarters_count(self, obj):
-        return self._get_units(obj)['regional_headquarters'].count()
-
-    def get_educational_headquarters_count(self, obj):
-        return self._get_units(obj)['educational_headquarters'].count()
-
-    def get_local_headquarters_count(self, obj):
-        return self._get_units(obj)['local_headquarters'].count()
-
-    def get_detachments_count(self, obj):
-        return self._get_units(obj)['detachments'].count()
-
-    def to_representation(self, obj):
-        """Для очищения кэша перед началом сериализации."""
-        self._cached_units = None
-        return super().to_representation(obj)
-
 
 class RegionalHeadquarterRegistrySerializer(BaseRegistrySerializer):
-    local_headquarters_count = serializers.SerializerMethodField()
-    educational_headquarters_count = serializers.SerializerMethodField()
-    detachments_count = serializers.SerializerMethodField()
+    DESCENDANTS_COUNTS = {
+        'local_headquarters_count': LocalHeadquarter,
+        'educational_headquarters_count': EducationalHeadquarter,
+        'detachments_count': Detachment,
+    }
+
+    local_headquarters_count = serializers.IntegerField(read_only=True)
+    educational_headquarters_count = serializers.IntegerField(read_only=True)
+    detachments_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = RegionalHeadquarter
@@ -75,36 +74,15 @@ class RegionalHeadquarterRegistrySerializer(BaseRegistrySerializer):
             'detachments_count',
         )
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._cached_units = None
-
-    def _get_units(self, obj):
-        """
-        Сохраняем юниты в кэш и отдаем их. Если есть в кэше, берем оттуда.
-        """
-        if self._cached_units is None:
-            self._cached_units = obj.get_related_units()
-        return self._cached_units
-
-    def get_educational_headquarters_count(self, obj):
-        return self._get_units(obj)['educational_headquarters'].count()
-
-    def get_local_headquarters_count(self, obj):
-        return self._get_units(obj)['local_headquarters'].count()
-
-    def get_detachments_count(self, obj):
-        return self._get_units(obj)['detachments'].count()
-
-    def to_representation(self, obj):
-        """Для очищения кэша перед началом сериализации."""
-        self._cached_units = None
-        return super().to_representation(obj)
-
 
 class LocalHeadquarterRegistrySerializer(BaseRegistrySerializer):
-    educational_headquarters_count = serializers.SerializerMethodField()
-    detachments_count = serializers.SerializerMethodField()
+    DESCENDANTS_COUNTS = {
+        'educational_headquarters_count': EducationalHeadquarter,
+        'detachments_count': Detachment,
+    }
+
+    educational_headquarters_count = serializers.IntegerField(read_only=True)
+    detachments_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = LocalHeadquarter
@@ -113,45 +91,16 @@ class LocalHeadquarterRegistrySerializer(BaseRegistrySerializer):
             'detachments_count',
         )
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._cached_units = None
-
-    def _get_units(self, obj):
-        """
-        Сохраняем юниты в кэш и отдаем их. Если есть в кэше, берем оттуда.
-        """
-        if self._cached_units is None:
-            self._cached_units = obj.get_related_units()
-        return self._cached_units
-
-    def get_educational_headquarters_count(self, obj):
-        return self._get_units(obj)['educational_headquarters'].count()
-
-    def get_detachments_count(self, obj):
-        return self._get_units(obj)['detachments'].count()
-
-    def to_representation(self, obj):
-        """Для очищения кэша перед началом сериализации."""
-        self._cached_units = None
-        return super().to_representation(obj)
-
 
 class EducationalHeadquarterRegistrySerializer(BaseRegistrySerializer):
-    detachments_count = serializers.SerializerMethodField()
+    DESCENDANTS_COUNTS = {'detachments_count': Detachment}
+
+    detachments_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = EducationalHeadquarter
         fields = BaseRegistrySerializer.Meta.fields + ('detachments_count',)
 
-    @staticmethod
-    def _get_units(obj):
-        """Получаем связанные юниты (отряды)."""
-        return obj.get_related_units()
-
-    def get_detachments_count(self, obj):
-        return self._get_units(obj)['detachments'].count()
-
 
 class DetachmentRegistrySerializer(BaseRegistrySerializer):
     class Meta:
@@ -8,7 +8,7 @@ from rest_framework import serializers
 
 from api.serializers import (AreaSerializer, EducationalInstitutionSerializer,
                              RegionSerializer)
-from competitions.models import CompetitionParticipants
+from competitions.pairing import get_participation
 from headquarters.models import (Area, CentralHeadquarter, Detachment,
                                  DistrictHeadquarter, EducationalHeadquarter,
                                  EducationalInstitution, LocalHeadquarter,
@@ -184,26 +184,18 @@ class BaseShortUnitListSerializer(serializers.ModelSerializer):
 
     @staticmethod
     def get_members_count(instance):
-        if isinstance(instance, QuerySet):
-            instance_type = type(instance.first())
-        else:
-            instance_type = type(instance)
-        if issubclass(instance_type, CentralHeadquarter):
-            return RSOUser.objects.filter(membership_fee=True).count()
-        return instance.members.filter(user__membership_fee=True).count() + 1
+        if isinstance(instance, CentralHeadquarter):
+            return instance.members_number
+        return instance.members_number + 1
 
     @staticmethod
     def get_participants_count(instance):
-        if isinstance(instance, QuerySet):
-            instance_type = type(instance.first())
-        else:
-            instance_type = type(instance)
-        if issubclass(instance_type, CentralHeadquarter):
-            return RSOUser.objects.count()
-        return instance.members.count() + 1
+        if isinstance(instance, CentralHeadquarter):
+            return instance.participants_number
+        return instance.participants_number + 1
 
     def get_events_count(self, instance):
-        return instance.events.count()
+        return instance.events_number
 
 
 class ShortDistrictHeadquarterListSerializer(BaseShortUnitListSerializer):
@@ -415,27 +407,19 @@ class BaseUnitSerializer(serializers.ModelSerializer):
         return serializer(leaders, many=True).data
 
     def get_events_count(self, instance):
-        return instance.events.count()
+        return instance.events_number
 
     @staticmethod
     def get_members_count(instance):
-        if isinstance(instance, QuerySet):
-            instance_type = type(instance.first())
-        else:
-            instance_type = type(instance)
-        if issubclass(instance_type, CentralHeadquarter):
-            return RSOUser.objects.filter(membership_fee=True).count()
-        return instance.members.filter(user__membership_fee=True).count() + 1
+        if isinstance(instance, CentralHeadquarter):
+            return instance.members_number
+        return instance.members_number + 1
 
     @staticmethod
     def get_participants_count(instance):
-        if isinstance(instance, QuerySet):
-            instance_type = type(instance.first())
-        else:
-            instance_type = type(instance)
-        if issubclass(instance_type, CentralHeadquarter):
-            return RSOUser.objects.count()
-        return instance.members.count() + 1
+        if isinstance(instance, CentralHeadquarter):
+            return instance.participants_number
+        return instance.participants_number + 1
 
     def validate(self, attrs):
         """
@@ -931,42 +915,28 @@ class DetachmentSerializer(BaseUnitSerializer):
         )
         return serializer(leaders, many=True).data
 
+    def _get_participation(self, obj):
+        """Участие отряда в текущем конкурсе (settings.COMPETITION_ID)."""
+        return get_participation(settings.COMPETITION_ID, obj.id)
+
     def get_status(self, obj):
-        if not CompetitionParticipants.objects.filter(
-            Q(detachment=obj) & Q(junior_detachment__isnull=False) |
-            Q(detachment__isnull=False) & Q(junior_detachment=obj)
-        ).exists():
+        participation = self._get_participation(obj)
+        if participation is None or not participation.is_tandem:
             return None
-        if CompetitionParticipants.objects.filter(
-            Q(detachment=obj) & Q(junior_detachment__isnull=False)
-        ).exists():
-            return 'Наставник'
-        return 'Старт'
+        return 'Старт' if participation.is_junior else 'Наставник'
 
     def get_nomination(self, obj):
-        if not CompetitionParticipants.objects.filter(
-            Q(detachment=obj) & Q(junior_detachment__isnull=False) |
-            Q(detachment__isnull=False) & Q(junior_detachment=obj) |
-            Q(junior_detachment=obj)
-        ).exists():
+        participation = self._get_participation(obj)
+        if participation is None:
             return None
-        if CompetitionParticipants.objects.filter(
-            Q(detachment=obj) & Q(junior_detachment__isnull=False) |
-            Q(detachment__isnull=False) & Q(junior_detachment=obj)
-        ).exists():
-            return 'Тандем'
-        return 'Дебют'
+        return 'Тандем' if participation.is_tandem else 'Дебют'
 
     def get_tandem_partner(self, obj):
-        participants = CompetitionParticipants.objects.filter(
-            Q(detachment=obj) | Q(junior_detachment=obj)
+        participation = self._get_participation(obj)
+        if participation is None or participation.partner_id is None:
+            return None
+        partner = Detachment.objects.filter(
+            id=participation.partner_id
         ).first()
-        if participants:
-            if participants.detachment == obj:
-                return ShortDetachmentSerializer(
-                    participants.junior_detachment
-                ).data
-            if participants.detachment:
-                return ShortDetachmentSerializer(
-                    participants.detachment
-                ).data
+        if partner:
+            return ShortDetachmentSerializer(partner).data
@@ -1,13 +1,32 @@
 import os
 
-from django.db.models.signals import pre_delete, pre_save
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
 from django.dispatch import receiver
 
+from api.utils import UNIT_POSITION_MODELS, invalidate_user_roles
+from events.models import Event
+from headquarters.counters import (change_unit_counters,
+                                   change_user_units_members)
+from headquarters.hierarchy import (UNIT_PARENT_FIELDS,
+                                    add_user_to_unit_hierarchy,
+                                    delete_hierarchy_node,
+                                    refresh_unit_hierarchy,
+                                    refresh_users_hierarchy)
+from headquarters.memberships import in_bulk_members_change
 from headquarters.models import (CentralHeadquarter, Detachment,
                                  DistrictHeadquarter, EducationalHeadquarter,
-                                 LocalHeadquarter, RegionalHeadquarter)
+                                 LocalHeadquarter, Position,
+                                 RegionalHeadquarter, UnitHierarchy,
+                                 UserCentralHeadquarterPosition,
+                                 UserDetachmentPosition,
+                                 UserDistrictHeadquarterPosition,
+                                 UserEducationalHeadquarterPosition,
+                                 UserLocalHeadquarterPosition,
+                                 UserRegionalHeadquarterPosition)
 from headquarters.utils import (headquarter_image_delete,
                                 headquarter_media_folder_delete)
+from users.models import RSOUser
 
 
 @receiver(pre_delete, sender=CentralHeadquarter)
@@ -168,3 +187,401 @@ def delete_image_with_detachment_headquarter(sender, instance, **kwargs):
                 pass
         except Detachment.DoesNotExist:
             pass
+
+
+@receiver(post_save, sender=UserCentralHeadquarterPosition)
+@receiver(post_save, sender=UserDistrictHeadquarterPosition)
+@receiver(post_save, sender=UserRegionalHeadquarterPosition)
+@receiver(post_save, sender=UserLocalHeadquarterPosition)
+@receiver(post_save, sender=UserEducationalHeadquarterPosition)
+@receiver(post_save, sender=UserDetachmentPosition)
+@receiver(post_delete, sender=UserCentralHeadquarterPosition)
+@receiver(post_delete, sender=UserDistrictHeadquarterPosition)
+@receiver(post_delete, sender=UserRegionalHeadquarterPosition)
+@receiver(post_delete, sender=UserLocalHeadquarterPosition)
+@receiver(post_delete, sender=UserEducationalHeadquarterPosition)
+@receiver(post_delete, sender=UserDetachmentPosition)
+def invalidate_member_roles(sender, instance, **kwargs):
+    """
+    Функция для сброса кеша ролей пользователя при изменении
+    его должности или доверенности в штабе/отряде.
+    """
+
+    if in_bulk_members_change():
+        return
+    invalidate_user_roles([instance.user_id])
+
+
+@receiver(pre_save, sender=CentralHeadquarter)
+@receiver(pre_save, sender=DistrictHeadquarter)
+@receiver(pre_save, sender=RegionalHeadquarter)
+@receiver(pre_save, sender=LocalHeadquarter)
+@receiver(pre_save, sender=EducationalHeadquarter)
+@receiver(pre_save, sender=Detachment)
+def remember_unit_fields(sender, instance, **kwargs):
+    """
+    Функция для сохранения командира, названия, баннера и вышестоящих
+    штабов структурной единицы до обновления.
+    """
+
+    instance._old_unit_fields = sender.objects.filter(
+        pk=instance.pk
+    ).values(
+        'commander_id', 'name', 'banner',
+        *(f'{field}_id' for field in UNIT_PARENT_FIELDS[
+            sender._meta.model_name
+        ])
+    ).first() if instance.pk else None
+
+
+@receiver(post_save, sender=CentralHeadquarter)
+@receiver(post_save, sender=DistrictHeadquarter)
+@receiver(post_save, sender=RegionalHeadquarter)
+@receiver(post_save, sender=LocalHeadquarter)
+@receiver(post_save, sender=EducationalHeadquarter)
+@receiver(post_save, sender=Detachment)
+def invalidate_unit_roles(sender, instance, created=False, **kwargs):
+    """
+    Функция для сброса кеша ролей при смене командира структурной
+    единицы. При смене названия или баннера сбрасывается и кеш
+    должностей членов штаба/отряда, в котором выводится структурная
+    единица.
+    """
+
+    old_fields = getattr(instance, '_old_unit_fields', None)
+    if created or old_fields is None:
+        invalidate_user_roles([instance.commander_id])
+        return
+    user_ids = []
+    if old_fields['commander_id'] != instance.commander_id:
+        user_ids += [old_fields['commander_id'], instance.commander_id]
+    if (
+        old_fields['name'] != instance.name
+        or old_fields['banner'] != instance.banner.name
+    ):
+        user_ids.append(instance.commander_id)
+        user_ids += UNIT_POSITION_MODELS[sender].objects.filter(
+            headquarter_id=instance.id
+        ).values_list('user_id', flat=True)
+    invalidate_user_roles(user_ids)
+
+
+@receiver(post_delete, sender=CentralHeadquarter)
+@receiver(post_delete, sender=DistrictHeadquarter)
+@receiver(post_delete, sender=RegionalHeadquarter)
+@receiver(post_delete, sender=LocalHeadquarter)
+@receiver(post_delete, sender=EducationalHeadquarter)
+@receiver(post_delete, sender=Detachment)
+def invalidate_deleted_unit_roles(sender, instance, **kwargs):
+    """
+    Функция для сброса кеша ролей командира удаленной структурной единицы.
+    """
+
+    invalidate_user_roles([instance.commander_id])
+
+
+@receiver(post_save, sender=Position)
+def invalidate_position_roles(sender, instance, created=False, **kwargs):
+    """
+    Функция для сброса кеша ролей всех пользователей
+    с должностью при ее переименовании.
+    """
+
+    if created:
+        return
+    user_ids = []
+    for position_model in UNIT_POSITION_MODELS.values():
+        user_ids += position_model.objects.filter(
+            position=instance
+        ).values_list('user_id', flat=True)
+    invalidate_user_roles(user_ids)
+
+
+@receiver(pre_save, sender=UserDistrictHeadquarterPosition)
+@receiver(pre_save, sender=UserRegionalHeadquarterPosition)
+@receiver(pre_save, sender=UserLocalHeadquarterPosition)
+@receiver(pre_save, sender=UserEducationalHeadquarterPosition)
+@receiver(pre_save, sender=UserDetachmentPosition)
+def remember_member_headquarter(sender, instance, **kwargs):
+    """
+    Функция для сохранения штаба/отряда участника до обновления.
+    Участники центрального штаба не учитываются - его счетчики
+    считаются по всем пользователям.
+    """
+
+    instance._old_headquarter_id = sender.objects.filter(
+        pk=instance.pk
+    ).values_list('headquarter_id', flat=True).first() if instance.pk else None
+
+
+@receiver(post_save, sender=UserDistrictHeadquarterPosition)
+@receiver(post_save, sender=UserRegionalHeadquarterPosition)
+@receiver(post_save, sender=UserLocalHeadquarterPosition)
+@receiver(post_save, sender=UserEducationalHeadquarterPosition)
+@receiver(post_save, sender=UserDetachmentPosition)
+def count_saved_member(sender, instance, created=False, **kwargs):
+    """
+    Функция для обновления счетчиков участников штаба/отряда
+    при вступлении пользователя или переводе в другой штаб/отряд.
+    """
+
+    unit_model = instance._meta.get_field('headquarter').related_model
+    old_headquarter_id = getattr(instance, '_old_headquarter_id', None)
+    if not created and old_headquarter_id == instance.headquarter_id:
+        return
+    delta_members = int(instance.user.membership_fee)
+    if not created and old_headquarter_id is not None:
+        change_unit_counters(
+            unit_model, [old_headquarter_id],
+            participants_number=-1, members_number=-delta_members
+        )
+    change_unit_counters(
+        unit_model, [instance.headquarter_id],
+        participants_number=1, members_number=delta_members
+    )
+
+
+@receiver(post_delete, sender=UserDistrictHeadquarterPosition)
+@receiver(post_delete, sender=UserRegionalHeadquarterPosition)
+@receiver(post_delete, sender=UserLocalHeadquarterPosition)
+@receiver(post_delete, sender=UserEducationalHeadquarterPosition)
+@receiver(post_delete, sender=UserDetachmentPosition)
+def count_deleted_member(sender, instance, **kwargs):
+    """
+    Функция для обновления счетчиков участников штаба/отряда
+    при исключении пользователя.
+    """
+
+    if in_bulk_members_change():
+        return
+    unit_model = instance._meta.get_field('headquarter').related_model
+    membership_fee = RSOUser.objects.filter(
+        id=instance.user_id
+    ).values_list('membership_fee', flat=True).first()
+    change_unit_counters(
+        unit_model, [instance.headquarter_id],
+        participants_number=-1, members_number=-int(bool(membership_fee))
+    )
+
+
+@receiver(post_save, sender=CentralHeadquarter)
+def count_central_headquarter_users(sender, instance, created=False,
+                                    **kwargs):
+    """
+    Функция для заполнения счетчиков созданного центрального штаба,
+    в который входят все зарегистрированные пользователи.
+    """
+
+    if created:
+        instance.participants_number = RSOUser.objects.count()
+        instance.members_number = RSOUser.objects.filter(
+            membership_fee=True
+        ).count()
+        sender.objects.filter(id=instance.id).update(
+            participants_number=instance.participants_number,
+            members_number=instance.members_number
+        )
+
+
+@receiver(pre_save, sender=RSOUser)
+def remember_membership_fee(sender, instance, **kwargs):
+    """
+    Функция для сохранения статуса оплаты членского взноса до обновления.
+    """
+
+    instance._old_membership_fee = sender.objects.filter(
+        pk=instance.pk
+    ).values_list('membership_fee', flat=True).first() if instance.pk else None
+
+
+@receiver(post_save, sender=RSOUser)
+def count_saved_user(sender, instance, created=False, **kwargs):
+    """
+    Функция для обновления счетчиков при регистрации пользователя
+    и изменении статуса оплаты членского взноса.
+    """
+
+    if created:
+        change_unit_counters(
+            CentralHeadquarter, None,
+            participants_number=1,
+            members_number=int(instance.membership_fee)
+        )
+        return
+    old_membership_fee = getattr(instance, '_old_membership_fee', None)
+    if (
+        old_membership_fee is not None
+        and old_membership_fee != instance.membership_fee
+    ):
+        change_user_units_members(
+            instance.id, 1 if instance.membership_fee else -1
+        )
+
+
+@receiver(post_delete, sender=RSOUser)
+def count_deleted_user(sender, instance, **kwargs):
+    """
+    Функция для обновления счетчиков центрального штаба
+    при удалении пользователя.
+    """
+
+    change_unit_counters(
+        CentralHeadquarter, None,
+        participants_number=-1,
+        members_number=-int(instance.membership_fee)
+    )
+
+
+@receiver(pre_save, sender=Event)
+def remember_event_organizers(sender, instance, **kwargs):
+    """
+    Функция для сохранения штаба/отряда-организатора мероприятия
+    до обновления.
+    """
+
+    instance._old_organizers = sender.objects.filter(
+        pk=instance.pk
+    ).values(*_organizer_attnames()).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Event)
+def count_created_event(sender, instance, created=False, **kwargs):
+    """
+    Функция для обновления счетчика мероприятий штаба/отряда-организатора
+    при создании мероприятия и смене организатора.
+    """
+
+    if created:
+        _change_organizer_events(instance, 1)
+        return
+    old_organizers = getattr(instance, '_old_organizers', None)
+    if old_organizers is None:
+        return
+    for unit_model, attname in zip(
+        UNIT_POSITION_MODELS, _organizer_attnames()
+    ):
+        old_unit_id = old_organizers[attname]
+        unit_id = getattr(instance, attname)
+        if old_unit_id == unit_id:
+            continue
+        if old_unit_id is not None:
+            change_unit_counters(
+                unit_model, [old_unit_id], events_number=-1
+            )
+        if unit_id is not None:
+            change_unit_counters(unit_model, [unit_id], events_number=1)
+
+
+@receiver(post_delete, sender=Event)
+def count_deleted_event(sender, instance, **kwargs):
+    """
+    Функция для обновления счетчика мероприятий при удалении мероприятия.
+    """
+
+    _change_organizer_events(instance, -1)
+
+
+def _organizer_attnames():
+    return [
+        unit_model._meta.get_field('events').field.attname
+        for unit_model in UNIT_POSITION_MODELS
+    ]
+
+
+def _change_organizer_events(event, delta):
+    for unit_model, attname in zip(
+        UNIT_POSITION_MODELS, _organizer_attnames()
+    ):
+        unit_id = getattr(event, attname)
+        if unit_id is not None:
+            change_unit_counters(
+                unit_model, [unit_id], events_number=delta
+            )
+
+
+@receiver(post_save, sender=CentralHeadquarter)
+@receiver(post_save, sender=DistrictHeadquarter)
+@receiver(post_save, sender=RegionalHeadquarter)
+@receiver(post_save, sender=LocalHeadquarter)
+@receiver(post_save, sender=EducationalHeadquarter)
+@receiver(post_save, sender=Detachment)
+def update_unit_hierarchy(sender, instance, created=False, **kwargs):
+    """
+    Функция для обновления иерархии при создании структурной единицы,
+    смене вышестоящих штабов или командира.
+    """
+
+    old_fields = getattr(instance, '_old_unit_fields', None)
+    if created or old_fields is None:
+        refresh_unit_hierarchy(instance)
+        return
+    if any(
+        old_fields[f'{field}_id'] != getattr(instance, f'{field}_id')
+        for field in UNIT_PARENT_FIELDS[sender._meta.model_name]
+    ):
+        refresh_unit_hierarchy(instance, old_fields['commander_id'])
+    elif old_fields['commander_id'] != instance.commander_id:
+        refresh_users_hierarchy(
+            [old_fields['commander_id'], instance.commander_id]
+        )
+
+
+@receiver(post_delete, sender=CentralHeadquarter)
+@receiver(post_delete, sender=DistrictHeadquarter)
+@receiver(post_delete, sender=RegionalHeadquarter)
+@receiver(post_delete, sender=LocalHeadquarter)
+@receiver(post_delete, sender=EducationalHeadquarter)
+@receiver(post_delete, sender=Detachment)
+def delete_unit_hierarchy(sender, instance, **kwargs):
+    """
+    Функция для удаления структурной единицы из иерархии.
+    """
+
+    delete_hierarchy_node(sender._meta.model_name, instance.id)
+    refresh_users_hierarchy([instance.commander_id])
+
+
+@receiver(post_save, sender=UserCentralHeadquarterPosition)
+@receiver(post_save, sender=UserDistrictHeadquarterPosition)
+@receiver(post_save, sender=UserRegionalHeadquarterPosition)
+@receiver(post_save, sender=UserLocalHeadquarterPosition)
+@receiver(post_save, sender=UserEducationalHeadquarterPosition)
+@receiver(post_save, sender=UserDetachmentPosition)
+def update_member_hierarchy(sender, instance, created=False, **kwargs):
+    """
+    Функция для обновления иерархии при вступлении пользователя
+    в структурную единицу или переводе в другую.
+    """
+
+    if created:
+        add_user_to_unit_hierarchy(instance.user_id, instance.headquarter)
+    elif getattr(
+        instance, '_old_headquarter_id', instance.headquarter_id
+    ) != instance.headquarter_id:
+        refresh_users_hierarchy([instance.user_id])
+
+
+@receiver(post_delete, sender=UserCentralHeadquarterPosition)
+@receiver(post_delete, sender=UserDistrictHeadquarterPosition)
+@receiver(post_delete, sender=UserRegionalHeadquarterPosition)
+@receiver(post_delete, sender=UserLocalHeadquarterPosition)
+@receiver(post_delete, sender=UserEducationalHeadquarterPosition)
+@receiver(post_delete, sender=UserDetachmentPosition)
+def delete_member_hierarchy(sender, instance, **kwargs):
+    """
+    Функция для обновления иерархии при исключении пользователя
+    из структурной единицы.
+    """
+
+    if in_bulk_members_change():
+        return
+    refresh_users_hierarchy([instance.user_id])
+
+
+@receiver(post_delete, sender=RSOUser)
+def delete_user_hierarchy(sender, instance, **kwargs):
+    """
+    Функция для удаления пользователя из иерархии.
+    """
+
+    delete_hierarchy_node(UnitHierarchy.USER_TYPE, instance.id)
@@ -2,6 +2,9 @@ import os
 import shutil
 from datetime import datetime as dt
 
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
 from users.models import UserVerificationRequest
 
 
@@ -82,3 +85,45 @@ def get_regional_hq_members_to_verify(regional_headquarter):
     return UserVerificationRequest.objects.filter(
             user__region=regional_headquarter.region,
         ).select_related('user')
+
+
+def _related_count_subquery(unit_model, related_name, **filters):
+    """Подзапрос количества связанных объектов структурной единицы."""
+    relation = unit_model._meta.get_field(related_name)
+    field_name = relation.field.name
+    return Coalesce(
+        Subquery(
+            relation.related_model.objects.filter(
+                **{field_name: OuterRef('pk')}, **filters
+            ).order_by().values(field_name).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        0
+    )
+
+
+def get_unit_counts_subqueries(unit_model) -> dict:
+    """Подзапросы количества членов, участников и мероприятий штаба/отряда.
+
+    Используются для заполнения и сверки счетчиков структурных единиц.
+    :param unit_model: Модель - наследник Unit.
+    """
+
+    return {
+        'members_count': _related_count_subquery(
+            unit_model, 'members', user__membership_fee=True
+        ),
+        'participants_count': _related_count_subquery(unit_model, 'members'),
+        'events_count': _related_count_subquery(unit_model, 'events'),
+    }
+
+
+def annotate_unit_counts(queryset):
+    """Добавляет к штабам/отрядам количество членов, участников и мероприятий,
+    посчитанное подзапросами по БД.
+
+    :param queryset: QuerySet одной из моделей - наследников Unit.
+    """
+
+    return queryset.annotate(**get_unit_counts_subqueries(queryset.model))
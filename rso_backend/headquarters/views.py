@@ -37,7 +37,7 @@ from headquarters.models import (CentralHeadquarter, Detachment,
                                  UserLocalHeadquarterPosition,
                                  UserRegionalHeadquarterPosition)
 from headquarters.registry_serializers import (
-    DetachmentRegistrySerializer, DistrictHeadquarterRegistrySerializer,
+    BaseRegistrySerializer, DetachmentRegistrySerializer, DistrictHeadquarterRegistrySerializer,
     EducationalHeadquarterRegistrySerializer,
     LocalHeadquarterRegistrySerializer, RegionalHeadquarterRegistrySerializer)
 from headquarters.serializers import (
@@ -78,6 +78,18 @@ class PositionViewSet(ListRetrieveViewSet):
         return super().list(request, *args, **kwargs)
 
 
+class RegistryViewSetMixin:
+    """Добавляет к списку штабов для реестра количество входящих
+    структурных единиц (см. BaseRegistrySerializer.annotate_queryset)."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, BaseRegistrySerializer):
+            return serializer_class.annotate_queryset(queryset)
+        return queryset
+
+
 class CentralViewSet(ListRetrieveUpdateViewSet):
     """Представляет центральные штабы.
 
@@ -104,7 +116,7 @@ class CentralViewSet(ListRetrieveUpdateViewSet):
         return [permission() for permission in permission_classes]
 
 
-class DistrictViewSet(viewsets.ModelViewSet):
+class DistrictViewSet(RegistryViewSetMixin, viewsets.ModelViewSet):
     """Представляет окружные штабы.
 
     Привязывается к центральному штабу по ключу central_headquarter.
@@ -147,7 +159,7 @@ class DistrictViewSet(viewsets.ModelViewSet):
         return super().retrieve(request, *args, **kwargs)
 
 
-class RegionalViewSet(viewsets.ModelViewSet):
+class RegionalViewSet(RegistryViewSetMixin, viewsets.ModelViewSet):
     """Представляет региональные штабы.
 
     Привязывается к окружному штабу по ключу district_headquarter (id).
@@ -178,6 +190,12 @@ class RegionalViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            return queryset.select_related('region')
+        return queryset
+
     def get_serializer_class(self):
         if (
                 self.request.query_params.get('registry') == 'true' and
@@ -213,7 +231,7 @@ class RegionalViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class LocalViewSet(viewsets.ModelViewSet):
+class LocalViewSet(RegistryViewSetMixin, viewsets.ModelViewSet):
     """Представляет местные штабы.
 
     Привязывается к региональному штабу по ключу regional_headquarter (id).
@@ -257,7 +275,7 @@ class LocalViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
-class EducationalViewSet(viewsets.ModelViewSet):
+class EducationalViewSet(RegistryViewSetMixin, viewsets.ModelViewSet):
     """Представляет образовательные штабы.
 
     Может привязываться к местному штабу по ключу local_headquarter (id).
@@ -288,6 +306,12 @@ class EducationalViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            return queryset.select_related('educational_institution__region')
+        return queryset
+
     def get_serializer_class(self):
         if (
                 self.request.query_params.get('registry') == 'true' and
@@ -306,7 +330,7 @@ class EducationalViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
-class DetachmentViewSet(viewsets.ModelViewSet):
+class DetachmentViewSet(RegistryViewSetMixin, viewsets.ModelViewSet):
     """Представляет информацию об отряде.
 
     Может привязываться к местному штабу по ключу local_headquarter (id).
@@ -342,6 +366,14 @@ class DetachmentViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            return queryset.select_related(
+                'educational_institution__region', 'area', 'region'
+            )
+        return queryset
+
     def get_serializer_class(self):
         if (
                 self.request.query_params.get('registry') == 'true' and
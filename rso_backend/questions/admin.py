@@ -1,6 +1,8 @@
 from django.utils.safestring import mark_safe
 from django.contrib import admin
-from questions.models import Question, AnswerOption, Attempt, UserAnswer
+from questions.models import (
+    Question, AnswerOption, Attempt, BestAttempt, UserAnswer
+)
 
 
 class AnswerOptionInline(admin.TabularInline):
@@ -51,6 +53,20 @@ class AttemptAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(BestAttempt)
+class BestAttemptAdmin(admin.ModelAdmin):
+    list_display = ('user', 'category', 'score', 'updated_at')
+    search_fields = ('user__username', 'user__first_name', 'user__last_name')
+    list_filter = ('category',)
+    readonly_fields = ('user', 'category', 'score', 'updated_at')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(UserAnswer)
 class UserAnswerAdmin(admin.ModelAdmin):
     list_display = ('attempt', 'question', 'answer_option')
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from questions.utils import refresh_best_attempts
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет таблицу лучших результатов тестов по истории попыток.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            type=int,
+            dest='user_ids',
+            help='id пользователя, можно указать несколько раз. '
+                 'По умолчанию пересчитываются все пользователи.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки для записи в БД.'
+        )
+
+    def handle(self, *args, **options):
+        count = refresh_best_attempts(
+            user_ids=options['user_ids'],
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Записано лучших результатов: {count}')
+        )
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('questions', '0003_alter_answeroption_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BestAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('university', 'Тест по обучению (корпоративный университет)'), ('safety', 'Тест по безопасности и охране труда')], max_length=20, verbose_name='Категория попытки')),
+                ('score', models.PositiveSmallIntegerField(default=0, verbose_name='Лучший результат')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_attempts', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Лучший результат пользователя',
+                'verbose_name_plural': 'Лучшие результаты пользователей',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='bestattempt',
+            constraint=models.UniqueConstraint(fields=('user', 'category'), name='unique_best_attempt'),
+        ),
+    ]
@@ -84,6 +84,46 @@ class Attempt(models.Model):
         verbose_name_plural = 'Попытки пользователей'
 
 
+class BestAttempt(models.Model):
+    """
+    Лучший результат пользователя по категории тестов.
+
+    Обновляется при отправке ответов (submit_answers), чтобы потребители
+    результатов читали одну строку вместо Max(score) по всем попыткам.
+    """
+    user = models.ForeignKey(
+        'users.RSOUser',
+        on_delete=models.CASCADE,
+        related_name='best_attempts',
+        verbose_name='Пользователь'
+    )
+    category = models.CharField(
+        max_length=20,
+        choices=Attempt.Category.choices,
+        verbose_name='Категория попытки'
+    )
+    score = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Лучший результат'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name='Дата обновления'
+    )
+
+    def __str__(self):
+        return f'id {self.user_id} {self.category}: {self.score}'
+
+    class Meta:
+        verbose_name = 'Лучший результат пользователя'
+        verbose_name_plural = 'Лучшие результаты пользователей'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'category'),
+                name='unique_best_attempt'
+            )
+        ]
+
+
 class UserAnswer(models.Model):
     attempt = models.ForeignKey(
         Attempt,
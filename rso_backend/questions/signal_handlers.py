@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from questions.models import AnswerOption, Attempt, Question
+from questions.utils import invalidate_questions_cache, refresh_best_attempts
+
+
+@receiver(post_delete, sender=Attempt)
+def refresh_best_attempt(sender, instance, **kwargs):
+    """
+    Пересчитывает лучший результат после удаления попытки.
+
+    Пересчет откладывается до коммита: при каскадном удалении
+    пользователя его попытки удаляются раньше самого пользователя.
+    """
+    user_id = instance.user_id
+    transaction.on_commit(lambda: refresh_best_attempts(user_ids=[user_id]))
+
+
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=AnswerOption)
+def reset_questions_cache(sender, instance, **kwargs):
+    """Сбрасывает кеш вопросов после коммита изменений."""
+    question_id = (
+        instance.question_id if sender is AnswerOption else instance.id
+    )
+    transaction.on_commit(lambda: invalidate_questions_cache([question_id]))
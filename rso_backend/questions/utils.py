@@ -0,0 +1,186 @@
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from questions.models import Attempt, BestAttempt, Question
+from questions.serializers import QuestionSerializer
+
+BLOCK_QUESTION_IDS_CACHE_KEY = 'questions:block:{block}:ids'
+QUESTION_CACHE_KEY = 'questions:question:{question_id}'
+
+
+def update_best_attempt(attempt: Attempt):
+    """
+    Обновляет лучший результат пользователя по категории попытки.
+
+    Строка блокируется на время сравнения, чтобы параллельная отправка
+    ответов не перезаписала больший результат меньшим.
+    """
+    with transaction.atomic():
+        best_attempt, created = (
+            BestAttempt.objects.select_for_update().get_or_create(
+                user_id=attempt.user_id,
+                category=attempt.category,
+                defaults={'score': attempt.score}
+            )
+        )
+        if not created and attempt.score > best_attempt.score:
+            best_attempt.score = attempt.score
+            best_attempt.save(update_fields=('score', 'updated_at'))
+
+
+def refresh_best_attempts(user_ids=None, batch_size=1000) -> int:
+    """
+    Пересчитывает лучшие результаты по истории попыток.
+
+    :param user_ids: id пользователей (список или подзапрос),
+                     если None - пересчитываются все пользователи
+    :param batch_size: размер пачки для bulk_create
+    :return: количество записанных строк
+    """
+    attempts = Attempt.objects.all()
+    best_attempts = BestAttempt.objects.all()
+    if user_ids is not None:
+        attempts = attempts.filter(user_id__in=user_ids)
+        best_attempts = best_attempts.filter(user_id__in=user_ids)
+    entries = [
+        BestAttempt(user_id=user_id, category=category, score=max_score)
+        for user_id, category, max_score in attempts.order_by().values(
+            'user_id', 'category'
+        ).annotate(
+            max_score=Max('score')
+        ).values_list('user_id', 'category', 'max_score')
+    ]
+    actual = {(entry.user_id, entry.category) for entry in entries}
+    with transaction.atomic():
+        # Удаляем результаты по категориям, в которых не осталось попыток.
+        stale = best_attempts.values_list('id', 'user_id', 'category')
+        best_attempts.filter(id__in=[
+            best_attempt_id
+            for best_attempt_id, user_id, category in stale
+            if (user_id, category) not in actual
+        ]).delete()
+        BestAttempt.objects.bulk_create(
+            entries,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=('user', 'category'),
+            update_fields=('score', 'updated_at')
+        )
+    return len(entries)
+
+
+def get_best_scores(user_ids, category: str = None) -> dict:
+    """
+    Лучшие результаты тестов пользователей.
+
+    :param user_ids: id пользователей (список или подзапрос)
+    :param category: категория попытки, если None - все категории
+    :return: словарь {(user_id, category): score}
+    """
+    best_attempts = BestAttempt.objects.filter(user_id__in=user_ids)
+    if category is not None:
+        best_attempts = best_attempts.filter(category=category)
+    return {
+        (user_id, category): score
+        for user_id, category, score in best_attempts.values_list(
+            'user_id', 'category', 'score'
+        )
+    }
+
+
+def get_block_question_ids(block) -> list[int]:
+    """
+    Id вопросов блока.
+
+    Список кешируется и сбрасывается при изменении вопросов
+    (invalidate_questions_cache).
+    """
+    cache_key = BLOCK_QUESTION_IDS_CACHE_KEY.format(block=block)
+    question_ids = cache.get(cache_key)
+    if question_ids is None:
+        question_ids = list(
+            Question.objects.filter(block=block).values_list('id', flat=True)
+        )
+        cache.set(cache_key, question_ids, settings.QUESTIONS_CACHE_TTL)
+    return question_ids
+
+
+def get_questions_data(question_ids) -> list[dict]:
+    """
+    Сериализованные вопросы с вариантами ответов.
+
+    Данные вопросов кешируются по отдельности, отсутствующие в кеше
+    вопросы загружаются одним запросом с prefetch вариантов ответа.
+
+    :param question_ids: id вопросов
+    :return: данные вопросов в порядке question_ids
+    """
+    cache_keys = {
+        question_id: QUESTION_CACHE_KEY.format(question_id=question_id)
+        for question_id in question_ids
+    }
+    cached = cache.get_many(cache_keys.values())
+    questions_data = {
+        question_id: cached[cache_key]
+        for question_id, cache_key in cache_keys.items()
+        if cache_key in cached
+    }
+    missing_ids = [
+        question_id for question_id in question_ids
+        if question_id not in questions_data
+    ]
+    if missing_ids:
+        questions = Question.objects.filter(
+            id__in=missing_ids
+        ).prefetch_related('answer_options')
+        loaded = {
+            question_data['id']: question_data
+            for question_data in QuestionSerializer(questions, many=True).data
+        }
+        cache.set_many(
+            {
+                cache_keys[question_id]: question_data
+                for question_id, question_data in loaded.items()
+            },
+            settings.QUESTIONS_CACHE_TTL
+        )
+        questions_data.update(loaded)
+    return [
+        questions_data[question_id] for question_id in question_ids
+        if question_id in questions_data
+    ]
+
+
+def sample_block_questions(block, count: int) -> list[dict]:
+    """
+    Случайные вопросы блока без сортировки всего блока в БД.
+
+    :param block: номер блока вопросов
+    :param count: количество вопросов, не больше размера блока
+    :return: сериализованные вопросы
+    """
+    question_ids = get_block_question_ids(block)
+    return get_questions_data(
+        random.sample(question_ids, min(count, len(question_ids)))
+    )
+
+
+def invalidate_questions_cache(question_ids=()):
+    """
+    Сбрасывает кеш списков вопросов по блокам и данных вопросов.
+
+    :param question_ids: id вопросов, данные которых изменились
+    """
+    cache.delete_many(
+        [
+            BLOCK_QUESTION_IDS_CACHE_KEY.format(block=block)
+            for block in Question.Block.values
+        ] + [
+            QUESTION_CACHE_KEY.format(question_id=question_id)
+            for question_id in question_ids
+        ]
+    )
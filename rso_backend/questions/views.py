@@ -2,16 +2,16 @@ from django.http import Http404
 from django.utils import timezone
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from datetime import datetime
+from datetime import date, datetime
 from django.db import transaction
-from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework import permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from questions.models import Question, Attempt, UserAnswer
+from questions.models import AnswerOption, Attempt, UserAnswer
 from questions.serializers import QuestionSerializer
+from questions.utils import sample_block_questions, update_best_attempt
 import random
 
 from questions.swagger_schemas import answers_request_body
@@ -78,8 +78,8 @@ class QuestionsView(APIView):
         category = request.query_params.get('category', None)
 
         current_date = datetime.now().date()
-        university_deadline = datetime(2024, 4, 10)
-        safety_deadline = datetime(2024, 6, 15)
+        university_deadline = date(2024, 4, 10)
+        safety_deadline = date(2024, 6, 15)
 
         attempts_count = Attempt.objects.filter(
             user=user, category=category
@@ -90,18 +90,22 @@ class QuestionsView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if category == 'university' and current_date > university_deadline:
-            return Response(
-                {"error": "Срок получения вопросов по "
-                          "категории 'university' истек."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        elif category == 'safety' and current_date > safety_deadline:
-            return Response(
-                {"error": "Срок получения вопросов по "
-                          "категории 'safety' истек."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        if category == 'university':
+            if current_date > university_deadline:
+                return Response(
+                    {"error": "Срок получения вопросов по "
+                              "категории 'university' истек."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            questions = self.get_university_questions_mix()
+        elif category == 'safety':
+            if current_date > safety_deadline:
+                return Response(
+                    {"error": "Срок получения вопросов по "
+                              "категории 'safety' истек."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            questions = self.get_block_questions(5, 15)
         else:
             return Response(
                 {
@@ -112,11 +116,9 @@ class QuestionsView(APIView):
             )
 
         attempt = Attempt.objects.create(user=user, category=category)
-        attempt.questions.set(questions)
-        attempt.save()
+        attempt.questions.set([question['id'] for question in questions])
 
-        serializer = QuestionSerializer(questions, many=True)
-        return Response(serializer.data)
+        return Response(questions)
 
     def get_university_questions_mix(self):
         questions_mix = []
@@ -128,9 +130,7 @@ class QuestionsView(APIView):
         return questions_mix
 
     def get_block_questions(self, block_number, count):
-        questions = Question.objects.filter(block=block_number).order_by('?')[
-                    :count]
-        return list(questions)
+        return sample_block_questions(block_number, count)
 
 
 @swagger_auto_schema(
@@ -206,6 +206,7 @@ def submit_answers(request):
     - Для каждой попытки допускается отправка ответов только один раз.
     Все вопросы в отправленных ответах должны соответствовать вопросам
     последней активной попытки пользователя.
+    - На каждый вопрос допускается только один ответ.
 
     Баллы:
     - За каждый правильный ответ начисляется фиксированное количество баллов.
@@ -229,46 +230,70 @@ def submit_answers(request):
             {'error': 'Сначала нужны получить вопросы.'}, status=400
         )
 
-    score = 0
     scores_per_answer = 6.66 if latest_attempt.category == 'safety' else 5
 
-    with transaction.atomic():
-        # Проверяем, есть ли уже ответы для этой попытки
-        if UserAnswer.objects.filter(attempt=latest_attempt).exists():
+    # Варианты ответов на вопросы попытки загружаем одним запросом,
+    # весь список ответов проверяем в памяти.
+    question_ids = set(
+        latest_attempt.questions.values_list('id', flat=True)
+    )
+    answer_options = {
+        answer_option.id: answer_option
+        for answer_option in AnswerOption.objects.filter(
+            question_id__in=question_ids
+        ).only('id', 'question_id', 'is_correct')
+    }
+
+    score = 0
+    user_answers = []
+    answered_question_ids = set()
+    for answer in answers_data:
+        try:
+            question_id = int(answer.get('question_id'))
+            answer_option_id = int(answer.get('answer_option_id'))
+        except (TypeError, ValueError):
             return Response(
-                {'error': 'Ответы по попытке уже были приняты.'},
+                {'error': 'Неверный формат ответа.'}, status=400
+            )
+
+        # Проверяем, принадлежит ли вопрос к последней попытке
+        if question_id not in question_ids:
+            return Response(
+                {'error': 'Вопрос не относится '
+                          'к последней попытке.'},
                 status=400
             )
+        if question_id in answered_question_ids:
+            return Response(
+                {'error': 'На вопрос можно ответить только один раз.'},
+                status=400
+            )
+        answered_question_ids.add(question_id)
 
-        for answer in answers_data:
-            question_id = answer.get('question_id')
-            answer_option_id = answer.get('answer_option_id')
+        answer_option = answer_options.get(answer_option_id)
+        if answer_option is None or answer_option.question_id != question_id:
+            raise Http404('Вариант ответа не найден.')
 
-            # Проверяем, принадлежит ли вопрос к последней попытке
-            if not Question.objects.filter(
-                    id=question_id, attempt=latest_attempt
-            ).exists():
-                return Response(
-                    {'error': 'Вопрос не относится '
-                                'к последней попытке.'},
-                    status=400
-                )
+        user_answers.append(UserAnswer(
+            attempt=latest_attempt,
+            question_id=question_id,
+            answer_option=answer_option
+        ))
+        if answer_option.is_correct:
+            score += scores_per_answer
 
-            question = get_object_or_404(Question, id=question_id)
-            answer_option = get_object_or_404(
-                question.answer_options, id=answer_option_id
-            )
-
-            UserAnswer.objects.create(
-                attempt=latest_attempt,
-                question=question,
-                answer_option=answer_option
+    with transaction.atomic():
+        # Проверяем, есть ли уже ответы для этой попытки
+        if UserAnswer.objects.filter(attempt=latest_attempt).exists():
+            return Response(
+                {'error': 'Ответы по попытке уже были приняты.'},
+                status=400
             )
-            if answer_option.is_correct:
-                score += scores_per_answer
+        UserAnswer.objects.bulk_create(user_answers)
 
-    latest_attempt.score = round(score)
-    latest_attempt.save()
+        latest_attempt.score = round(score)
+        latest_attempt.save(update_fields=('score',))
+        update_best_attempt(latest_attempt)
 
     return Response(
         {
@@ -26,6 +26,10 @@ DISTRCICTHQ_MEMBERS_CACHE_TTL = 40
 CENTRALHQ_MEMBERS_CACHE_TTL = 180
 EVENTS_CACHE_TTL = 45
 EDU_INST_CACHE_TTL = 180
+QUESTIONS_CACHE_TTL = 60 * 60
+USER_ROLES_CACHE_TTL = 60 * 60
+COMPETITION_PLACES_CACHE_TTL = 60 * 60
+COMPETITION_PAIRING_CACHE_TTL = 60 * 60
 
 
 MIN_FOUNDING_DATE = 1000
@@ -78,6 +82,9 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 EMAIL_ADMIN = EMAIL_HOST_USER
 
 COMPETITION_ID = 1
+# Через сколько секунд после последнего изменения отчетов
+# пересчитывается рейтинг показателя.
+RANKINGS_RECALCULATION_DELAY = 60
 
 INSTALLED_APPS = [
     'dal',
@@ -188,6 +195,24 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Архивы справок о членстве. Справки содержат персональные данные,
+# поэтому хранятся вне MEDIA_ROOT и отдаются только выдавшему их.
+MEMBER_CERTS_ROOT = os.path.join(BASE_DIR, 'member_certs')
+MEMBER_CERTS_ARCHIVE_TTL = 60 * 60 * 24
+
+# Загруженные файлы пакетного импорта пользователей. Содержат пароли,
+# поэтому хранятся вне MEDIA_ROOT и не отдаются веб-сервером.
+MEMBER_IMPORTS_ROOT = os.path.join(BASE_DIR, 'member_imports')
+
+# Отдача файлов веб-сервером: 'x-accel' (nginx X-Accel-Redirect),
+# 'x-sendfile' (X-Sendfile) или пустая строка - файлы отдает Django.
+FILE_DELIVERY_BACKEND = os.getenv('FILE_DELIVERY_BACKEND', '')
+# Каталоги с файлами для скачивания и внутренние location nginx для них.
+PROTECTED_FILES_LOCATIONS = {
+    os.path.join(BASE_DIR, 'templates'): '/protected/templates/',
+    MEMBER_CERTS_ROOT: '/protected/member_certs/',
+}
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -319,45 +344,9 @@ CELERY_BEAT_SCHEDULE = {
             month_of_year=10,
         )
     },
-    'calculate_q18': {
-        'task': 'competitions.tasks.calculate_q18_places_task',
-        'schedule': timedelta(hours=24)
-    },
-    'calculate_q1': {
-        'task': 'competitions.tasks.calculate_q1_places_task',
-        'schedule': timedelta(hours=24)
-    },
-    'calculate_q3_q4': {
-        'task': 'competitions.tasks.calculate_q3_q4_places_task',
-        'schedule': timedelta(minutes=10)
-    },
-    'calculate_q5': {
-        'task': 'competitions.tasks.calculate_q5_places_task',
-        'schedule': timedelta(seconds=25)
-    },
-    'calculate_q7': {
-        'task': 'competitions.tasks.calculate_q7_places_task',
-        'schedule': timedelta(hours=24)
-    },
-    'calculate_q8': {
-        'task': 'competitions.tasks.calculate_q7_places_task',
-        'schedule': timedelta(hours=24)
-    },
-    'calculate_q9': {
-        'task': 'competitions.tasks.calculate_q9_places_task',
-        'schedule': timedelta(hours=24)
-    },
-    'calculate_q10': {
-        'task': 'competitions.tasks.calculate_q10_places_task',
-        'schedule': timedelta(hours=24)
-    },
-    'calculate_q11': {
-        'task': 'competitions.tasks.calculate_q11_places_task',
-        'schedule': timedelta(hours=24)
-    },
-    'calculate_q12': {
-        'task': 'competitions.tasks.calculate_q12_places_task',
-        'schedule': timedelta(hours=24)
+    'calculate_dirty_rankings': {
+        'task': 'competitions.tasks.calculate_dirty_rankings_task',
+        'schedule': timedelta(seconds=30)
     },
     'calculate_q1_score': {
         'task': 'competitions.tasks.calculate_q1_score_task',
@@ -367,9 +356,9 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'competitions.tasks.calculate_q19',
         'schedule': timedelta(hours=30)
     },
-    'calculate_q20_': {
-        'task': 'competitions.tasks.calculate_q20_places_task',
-        'schedule': timedelta(hours=24)
+    'delete_expired_member_certs': {
+        'task': 'api.tasks.delete_expired_member_certs',
+        'schedule': timedelta(hours=1)
     },
 }
 
@@ -2,6 +2,7 @@ import datetime
 
 import pytest
 from django.conf import settings
+from django.core.cache import cache
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
@@ -54,6 +55,17 @@ pytest_plugins = [
 ]
 
 
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    """Кеш в памяти процесса вместо Redis, очищается перед каждым тестом."""
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    cache.clear()
+
+
 @pytest.fixture
 def client():
     """Неавторизованный клиент."""
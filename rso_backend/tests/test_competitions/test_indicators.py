@@ -0,0 +1,82 @@
+from http import HTTPStatus
+
+import pytest
+
+from competitions.indicators import (
+    get_indicator_place, invalidate_competition_places
+)
+from competitions.models import Q2Ranking, Q3Ranking
+from competitions.tasks import calculate_dirty_rankings_task
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestIndicatorPlace:
+    competition_url = '/api/v1/competitions/'
+
+    def test_start_and_tandem_places(
+        self, q7_tandem_ranking, q7_ranking, competition, junior_detachment,
+        junior_detachment_3, django_assert_num_queries
+    ):
+        """Отчет и места старт и тандем - одним запросом."""
+        with django_assert_num_queries(1):
+            start = get_indicator_place(
+                7, competition.id, junior_detachment_3.id
+            )
+        assert (start.is_participant, start.is_tandem) == (True, False)
+        assert (start.has_report, start.place) == (True, 2)
+        tandem = get_indicator_place(7, competition.id, junior_detachment.id)
+        assert (tandem.is_tandem, tandem.place) == (True, 1)
+
+    def test_cached_place(
+        self, q7_ranking, competition, junior_detachment_3,
+        django_assert_num_queries
+    ):
+        get_indicator_place(7, competition.id, junior_detachment_3.id)
+        with django_assert_num_queries(0):
+            place = get_indicator_place(
+                7, competition.id, junior_detachment_3.id
+            )
+        assert place.place == 2
+
+    def test_cache_invalidated_after_ranking(
+        self, settings, participants_competition_start, competition,
+        junior_detachment_3
+    ):
+        """Новое место видно после пересчета рейтингов."""
+        settings.RANKINGS_RECALCULATION_DELAY = 0
+        place = get_indicator_place(2, competition.id, junior_detachment_3.id)
+        assert place.place is None
+        Q2Ranking.objects.create(
+            competition=competition, detachment=junior_detachment_3, place=2
+        )
+        calculate_dirty_rankings_task()
+        place = get_indicator_place(2, competition.id, junior_detachment_3.id)
+        assert place.place == 2
+
+    def test_cache_invalidated_after_report_delete(
+        self, q7_ranking, report_question7_verif2, competition,
+        junior_detachment_3
+    ):
+        get_indicator_place(7, competition.id, junior_detachment_3.id)
+        report_question7_verif2.detachment_report.delete()
+        place = get_indicator_place(7, competition.id, junior_detachment_3.id)
+        assert place.has_report is False
+
+    def test_get_place_q3_start(
+        self, authenticated_client_5, participants_competition_start,
+        competition, junior_detachment_3
+    ):
+        """Место по показателю без отчета для стартового участника."""
+        url = (
+            self.competition_url + str(competition.id)
+            + '/reports/q3/get_place/'
+        )
+        response = authenticated_client_5.get(url)
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        Q3Ranking.objects.create(
+            competition=competition, detachment=junior_detachment_3, place=3
+        )
+        invalidate_competition_places(competition.id)
+        response = authenticated_client_5.get(url)
+        assert response.status_code == HTTPStatus.OK
+        assert response.data['place'] == 3
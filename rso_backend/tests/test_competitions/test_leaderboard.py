@@ -0,0 +1,176 @@
+import pytest
+
+from competitions.leaderboard import rebuild_leaderboard
+from competitions.models import (
+    LeaderboardEntry, Q2Ranking, Q7Ranking, Q7TandemRanking, Q9Ranking,
+    RankingRecalculation
+)
+from competitions import tasks
+from competitions.rankings import pop_dirty_rankings
+from competitions.tasks import calculate_dirty_rankings_task
+
+
+@pytest.fixture
+def rankings(
+    competition, participants_competition_tandem,
+    participants_competition_start, participants_competition_start_2,
+    junior_detachment_2, junior_detachment_3
+):
+    Q7Ranking.objects.create(
+        competition=competition, detachment=junior_detachment_2, place=2
+    )
+    Q7Ranking.objects.create(
+        competition=competition, detachment=junior_detachment_3, place=1
+    )
+    Q9Ranking.objects.create(
+        competition=competition, detachment=junior_detachment_2, place=1
+    )
+    Q9Ranking.objects.create(
+        competition=competition, detachment=junior_detachment_3, place=3
+    )
+    Q7TandemRanking.objects.create(
+        competition=competition,
+        detachment=participants_competition_tandem.detachment,
+        junior_detachment=participants_competition_tandem.junior_detachment,
+        place=1
+    )
+    rebuild_leaderboard(competition.id)
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestLeaderboard:
+    leaderboard_url = '/api/v1/competitions/{}/leaderboard/'
+
+    def test_rebuild_leaderboard(
+        self, rankings, participants_competition_tandem,
+        junior_detachment_2, junior_detachment_3
+    ):
+        """Итоговое место - по сумме мест, тандем - одно место на двоих."""
+        start_2 = LeaderboardEntry.objects.get(detachment=junior_detachment_2)
+        start_3 = LeaderboardEntry.objects.get(detachment=junior_detachment_3)
+        assert (start_2.q7_place, start_2.q9_place) == (2, 1)
+        assert (start_2.total, start_2.place) == (3, 1)
+        assert (start_3.total, start_3.place) == (4, 2)
+        assert start_2.q1_place is None
+        tandem = LeaderboardEntry.objects.filter(is_tandem=True)
+        assert {entry.detachment_id for entry in tandem} == {
+            participants_competition_tandem.detachment_id,
+            participants_competition_tandem.junior_detachment_id,
+        }
+        for entry in tandem:
+            assert (entry.q7_place, entry.total, entry.place) == (1, 1, 1)
+
+    def test_rebuild_leaderboard_replaces_rows(
+        self, rankings, competition, junior_detachment_3
+    ):
+        Q7Ranking.objects.filter(detachment=junior_detachment_3).delete()
+        assert rebuild_leaderboard(competition.id) == 4
+        entry = LeaderboardEntry.objects.get(detachment=junior_detachment_3)
+        # 3 место по Q9 + худшее место по Q7 (2 участника старт + 1)
+        assert (entry.q7_place, entry.total) == (None, 6)
+
+    def test_partial_participant_ranked_below_complete(
+        self, competition, participants_competition_start,
+        participants_competition_start_2, junior_detachment_2,
+        junior_detachment_3
+    ):
+        """Пропущенный показатель не поднимает участника в рейтинге."""
+        Q7Ranking.objects.create(
+            competition=competition, detachment=junior_detachment_2, place=1
+        )
+        Q7Ranking.objects.create(
+            competition=competition, detachment=junior_detachment_3, place=2
+        )
+        Q9Ranking.objects.create(
+            competition=competition, detachment=junior_detachment_3, place=1
+        )
+        rebuild_leaderboard(competition.id)
+        partial = LeaderboardEntry.objects.get(detachment=junior_detachment_2)
+        complete = LeaderboardEntry.objects.get(
+            detachment=junior_detachment_3
+        )
+        assert (complete.total, complete.place) == (3, 1)
+        assert (partial.total, partial.place) == (4, 2)
+
+    def test_leaderboard_list_filters(
+        self, rankings, client, competition, junior_detachment_2,
+        django_assert_num_queries
+    ):
+        url = self.leaderboard_url.format(competition.id)
+        with django_assert_num_queries(2):
+            response = client.get(url, {'is_tandem': False})
+        assert response.status_code == 200
+        assert [
+            entry['place'] for entry in response.data['results']
+        ] == [1, 2]
+        response = client.get(url, {'region': junior_detachment_2.region_id})
+        assert [
+            entry['detachment']['id'] for entry in response.data['results']
+        ] == [junior_detachment_2.id]
+
+    def test_leaderboard_detachment_summary(
+        self, rankings, client, competition, junior_detachment_3,
+        django_assert_num_queries
+    ):
+        url = (
+            self.leaderboard_url.format(competition.id)
+            + f'{junior_detachment_3.id}/'
+        )
+        with django_assert_num_queries(1):
+            response = client.get(url)
+        assert response.status_code == 200
+        assert response.data['q7_place'] == 1
+        assert response.data['q9_place'] == 3
+        assert response.data['place'] == 2
+
+    def test_dirty_rankings_task_rebuilds_leaderboard(
+        self, settings, competition, participants_competition_start,
+        junior_detachment_3
+    ):
+        """Рейтинг, посчитанный во вью, попадает в сводный рейтинг."""
+        settings.RANKINGS_RECALCULATION_DELAY = 0
+        Q2Ranking.objects.create(
+            competition=competition, detachment=junior_detachment_3, place=2
+        )
+        calculate_dirty_rankings_task()
+        entry = LeaderboardEntry.objects.get(detachment=junior_detachment_3)
+        assert (entry.q2_place, entry.place) == (2, 1)
+
+    def test_dirty_rankings_task_failed_calculation(
+        self, settings, monkeypatch, competition,
+        participants_competition_start, junior_detachment_3
+    ):
+        """Ошибка одного показателя не отменяет пересчет остальных."""
+        def fail(competition_id):
+            raise ValueError
+
+        settings.RANKINGS_RECALCULATION_DELAY = 0
+        monkeypatch.setitem(tasks.RANKING_CALCULATIONS, 7, fail)
+        Q2Ranking.objects.create(
+            competition=competition, detachment=junior_detachment_3, place=2
+        )
+        with pytest.raises(ValueError):
+            calculate_dirty_rankings_task()
+        entry = LeaderboardEntry.objects.get(detachment=junior_detachment_3)
+        assert entry.q2_place == 2
+        assert pop_dirty_rankings(0) == [(competition.id, 7)]
+
+    def test_dirty_rankings_task_failed_leaderboard(
+        self, settings, monkeypatch, competition,
+        participants_competition_start, junior_detachment_3
+    ):
+        """Показатели конкурса без сводного рейтинга отмечаются повторно."""
+        def fail(competition_id):
+            raise ValueError
+
+        settings.RANKINGS_RECALCULATION_DELAY = 0
+        monkeypatch.setattr(tasks, 'rebuild_leaderboard', fail)
+        Q2Ranking.objects.create(
+            competition=competition, detachment=junior_detachment_3, place=2
+        )
+        marked = set(RankingRecalculation.objects.values_list(
+            'competition_id', 'indicator'
+        ))
+        with pytest.raises(ValueError):
+            calculate_dirty_rankings_task()
+        assert set(pop_dirty_rankings(0)) == marked
@@ -0,0 +1,80 @@
+import pytest
+
+from api.utils import get_detachment_start, get_detachment_tandem
+from competitions.models import CompetitionParticipants
+from competitions.pairing import get_pairing_index, get_participation
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestPairingIndex:
+
+    def test_roles_and_partners(
+        self, participants_competition_tandem, participants_competition_start,
+        competition, detachment_competition, junior_detachment,
+        junior_detachment_3, junior_detachment_2
+    ):
+        senior = get_participation(competition.id, detachment_competition.id)
+        assert (senior.is_tandem, senior.is_junior) == (True, False)
+        assert senior.partner_id == junior_detachment.id
+        junior = get_participation(competition.id, junior_detachment.id)
+        assert (junior.is_tandem, junior.is_junior) == (True, True)
+        assert junior.partner_id == detachment_competition.id
+        start = get_participation(competition.id, junior_detachment_3.id)
+        assert (start.is_tandem, start.is_junior) == (False, True)
+        assert start.partner_id is None
+        assert get_participation(
+            competition.id, junior_detachment_2.id
+        ) is None
+
+    def test_cached_index(
+        self, participants_competition_tandem, competition,
+        junior_detachment, django_assert_num_queries
+    ):
+        with django_assert_num_queries(1):
+            get_pairing_index(competition.id)
+        with django_assert_num_queries(0):
+            participation = get_participation(
+                competition.id, junior_detachment.id
+            )
+        assert participation.is_tandem is True
+
+    def test_index_invalidated_on_participants_change(
+        self, participants_competition_start, competition,
+        junior_detachment_3, junior_detachment_2
+    ):
+        assert get_participation(
+            competition.id, junior_detachment_2.id
+        ) is None
+        participant = CompetitionParticipants.objects.create(
+            competition=competition, junior_detachment=junior_detachment_2
+        )
+        assert get_participation(
+            competition.id, junior_detachment_2.id
+        ).is_tandem is False
+        participant.delete()
+        assert get_participation(
+            competition.id, junior_detachment_2.id
+        ) is None
+
+    def test_index_scoped_by_competition(
+        self, participants_competition_start, competition, competition_2,
+        junior_detachment_3
+    ):
+        assert get_participation(competition.id, junior_detachment_3.id)
+        assert get_participation(
+            competition_2.id, junior_detachment_3.id
+        ) is None
+
+    def test_detachment_start_and_tandem(
+        self, participants_competition_tandem, participants_competition_start,
+        competition, user_3, user_5, junior_detachment, junior_detachment_3
+    ):
+        """Отряд командира по номинации конкурса."""
+        assert get_detachment_start(user_5, competition.id) == (
+            junior_detachment_3
+        )
+        assert get_detachment_start(user_3, competition.id) is None
+        assert get_detachment_tandem(user_3, competition.id) == (
+            junior_detachment
+        )
+        assert get_detachment_tandem(user_5, competition.id) is None
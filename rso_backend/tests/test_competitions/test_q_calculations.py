@@ -0,0 +1,469 @@
+import pytest
+from django.core.management import call_command
+
+from competitions.models import (
+    Competitions, Q13DetachmentReport, Q13EventOrganization, Q13TandemRanking,
+    Q18DetachmentReport, Q18Ranking, Q18TandemRanking, Q1Report, Q2Ranking,
+    Q2TandemRanking, Q3Ranking, Q4Ranking, Q5DetachmentReport,
+    Q5EducatedParticipant, Q5Ranking, Q5TandemRanking, Q7Ranking, Q7Report,
+    Q7TandemRanking, Q9Ranking, Q9Report, Q9TandemRanking,
+    RankingRecalculation
+)
+from competitions.q_calculations import (
+    calculate_q18_place, calculate_q3_q4_place, calculate_q5_place,
+    rank_participants, score_q1_reports
+)
+from headquarters.models import UserDetachmentPosition
+from questions.models import Attempt
+from questions.utils import update_best_attempt
+from users.models import RSOUser
+from competitions.rankings import (
+    RANKED_INDICATORS, pop_dirty_rankings, save_place, save_places,
+    save_tandem_place
+)
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestRankParticipants:
+    """Тесты пересчета рейтингов Q7 - Q12 и Q20."""
+
+    def test_rank_participants_places(
+        self, competition, participants_competition_tandem,
+        participants_competition_start, participants_competition_start_2,
+        junior_detachment, junior_detachment_2, junior_detachment_3
+    ):
+        """Больше очков - выше место, тандем считается по сумме очков."""
+        Q7Report.objects.create(
+            competition=competition, detachment=junior_detachment, score=10
+        )
+        Q7Report.objects.create(
+            competition=competition, detachment=junior_detachment_2, score=20
+        )
+        Q7Report.objects.create(
+            competition=competition, detachment=junior_detachment_3, score=100
+        )
+        rank_participants(
+            competition.id, Q7Report, Q7Ranking, Q7TandemRanking
+        )
+        assert Q7Ranking.objects.get(detachment=junior_detachment_3).place == 1
+        assert Q7Ranking.objects.get(detachment=junior_detachment_2).place == 2
+        tandem_ranking = Q7TandemRanking.objects.get()
+        assert tandem_ranking.junior_detachment == junior_detachment
+        assert (
+            tandem_ranking.detachment
+            == participants_competition_tandem.detachment
+        )
+        assert tandem_ranking.place == 1
+
+    def test_rank_participants_reverse(
+        self, competition, participants_competition_start,
+        participants_competition_start_2, junior_detachment_2,
+        junior_detachment_3
+    ):
+        """Меньше очков - выше место, отряды без отчета не ранжируются."""
+        Q9Report.objects.create(
+            competition=competition, detachment=junior_detachment_2, score=1
+        )
+        Q9Report.objects.create(
+            competition=competition, detachment=junior_detachment_3, score=2.5
+        )
+        rank_participants(
+            competition.id, Q9Report, Q9Ranking, Q9TandemRanking,
+            reverse=False
+        )
+        assert Q9Ranking.objects.get(detachment=junior_detachment_2).place == 1
+        assert Q9Ranking.objects.get(detachment=junior_detachment_3).place == 2
+        assert not Q9TandemRanking.objects.exists()
+
+    def test_rank_participants_constant_queries(
+        self, competition, participants_competition_tandem,
+        participants_competition_start, participants_competition_start_2,
+        junior_detachment, junior_detachment_2, junior_detachment_3,
+        django_assert_max_num_queries
+    ):
+        """Количество запросов не зависит от количества участников."""
+        for detachment in (
+            junior_detachment, junior_detachment_2, junior_detachment_3
+        ):
+            Q7Report.objects.create(
+                competition=competition, detachment=detachment, score=1
+            )
+        with django_assert_max_num_queries(8):
+            rank_participants(
+                competition.id, Q7Report, Q7Ranking, Q7TandemRanking
+            )
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestQ3Q4Places:
+    """Тесты расчета мест по результатам тестов (3 и 4 показатели)."""
+
+    def test_calculate_q3_q4_place(
+        self, competition, participants_competition_start,
+        junior_detachment_3, user_2, position_commissar,
+        django_assert_max_num_queries
+    ):
+        UserDetachmentPosition.objects.create(
+            user=user_2,
+            headquarter=junior_detachment_3,
+            position=position_commissar
+        )
+        Q5DetachmentReport.objects.create(
+            competition=competition, detachment=junior_detachment_3
+        )
+        commander = junior_detachment_3.commander
+        for user, category, score in (
+            (commander, 'university', 40),
+            (commander, 'university', 100),
+            (commander, 'safety', 100),
+            (user_2, 'university', 90),
+            (user_2, 'safety', 60),
+        ):
+            update_best_attempt(Attempt.objects.create(
+                user=user, category=category, score=score
+            ))
+        with django_assert_max_num_queries(14):
+            calculate_q3_q4_place(competition.id)
+        # (100 + 90) / 2 = 95, (100 + 60) / 2 = 80
+        assert Q3Ranking.objects.get(detachment=junior_detachment_3).place == 2
+        assert Q4Ranking.objects.get(detachment=junior_detachment_3).place == 4
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestQ1Score:
+    """Тесты расчета очков по 1 показателю."""
+
+    def test_score_q1_reports(
+        self, competition, participants_competition_start,
+        participants_competition_start_2, junior_detachment_2,
+        junior_detachment_3, django_assert_max_num_queries
+    ):
+        """10 человек в отряде - балл за каждого уплатившего взнос."""
+        commander = junior_detachment_3.commander
+        commander.membership_fee = True
+        commander.save()
+        for index in range(9):
+            user = RSOUser.objects.create_user(
+                username=f'member{index}',
+                password='password',
+                membership_fee=index < 4
+            )
+            UserDetachmentPosition.objects.create(
+                user=user, headquarter=junior_detachment_3
+            )
+        with django_assert_max_num_queries(8):
+            assert score_q1_reports(competition.id) == 2
+        # 4 члена отряда и командир
+        assert Q1Report.objects.get(detachment=junior_detachment_3).score == 6
+        assert Q1Report.objects.get(detachment=junior_detachment_2).score == 1
+
+    def test_calculate_q1_score_command(
+        self, competition, participants_competition_tandem,
+        detachment_competition, junior_detachment
+    ):
+        call_command('calculate_q1_score', competition=competition.id)
+        assert set(
+            Q1Report.objects.values_list('detachment_id', flat=True)
+        ) == {detachment_competition.id, junior_detachment.id}
+        assert RankingRecalculation.objects.filter(
+            competition=competition, indicator=1
+        ).exists()
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestQ18Places:
+    """Тесты расчета мест по 18 показателю."""
+
+    def test_calculate_q18_place(
+        self, competition, competition_2, participants_competition_tandem,
+        participants_competition_start, participants_competition_start_2,
+        detachment_competition, junior_detachment, junior_detachment_2,
+        junior_detachment_3, django_assert_max_num_queries
+    ):
+        """Места совпадают с прежним расчетом по долям участников."""
+        for detachment, participants_number, members in (
+            (junior_detachment_2, 10, 5),
+            (junior_detachment_3, 9, 3),
+            (junior_detachment, 4, 2),
+            (detachment_competition, 3, 1),
+        ):
+            Q18DetachmentReport.objects.create(
+                competition=competition,
+                detachment=detachment,
+                participants_number=participants_number,
+                june_15_detachment_members=members,
+                is_verified=True
+            )
+        Q18DetachmentReport.objects.create(
+            competition=competition_2,
+            detachment=junior_detachment_2,
+            participants_number=100,
+            is_verified=True
+        )
+        with django_assert_max_num_queries(12):
+            calculate_q18_place(competition.id)
+        # 9 / 3 = 3 больше, чем 10 / 5 = 2
+        assert Q18Ranking.objects.get(
+            detachment=junior_detachment_3
+        ).place == 1
+        assert Q18Ranking.objects.get(
+            detachment=junior_detachment_2
+        ).place == 2
+        tandem_ranking = Q18TandemRanking.objects.get()
+        assert tandem_ranking.junior_detachment == junior_detachment
+        assert tandem_ranking.detachment == detachment_competition
+        assert tandem_ranking.place == 1
+        assert Q18DetachmentReport.objects.get(
+            competition=competition, detachment=junior_detachment
+        ).score == 2
+        assert Q18DetachmentReport.objects.get(
+            competition=competition_2
+        ).score == 1000
+
+    def test_calculate_q18_place_not_verified(
+        self, competition, participants_competition_start,
+        junior_detachment_3
+    ):
+        Q18DetachmentReport.objects.create(
+            competition=competition,
+            detachment=junior_detachment_3,
+            participants_number=10
+        )
+        calculate_q18_place(competition.id)
+        assert not Q18Ranking.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestQ5Places:
+    """Тесты расчета мест по 5 показателю."""
+
+    @pytest.fixture
+    def q5_reports(
+        self, competition, participants_competition_tandem,
+        participants_competition_start, detachment_competition,
+        junior_detachment, junior_detachment_3
+    ):
+        reports = {}
+        for detachment, members, verified, not_verified in (
+            (junior_detachment_3, 2, 2, 1),
+            (junior_detachment, 10, 9, 0),
+            (detachment_competition, 10, 5, 0),
+        ):
+            report = Q5DetachmentReport.objects.create(
+                competition=competition,
+                detachment=detachment,
+                june_15_detachment_members=members
+            )
+            Q5EducatedParticipant.objects.bulk_create([
+                Q5EducatedParticipant(
+                    detachment_report=report,
+                    name=f'Участник {index}',
+                    is_verified=index < verified
+                )
+                for index in range(verified + not_verified)
+            ])
+            reports[detachment.id] = report
+        return reports
+
+    def test_calculate_q5_place(
+        self, q5_reports, competition, junior_detachment_3,
+        django_assert_max_num_queries
+    ):
+        with django_assert_max_num_queries(8):
+            calculate_q5_place(competition.id)
+        # 2 из 2 - 100%
+        assert Q5Ranking.objects.get(detachment=junior_detachment_3).place == 1
+        # (90% - 2 место + 50% - 10 место) / 2
+        assert Q5TandemRanking.objects.get().place == 6
+
+    def test_calculate_q5_place_without_changes(
+        self, q5_reports, competition, django_assert_num_queries
+    ):
+        """Повторный расчет без изменений ничего не пишет в БД."""
+        calculate_q5_place(competition.id)
+        with django_assert_num_queries(4):
+            calculate_q5_place(competition.id)
+
+    def test_calculate_q5_place_changes(
+        self, q5_reports, competition, junior_detachment,
+        junior_detachment_3
+    ):
+        calculate_q5_place(competition.id)
+        tandem_ranking = Q5TandemRanking.objects.get()
+        q5_reports[junior_detachment_3.id].delete()
+        Q5EducatedParticipant.objects.filter(
+            detachment_report=q5_reports[junior_detachment.id]
+        ).update(is_verified=True)
+        calculate_q5_place(competition.id)
+        assert not Q5Ranking.objects.exists()
+        # (100% - 1 место + 50% - 10 место) / 2
+        tandem_ranking.refresh_from_db()
+        assert tandem_ranking.place == 6
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestSavePlaces:
+    """Тесты записи мест в таблицы рейтингов."""
+
+    def test_save_places_writes_changes(
+        self, competition, detachment_competition, junior_detachment,
+        junior_detachment_2, junior_detachment_3
+    ):
+        """Строки обновляются на месте, выпавшие из рейтинга - удаляются."""
+        save_places(
+            competition.id, Q7Ranking, Q7TandemRanking,
+            [(junior_detachment_2.id, 1), (junior_detachment_3.id, 2)],
+            [(junior_detachment.id, detachment_competition.id, 1)]
+        )
+        ranking = Q7Ranking.objects.get(detachment=junior_detachment_3)
+        save_places(
+            competition.id, Q7Ranking, Q7TandemRanking,
+            [(junior_detachment_3.id, 1)],
+            []
+        )
+        assert list(
+            Q7Ranking.objects.values_list('id', 'detachment_id', 'place')
+        ) == [(ranking.id, junior_detachment_3.id, 1)]
+        assert not Q7TandemRanking.objects.exists()
+
+    def test_save_places_without_changes(
+        self, competition, junior_detachment_3, django_assert_num_queries
+    ):
+        places = [(junior_detachment_3.id, 1)]
+        save_places(competition.id, Q7Ranking, Q7TandemRanking, places, [])
+        with django_assert_num_queries(2):
+            save_places(
+                competition.id, Q7Ranking, Q7TandemRanking, places, []
+            )
+
+    def test_save_place_upsert(
+        self, competition, detachment_competition, junior_detachment,
+        junior_detachment_3
+    ):
+        """Повторная запись места не создает дубликатов."""
+        for place in (3, 1):
+            save_place(2, competition.id, junior_detachment_3.id, place)
+            save_tandem_place(
+                2, competition.id, detachment_competition.id,
+                junior_detachment.id, place + 0.5
+            )
+        assert Q2Ranking.objects.get().place == 1
+        assert Q2TandemRanking.objects.get().place == 1.5
+        assert pop_dirty_rankings(0) == [(competition.id, 2)]
+
+    def test_save_tandem_place_after_repairing(
+        self, competition, detachment_competition, junior_detachment,
+        junior_detachment_2, junior_detachment_3
+    ):
+        """Строки прежней пары и старт рейтинга заменяются новой парой."""
+        save_tandem_place(
+            2, competition.id, detachment_competition.id,
+            junior_detachment_2.id, 3
+        )
+        save_place(2, competition.id, junior_detachment.id, 2)
+        save_tandem_place(
+            2, competition.id, detachment_competition.id,
+            junior_detachment.id, 1.5
+        )
+        tandem_ranking = Q2TandemRanking.objects.get()
+        assert tandem_ranking.junior_detachment == junior_detachment
+        assert tandem_ranking.place == 1.5
+        assert not Q2Ranking.objects.exists()
+        save_place(2, competition.id, junior_detachment.id, 2)
+        save_tandem_place(
+            2, competition.id, junior_detachment_3.id,
+            junior_detachment_2.id, 4
+        )
+        assert Q2Ranking.objects.get().detachment == junior_detachment
+        assert Q2TandemRanking.objects.get().junior_detachment == (
+            junior_detachment_2
+        )
+
+    def test_verify_q13_event_tandem(
+        self, authenticated_client_commissar_regional_headquarter,
+        competition, participants_competition_tandem,
+        detachment_competition, junior_detachment
+    ):
+        """Место тандема по 13 показателю - среднее мест обоих отрядов."""
+        report = Q13DetachmentReport.objects.create(
+            competition=competition, detachment=junior_detachment
+        )
+        Q13DetachmentReport.objects.create(
+            competition=competition, detachment=detachment_competition
+        )
+        event = Q13EventOrganization.objects.create(
+            detachment_report=report,
+            event_type='Спортивное',
+            event_link='https://example.com/q13'
+        )
+        response = (
+            authenticated_client_commissar_regional_headquarter.post(
+                f'/api/v1/competitions/{competition.id}/reports/q13/'
+                f'{report.id}/verify-event/{event.id}/'
+            )
+        )
+        assert response.status_code == 200
+        # (5 место + 6 место) / 2
+        tandem_ranking = Q13TandemRanking.objects.get()
+        assert tandem_ranking.junior_detachment == junior_detachment
+        assert tandem_ranking.place == 5.5
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestDirtyRankings:
+    """Тесты отметки показателей для пересчета рейтинга."""
+
+    def test_participants_mark_all_rankings(
+        self, competition, participants_competition_start
+    ):
+        indicators = set(
+            RankingRecalculation.objects.filter(
+                competition=competition
+            ).values_list('indicator', flat=True)
+        )
+        assert indicators == set(RANKED_INDICATORS)
+
+    def test_report_marks_ranking(
+        self, competition, junior_detachment
+    ):
+        Q18DetachmentReport.objects.create(
+            competition=competition,
+            detachment=junior_detachment,
+            participants_number=10
+        )
+        assert pop_dirty_rankings(0) == [(competition.id, 18)]
+        assert not RankingRecalculation.objects.exists()
+
+    def test_q3_q4_marks_participant_competitions(
+        self, competition, participants_competition_start,
+        junior_detachment_3, user_2
+    ):
+        """Попытки и должности отмечают только конкурсы своего отряда."""
+        Competitions.objects.create(name='Другой конкурс')
+        pop_dirty_rankings(0)
+        Attempt.objects.create(user=user_2, category='safety')
+        assert pop_dirty_rankings(0) == []
+        Attempt.objects.create(
+            user=junior_detachment_3.commander, category='safety', score=60
+        )
+        q3_q4_marks = [(competition.id, 3), (competition.id, 4)]
+        assert pop_dirty_rankings(0) == q3_q4_marks
+        position = UserDetachmentPosition.objects.create(
+            user=user_2, headquarter=junior_detachment_3
+        )
+        assert pop_dirty_rankings(0) == q3_q4_marks
+        position.is_trusted = True
+        position.save()
+        assert pop_dirty_rankings(0) == []
+
+    def test_pop_dirty_rankings_delay(
+        self, competition, junior_detachment
+    ):
+        """Недавно измененные показатели ждут следующего запуска таски."""
+        Q18DetachmentReport.objects.create(
+            competition=competition,
+            detachment=junior_detachment,
+            participants_number=10
+        )
+        assert pop_dirty_rankings(60) == []
+        assert RankingRecalculation.objects.filter(indicator=18).exists()
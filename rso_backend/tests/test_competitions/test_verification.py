@@ -0,0 +1,153 @@
+from http import HTTPStatus
+
+import pytest
+
+from competitions.models import (
+    Q13DetachmentReport, Q13EventOrganization, Q13Ranking, Q13TandemRanking,
+    Q7, Q9, Q7Report, Q9Report
+)
+from competitions.rankings import pop_dirty_rankings
+from competitions.verification import verify_events, verify_q13_events
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestEventsVerification:
+    competition_url = '/api/v1/competitions/'
+
+    def test_bulk_accept_q7(
+        self, authenticated_client_commissar_regional_headquarter,
+        report_question7_not_verif, report_question7_not_verif2,
+        report_question7_not_verif3, competition
+    ):
+        """Верифицируются только мероприятия отрядов рег. штаба."""
+        start_event = report_question7_not_verif2.participation_data.get()
+        other_region_event = (
+            report_question7_not_verif3.participation_data.get()
+        )
+        url = (
+            f'{self.competition_url}{competition.id}/reports/q7/bulk_accept/'
+        )
+        pop_dirty_rankings(0)
+        response = authenticated_client_commissar_regional_headquarter.post(
+            url,
+            {'ids': [report_question7_not_verif.id, start_event.id,
+                     other_region_event.id]},
+            format='json'
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert response.data == {'verified': 2}
+        assert Q7.objects.get(id=other_region_event.id).is_verified is False
+        assert dict(Q7Report.objects.values_list(
+            'id', 'score'
+        )) == {
+            report_question7_not_verif.detachment_report_id: 10,
+            report_question7_not_verif2.id: 100,
+            report_question7_not_verif3.id: 0,
+        }
+        assert pop_dirty_rankings(0) == [(competition.id, 7)]
+
+    def test_bulk_accept_empty_ids(
+        self, authenticated_client_commissar_regional_headquarter,
+        competition
+    ):
+        url = (
+            f'{self.competition_url}{competition.id}/reports/q7/bulk_accept/'
+        )
+        response = authenticated_client_commissar_regional_headquarter.post(
+            url, {'ids': []}, format='json'
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_verify_events_avg_score(
+        self, report_question9_verif, competition, django_assert_num_queries
+    ):
+        """Очки отчета Q9 - среднее призовое место одним запросом."""
+        event = Q9.objects.create(
+            event_name='Мероприятие 2',
+            prize_place=3,
+            detachment_report=report_question9_verif.detachment_report
+        )
+        # Транзакция верификации и отметка рейтинга после ее коммита.
+        with django_assert_num_queries(9):
+            verified = verify_events(9, competition.id, [event.id])
+        assert verified == 1
+        assert Q9Report.objects.get().score == 2.5
+        assert Q9.objects.filter(is_verified=False).exists() is False
+
+    def test_verify_events_already_verified(
+        self, report_question7_verif, competition, django_assert_num_queries
+    ):
+        with django_assert_num_queries(3):
+            verified = verify_events(
+                7, competition.id, [report_question7_verif.id]
+            )
+        assert verified == 0
+
+    def test_verify_q13_events(
+        self, authenticated_client_commissar_regional_headquarter,
+        competition, participants_competition_tandem,
+        participants_competition_start, detachment_competition,
+        junior_detachment, junior_detachment_3
+    ):
+        """Места старт и тандем по 13 показателю пересчитываются разом."""
+        tandem_report = Q13DetachmentReport.objects.create(
+            competition=competition, detachment=junior_detachment
+        )
+        start_report = Q13DetachmentReport.objects.create(
+            competition=competition, detachment=junior_detachment_3
+        )
+        events = [
+            Q13EventOrganization.objects.create(
+                detachment_report=report,
+                event_type=event_type,
+                event_link='https://example.com/q13'
+            )
+            for report, event_type in (
+                (tandem_report, 'Спортивное'),
+                (start_report, 'Спортивное'),
+                (start_report, 'Творческое'),
+            )
+        ]
+        url = self.competition_url + f'{competition.id}/reports/q13/'
+        response = authenticated_client_commissar_regional_headquarter.post(
+            url + 'verify-events/',
+            {'ids': [event.id for event in events]},
+            format='json'
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert response.data == {'verified': 3}
+        assert Q13Ranking.objects.get().place == 4
+        # (5 место + 6 место у наставника без отчета) / 2
+        tandem_ranking = Q13TandemRanking.objects.get()
+        assert tandem_ranking.detachment == detachment_competition
+        assert tandem_ranking.place == 5.5
+        response = authenticated_client_commissar_regional_headquarter.post(
+            url + 'verify-events/',
+            {'ids': [event.id for event in events]},
+            format='json'
+        )
+        assert response.data == {'verified': 0}
+
+    def test_verify_q13_events_after_repairing(
+        self, competition, participants_competition_tandem,
+        detachment_competition, junior_detachment, junior_detachment_2
+    ):
+        """Строка прежней пары наставника заменяется новой."""
+        Q13TandemRanking.objects.create(
+            competition=competition,
+            detachment=detachment_competition,
+            junior_detachment=junior_detachment_2,
+            place=3
+        )
+        report = Q13DetachmentReport.objects.create(
+            competition=competition, detachment=junior_detachment
+        )
+        event = Q13EventOrganization.objects.create(
+            detachment_report=report,
+            event_type='Спортивное',
+            event_link='https://example.com/q13'
+        )
+        assert verify_q13_events(competition.id, [event.id]) == 1
+        tandem_ranking = Q13TandemRanking.objects.get()
+        assert tandem_ranking.junior_detachment == junior_detachment
+        assert tandem_ranking.place == 5.5
@@ -279,3 +279,31 @@ class TestDetachmentsPositions:
         assert response.status_code == HTTPStatus.FORBIDDEN, (
             'Response code is not 403.'
         )
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestDetachmentsList:
+    url = '/api/v1/detachments/'
+
+    def test_detachments_list_counts(
+            self, authenticated_det_com_1a, detachment_1a, detachment_1b,
+            detachment_positions, user_with_position_in_detachment,
+            django_assert_max_num_queries
+    ):
+        user_with_position_in_detachment.membership_fee = True
+        user_with_position_in_detachment.save()
+        with django_assert_max_num_queries(5):
+            response = authenticated_det_com_1a.get(self.url)
+        assert response.status_code == HTTPStatus.OK
+        data = response.data['results']
+        counts = {
+            detachment['id']: (
+                detachment['members_count'],
+                detachment['participants_count'],
+                detachment['events_count'],
+            )
+            for detachment in data
+        }
+        assert counts[detachment_1a.id] == (2, 3, 0)
+        assert counts[detachment_1b.id] == (1, 1, 0)
+        assert data[0]['area']['id'] is not None
@@ -0,0 +1,126 @@
+import pytest
+from django.core.exceptions import ValidationError
+
+from competitions.models import CompetitionParticipants, Competitions
+from competitions.rankings import pop_dirty_rankings
+from headquarters.memberships import (add_detachment_members,
+                                      remove_unit_members)
+from headquarters.models import (UserCentralHeadquarterPosition,
+                                 UserDetachmentPosition,
+                                 UserDistrictHeadquarterPosition,
+                                 UserEducationalHeadquarterPosition,
+                                 UserLocalHeadquarterPosition,
+                                 UserRegionalHeadquarterPosition)
+
+POSITION_MODELS = (
+    UserCentralHeadquarterPosition,
+    UserDistrictHeadquarterPosition,
+    UserRegionalHeadquarterPosition,
+    UserLocalHeadquarterPosition,
+    UserEducationalHeadquarterPosition,
+    UserDetachmentPosition,
+)
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestMemberships:
+    """Тесты пакетного добавления и исключения членов отрядов."""
+
+    def test_add_detachment_members(
+        self, central_hq, district_hq_1a, regional_hq_1a, local_hq_1a,
+        edu_hq_1a, detachment_1a, detachment_1b, user_unverified,
+        user_with_position_in_detachment, django_assert_max_num_queries
+    ):
+        user_with_position_in_detachment.membership_fee = True
+        user_with_position_in_detachment.save()
+        with django_assert_max_num_queries(50):
+            created = add_detachment_members([
+                (user_unverified.id, detachment_1a.id),
+                (user_with_position_in_detachment.id, detachment_1b.id),
+            ])
+        assert created == 12
+        for position_model in POSITION_MODELS:
+            assert position_model.objects.filter(
+                user=user_unverified
+            ).exists()
+        assert UserDetachmentPosition.objects.get(
+            user=user_with_position_in_detachment
+        ).headquarter == detachment_1b
+        regional_hq_1a.refresh_from_db()
+        assert regional_hq_1a.participants_number == 2
+        assert regional_hq_1a.members_number == 1
+        assert user_unverified in district_hq_1a.get_users()
+
+    def test_add_existing_member(
+        self, detachment_1a, user_unverified
+    ):
+        add_detachment_members([(user_unverified.id, detachment_1a.id)])
+        with pytest.raises(ValidationError):
+            add_detachment_members([(user_unverified.id, detachment_1a.id)])
+
+    def test_remove_unit_members(
+        self, district_hq_1a, edu_hq_1a, detachment_1a, user_unverified,
+        user_with_position_in_detachment, django_assert_max_num_queries
+    ):
+        add_detachment_members([
+            (user_unverified.id, detachment_1a.id),
+            (user_with_position_in_detachment.id, detachment_1a.id),
+        ])
+        with django_assert_max_num_queries(40):
+            deleted, deleted_per_model = remove_unit_members([
+                user_unverified.id, user_with_position_in_detachment.id
+            ])
+        assert deleted == 12
+        assert deleted_per_model[UserDetachmentPosition._meta.label] == 2
+        for position_model in POSITION_MODELS:
+            assert not position_model.objects.exists()
+        edu_hq_1a.refresh_from_db()
+        assert edu_hq_1a.participants_number == 0
+        assert user_unverified not in district_hq_1a.get_users()
+
+    def test_members_change_marks_q3_q4_rankings(
+        self, detachment_1a, user_unverified
+    ):
+        """Места Q3 и Q4 зависят от состава отрядов."""
+        competition = Competitions.objects.create(name='Конкурс')
+        Competitions.objects.create(name='Другой конкурс')
+        CompetitionParticipants.objects.create(
+            competition=competition, junior_detachment=detachment_1a
+        )
+        pop_dirty_rankings(0)
+        add_detachment_members([(user_unverified.id, detachment_1a.id)])
+        assert pop_dirty_rankings(0) == [
+            (competition.id, 3), (competition.id, 4)
+        ]
+        UserDetachmentPosition.objects.get(user=user_unverified).delete()
+        assert pop_dirty_rankings(0) == [
+            (competition.id, 3), (competition.id, 4)
+        ]
+        assert not UserRegionalHeadquarterPosition.objects.exists()
+
+    def test_add_headquarter_staff_member(
+        self, central_hq, regional_hq_1a, detachment_1a, user_unverified
+    ):
+        """Должность в штабе не мешает вступить в отряд и не дублируется."""
+        UserRegionalHeadquarterPosition.objects.bulk_create([
+            UserRegionalHeadquarterPosition(
+                user=user_unverified, headquarter=regional_hq_1a
+            )
+        ])
+        assert add_detachment_members(
+            [(user_unverified.id, detachment_1a.id)]
+        ) == 5
+        assert UserDetachmentPosition.objects.filter(
+            user=user_unverified
+        ).exists()
+        assert UserRegionalHeadquarterPosition.objects.filter(
+            user=user_unverified
+        ).count() == 1
+
+    def test_delete_position_without_user(self, central_hq):
+        """Должность без пользователя удаляется стандартным способом."""
+        position = UserCentralHeadquarterPosition.objects.bulk_create(
+            [UserCentralHeadquarterPosition(headquarter=central_hq)]
+        )[0]
+        UserCentralHeadquarterPosition.objects.get(pk=position.pk).delete()
+        assert not UserCentralHeadquarterPosition.objects.exists()
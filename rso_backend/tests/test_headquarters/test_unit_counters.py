@@ -0,0 +1,81 @@
+import pytest
+from django.core.management import call_command
+
+from headquarters.models import (CentralHeadquarter, Detachment,
+                                 RegionalHeadquarter, UserDetachmentPosition)
+from users.models import RSOUser
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestUnitCounters:
+    """Тесты счетчиков участников и мероприятий структурных единиц."""
+
+    def test_member_counters(self, detachment, user_2):
+        position = UserDetachmentPosition.objects.create(
+            user=user_2, headquarter=detachment
+        )
+        detachment.refresh_from_db()
+        assert detachment.participants_number == 1
+        assert detachment.members_number == 0
+
+        user_2.membership_fee = True
+        user_2.save()
+        detachment.refresh_from_db()
+        assert detachment.members_number == 1
+        regional_headquarter = RegionalHeadquarter.objects.get(
+            id=detachment.regional_headquarter_id
+        )
+        assert regional_headquarter.members_number == 1
+
+        position.delete()
+        detachment.refresh_from_db()
+        assert detachment.participants_number == 0
+        assert detachment.members_number == 0
+
+    def test_central_headquarter_counters(self, central_headquarter, user):
+        central_headquarter.refresh_from_db()
+        assert central_headquarter.participants_number == (
+            RSOUser.objects.count()
+        )
+        user.membership_fee = True
+        user.save()
+        RSOUser.objects.create_user(username='newuser', password='p@ss12345')
+        central_headquarter.refresh_from_db()
+        assert central_headquarter.participants_number == (
+            RSOUser.objects.count()
+        )
+        assert central_headquarter.members_number == 1
+
+    def test_event_counter(self, event_individual, regional_headquarter):
+        regional_headquarter.refresh_from_db()
+        assert regional_headquarter.events_number == 1
+        event_individual.delete()
+        regional_headquarter.refresh_from_db()
+        assert regional_headquarter.events_number == 0
+
+    def test_event_counter_organizer_change(
+        self, event_individual, regional_headquarter, regional_headquarter_2
+    ):
+        event_individual.org_regional_headquarter = regional_headquarter_2
+        event_individual.save()
+        regional_headquarter.refresh_from_db()
+        regional_headquarter_2.refresh_from_db()
+        assert regional_headquarter.events_number == 0
+        assert regional_headquarter_2.events_number == 1
+
+    def test_reconcile_unit_counters(
+        self, central_headquarter, detachment, user_2
+    ):
+        UserDetachmentPosition.objects.create(
+            user=user_2, headquarter=detachment
+        )
+        CentralHeadquarter.objects.update(participants_number=0)
+        Detachment.objects.update(participants_number=10, events_number=3)
+        call_command('reconcile_unit_counters')
+        detachment.refresh_from_db()
+        central_headquarter.refresh_from_db()
+        assert detachment.participants_number == 1
+        assert detachment.events_number == 0
+        assert central_headquarter.participants_number == (
+            RSOUser.objects.count()
+        )
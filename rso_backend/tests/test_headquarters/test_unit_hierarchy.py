@@ -0,0 +1,117 @@
+import pytest
+from django.core.management import call_command
+
+from headquarters.filters import EducationalHeadquarterFilter
+from headquarters.models import (Detachment, DistrictHeadquarter,
+                                 EducationalHeadquarter, UnitHierarchy)
+from headquarters.registry_serializers import (
+    DistrictHeadquarterRegistrySerializer)
+from users.filters import RSOUserFilter
+from users.models import RSOUser
+
+
+def get_hierarchy_rows():
+    return set(UnitHierarchy.objects.values_list(
+        'ancestor_type', 'ancestor_id', 'descendant_type', 'descendant_id'
+    ))
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestUnitHierarchy:
+    """Тесты таблицы замыкания иерархии структурных единиц."""
+
+    def test_related_units(
+        self, district_hq_1a, regional_hq_1a, local_hq_1a, local_hq_1b,
+        edu_hq_1a, detachment_1a, detachment_1b
+    ):
+        district_units = district_hq_1a.get_related_units()
+        assert set(district_units['detachments']) == {
+            detachment_1a, detachment_1b
+        }
+        assert set(district_units['local_headquarters']) == {
+            local_hq_1a, local_hq_1b
+        }
+        regional_units = regional_hq_1a.get_related_units()
+        assert set(regional_units['local_headquarters']) == {
+            local_hq_1a, local_hq_1b
+        }
+        assert set(local_hq_1a.get_descendants(Detachment)) == {
+            detachment_1a, detachment_1b
+        }
+
+    def test_unit_users(
+        self, district_hq_1a, detachment_1a, detachment_positions,
+        user_with_position_in_detachment, detachment_commander_1a,
+        django_assert_num_queries
+    ):
+        with django_assert_num_queries(1):
+            users = set(district_hq_1a.get_users())
+        assert user_with_position_in_detachment in users
+        assert detachment_commander_1a in users
+        detachment_positions[0].delete()
+        assert user_with_position_in_detachment not in set(
+            district_hq_1a.get_users()
+        )
+
+    def test_move_unit(
+        self, local_hq_1a, local_hq_1b, edu_hq_1a, detachment_1a,
+        detachment_commander_1a
+    ):
+        edu_hq_1a.local_headquarter = local_hq_1b
+        edu_hq_1a.save()
+        assert detachment_1a in local_hq_1b.get_descendants(Detachment)
+        assert detachment_1a not in local_hq_1a.get_descendants(Detachment)
+        assert detachment_commander_1a in local_hq_1b.get_users()
+        assert edu_hq_1a in local_hq_1b.get_descendants(
+            EducationalHeadquarter
+        )
+
+    def test_rebuild_matches_signals(
+        self, detachment_1a, detachment_1b, detachment_positions
+    ):
+        rows = get_hierarchy_rows()
+        UnitHierarchy.objects.all().delete()
+        call_command('rebuild_unit_hierarchy')
+        assert get_hierarchy_rows() == rows
+
+    def test_user_filter_by_unit_name(
+        self, local_hq_1a, detachment_1a, detachment_positions,
+        user_with_position_in_detachment
+    ):
+        users = RSOUserFilter(
+            {'local_headquarter__name': local_hq_1a.name},
+            queryset=RSOUser.objects.all()
+        ).qs
+        assert user_with_position_in_detachment in users
+        assert not RSOUserFilter(
+            {'local_headquarter__name': 'нет такого штаба'},
+            queryset=RSOUser.objects.all()
+        ).qs.exists()
+
+    def test_registry_descendants_counts(
+        self, district_hq_1a, local_hq_1a, local_hq_1b, edu_hq_1a,
+        detachment_1a, detachment_1b, django_assert_num_queries
+    ):
+        queryset = DistrictHeadquarterRegistrySerializer.annotate_queryset(
+            DistrictHeadquarter.objects.all()
+        )
+        with django_assert_num_queries(1):
+            data = DistrictHeadquarterRegistrySerializer(
+                queryset, many=True
+            ).data
+        assert data[0]['regional_headquarters_count'] == 1
+        assert data[0]['local_headquarters_count'] == 2
+        assert data[0]['detachments_count'] == 2
+
+    def test_filter_by_district_headquarter(
+        self, district_hq_1a, edu_hq_1a
+    ):
+        headquarters = EducationalHeadquarterFilter(
+            {'district_headquarter__name': district_hq_1a.name},
+            queryset=EducationalHeadquarter.objects.all()
+        ).qs
+        assert edu_hq_1a in headquarters
+        assert not EducationalHeadquarterFilter(
+            {'district_headquarter__name': 'нет такого штаба'},
+            queryset=EducationalHeadquarter.objects.all()
+        ).qs.exists()
@@ -0,0 +1,56 @@
+import pytest
+from django.core.management import call_command
+
+from questions.models import Attempt, BestAttempt
+from questions.utils import (
+    get_best_scores, refresh_best_attempts, update_best_attempt
+)
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestBestAttempts:
+    """Тесты таблицы лучших результатов тестов."""
+
+    def test_update_best_attempt_keeps_max(self, user):
+        for score in (70, 90, 80):
+            update_best_attempt(Attempt.objects.create(
+                user=user, category='safety', score=score
+            ))
+        assert get_best_scores([user.id]) == {(user.id, 'safety'): 90}
+
+    def test_get_best_scores_category(self, user, user_2):
+        update_best_attempt(Attempt.objects.create(
+            user=user, category='safety', score=60
+        ))
+        update_best_attempt(Attempt.objects.create(
+            user=user_2, category='university', score=75
+        ))
+        assert get_best_scores(
+            [user.id, user_2.id], category='university'
+        ) == {(user_2.id, 'university'): 75}
+
+    def test_backfill_command(self, user, user_2):
+        Attempt.objects.create(user=user, category='university', score=50)
+        Attempt.objects.create(user=user, category='university', score=85)
+        Attempt.objects.create(user=user_2, category='safety', score=40)
+        call_command('backfill_best_attempts')
+        assert get_best_scores([user.id, user_2.id]) == {
+            (user.id, 'university'): 85,
+            (user_2.id, 'safety'): 40,
+        }
+
+    def test_refresh_after_attempt_delete(self, user):
+        attempt = Attempt.objects.create(
+            user=user, category='safety', score=90
+        )
+        update_best_attempt(attempt)
+        update_best_attempt(Attempt.objects.create(
+            user=user, category='safety', score=30
+        ))
+        attempt.delete()
+        assert BestAttempt.objects.get(user=user).score == 30
+
+    def test_refresh_removes_stale_categories(self, user):
+        BestAttempt.objects.create(user=user, category='safety', score=10)
+        assert refresh_best_attempts() == 0
+        assert not BestAttempt.objects.exists()
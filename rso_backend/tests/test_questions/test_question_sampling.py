@@ -0,0 +1,55 @@
+import pytest
+
+from questions.models import AnswerOption, Question
+from questions.utils import get_block_question_ids, sample_block_questions
+
+
+@pytest.fixture
+def block_questions():
+    """Десять вопросов пятого блока с вариантами ответа."""
+    questions = []
+    for number in range(10):
+        question = Question.objects.create(
+            block=Question.Block.WORK_SAFETY, title=f'Вопрос {number}'
+        )
+        AnswerOption.objects.create(question=question, text='Ответ')
+        questions.append(question)
+    return questions
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestQuestionSampling:
+    """Тесты случайной выборки вопросов блока."""
+
+    def test_sample_block_questions(self, block_questions):
+        questions = sample_block_questions(5, 4)
+        question_ids = [question['id'] for question in questions]
+        assert len(set(question_ids)) == 4
+        assert set(question_ids) <= {
+            question.id for question in block_questions
+        }
+        assert all(len(question['answer_options']) == 1
+                   for question in questions)
+
+    def test_sample_more_than_block(self, block_questions):
+        assert len(sample_block_questions(5, 15)) == 10
+
+    def test_sample_uses_cache(
+        self, block_questions, django_assert_num_queries
+    ):
+        sample_block_questions(5, 10)
+        with django_assert_num_queries(0):
+            assert len(sample_block_questions(5, 10)) == 10
+
+    def test_cache_invalidated_on_change(self, block_questions):
+        assert len(get_block_question_ids(5)) == 10
+        question = block_questions[0]
+        sample_block_questions(5, 10)
+        AnswerOption.objects.create(question=question, text='Второй ответ')
+        question_data, = [
+            question_data for question_data in sample_block_questions(5, 10)
+            if question_data['id'] == question.id
+        ]
+        assert len(question_data['answer_options']) == 2
+        question.delete()
+        assert len(get_block_question_ids(5)) == 9
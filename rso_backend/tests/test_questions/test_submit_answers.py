@@ -0,0 +1,111 @@
+import pytest
+
+from questions.models import (
+    AnswerOption, Attempt, BestAttempt, Question, UserAnswer
+)
+
+SUBMIT_ANSWERS_URL = '/api/v1/submit_answers/'
+
+
+@pytest.fixture
+def attempt_questions(user):
+    """Попытка пользователя из трех вопросов с двумя вариантами ответа."""
+    attempt = Attempt.objects.create(user=user, category='university')
+    questions = []
+    for number in range(3):
+        question = Question.objects.create(title=f'Вопрос {number}')
+        AnswerOption.objects.create(
+            question=question, text='Верно', is_correct=True
+        )
+        AnswerOption.objects.create(
+            question=question, text='Неверно', is_correct=False
+        )
+        questions.append(question)
+    attempt.questions.set(questions)
+    return attempt, questions
+
+
+def get_answers(questions, correct_count):
+    return [
+        {
+            'question_id': question.id,
+            'answer_option_id': question.answer_options.get(
+                is_correct=number < correct_count
+            ).id
+        }
+        for number, question in enumerate(questions)
+    ]
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestSubmitAnswers:
+    """Тесты отправки ответов на вопросы попытки."""
+
+    def test_submit_answers_score(
+        self, authenticated_client, attempt_questions
+    ):
+        attempt, questions = attempt_questions
+        response = authenticated_client.post(
+            SUBMIT_ANSWERS_URL,
+            {'answers': get_answers(questions, 2)},
+            format='json'
+        )
+        assert response.status_code == 200, response.data
+        attempt.refresh_from_db()
+        assert attempt.score == 10
+        assert UserAnswer.objects.filter(attempt=attempt).count() == 3
+        assert BestAttempt.objects.get(user=attempt.user).score == 10
+
+    def test_submit_answers_constant_queries(
+        self, authenticated_client, attempt_questions,
+        django_assert_max_num_queries
+    ):
+        _, questions = attempt_questions
+        answers = get_answers(questions, 3)
+        with django_assert_max_num_queries(16):
+            response = authenticated_client.post(
+                SUBMIT_ANSWERS_URL, {'answers': answers}, format='json'
+            )
+        assert response.status_code == 200, response.data
+
+    def test_submit_answers_foreign_question(
+        self, authenticated_client, attempt_questions
+    ):
+        attempt, questions = attempt_questions
+        other_question = Question.objects.create(title='Чужой вопрос')
+        option = AnswerOption.objects.create(
+            question=other_question, text='Верно', is_correct=True
+        )
+        answers = get_answers(questions, 3) + [
+            {'question_id': other_question.id, 'answer_option_id': option.id}
+        ]
+        response = authenticated_client.post(
+            SUBMIT_ANSWERS_URL, {'answers': answers}, format='json'
+        )
+        assert response.status_code == 400
+        assert not UserAnswer.objects.filter(attempt=attempt).exists()
+
+    def test_submit_answers_foreign_option(
+        self, authenticated_client, attempt_questions
+    ):
+        attempt, questions = attempt_questions
+        answers = get_answers(questions, 0)
+        answers[0]['answer_option_id'] = answers[1]['answer_option_id']
+        response = authenticated_client.post(
+            SUBMIT_ANSWERS_URL, {'answers': answers}, format='json'
+        )
+        assert response.status_code == 404
+        assert not UserAnswer.objects.filter(attempt=attempt).exists()
+
+    def test_submit_answers_twice(
+        self, authenticated_client, attempt_questions
+    ):
+        _, questions = attempt_questions
+        answers = get_answers(questions, 1)
+        authenticated_client.post(
+            SUBMIT_ANSWERS_URL, {'answers': answers}, format='json'
+        )
+        response = authenticated_client.post(
+            SUBMIT_ANSWERS_URL, {'answers': answers}, format='json'
+        )
+        assert response.status_code == 400
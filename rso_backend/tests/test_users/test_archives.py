@@ -0,0 +1,34 @@
+import io
+import zipfile
+
+import pytest
+
+from api.utils import iter_zip
+
+
+def test_iter_zip(tmp_path):
+    form_path = tmp_path / 'form.rtf'
+    form_path.write_bytes(b'x' * 1000)
+    chunks = list(iter_zip(
+        [('form.rtf', form_path), ('cert.pdf', b'%PDF')], chunk_size=100
+    ))
+    assert len(chunks) > 10
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.read('form.rtf') == b'x' * 1000
+        assert archive.read('cert.pdf') == b'%PDF'
+
+
+@pytest.mark.django_db
+def test_download_all_forms(authenticated_client):
+    response = authenticated_client.get(
+        '/api/v1/rsousers/me/statement/download_all_forms/'
+    )
+    assert response.status_code == 200
+    assert response.streaming
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+    assert sorted(archive.namelist()) == [
+        'consent_to_the_processing_of_personal_data.rtf',
+        'download_parent_consent_to_the_processing_of_personal_data.rtf',
+        'rso_membership_statement.rtf',
+    ]
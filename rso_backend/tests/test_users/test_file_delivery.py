@@ -0,0 +1,48 @@
+from django.conf import settings as django_settings
+from django.http import FileResponse
+
+from api.utils import FILE_CHUNK_SIZE, file_response
+
+REGULATION_PATH = (
+    django_settings.BASE_DIR / 'templates' / 'competitions'
+    / 'Regulation_on_the_best_LSO_2024.pdf'
+)
+
+
+def test_file_response_streams_by_default(settings):
+    settings.FILE_DELIVERY_BACKEND = ''
+    response = file_response(REGULATION_PATH, 'regulation.pdf')
+    assert isinstance(response, FileResponse)
+    assert response.block_size == FILE_CHUNK_SIZE
+    assert response['Content-Type'] == 'application/pdf'
+    assert 'regulation.pdf' in response['Content-Disposition']
+    response.file_to_stream.close()
+
+
+def test_file_response_x_accel(settings):
+    settings.FILE_DELIVERY_BACKEND = 'x-accel'
+    response = file_response(REGULATION_PATH, 'regulation.pdf')
+    assert response['X-Accel-Redirect'] == (
+        '/protected/templates/competitions/'
+        'Regulation_on_the_best_LSO_2024.pdf'
+    )
+    assert response.content == b''
+    assert response['Content-Disposition'] == (
+        'attachment; filename="regulation.pdf"'
+    )
+
+
+def test_file_response_x_accel_outside_locations(settings, tmp_path):
+    settings.FILE_DELIVERY_BACKEND = 'x-accel'
+    file_path = tmp_path / 'file.txt'
+    file_path.write_text('content')
+    response = file_response(file_path, 'file.txt')
+    assert isinstance(response, FileResponse)
+    assert 'X-Accel-Redirect' not in response
+    assert b''.join(response.streaming_content) == b'content'
+
+
+def test_file_response_x_sendfile(settings):
+    settings.FILE_DELIVERY_BACKEND = 'x-sendfile'
+    response = file_response(REGULATION_PATH, 'regulation.pdf')
+    assert response['X-Sendfile'] == str(REGULATION_PATH)
@@ -0,0 +1,143 @@
+import datetime
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from api import certificates, views
+from api.certificates import (EXTERNAL_CERT, get_certificates_data,
+                              load_cert_resources, write_certificates_archive)
+from headquarters.models import UserRegionalHeadquarterPosition
+from users.models import UserDocuments, UserMemberCertLogs
+
+CERT_DATA = {
+    'cert_start_date': '2024-01-01',
+    'cert_end_date': '2024-12-31',
+    'recipient': 'по месту требования',
+}
+
+
+@pytest.fixture
+def cert_regional_headquarter(regional_headquarter):
+    regional_headquarter.registry_date = datetime.date(2020, 1, 1)
+    regional_headquarter.registry_number = '123'
+    regional_headquarter.case_name = 'Региональном штабе'
+    regional_headquarter.legal_address = 'г. Москва'
+    regional_headquarter.requisites = 'ИНН 7700000000'
+    regional_headquarter.save()
+    return regional_headquarter
+
+
+@pytest.fixture
+def cert_members(cert_regional_headquarter, user_2, user_3):
+    for member in (user_2, user_3):
+        member.date_of_birth = datetime.date(2000, 1, 1)
+        member.save()
+        UserDocuments.objects.filter(user=member).update(
+            inn='123456789012', snils='12345678901'
+        )
+        UserRegionalHeadquarterPosition.objects.create(
+            user=member, headquarter=cert_regional_headquarter
+        )
+    return user_2, user_3
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestMemberCerts:
+    """Тесты пакетного формирования справок о членстве."""
+
+    def test_write_certificates_archive(
+        self, settings, tmp_path, user_commander, cert_members,
+        django_assert_max_num_queries
+    ):
+        settings.MEMBER_CERTS_ROOT = str(tmp_path)
+        ids = [member.id for member in cert_members]
+        with django_assert_max_num_queries(2):
+            certificates_data = get_certificates_data(
+                ids, CERT_DATA, user_commander, EXTERNAL_CERT
+            )
+        archive_path = write_certificates_archive(
+            certificates_data, 'certs.zip', workers=1
+        )
+        with zipfile.ZipFile(archive_path) as archive:
+            assert archive.namelist() == [
+                f'{member.username}.pdf' for member in cert_members
+            ]
+            assert archive.read(archive.namelist()[0]).startswith(b'%PDF')
+
+    def test_cert_resources_loaded_once(
+        self, settings, tmp_path, monkeypatch, user_commander, cert_members
+    ):
+        settings.MEMBER_CERTS_ROOT = str(tmp_path)
+        load_cert_resources()
+        monkeypatch.setattr(certificates.pdfrw, 'PdfReader', None)
+        monkeypatch.setattr(certificates, 'TTFont', None)
+        certificates_data = get_certificates_data(
+            [member.id for member in cert_members], CERT_DATA, user_commander
+        )
+        write_certificates_archive(certificates_data, 'certs.zip', workers=1)
+
+    def test_certificates_data_without_documents(
+        self, user_commander, cert_members
+    ):
+        UserDocuments.objects.filter(user=cert_members[0]).update(inn=None)
+        with pytest.raises(ValidationError):
+            get_certificates_data(
+                [cert_members[0].id], CERT_DATA, user_commander
+            )
+
+    def test_certificates_job(
+        self, client, monkeypatch, user_commander, cert_members
+    ):
+        submitted = []
+        monkeypatch.setattr(
+            views.generate_member_certificates, 'delay',
+            lambda *args: submitted.append(args) or SimpleNamespace(id='1')
+        )
+        token, _ = Token.objects.get_or_create(user=user_commander)
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        ids = [member.id for member in cert_members]
+        response = client.post(
+            '/api/v1/membership_certificates/internal/',
+            {**CERT_DATA, 'ids': ids + ids[:1]},
+            format='json'
+        )
+        assert response.status_code == 202
+        assert response.data == {'task_id': '1'}
+        certificates_data, issuer_id = submitted[0]
+        assert [data['user_id'] for data in certificates_data] == ids
+        assert issuer_id == user_commander.id
+        assert UserMemberCertLogs.objects.filter(
+            cert_issued_by=user_commander
+        ).count() == 2
+
+        # Состояние чужой задачи недоступно, даже если у нее еще нет
+        # метаданных с автором (PENDING).
+        monkeypatch.setattr(views, 'AsyncResult', lambda task_id: (
+            SimpleNamespace(state='PENDING', info=None)
+        ))
+        other_client = APIClient()
+        other_token, _ = Token.objects.get_or_create(user=cert_members[0])
+        other_client.credentials(
+            HTTP_AUTHORIZATION='Token ' + other_token.key
+        )
+        response = other_client.get('/api/v1/membership_certificates/jobs/1/')
+        assert response.status_code == 404
+        response = client.get('/api/v1/membership_certificates/jobs/2/')
+        assert response.status_code == 404
+
+        monkeypatch.setattr(views, 'AsyncResult', lambda task_id: (
+            SimpleNamespace(
+                state='PROGRESS',
+                info={'issuer_id': user_commander.id, 'rendered': 1,
+                      'total': 2}
+            )
+        ))
+        response = client.get('/api/v1/membership_certificates/jobs/1/')
+        assert response.status_code == 200
+        assert response.data == {
+            'state': 'PROGRESS', 'rendered': 1, 'total': 2
+        }
@@ -0,0 +1,99 @@
+import io
+import os
+
+import pytest
+from django.contrib.auth.hashers import check_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from openpyxl import Workbook
+
+from headquarters.models import (UserDetachmentPosition,
+                                 UserRegionalHeadquarterPosition)
+from users.imports import hash_passwords, import_members, save_import_file
+from users.models import RSOUser
+
+
+def make_csv(rows):
+    lines = ['username,first_name,last_name,password,detachment']
+    lines += [','.join(row) for row in rows]
+    return io.BytesIO('\n'.join(lines).encode())
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestMembersImport:
+    """Тесты пакетного импорта пользователей."""
+
+    def test_import_csv(self, central_hq, regional_hq_1a, detachment_1a, user):
+        participants_number = RSOUser.objects.count()
+        file = make_csv([
+            ('member_1', 'Иван', 'Иванов', 'secret_1', str(detachment_1a.id)),
+            ('member_2', 'Петр', 'Петров', 'secret_2', ''),
+            ('member_1', 'Иван', 'Иванов', 'secret_1', ''),
+            (user.username, 'Иван', 'Иванов', 'secret_1', ''),
+            ('member_3', 'Иван', 'Иванов', 'secret_1', '100500'),
+            ('member_4', '', 'Иванов', 'secret_1', ''),
+        ])
+        progress = []
+        result = import_members(
+            file, 'csv', chunk_size=2, workers=1,
+            progress=lambda result: progress.append(result['processed'])
+        )
+        assert result['created'] == 2
+        assert [line for line, _ in result['errors']] == [4, 5, 6, 7]
+        assert progress == [2, 4, 6]
+        member = RSOUser.objects.get(username='member_1')
+        assert check_password('secret_1', member.password)
+        assert member.education and member.media and member.privacy
+        assert UserDetachmentPosition.objects.get(
+            user=member
+        ).headquarter == detachment_1a
+        assert UserRegionalHeadquarterPosition.objects.filter(
+            user=member, headquarter=regional_hq_1a
+        ).exists()
+        assert not UserDetachmentPosition.objects.filter(
+            user__username='member_2'
+        ).exists()
+        central_hq.refresh_from_db()
+        assert central_hq.participants_number == participants_number + 2
+
+    def test_import_xlsx(self, detachment_1a):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(('username', 'first_name', 'last_name', 'password',
+                      'detachment'))
+        sheet.append(('member_1', 'Иван', 'Иванов', None, detachment_1a.id))
+        file = io.BytesIO()
+        workbook.save(file)
+        file.seek(0)
+        result = import_members(file, 'xlsx', workers=1)
+        assert result == {'processed': 1, 'created': 1, 'errors': []}
+        member = RSOUser.objects.get(username='member_1')
+        assert not member.has_usable_password()
+        assert member.userdetachmentposition.headquarter == detachment_1a
+
+    def test_import_members_command(self, tmp_path, detachment_1a):
+        path = tmp_path / 'members.csv'
+        path.write_bytes(make_csv([
+            ('member_1', 'Иван', 'Иванов', 'secret_1', str(detachment_1a.id)),
+        ]).getvalue())
+        call_command('import_members', str(path), '--workers', '1')
+        assert RSOUser.objects.filter(username='member_1').exists()
+
+
+def test_save_import_file(settings, tmp_path):
+    settings.MEMBER_IMPORTS_ROOT = str(tmp_path / 'imports')
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    file_path = save_import_file(
+        SimpleUploadedFile('members.csv', make_csv([]).getvalue())
+    )
+    assert os.path.dirname(file_path) == settings.MEMBER_IMPORTS_ROOT
+    assert os.path.basename(file_path) != 'members.csv'
+    assert file_path.endswith('.csv')
+    assert not os.path.exists(settings.MEDIA_ROOT)
+
+
+def test_hash_passwords_in_process_pool():
+    passwords = hash_passwords(['secret_1', 'secret_2', ''], workers=2)
+    assert check_password('secret_1', passwords[0])
+    assert check_password('secret_2', passwords[1])
+    assert not check_password('', passwords[2])
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import pytest
+
+from api.permissions import IsCommanderOrTrustedAnywhere
+from api.utils import (check_trusted_for_detachments,
+                       check_trusted_for_regionalhead,
+                       get_detachment_commander_num, get_role_context,
+                       get_regional_hq_commander_num, is_regional_commander,
+                       is_stuff_or_central_commander)
+from headquarters.models import (Detachment, RegionalHeadquarter,
+                                 UserRegionalHeadquarterPosition)
+from users.models import RSOUser
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestRoleContext:
+    """Тесты контекста ролей пользователя."""
+
+    def test_commander_roles(self, user, detachment):
+        role_context = get_role_context(user)
+        assert role_context.commander_id(Detachment) == detachment.id
+        assert role_context.commander_id(RegionalHeadquarter) is None
+        assert get_detachment_commander_num(user) == detachment.id
+        assert get_regional_hq_commander_num(user) is None
+        assert not is_regional_commander(user)
+
+    def test_trusted_roles(
+        self, user_trusted_in_regional_hq, regional_headquarter, detachment
+    ):
+        UserRegionalHeadquarterPosition.objects.create(
+            user=user_trusted_in_regional_hq,
+            headquarter=regional_headquarter,
+            is_trusted=True
+        )
+        request = SimpleNamespace(
+            user=user_trusted_in_regional_hq, method='PATCH'
+        )
+        assert check_trusted_for_detachments(request, detachment)
+        assert check_trusted_for_regionalhead(request, regional_headquarter)
+        assert check_trusted_for_regionalhead(request)
+        assert not is_stuff_or_central_commander(request)
+
+    def test_role_context_loaded_once(
+        self, user, detachment, django_assert_num_queries
+    ):
+        request = SimpleNamespace(user=user, method='PATCH')
+        with django_assert_num_queries(1):
+            is_stuff_or_central_commander(request)
+            check_trusted_for_detachments(request, detachment)
+            check_trusted_for_regionalhead(request)
+            assert IsCommanderOrTrustedAnywhere().has_object_permission(
+                request, None, None
+            )
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestRoleContextCache:
+    """Тесты кеширования ролей пользователя между запросами."""
+
+    def test_role_context_cached(
+        self, user, detachment, django_assert_num_queries
+    ):
+        get_role_context(user)
+        with django_assert_num_queries(0):
+            role_context = get_role_context(RSOUser(id=user.id))
+        assert role_context.commander_id(Detachment) == detachment.id
+
+    def test_position_invalidates_cache(
+        self, user_trusted_in_regional_hq, regional_headquarter
+    ):
+        assert not get_role_context(
+            RSOUser(id=user_trusted_in_regional_hq.id)
+        ).is_trusted_anywhere()
+        UserRegionalHeadquarterPosition.objects.create(
+            user=user_trusted_in_regional_hq,
+            headquarter=regional_headquarter,
+            is_trusted=True
+        )
+        assert get_role_context(
+            RSOUser(id=user_trusted_in_regional_hq.id)
+        ).is_trusted_anywhere()
+
+    def test_commander_change_invalidates_cache(
+        self, user, user_2, detachment
+    ):
+        get_role_context(RSOUser(id=user.id))
+        get_role_context(RSOUser(id=user_2.id))
+        detachment.commander = user_2
+        detachment.save()
+        assert get_role_context(
+            RSOUser(id=user.id)
+        ).commander_id(Detachment) is None
+        assert get_role_context(
+            RSOUser(id=user_2.id)
+        ).commander_id(Detachment) == detachment.id
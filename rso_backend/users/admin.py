@@ -1,19 +1,27 @@
+from celery.result import AsyncResult
 from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import Group
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 from django_celery_beat.models import (ClockedSchedule, CrontabSchedule,
                                        IntervalSchedule, PeriodicTask,
                                        SolarSchedule)
 from import_export.admin import ImportExportModelAdmin
 from rest_framework.authtoken.models import TokenProxy
 
-from users.forms import RSOUserForm
+from users.forms import MembersImportForm, RSOUserForm
+from users.imports import save_import_file
 from users.models import (RSOUser, UserDocuments, UserEducation, UserMedia,
                           UserMemberCertLogs, UserMembershipLogs, UserParent,
                           UserPrivacySettings, UserRegion,
                           UserStatementDocuments, UserVerificationLogs)
 from users.resources import RSOUserResource
+from users.tasks import import_members_file
 
 
 class UserRegionInline(admin.StackedInline):
@@ -54,6 +62,9 @@ class UserStatementDocumentsInLine(admin.StackedInline):
 @admin.register(RSOUser)
 class UserAdmin(ImportExportModelAdmin, BaseUserAdmin):
     resource_class = RSOUserResource
+    import_export_change_list_template = (
+        'admin/users/rsouser/change_list_import_members.html'
+    )
     add_fieldsets = (
         (None, {
             'classes': ('wide',),
@@ -114,6 +125,67 @@ class UserAdmin(ImportExportModelAdmin, BaseUserAdmin):
     filter_horizontal = ()
     fieldsets = ()
 
+    def get_urls(self):
+        info = self.get_model_info()
+        return [
+            path(
+                'import-members/',
+                self.admin_site.admin_view(self.import_members_view),
+                name='%s_%s_import_members' % info,
+            ),
+            path(
+                'import-members/<str:task_id>/',
+                self.admin_site.admin_view(self.import_members_status_view),
+                name='%s_%s_import_members_status' % info,
+            ),
+        ] + super().get_urls()
+
+    def import_members_view(self, request):
+        """
+        Пакетный импорт пользователей с добавлением в отряды.
+
+        Файл сохраняется в MEMBER_IMPORTS_ROOT и обрабатывается Celery-таской,
+        ход импорта доступен по ссылке из сообщения.
+        """
+        if not self.has_import_permission(request):
+            raise PermissionDenied
+        form = MembersImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            import_file = form.cleaned_data['import_file']
+            file_path = save_import_file(import_file)
+            task = import_members_file.delay(
+                file_path, form.cleaned_data['chunk_size']
+            )
+            status_url = reverse(
+                'admin:%s_%s_import_members_status' % self.get_model_info(),
+                args=(task.id,)
+            )
+            self.message_user(
+                request, f'Импорт запущен. Ход импорта: {status_url}'
+            )
+            return redirect(
+                'admin:%s_%s_changelist' % self.get_model_info()
+            )
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'form': form,
+            'title': 'Пакетный импорт пользователей',
+        }
+        return TemplateResponse(
+            request, 'admin/users/rsouser/import_members.html', context
+        )
+
+    def import_members_status_view(self, request, task_id):
+        """Состояние таски импорта пользователей."""
+        if not self.has_import_permission(request):
+            raise PermissionDenied
+        result = AsyncResult(task_id)
+        info = result.info
+        if not isinstance(info, dict):
+            info = str(info) if info is not None else None
+        return JsonResponse({'state': result.state, 'info': info})
+
 
 @admin.register(UserMembershipLogs)
 class UserMembershipLogsAdmin(admin.ModelAdmin):
@@ -1,9 +1,21 @@
 from django_filters import rest_framework as filters
 
+from headquarters.hierarchy import get_descendant_ids
+from headquarters.models import (Detachment, DistrictHeadquarter,
+                                 EducationalHeadquarter, LocalHeadquarter,
+                                 RegionalHeadquarter)
 from users.models import RSOUser
 
 
 class RSOUserFilter(filters.FilterSet):
+    UNIT_NAME_FILTERS = {
+        'district_headquarter__name': DistrictHeadquarter,
+        'regional_headquarter__name': RegionalHeadquarter,
+        'local_headquarter__name': LocalHeadquarter,
+        'educational_headquarter__name': EducationalHeadquarter,
+        'detachment__name': Detachment,
+    }
+
     date_of_birth = filters.DateFilter()
     date_of_birth_gte = filters.DateFilter(
         field_name='date_of_birth', lookup_expr='gte'
@@ -12,28 +24,23 @@ class RSOUserFilter(filters.FilterSet):
         field_name='date_of_birth', lookup_expr='lte'
     )
     district_headquarter__name = filters.CharFilter(
-        field_name='userdistrictheadquarterposition__headquarter__name',
-        lookup_expr='icontains',
+        method='filter_unit_name',
         label='Название окружного штаба'
     )
     regional_headquarter__name = filters.CharFilter(
-        field_name='userregionalheadquarterposition__headquarter__name',
-        lookup_expr='icontains',
+        method='filter_unit_name',
         label='Название регионального штаба'
     )
     local_headquarter__name = filters.CharFilter(
-        field_name='userlocalheadquarterposition__headquarter__name',
-        lookup_expr='icontains',
+        method='filter_unit_name',
         label='Название местного штаба'
     )
     educational_headquarter__name = filters.CharFilter(
-        field_name='usereducationalheadquarterposition__headquarter__name',
-        lookup_expr='icontains',
+        method='filter_unit_name',
         label='Название образовательного штаба'
     )
     detachment__name = filters.CharFilter(
-        field_name='userdetachmentposition__headquarter__name',
-        lookup_expr='icontains',
+        method='filter_unit_name',
         label='Название отряда'
     )
     region = filters.CharFilter(
@@ -58,3 +65,12 @@ class RSOUserFilter(filters.FilterSet):
             'membership_fee',
             'region',
         )
+
+    def filter_unit_name(self, queryset, name, value):
+        """Пользователи, входящие в структурные единицы с названием,
+        содержащим value, или в любые входящие в них единицы."""
+        unit_model = self.UNIT_NAME_FILTERS[name]
+        return queryset.filter(id__in=get_descendant_ids(
+            unit_model,
+            unit_model.objects.filter(name__icontains=value).values('id')
+        ))
@@ -1,6 +1,7 @@
 from dal import autocomplete
 from django import forms
 
+from users.imports import get_import_format
 from users.models import RSOUser
 
 
@@ -13,3 +14,21 @@ class RSOUserForm(forms.ModelForm):
         }
 
 
+class MembersImportForm(forms.Form):
+    import_file = forms.FileField(
+        label='Файл CSV/XLSX',
+        help_text=(
+            'Колонки: username, first_name, last_name, password, '
+            'detachment (id отряда, необязательно).'
+        )
+    )
+    chunk_size = forms.IntegerField(
+        label='Размер пачки',
+        min_value=1,
+        initial=1000,
+    )
+
+    def clean_import_file(self):
+        import_file = self.cleaned_data['import_file']
+        get_import_format(import_file.name)
+        return import_file
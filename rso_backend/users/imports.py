@@ -0,0 +1,262 @@
+import csv
+import io
+import os
+import uuid
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from openpyxl import load_workbook
+
+from api.utils import process_map
+from headquarters.counters import change_unit_counters
+from headquarters.memberships import add_detachment_members
+from headquarters.models import CentralHeadquarter, Detachment
+from users.models import (RSOUser, UserDocuments, UserEducation,
+                          UserForeignDocuments, UserMedia, UserParent,
+                          UserPrivacySettings, UserRegion,
+                          UserStatementDocuments)
+
+# Колонки файла импорта. detachment - id отряда, необязательная.
+IMPORT_COLUMNS = ('username', 'first_name', 'last_name', 'password',
+                  'detachment')
+REQUIRED_COLUMNS = ('username', 'first_name', 'last_name')
+IMPORT_FORMATS = ('csv', 'xlsx')
+
+# Модели, которые RSOUser.save создает для каждого пользователя.
+USER_RELATED_MODELS = (
+    UserEducation,
+    UserDocuments,
+    UserForeignDocuments,
+    UserRegion,
+    UserPrivacySettings,
+    UserMedia,
+    UserStatementDocuments,
+    UserParent,
+)
+
+
+def get_import_format(file_name: str) -> str:
+    """Формат файла импорта по расширению."""
+    file_format = os.path.splitext(file_name)[1].lstrip('.').lower()
+    if file_format not in IMPORT_FORMATS:
+        raise ValidationError(
+            'Поддерживаются только файлы форматов: '
+            f'{", ".join(IMPORT_FORMATS)}.'
+        )
+    return file_format
+
+
+def save_import_file(import_file) -> str:
+    """
+    Сохраняет загруженный файл импорта в MEMBER_IMPORTS_ROOT.
+
+    Имя файла случайное, расширение сохраняется для определения формата.
+
+    :param import_file: загруженный файл
+    :return: путь к сохраненному файлу
+    """
+    os.makedirs(settings.MEMBER_IMPORTS_ROOT, exist_ok=True)
+    file_path = os.path.join(
+        settings.MEMBER_IMPORTS_ROOT,
+        f'{uuid.uuid4().hex}.{get_import_format(import_file.name)}'
+    )
+    with open(file_path, 'wb') as file:
+        for chunk in import_file.chunks():
+            file.write(chunk)
+    return file_path
+
+
+def read_member_rows(file, file_format: str):
+    """
+    Построчно читает файл импорта, не загружая его целиком в память.
+
+    :param file: бинарный файловый объект
+    :param file_format: csv или xlsx
+    :return: генератор словарей {колонка: значение}
+    """
+    if file_format == 'csv':
+        yield from csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig'))
+        return
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [
+            str(column).strip() if column is not None else ''
+            for column in next(rows, ())
+        ]
+        for row in rows:
+            if any(value is not None for value in row):
+                yield dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+def _clean_value(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def hash_passwords(passwords, workers: int = None) -> list[str]:
+    """
+    Хеширует пароли в пуле процессов.
+
+    Хеширование занимает основное время импорта, поэтому распределяется
+    по ядрам.
+
+    :param passwords: пароли, пустой пароль - непригодный для входа
+    :param workers: количество процессов, по умолчанию - число ядер
+    """
+    return list(process_map(
+        make_password,
+        [password or None for password in passwords],
+        workers
+    ))
+
+
+def _validate_chunk(rows, seen_usernames) -> tuple[list, list]:
+    """
+    Проверяет пачку строк файла.
+
+    :param rows: пары (номер строки, данные)
+    :param seen_usernames: имена пользователей из предыдущих строк файла
+    :return: корректные строки и ошибки (номер строки, сообщение)
+    """
+    valid_rows = []
+    errors = []
+    usernames = [data['username'] for _, data in rows]
+    existing_usernames = set(RSOUser.objects.filter(
+        username__in=usernames
+    ).values_list('username', flat=True))
+    detachment_ids = {
+        data['detachment'] for _, data in rows
+        if data['detachment'].isdigit()
+    }
+    existing_detachment_ids = {
+        str(detachment_id) for detachment_id in Detachment.objects.filter(
+            id__in=detachment_ids
+        ).values_list('id', flat=True)
+    }
+    for line, data in rows:
+        missing = [column for column in REQUIRED_COLUMNS if not data[column]]
+        if missing:
+            errors.append((
+                line,
+                f'Не заполнены обязательные поля: {", ".join(missing)}.'
+            ))
+            continue
+        try:
+            RSOUser.username_validator(data['username'])
+        except ValidationError as error:
+            errors.append((line, ' '.join(error.messages)))
+            continue
+        if (
+            data['username'] in seen_usernames
+            or data['username'] in existing_usernames
+        ):
+            errors.append(
+                (line, f'Пользователь {data["username"]} уже существует.')
+            )
+            continue
+        if (
+            data['detachment']
+            and data['detachment'] not in existing_detachment_ids
+        ):
+            errors.append(
+                (line, f'Отряд с id {data["detachment"]} не найден.')
+            )
+            continue
+        seen_usernames.add(data['username'])
+        valid_rows.append((line, data))
+    return valid_rows, errors
+
+
+def _create_chunk(rows, workers=None) -> int:
+    """
+    Создает пользователей пачки и добавляет их в отряды.
+
+    bulk_create не вызывает RSOUser.save и сигналы, поэтому связанные
+    модели и счетчики центрального штаба заполняются здесь же.
+    """
+    passwords = hash_passwords(
+        [data['password'] for _, data in rows], workers
+    )
+    users = [
+        RSOUser(
+            username=data['username'],
+            first_name=data['first_name'],
+            last_name=data['last_name'],
+            password=password,
+        )
+        for (_, data), password in zip(rows, passwords)
+    ]
+    with transaction.atomic():
+        RSOUser.objects.bulk_create(users)
+        for related_model in USER_RELATED_MODELS:
+            related_model.objects.bulk_create(
+                [related_model(user=user) for user in users]
+            )
+        change_unit_counters(
+            CentralHeadquarter, None, participants_number=len(users)
+        )
+        pairs = [
+            (user.id, int(data['detachment']))
+            for user, (_, data) in zip(users, rows)
+            if data['detachment']
+        ]
+        if pairs:
+            add_detachment_members(pairs)
+    return len(users)
+
+
+def import_members(file, file_format: str, chunk_size: int = 1000,
+                   workers: int = None, progress=None) -> dict:
+    """
+    Пакетный импорт пользователей из CSV/XLSX.
+
+    Файл читается потоково, пачками по chunk_size строк. Каждая пачка
+    проверяется и создается в отдельной транзакции: некорректные строки
+    пропускаются и попадают в список ошибок, ошибка при добавлении
+    в отряды откатывает только свою пачку.
+
+    :param file: бинарный файловый объект
+    :param file_format: csv или xlsx
+    :param chunk_size: количество строк в пачке
+    :param workers: количество процессов для хеширования паролей
+    :param progress: функция, которая вызывается после каждой пачки
+                     с текущим результатом импорта
+    :return: словарь {'processed', 'created', 'errors'}, ошибки -
+             список [номер строки, сообщение]
+    """
+    result = {'processed': 0, 'created': 0, 'errors': []}
+    seen_usernames = set()
+    # Первая строка файла - заголовок.
+    rows = enumerate(read_member_rows(file, file_format), start=2)
+    while chunk := list(islice(rows, chunk_size)):
+        chunk = [
+            (line, {
+                column: _clean_value(data.get(column))
+                for column in IMPORT_COLUMNS
+            })
+            for line, data in chunk
+        ]
+        valid_rows, errors = _validate_chunk(chunk, seen_usernames)
+        if valid_rows:
+            try:
+                result['created'] += _create_chunk(valid_rows, workers)
+            except ValidationError as error:
+                message = ' '.join(error.messages)
+                seen_usernames -= {data['username'] for _, data in valid_rows}
+                errors += [(line, message) for line, _ in valid_rows]
+        result['processed'] += len(chunk)
+        result['errors'] += [
+            [line, message] for line, message in sorted(errors)
+        ]
+        if progress is not None:
+            progress(result)
+    return result
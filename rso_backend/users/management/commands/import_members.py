@@ -0,0 +1,57 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from users.imports import get_import_format, import_members
+
+
+class Command(BaseCommand):
+    help = (
+        'Пакетный импорт пользователей из CSV/XLSX файла с колонками '
+        'username, first_name, last_name, password и detachment (id отряда).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к CSV/XLSX файлу.')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Количество строк, которые проверяются и создаются '
+                 'в одной транзакции.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Количество процессов для хеширования паролей. '
+                 'По умолчанию - число ядер.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            file_format = get_import_format(options['path'])
+        except ValidationError as error:
+            raise CommandError(' '.join(error.messages))
+
+        def report_progress(result):
+            self.stdout.write(
+                f'Обработано строк: {result["processed"]}, '
+                f'создано пользователей: {result["created"]}'
+            )
+
+        with open(options['path'], 'rb') as file:
+            result = import_members(
+                file,
+                file_format,
+                chunk_size=options['chunk_size'],
+                workers=options['workers'],
+                progress=report_progress
+            )
+        for line, message in result['errors']:
+            self.stderr.write(f'Строка {line}: {message}')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Создано пользователей: {result["created"]}, '
+                f'ошибок: {len(result["errors"])}'
+            )
+        )
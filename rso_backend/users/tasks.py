@@ -1,7 +1,10 @@
 import logging
+import os
 
 from celery import shared_task
 
+from headquarters.counters import reset_members_counters
+from users.imports import get_import_format, import_members
 from users.models import RSOUser
 
 logger = logging.getLogger('tasks')
@@ -10,6 +13,7 @@ logger = logging.getLogger('tasks')
 @shared_task
 def reset_membership_fee():
     RSOUser.objects.update(membership_fee=False)
+    reset_members_counters()
     logger.info(
         'Успешно сброшен статус оплаты для всех пользователей.'
     )
@@ -26,3 +30,35 @@ def debug_periodic_task():
         'Выполнена тестовая периодическая задача для проверки корректной '
         'работы Celery воркера и Celery Beat локально и на сервере.'
     )
+
+
+@shared_task(bind=True)
+def import_members_file(self, file_path, chunk_size=1000):
+    """Пакетный импорт пользователей из загруженного CSV/XLSX файла.
+
+    Ход импорта сохраняется в бэкенде результатов Celery в состоянии
+    PROGRESS после каждой пачки. Загруженный файл удаляется после импорта.
+    """
+
+    def report_progress(result):
+        self.update_state(state='PROGRESS', meta={
+            'processed': result['processed'],
+            'created': result['created'],
+            'errors_count': len(result['errors']),
+        })
+
+    try:
+        with open(file_path, 'rb') as file:
+            result = import_members(
+                file,
+                get_import_format(file_path),
+                chunk_size=chunk_size,
+                progress=report_progress
+            )
+    finally:
+        os.remove(file_path)
+    logger.info(
+        f'Импорт пользователей из {os.path.basename(file_path)}: '
+        f'создано {result["created"]}, ошибок {len(result["errors"])}.'
+    )
+    return result
@@ -1,13 +1,8 @@
-import mimetypes
-import os
-import zipfile
-
 from dal import autocomplete
 from django.db.models import Q
 from django.conf import settings
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
-from django.http.response import HttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
@@ -19,7 +14,8 @@ from api.mixins import RetrieveUpdateViewSet, RetrieveViewSet
 from api.permissions import (IsCommanderOrTrustedAnywhere,
                              IsDetComOrRegComAndRegionMatches, IsStuffOrAuthor)
 from api.tasks import send_reset_password_email_without_user
-from api.utils import download_file, get_user
+from api.utils import (download_file, get_user, get_user_roles_data,
+                       zip_response)
 from rso_backend.settings import BASE_DIR, RSOUSERS_CACHE_TTL
 from users.filters import RSOUserFilter
 from users.models import (RSOUser, UserDocuments, UserEducation,
@@ -180,8 +176,9 @@ class RSOUserViewSet(RetrieveUpdateViewSet):
         является командиром.
         """
         if request.method == 'GET':
-            serializer = UserCommanderSerializer(request.user)
-            return Response(serializer.data)
+            return Response(get_user_roles_data(
+                request.user, 'commander', UserCommanderSerializer
+            ))
 
     @action(
         detail=False,
@@ -209,8 +206,9 @@ class RSOUserViewSet(RetrieveUpdateViewSet):
         Представляет должности текущего юзера на каждом структурном уровне.
         """
         if request.method == 'GET':
-            serializer = UserHeadquarterPositionSerializer(request.user)
-            return Response(serializer.data)
+            return Response(get_user_roles_data(
+                request.user, 'positions', UserHeadquarterPositionSerializer
+            ))
 
     @action(
         detail=True,
@@ -224,8 +222,9 @@ class RSOUserViewSet(RetrieveUpdateViewSet):
         """
         if request.method == 'GET':
             user = get_object_or_404(RSOUser, id=pk)
-            serializer = UserHeadquarterPositionSerializer(user)
-            return Response(serializer.data)
+            return Response(get_user_roles_data(
+                user, 'positions', UserHeadquarterPositionSerializer
+            ))
 
     @action(
         detail=True,
@@ -240,8 +239,9 @@ class RSOUserViewSet(RetrieveUpdateViewSet):
         """
         if request.method == 'GET':
             user = get_object_or_404(RSOUser, id=pk)
-            serializer = UserCommanderSerializer(user)
-            return Response(serializer.data)
+            return Response(get_user_roles_data(
+                user, 'commander', UserCommanderSerializer
+            ))
 
 
 class SafeUserViewSet(RetrieveViewSet):
@@ -542,22 +542,14 @@ class UserStatementDocumentsViewSet(BaseUserViewSet):
         Архив доступен по эндпоинту /users/me/statement/download_all_forms/
         """
 
-        filepath = BASE_DIR.joinpath('templates', 'membership')
-        zip_filename = BASE_DIR.joinpath('templates', 'entry_forms.zip')
-        file_dir = os.listdir(filepath)
-        with zipfile.ZipFile(zip_filename, 'w') as zipf:
-            for file in file_dir:
-                zipf.write(os.path.join(filepath, file), file)
-        zipf.close()
-        filepath = BASE_DIR.joinpath('templates', 'entry_forms.zip')
-        path = open(filepath, 'rb')
-        mime_type, _ = mimetypes.guess_type(filepath)
-        response = HttpResponse(path, content_type=mime_type)
-        response['Content-Disposition'] = (
-                'attachment; filename=%s' % 'entry_forms.zip'
+        forms_dir = BASE_DIR.joinpath('templates', 'membership')
+        return zip_response(
+            (
+                (form_path.name, form_path)
+                for form_path in sorted(forms_dir.iterdir())
+            ),
+            'entry_forms.zip'
         )
-        os.remove(filepath)
-        return response
 
 
 class UsersParentViewSet(BaseUserViewSet):